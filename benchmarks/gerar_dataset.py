@@ -0,0 +1,175 @@
+# benchmarks/gerar_dataset.py
+"""
+Gera um dataset sintético com o mesmo layout do UEyes, para benchmarks e CI:
+
+    <destino>/info.csv                                  Image Name;Category;Block;Train/Test
+    <destino>/images/<mídia>.png                        imagens "de interface" (blocos coloridos)
+    <destino>/eyetracker_logs/<bloco>_kh0<pp>_fixations.csv   colunas no formato Gazepoint
+    <destino>/saliency_maps/{heatmaps,fixmaps,overlay_heatmaps}_<d>/...
+    <destino>/scanpaths/paths_<d>/<mídia>/<pp>.png
+
+As fixações de cada imagem são sorteadas ao redor de alguns pontos de
+interesse próprios da imagem (compartilhados pelos participantes) mais um
+viés central, então heatmaps, métricas e similaridade de scanpaths têm
+estrutura parecida com a dos dados reais. Tudo é determinístico pela semente.
+
+Uso:
+    python -m benchmarks.gerar_dataset /tmp/ueyes_sintetico --imagens 200 --participantes 16
+"""
+import os
+import argparse
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Categorias do UEyes e tamanho típico (largura, altura) das capturas de cada uma.
+CATEGORIAS = {
+    'webpage': (1440, 900),
+    'desktop UI': (1280, 800),
+    'mobile UI': (390, 844),
+    'poster': (720, 1024),
+}
+CABECALHO_LOG = ("MEDIA_ID,MEDIA_NAME,CNT,TIME,TIMETICK,FPOGX,FPOGY,FPOGS,FPOGD,FPOGID,FPOGV,"
+                 "BPOGX,BPOGY,BPOGV,USER")
+
+
+def _imagem_interface(rng, largura, altura):
+    """Imagem com fundo claro e blocos coloridos, parecida com uma captura de interface."""
+    imagem = Image.new('RGB', (largura, altura), tuple(int(c) for c in rng.integers(225, 256, 3)))
+    draw = ImageDraw.Draw(imagem)
+    for _ in range(int(rng.integers(8, 20))):
+        x0, y0 = rng.integers(0, largura - 10), rng.integers(0, altura - 10)
+        x1 = min(largura, x0 + int(rng.integers(20, max(21, largura // 2))))
+        y1 = min(altura, y0 + int(rng.integers(10, max(11, altura // 4))))
+        draw.rectangle((int(x0), int(y0), int(x1), int(y1)), fill=tuple(int(c) for c in rng.integers(0, 256, 3)))
+    return imagem
+
+
+def _mapa_gaussiano(pontos, pesos, largura, altura, sigma):
+    """Mapa em tons de cinza (uint8) com uma gaussiana por ponto de interesse."""
+    yy, xx = np.mgrid[0:altura, 0:largura].astype(np.float32)
+    mapa = np.zeros((altura, largura), dtype=np.float32)
+    for (px, py), peso in zip(pontos, pesos):
+        mapa += peso * np.exp(-((xx - px * largura) ** 2 + (yy - py * altura) ** 2) / (2 * sigma ** 2))
+    return (mapa / max(mapa.max(), 1e-6) * 255).astype(np.uint8)
+
+
+def gerar_dataset(destino, num_imagens=40, num_participantes=8, num_blocos=4, fixacoes_por_imagem=(8, 40),
+                  duracoes=('7s',), escala_imagens=0.5, com_mapas=True, semente=0):
+    """
+    Gera o dataset sintético em 'destino' (que deve estar vazio ou não existir).
+
+    Args:
+        num_imagens (int): Total de imagens, distribuídas entre as categorias e os blocos.
+        num_participantes (int): Participantes; cada um tem um log por bloco.
+        fixacoes_por_imagem (tuple): Faixa (mín, máx) de fixações de um participante por imagem.
+        duracoes (tuple): Durações dos mapas pré-calculados ('1s', '3s', '7s').
+        escala_imagens (float): Fator aplicado aos tamanhos típicos de cada categoria.
+        com_mapas (bool): Se False, não gera saliency_maps/ nem scanpaths/.
+
+    Returns:
+        dict: Resumo (imagens, participantes, logs e fixações gerados).
+    """
+    rng = np.random.default_rng(semente)
+    for sub in ('images', 'eyetracker_logs'):
+        os.makedirs(os.path.join(destino, sub), exist_ok=True)
+
+    nomes_categorias = list(CATEGORIAS)
+    imagens = []
+    linhas_info = ["Image Name;Category;Block;Train/Test"]
+    for i in range(num_imagens):
+        nome = f"{int(rng.integers(0, 1 << 24)):06x}{i:04d}.png"
+        categoria = nomes_categorias[i % len(nomes_categorias)]
+        bloco = i % num_blocos + 1
+        largura, altura = (max(32, int(round(d * escala_imagens))) for d in CATEGORIAS[categoria])
+        # Pontos de interesse da imagem (compartilhados por todos os participantes).
+        num_pontos = int(rng.integers(2, 6))
+        pontos = rng.uniform(0.1, 0.9, size=(num_pontos, 2))
+        pesos = rng.dirichlet(np.ones(num_pontos))
+        imagens.append((nome, categoria, bloco, largura, altura, pontos, pesos))
+        linhas_info.append(f"{nome};{categoria};{bloco};{'train' if rng.random() < 0.8 else 'test'}")
+        _imagem_interface(rng, largura, altura).save(os.path.join(destino, 'images', nome))
+    with open(os.path.join(destino, 'info.csv'), 'w', encoding='utf-8') as f:
+        f.write("\n".join(linhas_info) + "\n")
+
+    total_fixacoes = 0
+    sequencias = {}
+    for bloco in range(1, num_blocos + 1):
+        do_bloco = [img for img in imagens if img[2] == bloco]
+        for p in range(1, num_participantes + 1):
+            linhas = [CABECALHO_LOG]
+            cnt, tempo, id_fixacao = 0, 0.0, 0
+            for media_id in rng.permutation(len(do_bloco)):
+                nome, _, _, _, _, pontos, pesos = do_bloco[media_id]
+                n = int(rng.integers(fixacoes_por_imagem[0], fixacoes_por_imagem[1] + 1))
+                # Cada fixação cai perto de um ponto de interesse (ou do centro, com 20% de chance).
+                alvo = rng.choice(len(pontos), size=n, p=pesos)
+                centros = np.where(rng.random((n, 1)) < 0.2, 0.5, pontos[alvo])
+                xy = np.clip(centros + rng.normal(0, 0.06, size=(n, 2)), 0.0, 1.0)
+                duracoes_fix = rng.gamma(2.0, 0.12, size=n) + 0.08
+                sequencias[(nome, p)] = xy
+                for (x, y), d in zip(xy, duracoes_fix):
+                    cnt += 1
+                    id_fixacao += 1
+                    bx, by = np.clip((x, y) + rng.normal(0, 0.005, 2), 0, 1)
+                    linhas.append(f"{media_id},{nome},{cnt},{tempo:.5f},{int(tempo * 1e7)},{x:.5f},{y:.5f},"
+                                  f"{tempo:.5f},{d:.5f},{id_fixacao},1,{bx:.5f},{by:.5f},1,")
+                    tempo += d + float(rng.uniform(0.02, 0.06))
+                total_fixacoes += n
+                tempo += 1.0
+            caminho = os.path.join(destino, 'eyetracker_logs', f"{bloco:02d}_kh0{p:02d}_fixations.csv")
+            with open(caminho, 'w', encoding='utf-8') as f:
+                f.write("\n".join(linhas) + "\n")
+
+    if com_mapas:
+        for duracao in duracoes:
+            for sub in (f"heatmaps_{duracao}", f"fixmaps_{duracao}", f"overlay_heatmaps_{duracao}"):
+                os.makedirs(os.path.join(destino, 'saliency_maps', sub), exist_ok=True)
+            for nome, _, _, largura, altura, pontos, pesos in imagens:
+                mapa = _mapa_gaussiano(pontos, pesos, largura, altura, sigma=0.06 * max(largura, altura))
+                Image.fromarray(mapa, 'L').save(os.path.join(destino, 'saliency_maps', f"heatmaps_{duracao}", nome))
+                fixmap = np.zeros_like(mapa)
+                for p in range(1, num_participantes + 1):
+                    xy = sequencias[(nome, p)]
+                    fixmap[np.minimum((xy[:, 1] * altura).astype(int), altura - 1),
+                           np.minimum((xy[:, 0] * largura).astype(int), largura - 1)] = 255
+                Image.fromarray(fixmap, 'L').save(os.path.join(destino, 'saliency_maps', f"fixmaps_{duracao}", nome))
+                base = Image.open(os.path.join(destino, 'images', nome)).convert('RGB')
+                overlay = Image.blend(base, Image.fromarray(mapa, 'L').convert('RGB'), 0.5)
+                overlay.save(os.path.join(destino, 'saliency_maps', f"overlay_heatmaps_{duracao}", f"overlay_{nome}"))
+
+                # Scanpath de cada participante desenhado sobre a imagem reduzida: arquivos distintos, como
+                # no UEyes, para que os caches de miniaturas e payloads não tenham acertos irreais.
+                pasta = os.path.join(destino, 'scanpaths', f"paths_{duracao}", nome.split('.')[0])
+                os.makedirs(pasta, exist_ok=True)
+                miniatura = base.resize((max(1, largura // 2), max(1, altura // 2)))
+                raio = max(2, min(miniatura.size) // 60)
+                for p in range(1, num_participantes + 1):
+                    scanpath = miniatura.copy()
+                    desenho = ImageDraw.Draw(scanpath)
+                    pontos_px = [(float(x) * (scanpath.width - 1), float(y) * (scanpath.height - 1))
+                                 for x, y in sequencias[(nome, p)]]
+                    if len(pontos_px) > 1:
+                        desenho.line(pontos_px, fill=(30, 90, 220), width=max(1, raio // 2))
+                    for x, y in pontos_px:
+                        desenho.ellipse((x - raio, y - raio, x + raio, y + raio), fill=(220, 40, 40))
+                    scanpath.save(os.path.join(pasta, f"{p:02d}.png"))
+
+    resumo = {"imagens": num_imagens, "participantes": num_participantes, "blocos": num_blocos,
+              "logs": num_blocos * num_participantes, "fixacoes": total_fixacoes}
+    print(f"--- DATASET SINTÉTICO GERADO EM '{destino}': {resumo} ---")
+    return resumo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera um dataset sintético com o layout do UEyes.")
+    parser.add_argument("destino", help="Diretório de saída")
+    parser.add_argument("--imagens", type=int, default=40, help="Número de imagens")
+    parser.add_argument("--participantes", type=int, default=8, help="Número de participantes")
+    parser.add_argument("--blocos", type=int, default=4, help="Número de blocos")
+    parser.add_argument("--duracoes", nargs="+", default=['7s'], help="Durações dos mapas (ex: 3s 7s)")
+    parser.add_argument("--escala-imagens", type=float, default=0.5, help="Fator dos tamanhos das imagens")
+    parser.add_argument("--sem-mapas", action="store_true", help="Não gera saliency_maps/ nem scanpaths/")
+    parser.add_argument("--semente", type=int, default=0, help="Semente do gerador")
+    args = parser.parse_args()
+    gerar_dataset(args.destino, args.imagens, args.participantes, args.blocos, duracoes=tuple(args.duracoes),
+                  escala_imagens=args.escala_imagens, com_mapas=not args.sem_mapas, semente=args.semente)
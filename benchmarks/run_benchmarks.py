@@ -0,0 +1,293 @@
+# benchmarks/run_benchmarks.py
+"""
+Benchmarks reprodutíveis das etapas do eyetracking_analyzer sobre um dataset
+sintético (benchmarks/gerar_dataset.py), mais uma execução ponta a ponta do
+main.py com o backend 'falso' sem latência. O resultado é um JSON com os
+tempos de cada caso, para comparar commits:
+
+    python -m benchmarks.run_benchmarks --imagens 40 --participantes 8
+    python -m benchmarks.run_benchmarks --comparar benchmarks/resultados/bench_<commit anterior>.json
+
+O dataset, os caches e as saídas ficam em um diretório temporário (ou em
+--dados), apontado por UEYES_DADOS_DIR antes de o config ser importado.
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import statistics
+import tempfile
+import argparse
+import subprocess
+import contextlib
+from collections import defaultdict
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRETORIO_RESULTADOS = os.path.join(RAIZ, 'benchmarks', 'resultados')
+# Razão (atual / base) da mediana a partir da qual a comparação acusa regressão.
+LIMIAR_REGRESSAO = 1.10
+
+
+def _commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _configurar_execucao_sem_modelo():
+    """Backend 'falso' sem latência nem erros, sem limite de taxa e sem cache de respostas."""
+    import config
+    config.BACKEND_MODELO = 'falso'
+    config.BACKEND_FALSO_LATENCIA_SEGUNDOS = (0.0, 0.0)
+    config.BACKEND_FALSO_TAXA_ERRO_429 = 0.0
+    config.LIMITE_REQUISICOES_POR_MINUTO = 10 ** 9
+    config.LIMITE_TOKENS_POR_MINUTO = 10 ** 12
+    config.USAR_CACHE_RESPOSTAS = False
+
+
+def casos_de_benchmark(dados):
+    """
+    Gera (nome, itens, função) para cada caso. A preparação de um caso roda
+    fora da medição; 'itens' é quantos registros/mídias a função processa.
+    """
+    from eyetracking_analyzer import (
+        fixation_index, data_loader, prompt_builder, visualizer, pdf_generator, reporter, image_payload,
+        saliency_metrics, scanpath_similarity, map_store
+    )
+
+    saida = os.path.join(dados, 'bench_saida')
+    os.makedirs(saida, exist_ok=True)
+
+    yield 'fixation_index.construir_indice_fixacoes', 1, fixation_index.construir_indice_fixacoes
+    fixation_index.carregar_indice_fixacoes()
+    yield 'fixation_index.carregar_indice_fixacoes', 1, fixation_index.carregar_indice_fixacoes
+
+    registros = data_loader.buscar_dados_participante()
+    n = len(registros)
+    yield 'data_loader.buscar_dados_participante', n, data_loader.buscar_dados_participante
+    yield 'data_loader.dados_oculares', n, lambda: [r.dados_oculares for r in registros]
+
+    yield 'prompt_builder.construir_prompt_completo', n, lambda: [prompt_builder.construir_prompt_completo(r) for r in registros]
+    yield 'prompt_builder.codificar_fixacoes', n, lambda: [prompt_builder.codificar_fixacoes(r.fixacoes) for r in registros]
+    yield 'prompt_builder.agrupar_em_lotes', n, lambda: list(prompt_builder.agrupar_em_lotes(registros, 32_000, 8))
+
+    por_midia = defaultdict(list)
+    for r in registros:
+        por_midia[r.media_name].append(r)
+    midias = list(por_midia.items())
+
+    def heatmaps():
+        for media, lista in midias:
+            visualizer.gerar_heatmaps_em_lote(lista, lista[0].image_path,
+                                              [os.path.join(saida, f"h_{media}_{r.participante}.png") for r in lista])
+
+    def heatmaps_duracoes():
+        for media, lista in midias:
+            visualizer.gerar_heatmaps_por_duracao(
+                lista, lista[0].image_path,
+                [[os.path.join(saida, f"h_{media}_{r.participante}_{d}.png") for d in ('1s', '3s', '7s')] for r in lista])
+
+    def scanpaths():
+        for media, lista in midias:
+            visualizer.gerar_scanpaths_em_lote(lista, lista[0].image_path,
+                                               [os.path.join(saida, f"s_{media}_{r.participante}.png") for r in lista])
+
+    yield 'visualizer.gerar_heatmaps_em_lote', n, heatmaps
+    yield 'visualizer.gerar_heatmaps_por_duracao', n, heatmaps_duracoes
+    yield 'visualizer.gerar_scanpaths_em_lote', n, scanpaths
+
+    amostra = registros[:min(n, 20)]
+    yield 'pdf_generator.compor_imagem', len(amostra), lambda: [
+        pdf_generator.compor_imagem(pdf_generator._imagens_para_compor(r)) for r in amostra]
+    yield 'pdf_generator.criar_relatorio_pdf', len(amostra), lambda: [
+        pdf_generator.criar_relatorio_pdf(r, "Resposta de benchmark. " * 50) for r in amostra]
+
+    resultados = [{"participante": r.participante, "media_name": r.media_name, "categoria": r.categoria,
+                   "bloco": r.bloco, "prompt": "x" * 4000, "Resposta": "y" * 2000} for r in registros]
+    caminho_jsonl = os.path.join(saida, 'relatorio.jsonl')
+
+    def escrever_relatorio():
+        with reporter.EscritorRelatorioJsonl(caminho_jsonl, modo='w') as escritor:
+            for resultado in resultados:
+                escritor.escrever(resultado)
+
+    yield 'reporter.EscritorRelatorioJsonl', n, escrever_relatorio
+    escrever_relatorio()
+    yield 'reporter.carregar_chaves_concluidas', n, lambda: reporter.carregar_chaves_concluidas(caminho_jsonl)
+
+    imagens = sorted({r.image_path for r in registros})
+
+    def payload_frio():
+        image_payload._preparar_cache.cache_clear()
+        shutil.rmtree(image_payload.PAYLOAD_CACHE_DIR, ignore_errors=True)
+        [image_payload.preparar_imagem(c) for c in imagens]
+
+    yield 'image_payload.preparar_imagem', len(imagens), payload_frio
+
+    yield 'map_store.empacotar_familia', len(imagens), lambda: map_store.empacotar_familia('heatmaps_7s', 320)
+    map_store.carregar_pacote_mapas('heatmaps_7s', 320)
+    yield 'saliency_metrics.avaliar_midia', n, lambda: [
+        saliency_metrics.avaliar_midia(media, [r.participante for r in lista]) for media, lista in midias]
+
+    coordenadas = [[(r.fixacoes['FPOGX'], r.fixacoes['FPOGY']) for r in lista] for _, lista in midias]
+    yield 'scanpath_similarity.matrizes_similaridade', len(midias), lambda: [
+        scanpath_similarity.matrizes_similaridade(c) for c in coordenadas]
+
+
+def casos_de_benchmark_filtrados(dados, filtro):
+    """Prepara os casos (a preparação roda mesmo para os filtrados, pois uns dependem dos outros)."""
+    for nome, itens, funcao in casos_de_benchmark(dados):
+        if not filtro or filtro in nome:
+            yield nome, itens, funcao
+
+
+def medir_caso(funcao, repeticoes):
+    """Executa 'funcao' 'repeticoes' vezes com a saída padrão suprimida; retorna os tempos."""
+    tempos = []
+    for _ in range(repeticoes):
+        with contextlib.redirect_stdout(io.StringIO()):
+            inicio = time.perf_counter()
+            funcao()
+            tempos.append(time.perf_counter() - inicio)
+    return tempos
+
+
+def resumir_tempos(tempos, itens):
+    mediana = statistics.median(tempos)
+    return {"itens": itens, "tempos_s": [round(t, 6) for t in tempos], "min_s": round(min(tempos), 6),
+            "mediana_s": round(mediana, 6), "itens_por_s": round(itens / mediana, 2) if mediana > 0 else None}
+
+
+def executar_ponta_a_ponta(dados):
+    """
+    Roda executar_analise_completa em um processo novo (caches frios), com o
+    backend 'falso' sem latência. Retorna o tempo da análise, sem a inicialização do Python.
+    """
+    for sub in ('cache', 'reports'):
+        shutil.rmtree(os.path.join(dados, sub), ignore_errors=True)
+    ambiente = dict(os.environ, UEYES_DADOS_DIR=dados)
+    processo = subprocess.run([sys.executable, '-m', 'benchmarks.run_benchmarks', '--dados', dados, '--somente-e2e'],
+                              cwd=RAIZ, env=ambiente, capture_output=True, text=True)
+    if processo.returncode != 0:
+        raise RuntimeError(processo.stderr.strip().splitlines()[-1] if processo.stderr.strip() else "falha no main.py")
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+def _somente_ponta_a_ponta():
+    """Modo interno do subprocesso de executar_ponta_a_ponta."""
+    _configurar_execucao_sem_modelo()
+    import main
+    with contextlib.redirect_stdout(io.StringIO()):
+        inicio = time.perf_counter()
+        main.executar_analise_completa({"participante": None, "media_name": None, "tipo_de_midia": None})
+        segundos = time.perf_counter() - inicio
+    print(json.dumps({"segundos": segundos}))
+
+
+def comparar(atual, caminho_base):
+    """Imprime a razão das medianas (atual / base) por caso e retorna os casos com regressão."""
+    with open(caminho_base, encoding='utf-8') as f:
+        base = json.load(f)
+    print(f"\n--- COMPARAÇÃO COM '{caminho_base}' (commit {base.get('commit')}) ---")
+    print(f"{'caso':<46}{'base(s)':>10}{'atual(s)':>10}{'razão':>8}")
+    regressoes = []
+    for nome, resultado in atual['resultados'].items():
+        anterior = base['resultados'].get(nome)
+        if anterior is None or 'mediana_s' not in anterior or 'mediana_s' not in resultado:
+            print(f"{nome:<46}{'-':>10}{resultado.get('mediana_s', '-'):>10}{'novo':>8}")
+            continue
+        razao = resultado['mediana_s'] / max(anterior['mediana_s'], 1e-9)
+        marca = "  REGRESSÃO" if razao > LIMIAR_REGRESSAO else ""
+        print(f"{nome:<46}{anterior['mediana_s']:>10.4f}{resultado['mediana_s']:>10.4f}{razao:>8.2f}{marca}")
+        if marca:
+            regressoes.append(nome)
+    return regressoes
+
+
+def main(args):
+    temporario = None
+    dados = args.dados
+    if dados is None:
+        dados = temporario = tempfile.mkdtemp(prefix='ueyes_bench_')
+    dados = os.path.abspath(dados)
+    # Precisa vir antes de qualquer import do config/eyetracking_analyzer.
+    os.environ['UEYES_DADOS_DIR'] = dados
+
+    from benchmarks.gerar_dataset import gerar_dataset
+    try:
+        if not os.path.exists(os.path.join(dados, 'info.csv')):
+            resumo_dataset = gerar_dataset(dados, args.imagens, args.participantes, args.blocos, semente=args.semente)
+        else:
+            print(f"Usando o dataset existente em '{dados}'.")
+            resumo_dataset = {"existente": True}
+
+        resultado = {
+            "commit": _commit_atual(),
+            "data": time.strftime('%Y-%m-%dT%H:%M:%S'),
+            "python": platform.python_version(),
+            "plataforma": platform.platform(),
+            "cpus": os.cpu_count(),
+            "dataset": dict(resumo_dataset, semente=args.semente),
+            "repeticoes": args.repeticoes,
+            "resultados": {},
+        }
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            casos = list(casos_de_benchmark_filtrados(dados, args.filtro))
+        for nome, itens, funcao in casos:
+            try:
+                resultado['resultados'][nome] = resumir_tempos(medir_caso(funcao, args.repeticoes), itens)
+                r = resultado['resultados'][nome]
+                print(f"{nome:<46}{r['mediana_s']:>10.4f}s  ({r['itens_por_s']} itens/s)")
+            except Exception as e:
+                resultado['resultados'][nome] = {"erro": f"{type(e).__name__}: {e}"}
+                print(f"{nome:<46}  ERRO: {e}")
+
+        if not args.sem_e2e and (not args.filtro or args.filtro in 'main.executar_analise_completa'):
+            try:
+                tempos = [executar_ponta_a_ponta(dados)['segundos'] for _ in range(args.repeticoes)]
+                num_registros = resultado['resultados'].get('data_loader.buscar_dados_participante', {}).get('itens', 1)
+                r = resultado['resultados']['main.executar_analise_completa'] = resumir_tempos(tempos, num_registros)
+                print(f"{'main.executar_analise_completa':<46}{r['mediana_s']:>10.4f}s  ({r['itens_por_s']} itens/s)")
+            except Exception as e:
+                resultado['resultados']['main.executar_analise_completa'] = {"erro": str(e)}
+                print(f"{'main.executar_analise_completa':<46}  ERRO: {e}")
+
+        saida = args.saida or os.path.join(DIRETORIO_RESULTADOS, f"bench_{resultado['commit'] or 'local'}_{time.strftime('%Y%m%d-%H%M%S')}.json")
+        os.makedirs(os.path.dirname(saida) or '.', exist_ok=True)
+        with open(saida, 'w', encoding='utf-8') as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"--- RESULTADOS SALVOS EM: '{saida}' ---")
+
+        if args.comparar and comparar(resultado, args.comparar):
+            sys.exit(1)
+    finally:
+        if temporario is not None and not args.manter:
+            shutil.rmtree(temporario, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks do eyetracking_analyzer sobre um dataset sintético.")
+    parser.add_argument("--dados", help="Diretório do dataset (padrão: temporário, gerado e apagado)")
+    parser.add_argument("--imagens", type=int, default=40, help="Imagens do dataset sintético")
+    parser.add_argument("--participantes", type=int, default=8, help="Participantes do dataset sintético")
+    parser.add_argument("--blocos", type=int, default=4, help="Blocos do dataset sintético")
+    parser.add_argument("--semente", type=int, default=0, help="Semente do dataset sintético")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções de cada caso (vale a mediana)")
+    parser.add_argument("--filtro", help="Só os casos cujo nome contém este texto (ex: visualizer)")
+    parser.add_argument("--sem-e2e", action="store_true", help="Não roda o main.py ponta a ponta")
+    parser.add_argument("--saida", help="Arquivo JSON de resultados (padrão: benchmarks/resultados/)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior; sai com código 1 se houver regressão")
+    parser.add_argument("--manter", action="store_true", help="Mantém o diretório temporário do dataset")
+    parser.add_argument("--somente-e2e", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.somente_e2e:
+        _somente_ponta_a_ponta()
+    else:
+        main(args)
@@ -4,23 +4,159 @@ import os
 # --- Caminhos Base ---
 # Pega o caminho do diretório onde o script está sendo executado.
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Raiz do dataset, dos caches e dos relatórios. A variável de ambiente UEYES_DADOS_DIR aponta
+# para outra cópia (ex: o dataset sintético de benchmarks/gerar_dataset.py).
+DADOS_DIR = os.environ.get('UEYES_DADOS_DIR', BASE_DIR)
 
 # --- Caminhos dos Dados ---
-INFO_CSV_PATH = os.path.join(BASE_DIR, 'info.csv')
-IMAGES_DIR = os.path.join(BASE_DIR, 'images')
-LOGS_DIR = os.path.join(BASE_DIR, 'eyetracker_logs')
+INFO_CSV_PATH = os.path.join(DADOS_DIR, 'info.csv')
+IMAGES_DIR = os.path.join(DADOS_DIR, 'images')
+LOGS_DIR = os.path.join(DADOS_DIR, 'eyetracker_logs')
 # NOVOS CAMINHOS ADICIONADOS
-SALIENCY_MAPS_DIR = os.path.join(BASE_DIR, 'saliency_maps')
-SCANPATHS_DIR = os.path.join(BASE_DIR, 'scanpaths')
+SALIENCY_MAPS_DIR = os.path.join(DADOS_DIR, 'saliency_maps')
+SCANPATHS_DIR = os.path.join(DADOS_DIR, 'scanpaths')
+# Se True, o loader corta as fixações de cada registro à janela 'duration' (ex: '3s' = fixações
+# iniciadas até 3 s após a primeira, pelo FPOGS); False mantém a sequência inteira, como antes.
+FATIAR_FIXACOES_POR_DURACAO = False
+
+# --- Caches Locais ---
+CACHE_DIR = os.path.join(DADOS_DIR, 'cache')
+# Índice colunar (NumPy) com todas as fixações dos logs, reconstruído quando um log muda.
+FIXATION_INDEX_DIR = os.path.join(CACHE_DIR, 'indice_fixacoes')
 
 # --- Configurações do Modelo ---
 # Para análise de imagem e texto, 'gemini-pro-vision' é o recomendado.
 MODELO_GENERATIVO = 'gemini-2.5-flash'
 
+# --- Submissão Concorrente ao Modelo ---
+# 'gemini' usa a API real; 'falso' usa um modelo local simulado (latência e erros 429 injetados).
+BACKEND_MODELO = 'gemini'
+# Latência (mín, máx em segundos) e taxa de erros 429 do backend 'falso'.
+BACKEND_FALSO_LATENCIA_SEGUNDOS = (0.5, 2.0)
+BACKEND_FALSO_TAXA_ERRO_429 = 0.05
+MAX_CONCORRENCIA_MODELO = 4
+LIMITE_REQUISICOES_POR_MINUTO = 60
+LIMITE_TOKENS_POR_MINUTO = 1_000_000
+MAX_TENTATIVAS_MODELO = 5
+BACKOFF_BASE_SEGUNDOS = 2.0
+BACKOFF_MAX_SEGUNDOS = 60.0
+# Cache persistente de respostas (chave: modelo + prompt + bytes da imagem).
+USAR_CACHE_RESPOSTAS = True
+RESPONSE_CACHE_PATH = os.path.join(CACHE_DIR, 'respostas_modelo.sqlite')
+RESPONSE_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# 'individual' envia um prompt por (mídia, participante); 'lote' envia a imagem e as instruções
+# uma vez para vários participantes da mesma mídia, com a resposta em JSON por participante.
+MODO_PROMPT = 'individual'
+# Orçamento estimado de tokens de entrada por prompt em lote e máximo de participantes por lote
+# (este último limita o tamanho da resposta).
+PROMPT_LOTE_ORCAMENTO_TOKENS = 32_000
+PROMPT_LOTE_MAX_PARTICIPANTES = 8
+# Formato das fixações no prompt: 'listas' (original, 4 casas decimais) ou 'compacto'
+# (inteiros quantizados com deltas, fusão de fixações próximas e limite rígido de tokens).
+FORMATO_FIXACOES = 'listas'
+FIXACOES_ORCAMENTO_TOKENS = 4000
+FIXACOES_GRADE_QUANTIZACAO = 1000
+FIXACOES_RAIO_FUSAO = 0.01
+# Inclui no prompt a consistência de scanpath entre participantes da imagem (exige ter rodado
+# run_scanpath_similarity.py; sem o resultado, a linha é omitida).
+PROMPT_INCLUIR_CONSISTENCIA = False
+# Pré-processamento da imagem enviada ao modelo. PAYLOAD_FORMATO None envia o arquivo original.
+PAYLOAD_ARESTA_MAXIMA = 1536
+PAYLOAD_FORMATO = 'JPEG'
+PAYLOAD_QUALIDADE = 85
+# Imagens extras enviadas como partes adicionais (ex: ['overlay_heatmap_path', 'scanpath_path']).
+PAYLOAD_IMAGENS_EXTRAS = []
+PAYLOAD_CACHE_DIR = os.path.join(CACHE_DIR, 'payloads')
+PAYLOAD_CACHE_MEMORIA_MAXIMO = 32
+# Capacidade das filas entre as etapas do pipeline (busca/prompt -> modelo -> PDF -> relatório).
+PIPELINE_TAMANHO_FILA = 16
+
 # --- Configurações de Saída ---
-OUTPUT_DIR = os.path.join(BASE_DIR, 'reports')
+# UEYES_SAIDA_DIR desvia todas as saídas abaixo (os workers de shard gravam cada shard à parte).
+OUTPUT_DIR = os.environ.get('UEYES_SAIDA_DIR', os.path.join(DADOS_DIR, 'reports'))
 OUTPUT_CSV_PATH = os.path.join(OUTPUT_DIR, 'relatorio_analise_modelos.csv')
+OUTPUT_JSONL_PATH = OUTPUT_CSV_PATH.replace('.csv', '.jsonl')
+# Escrita incremental do relatório: flush a cada N registros e fsync a cada N segundos.
+RELATORIO_FLUSH_A_CADA = 20
+RELATORIO_FSYNC_SEGUNDOS = 5.0
+# Onde main.py grava os resultados: 'jsonl' (OUTPUT_JSONL_PATH) ou 'parquet' (armazém particionado
+# por categoria/bloco, com o texto fixo dos prompts guardado uma vez e os caminhos derivados do config).
+BACKEND_RESULTADOS = 'jsonl'
+RESULTADOS_PARQUET_DIR = os.path.join(OUTPUT_DIR, 'resultados')
+# O armazém Parquet grava um novo arquivo por partição a cada N registros ou N segundos.
+RESULTADOS_LINHAS_POR_ARQUIVO = 2000
+RESULTADOS_DESCARGA_SEGUNDOS = 60.0
 # NOVO CAMINHO PARA OS PDFs
 PDF_REPORTS_DIR = os.path.join(OUTPUT_DIR, 'pdf') 
+# Qualidade JPEG da galeria embutida no PDF e quantas miniaturas cada processo mantém em cache.
+PDF_JPEG_QUALIDADE = 85
+PDF_CACHE_MINIATURAS_MAXIMO = 64
+# Processos dedicados à geração de PDFs, em paralelo às chamadas ao modelo.
+PDF_WORKERS = 2
+# 'individual' gera um PDF por (mídia, participante); 'media', 'categoria' ou 'bloco'
+# geram um PDF consolidado por grupo, com as imagens compartilhadas embutidas uma vez.
+MODO_RELATORIO_PDF = 'individual'
+# Métricas de saliência (NSS, CC, KL, SIM, AUC-Judd) gravadas em Parquet.
+OUTPUT_METRICAS_PATH = os.path.join(OUTPUT_DIR, 'metricas_saliencia.parquet')
+# Similaridade de scanpaths entre participantes (DTW, Fréchet, edição em grade) e consistência por imagem.
+OUTPUT_SIMILARIDADE_PATH = os.path.join(OUTPUT_DIR, 'similaridade_scanpaths.parquet')
 # NOVO CAMINHO PARA AS VISUALIZAÇÕES
-OUTPUT_VIS_DIR = os.path.join(OUTPUT_DIR, 'visualizations')
\ No newline at end of file
+OUTPUT_VIS_DIR = os.path.join(OUTPUT_DIR, 'visualizations')
+# Exportação do painel web (index_.html): um índice leve só com os campos de filtro e
+# shards gzip com os prompts e as respostas, baixados sob demanda pelo script.js.
+DASHBOARD_DIR = os.path.join(OUTPUT_DIR, 'dashboard')
+# Agrupamento dos shards: 'media' (um shard por mídia) ou 'bloco'.
+DASHBOARD_AGRUPAR_POR = 'media'
+# Reexporta o painel no fim de cada análise do main.py (só os shards alterados são regravados).
+DASHBOARD_EXPORTAR_AO_FINAL = True
+
+# --- Build Incremental (run_build.py) ---
+# Manifesto (SQLite) com a assinatura das entradas de cada artefato já construído
+# (prompt, resposta, PDF, heatmap, scanpath); só artefatos desatualizados são refeitos.
+MANIFESTO_ARTEFATOS_PATH = os.path.join(CACHE_DIR, 'manifesto_artefatos.sqlite')
+
+# --- Execução Distribuída (eyetracking_analyzer/sharding.py) ---
+# Planos de shards, leases (SQLite) e saídas por shard, num diretório compartilhado entre as máquinas.
+SHARDS_DIR = os.path.join(DADOS_DIR, 'shards')
+# Um worker renova o lease do shard a cada 1/3 deste tempo; um lease vencido pode ser assumido por outro.
+SHARD_LEASE_SEGUNDOS = 300
+SHARD_MAX_TENTATIVAS = 3
+
+# --- Perfil de Execução ---
+# Grava um span por etapa (tempo de parede, CPU, bytes lidos/escritos, pico de RSS) em PERFIL_DIR
+# e imprime uma tabela-resumo no fim da análise.
+PERFIL_ATIVO = False
+# 'jsonl' (um span por linha) ou 'prometheus' (também um .prom com os totais por etapa).
+PERFIL_FORMATO = 'jsonl'
+PERFIL_DIR = os.path.join(OUTPUT_DIR, 'perfil')
+# Registro 'mídia:participante' (ex: '1a27f3.png:01') perfilado com cProfile em cada etapa; None desativa.
+PERFIL_CPROFILE_REGISTRO = None
+
+# --- Configurações do Heatmap ---
+# Maior lado da grade onde a densidade é calculada (depois ampliada para a imagem).
+HEATMAP_RESOLUCAO_GRADE = 384
+HEATMAP_ALPHA = 0.6
+# Fração da massa de probabilidade deixada transparente (equivale ao 'thresh' do kdeplot).
+HEATMAP_LIMIAR_MASSA = 0.05
+# Quantos heatmaps são desfocados juntos em uma multiplicação de matrizes.
+HEATMAP_LOTE_MAXIMO = 16
+# Quantas imagens base decodificadas cada processo mantém em memória (LRU).
+CACHE_IMAGENS_BASE_MAXIMO = 8
+# Janelas geradas de uma vez por gerar_heatmaps_por_duracao (mesmas durações dos mapas do dataset).
+DURACOES_JANELA = ('1s', '3s', '7s')
+# --- Métricas de Saliência ---
+# Maior lado da grade em que mapas e fixações são comparados (os mapas são reduzidos a ela).
+METRICAS_RESOLUCAO = 320
+# Pacotes de mapas (uma família por arquivo, lido por memory-map); ver eyetracking_analyzer/map_store.py.
+MAPAS_PACOTES_DIR = os.path.join(CACHE_DIR, 'mapas_empacotados')
+# --- Similaridade de Scanpaths ---
+# Grade da distância de edição no estilo ScanMatch (colunas x linhas).
+SIMILARIDADE_GRADE_COLUNAS = 12
+SIMILARIDADE_GRADE_LINHAS = 8
+# Máximo de células de custo (pares x N x N) processadas por vez; limita a memória por processo.
+SIMILARIDADE_MAX_ELEMENTOS = 4_000_000
+# Matrizes P x P por imagem (.npz), endereçadas pelo conteúdo das fixações.
+SIMILARIDADE_CACHE_DIR = os.path.join(CACHE_DIR, 'similaridade_scanpaths')
+
+# Fontes tentadas, em ordem, para os rótulos do scanpath (Windows, Linux, macOS).
+FONTES_CANDIDATAS = ['arial.ttf', 'DejaVuSans.ttf', 'LiberationSans-Regular.ttf', 'Arial.ttf']
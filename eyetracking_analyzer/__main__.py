@@ -0,0 +1,6 @@
+# eyetracking_analyzer/__main__.py
+# Uso: python -m eyetracking_analyzer <subcomando> [opções]  (ver cli.py)
+import sys
+from eyetracking_analyzer.cli import main
+
+sys.exit(main())
@@ -0,0 +1,281 @@
+# eyetracking_analyzer/build_graph.py
+"""
+Grafo de dependências dos artefatos derivados, no estilo do make.
+
+Cada Artefato declara suas entradas (hash da fatia do log, hash da imagem,
+versão do modelo de prompt, nome do modelo, parâmetros de renderização...) e
+os artefatos de que depende. A assinatura de um artefato é o hash das suas
+entradas e das assinaturas das dependências, então qualquer mudança se
+propaga para baixo no grafo sem precisar reconstruir nada para descobri-la.
+O ManifestoArtefatos (SQLite) guarda a assinatura de cada artefato construído;
+numa nova execução só os desatualizados são refeitos, em ordem topológica.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from config import MANIFESTO_ARTEFATOS_PATH
+from eyetracking_analyzer.profiling import medir
+
+
+class Artefato:
+    """
+    Um nó do grafo.
+
+    Args:
+        chave (str): Identificador único (ex: 'heatmap:1a27f3.png:01').
+        tipo (str): Tipo do artefato (ex: 'prompt', 'pdf').
+        entradas (dict): {nome: valor} de tudo, além das dependências, que determina a saída.
+        construir (callable): Recebe {chave: valor} das dependências e retorna o valor
+            do artefato (gravado no manifesto se 'guardar_valor'). Deve levantar uma
+            exceção em caso de falha.
+        dependencias (tuple): Chaves dos artefatos de que este depende.
+        saida (str): Arquivo produzido, se houver; um arquivo ausente torna o artefato desatualizado.
+        guardar_valor (bool): Guarda o valor retornado, para os dependentes o receberem
+            mesmo quando este artefato não precisar ser reconstruído.
+    """
+
+    __slots__ = ('chave', 'tipo', 'entradas', 'construir', 'dependencias', 'saida', 'guardar_valor')
+
+    def __init__(self, chave, tipo, entradas, construir, dependencias=(), saida=None, guardar_valor=False):
+        self.chave = chave
+        self.tipo = tipo
+        self.entradas = entradas
+        self.construir = construir
+        self.dependencias = tuple(dependencias)
+        self.saida = saida
+        self.guardar_valor = guardar_valor
+
+
+def hash_dados(*partes):
+    """SHA-1 de textos, bytes ou arrays NumPy (pelos bytes), na ordem dada."""
+    h = hashlib.sha1()
+    for parte in partes:
+        if isinstance(parte, str):
+            parte = parte.encode('utf-8')
+        elif not isinstance(parte, (bytes, bytearray, memoryview)):
+            parte = memoryview(parte).cast('B') if parte.flags.c_contiguous else parte.tobytes()
+        h.update(parte)
+        h.update(b'\0')
+    return h.hexdigest()
+
+
+class ManifestoArtefatos:
+    """
+    Manifesto persistente (SQLite) dos artefatos construídos: tipo, assinatura,
+    entradas (para explicar o que mudou) e, se pedido, o valor produzido.
+    Deve ser usado só pela thread que executa o grafo.
+    """
+
+    def __init__(self, caminho=MANIFESTO_ARTEFATOS_PATH):
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        self.caminho = caminho
+        self._conexao = sqlite3.connect(caminho, isolation_level=None)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS artefatos ("
+            " chave TEXT PRIMARY KEY, tipo TEXT NOT NULL, assinatura TEXT NOT NULL,"
+            " entradas TEXT NOT NULL, saida TEXT, valor TEXT, construido_em REAL NOT NULL)"
+        )
+
+    def obter(self, chaves):
+        """{chave: (assinatura, entradas)} dos artefatos já registrados, sem os valores."""
+        registrados = {}
+        chaves = list(chaves)
+        for i in range(0, len(chaves), 500):
+            lote = chaves[i:i + 500]
+            consulta = (f"SELECT chave, assinatura, entradas FROM artefatos "
+                        f"WHERE chave IN ({','.join('?' * len(lote))})")
+            for chave, assinatura, entradas in self._conexao.execute(consulta, lote):
+                registrados[chave] = (assinatura, json.loads(entradas))
+        return registrados
+
+    def valor(self, chave):
+        linha = self._conexao.execute("SELECT valor FROM artefatos WHERE chave = ?", (chave,)).fetchone()
+        return json.loads(linha[0]) if linha and linha[0] is not None else None
+
+    def registrar(self, artefato, assinatura, valor=None):
+        self._conexao.execute(
+            "INSERT OR REPLACE INTO artefatos (chave, tipo, assinatura, entradas, saida, valor, construido_em)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (artefato.chave, artefato.tipo, assinatura, json.dumps(artefato.entradas, sort_keys=True),
+             artefato.saida, json.dumps(valor, ensure_ascii=False) if artefato.guardar_valor else None, time.time())
+        )
+
+    def fechar(self):
+        self._conexao.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def ordem_topologica(artefatos):
+    """
+    Ordena os artefatos de modo que cada um venha depois das suas dependências.
+    Levanta ValueError se faltar uma dependência ou houver ciclo.
+    """
+    por_chave = {a.chave: a for a in artefatos}
+    pendentes = {}
+    dependentes = {}
+    for artefato in artefatos:
+        for dep in artefato.dependencias:
+            if dep not in por_chave:
+                raise ValueError(f"Dependência '{dep}' de '{artefato.chave}' não está no grafo.")
+            dependentes.setdefault(dep, []).append(artefato.chave)
+        pendentes[artefato.chave] = len(artefato.dependencias)
+
+    prontos = [a.chave for a in artefatos if not a.dependencias]
+    ordem = []
+    while prontos:
+        chave = prontos.pop()
+        ordem.append(por_chave[chave])
+        for dependente in dependentes.get(chave, ()):
+            pendentes[dependente] -= 1
+            if not pendentes[dependente]:
+                prontos.append(dependente)
+    if len(ordem) != len(artefatos):
+        ciclo = sorted(chave for chave, n in pendentes.items() if n)
+        raise ValueError(f"Ciclo no grafo de artefatos envolvendo: {ciclo[:5]}")
+    return ordem
+
+
+def planejar(artefatos, manifesto):
+    """
+    Calcula a assinatura de cada artefato e decide quais estão desatualizados, sem
+    construir nada.
+
+    Returns:
+        list: (artefato, assinatura, motivos) em ordem topológica; 'motivos' é a
+        lista (vazia se atualizado) das razões da reconstrução.
+    """
+    ordem = ordem_topologica(artefatos)
+    registrados = manifesto.obter(a.chave for a in ordem)
+    assinaturas, desatualizados, plano = {}, set(), []
+    for artefato in ordem:
+        assinatura = hash_dados(artefato.tipo, json.dumps(artefato.entradas, sort_keys=True),
+                                *(assinaturas[dep] for dep in artefato.dependencias))
+        assinaturas[artefato.chave] = assinatura
+
+        motivos = []
+        registrado = registrados.get(artefato.chave)
+        if registrado is None:
+            motivos.append("novo")
+        elif registrado[0] != assinatura:
+            anteriores = registrado[1]
+            alteradas = sorted(nome for nome in set(anteriores) | set(artefato.entradas)
+                               if anteriores.get(nome) != artefato.entradas.get(nome))
+            if alteradas:
+                motivos.append(f"entradas alteradas: {', '.join(alteradas)}")
+            deps_alteradas = [dep for dep in artefato.dependencias if dep in desatualizados]
+            if deps_alteradas:
+                motivos.append(f"dependência refeita: {', '.join(deps_alteradas)}")
+            if not motivos:
+                motivos.append("assinatura de dependência alterada")
+        if artefato.saida and not os.path.exists(artefato.saida):
+            motivos.append("saída ausente")
+        if motivos:
+            desatualizados.add(artefato.chave)
+        plano.append((artefato, assinatura, motivos))
+    return plano
+
+
+def descrever_plano(plano, detalhar=True):
+    """Imprime o que seria reconstruído e por quê, e um resumo por tipo."""
+    por_tipo = {}
+    for artefato, _, motivos in plano:
+        contagem = por_tipo.setdefault(artefato.tipo, [0, 0])
+        contagem[0 if motivos else 1] += 1
+        if motivos and detalhar:
+            print(f"  - REFAZER {artefato.chave}: {'; '.join(motivos)}")
+    for tipo, (refazer, atualizados) in sorted(por_tipo.items()):
+        print(f"  {tipo:<10} {refazer:>6} a refazer | {atualizados:>6} atualizados")
+    return por_tipo
+
+
+def executar_grafo(plano, manifesto, workers=None, ao_concluir=None):
+    """
+    Constrói os artefatos desatualizados do plano em um pool de threads, cada um
+    assim que suas dependências terminam. Artefatos atualizados repassam o valor
+    guardado no manifesto. Se um artefato falha, os que dependem dele são pulados
+    (e continuam desatualizados para a próxima execução).
+
+    'ao_concluir(artefato, valor, valores_dependencias)' é chamado na thread do
+    chamador para cada artefato construído com sucesso (ex: para gravar a
+    resposta no relatório).
+
+    Returns:
+        dict: Contagens de construídos, atualizados, falhas e pulados, e a lista de falhas.
+    """
+    por_chave = {artefato.chave: (artefato, assinatura, motivos) for artefato, assinatura, motivos in plano}
+    dependentes = {}
+    faltando = {}
+    # Valores guardados só são lidos do manifesto se algum dependente for refeito.
+    valores_necessarios = {dep for artefato, _, motivos in plano if motivos for dep in artefato.dependencias}
+    for artefato, _, _ in plano:
+        faltando[artefato.chave] = len(artefato.dependencias)
+        for dep in artefato.dependencias:
+            dependentes.setdefault(dep, []).append(artefato.chave)
+
+    valores, falhas = {}, []
+    resumo = {"construidos": 0, "atualizados": 0, "falhas": 0, "pulados": 0}
+    prontos = [chave for chave, n in faltando.items() if not n]
+    bloqueados = set()
+
+    def construir(artefato, entradas_deps):
+        with medir(f'build_graph.{artefato.tipo}'):
+            return artefato.construir(entradas_deps)
+
+    def liberar(chave, sucesso):
+        for dependente in dependentes.get(chave, ()):
+            if not sucesso:
+                bloqueados.add(dependente)
+            faltando[dependente] -= 1
+            if not faltando[dependente]:
+                prontos.append(dependente)
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='build') as executor:
+        em_execucao = {}
+        while prontos or em_execucao:
+            while prontos:
+                chave = prontos.pop()
+                artefato, assinatura, motivos = por_chave[chave]
+                if chave in bloqueados:
+                    resumo["pulados"] += 1
+                    liberar(chave, False)
+                elif not motivos:
+                    if artefato.guardar_valor and chave in valores_necessarios:
+                        valores[chave] = manifesto.valor(chave)
+                    resumo["atualizados"] += 1
+                    liberar(chave, True)
+                else:
+                    entradas_deps = {dep: valores.get(dep) for dep in artefato.dependencias}
+                    em_execucao[executor.submit(construir, artefato, entradas_deps)] = (chave, entradas_deps)
+            if not em_execucao:
+                break
+
+            concluidos, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                chave, entradas_deps = em_execucao.pop(futuro)
+                artefato, assinatura, _ = por_chave[chave]
+                try:
+                    valor = futuro.result()
+                except Exception as e:
+                    resumo["falhas"] += 1
+                    falhas.append((chave, str(e)))
+                    print(f"  - FALHA em '{chave}': {e}")
+                    liberar(chave, False)
+                    continue
+                valores[chave] = valor
+                manifesto.registrar(artefato, assinatura, valor)
+                resumo["construidos"] += 1
+                if ao_concluir is not None:
+                    ao_concluir(artefato, valor, entradas_deps)
+                liberar(chave, True)
+
+    resumo["lista_falhas"] = falhas
+    return resumo
@@ -0,0 +1,312 @@
+# eyetracking_analyzer/cli.py
+"""
+Ponto de entrada único do projeto:
+
+    python -m eyetracking_analyzer query -m 1a27f3.png
+    python -m eyetracking_analyzer analyze -c webpage
+    python -m eyetracking_analyzer visualize --categoria webpage --workers 8
+    python -m eyetracking_analyzer pdf --agrupar-por bloco
+    python -m eyetracking_analyzer export --agrupar-por media
+
+Este módulo só importa a biblioteca padrão e o config; cada subcomando importa
+o que precisa (SDK do Gemini, fpdf, PIL, pandas...) quando é executado, então
+'--help' e 'query' no relatório .jsonl não pagam a importação dos backends.
+
+Para milhares de chamadas curtas (ex: jobs do escalonador), 'serve' mantém um
+processo com os módulos já importados e executa os comandos recebidos pela
+entrada padrão ou por um socket local, um JSON por linha:
+
+    python -m eyetracking_analyzer serve --socket /tmp/ueyes.sock
+    python -m eyetracking_analyzer --worker /tmp/ueyes.sock query -p 01
+
+O worker lê o config uma vez, ao iniciar: mudanças no config.py ou nas
+variáveis de ambiente (UEYES_*) só valem depois de reiniciá-lo.
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import traceback
+import contextlib
+from config import (
+    OUTPUT_JSONL_PATH, BACKEND_RESULTADOS, RESULTADOS_PARQUET_DIR, MODO_RELATORIO_PDF, DASHBOARD_DIR, DASHBOARD_AGRUPAR_POR
+)
+from eyetracking_analyzer.dashboard_export import AGRUPAMENTOS as AGRUPAMENTOS_PAINEL
+
+# Módulos importados pelo 'serve' antes do primeiro comando.
+MODULOS_PRECARREGADOS = (
+    'main', 'run_visualizations', 'eyetracking_analyzer.pdf_generator', 'eyetracking_analyzer.results_store',
+    'eyetracking_analyzer.dashboard_export', 'eyetracking_analyzer.sharding',
+)
+CAMPOS_FILTRO = (('participante', 'participante'), ('media_name', 'media'), ('categoria', 'categoria'),
+                 ('bloco', 'bloco'))
+
+
+# --- Subcomandos ---
+
+def _filtros(args):
+    return {campo: set(getattr(args, opcao)) for campo, opcao in CAMPOS_FILTRO if getattr(args, opcao)}
+
+
+def _consultar_jsonl(caminho, filtros):
+    """Registros do relatório .jsonl que passam nos filtros, o mais recente de cada (mídia, participante)."""
+    registros = {}
+    with open(caminho, 'rb') as f:
+        for linha in f:
+            if not linha.endswith(b'\n'):
+                continue
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                continue
+            if all(str(registro.get(campo)) in valores for campo, valores in filtros.items()):
+                registros[(registro.get('media_name'), str(registro.get('participante')))] = registro
+    return list(registros.values())
+
+
+def comando_query(args):
+    filtros = _filtros(args)
+    if args.backend == 'parquet':
+        from eyetracking_analyzer.results_store import ArmazemResultados
+        df = ArmazemResultados(args.diretorio).consultar(
+            *(sorted(filtros[campo]) if campo in filtros else None for campo, _ in CAMPOS_FILTRO),
+            com_prompt=args.json, com_caminhos=args.json
+        )
+        registros = df.to_dict(orient='records')
+    else:
+        if not os.path.exists(args.jsonl):
+            print(f"AVISO: Relatório '{args.jsonl}' não encontrado.")
+            return 1
+        from eyetracking_analyzer.reporter import _eh_resposta_de_erro
+        registros = _consultar_jsonl(args.jsonl, filtros)
+        for registro in registros:
+            registro['erro'] = _eh_resposta_de_erro(registro.get('Resposta'))
+
+    if args.json:
+        for registro in registros:
+            print(json.dumps(registro, ensure_ascii=False, default=str))
+        return 0
+    for registro in registros:
+        resposta = ' '.join(str(registro.get('Resposta') or '').split())
+        print(f"{registro.get('participante')!s:>4}  {registro.get('media_name')!s:<24} {registro.get('categoria')!s:<12} "
+              f"{registro.get('bloco')!s:>3}  {'ERRO' if registro.get('erro') else 'ok  '}  {resposta[:args.largura]}")
+    print(f"{len(registros)} resultado(s) encontrado(s).")
+    return 0
+
+
+def comando_analyze(args):
+    from dotenv import load_dotenv
+    import main
+    load_dotenv()
+    if args.plano is not None:
+        from eyetracking_analyzer.sharding import carregar_plano, unidades_do_shard
+        plano = carregar_plano(args.plano)
+        sucesso = main.executar_analise_completa(plano['parametros'], unidades=unidades_do_shard(plano, args.shard))
+    else:
+        sucesso = main.executar_analise_completa({"participante": args.participante, "media_name": args.media,
+                                                  "tipo_de_midia": args.categoria})
+    return 0 if sucesso else 1
+
+
+def comando_visualize(args, extras):
+    import run_visualizations
+    run_visualizations.executar_cli(extras, prog='python -m eyetracking_analyzer visualize')
+    return 0
+
+
+def comando_pdf(args):
+    from eyetracking_analyzer.pdf_generator import gerar_relatorios_consolidados
+    gerar_relatorios_consolidados(agrupar_por=args.agrupar_por, caminho_jsonl=args.jsonl,
+                                  grupos=set(args.grupos) if args.grupos else None)
+    return 0
+
+
+def comando_export(args):
+    from eyetracking_analyzer.dashboard_export import exportar_dashboard
+    return 0 if exportar_dashboard(args.jsonl, args.destino, args.agrupar_por, args.completo) is not None else 1
+
+
+def comando_serve(args):
+    return servir(args.socket, precarregar=not args.sem_precarregar)
+
+
+# --- Worker persistente ---
+
+def executar_comando(argv):
+    """
+    Executa uma linha de comando no processo atual, capturando a saída.
+
+    Returns:
+        tuple: (código de saída, texto impresso).
+    """
+    saida = io.StringIO()
+    with contextlib.redirect_stdout(saida), contextlib.redirect_stderr(saida):
+        try:
+            codigo = main(argv)
+        except SystemExit as e:  # --help e erros do argparse
+            codigo = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        except Exception:
+            traceback.print_exc()
+            codigo = 1
+    return codigo, saida.getvalue()
+
+
+def _atender(linha):
+    """Resposta (uma linha JSON) para um pedido {"argv": [...]}."""
+    inicio = time.perf_counter()
+    try:
+        argv = json.loads(linha)['argv']
+        if not isinstance(argv, list) or (argv and argv[0] == 'serve'):
+            raise ValueError("'argv' deve ser uma lista de argumentos de um subcomando (exceto 'serve').")
+    except (ValueError, KeyError, TypeError) as e:
+        codigo, saida = 2, f"ERRO no pedido: {e}\n"
+    else:
+        codigo, saida = executar_comando([str(arg) for arg in argv])
+    resposta = {"codigo": codigo, "saida": saida, "segundos": round(time.perf_counter() - inicio, 4)}
+    return (json.dumps(resposta, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def _endereco(texto):
+    """Porta TCP em 127.0.0.1 se 'texto' for um número; senão, caminho de socket Unix."""
+    return ('127.0.0.1', int(texto)) if texto.isdigit() else texto
+
+
+def servir(endereco=None, precarregar=True):
+    """
+    Atende comandos até a entrada acabar (modo stdin) ou o processo ser
+    interrompido (modo socket). Os comandos rodam um de cada vez, já que
+    compartilham o stdout e o estado dos módulos.
+    """
+    if precarregar:
+        inicio = time.perf_counter()
+        import importlib
+        for modulo in MODULOS_PRECARREGADOS:
+            importlib.import_module(modulo)
+        print(f"Módulos pré-carregados em {time.perf_counter() - inicio:.2f}s.", file=sys.stderr)
+
+    if endereco is None:
+        print("--- WORKER PRONTO (stdin) ---", file=sys.stderr)
+        for linha in sys.stdin.buffer:
+            if linha.strip():
+                sys.stdout.buffer.write(_atender(linha))
+                sys.stdout.buffer.flush()
+        return 0
+
+    import socketserver
+
+    class Atendente(socketserver.StreamRequestHandler):
+        def handle(self):
+            for linha in self.rfile:
+                if linha.strip():
+                    self.wfile.write(_atender(linha))
+
+    endereco = _endereco(endereco)
+    if isinstance(endereco, tuple):
+        servidor = socketserver.TCPServer(endereco, Atendente)
+    else:
+        if not hasattr(socketserver, 'UnixStreamServer'):
+            print("ERRO: Sockets Unix não disponíveis nesta plataforma; use uma porta (ex: --socket 8765).")
+            return 1
+        if os.path.exists(endereco):
+            os.remove(endereco)
+        servidor = socketserver.UnixStreamServer(endereco, Atendente)
+    print(f"--- WORKER PRONTO em {endereco} ---", file=sys.stderr)
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        if isinstance(endereco, str) and os.path.exists(endereco):
+            os.remove(endereco)
+    return 0
+
+
+def enviar_ao_worker(endereco, argv):
+    """Envia o comando a um worker do 'serve', imprime a saída e retorna o código de saída."""
+    import socket
+    endereco = _endereco(endereco)
+    familia = socket.AF_INET if isinstance(endereco, tuple) else socket.AF_UNIX
+    with socket.socket(familia, socket.SOCK_STREAM) as conexao:
+        conexao.connect(endereco)
+        conexao.sendall((json.dumps({"argv": argv}) + '\n').encode('utf-8'))
+        with conexao.makefile('rb') as f:
+            resposta = json.loads(f.readline())
+    sys.stdout.write(resposta['saida'])
+    return resposta['codigo']
+
+
+# --- Argumentos ---
+
+def criar_parser():
+    parser = argparse.ArgumentParser(prog='python -m eyetracking_analyzer',
+                                     description="Análise de rastreamento ocular do UEyes com modelos generativos.")
+    parser.add_argument("--worker", metavar="SOCKET",
+                        help="Envia o comando a um worker iniciado com 'serve' (caminho do socket ou porta)")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+
+    query = subparsers.add_parser("query", help="Consulta os resultados já gravados")
+    query.add_argument("-p", "--participante", nargs="+", help="Um ou mais participantes (ex: 01 07)")
+    query.add_argument("-m", "--media", nargs="+", help="Uma ou mais mídias")
+    query.add_argument("-c", "--categoria", nargs="+", help="Uma ou mais categorias")
+    query.add_argument("-b", "--bloco", nargs="+", help="Um ou mais blocos")
+    query.add_argument("--backend", choices=('jsonl', 'parquet'), default=BACKEND_RESULTADOS,
+                       help="Onde ler os resultados")
+    query.add_argument("--jsonl", default=OUTPUT_JSONL_PATH, help="Relatório .jsonl (backend 'jsonl')")
+    query.add_argument("--diretorio", default=RESULTADOS_PARQUET_DIR, help="Armazém Parquet (backend 'parquet')")
+    query.add_argument("--json", action="store_true", help="Imprime os registros completos, um JSON por linha")
+    query.add_argument("--largura", type=int, default=60, help="Caracteres da resposta mostrados na tabela")
+    query.set_defaults(funcao=comando_query)
+
+    analyze = subparsers.add_parser("analyze", help="Submete os registros ao modelo e gera o relatório e os PDFs")
+    analyze.add_argument("-p", "--participante", help="ID do participante (ex: 01)")
+    analyze.add_argument("-m", "--media", help="Nome do arquivo da imagem")
+    analyze.add_argument("-c", "--categoria", help="Filtra por categoria (ex: webpage)")
+    analyze.add_argument("--plano", help="Diretório de um plano de shards (ver eyetracking_analyzer/sharding.py)")
+    analyze.add_argument("--shard", type=int, help="Número do shard do plano a analisar")
+    analyze.set_defaults(funcao=comando_analyze)
+
+    # As opções do visualize são as do run_visualizations.py, repassadas sem importá-lo aqui.
+    visualize = subparsers.add_parser("visualize", add_help=False,
+                                      help="Gera heatmaps e scanpaths (opções de run_visualizations.py)")
+    visualize.set_defaults(funcao=comando_visualize, repassa_argumentos=True)
+
+    # Mesmas chaves de pdf_generator.AGRUPAMENTOS_CONSOLIDADOS, sem importar o fpdf para montar o --help.
+    agrupamentos = ('media', 'categoria', 'bloco')
+    pdf = subparsers.add_parser("pdf", help="Gera os PDFs consolidados a partir do relatório .jsonl")
+    pdf.add_argument("--agrupar-por", choices=agrupamentos,
+                     default=MODO_RELATORIO_PDF if MODO_RELATORIO_PDF in agrupamentos else 'media',
+                     help="Um PDF por mídia, categoria ou bloco")
+    pdf.add_argument("--grupos", nargs="+", help="Gera só estes grupos (ex: 1a27f3.png)")
+    pdf.add_argument("--jsonl", default=OUTPUT_JSONL_PATH, help="Relatório de origem")
+    pdf.set_defaults(funcao=comando_pdf)
+
+    export = subparsers.add_parser("export", help="Exporta o relatório para o painel web (índice + shards gzip)")
+    export.add_argument("--jsonl", default=OUTPUT_JSONL_PATH, help="Relatório de origem")
+    export.add_argument("--destino", default=DASHBOARD_DIR, help="Diretório do painel")
+    export.add_argument("--agrupar-por", choices=AGRUPAMENTOS_PAINEL, default=DASHBOARD_AGRUPAR_POR,
+                        help="Um shard por mídia ou por bloco")
+    export.add_argument("--completo", action="store_true", help="Relê o relatório inteiro em vez de só as linhas novas")
+    export.set_defaults(funcao=comando_export)
+
+    serve = subparsers.add_parser("serve", help="Mantém um worker com os módulos carregados (stdin ou socket)")
+    serve.add_argument("--socket", help="Caminho do socket Unix ou porta TCP local; sem ele, lê da entrada padrão")
+    serve.add_argument("--sem-precarregar", action="store_true",
+                       help="Importa os módulos só no primeiro comando que os usar")
+    serve.set_defaults(funcao=comando_serve)
+    return parser
+
+
+def main(argv=None):
+    """Interpreta 'argv' (padrão: sys.argv[1:]) e executa o subcomando. Retorna o código de saída."""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    args, extras = criar_parser().parse_known_args(argv)
+    if args.worker:
+        return enviar_ao_worker(args.worker, argv[argv.index(args.comando):])
+    if getattr(args, 'repassa_argumentos', False):
+        return args.funcao(args, extras)
+    if extras:
+        criar_parser().error(f"argumentos não reconhecidos: {' '.join(extras)}")
+    return args.funcao(args)
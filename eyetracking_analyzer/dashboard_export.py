@@ -0,0 +1,247 @@
+# eyetracking_analyzer/dashboard_export.py
+"""
+Exporta o relatório .jsonl para o painel web (index_.html) em dois níveis:
+
+    <DASHBOARD_DIR>/indice.json            campos de filtro, caminhos e a posição de
+                                           cada registro no seu shard
+    <DASHBOARD_DIR>/<grupo>-<hash>.jsonl.gz  prompts e respostas de uma mídia (ou bloco)
+
+O painel carrega só o índice para montar os filtros e baixa os shards quando
+os cards ficam visíveis. O nome de cada shard leva o hash do conteúdo: um
+shard cujo grupo não mudou mantém o nome e não é regravado, e o navegador pode
+mantê-lo em cache indefinidamente.
+
+O índice também guarda até que byte do relatório já foi exportado (e a
+assinatura dos bytes logo antes desse ponto). Como o relatório só recebe linhas
+no fim, a exportação seguinte lê apenas as linhas novas e remonta só os shards
+dos grupos que elas tocam; os demais registros do índice são reaproveitados
+como estão. Se o relatório foi truncado ou reescrito, a exportação é completa.
+"""
+import os
+import re
+import gzip
+import json
+import hashlib
+from config import OUTPUT_JSONL_PATH, DASHBOARD_DIR, DASHBOARD_AGRUPAR_POR
+from eyetracking_analyzer.profiling import medido
+
+VERSAO_INDICE = 2
+NOME_INDICE = 'indice.json'
+SUFIXO_SHARD = '.jsonl.gz'
+CAMPOS_FILTRO = ('participante', 'media_name', 'categoria', 'bloco')
+CAMPOS_CAMINHOS = ('image_path', 'scanpath_path', 'heatmap_path', 'fixmap_path', 'overlay_heatmap_path')
+CAMPOS_CORPO = ('prompt', 'Resposta')
+AGRUPAMENTOS = ('media', 'bloco')
+BYTES_ASSINATURA = 4096
+
+
+def _nome_grupo(registro, agrupar_por):
+    """Nome seguro para arquivo do grupo do registro (ex: '1a27f3' ou 'bloco_03')."""
+    if agrupar_por == 'media':
+        nome = os.path.splitext(str(registro.get('media_name')))[0]
+    else:
+        nome = f"bloco_{str(registro.get('bloco')).zfill(2)}"
+    return re.sub(r'[^\w.-]', '_', nome)
+
+
+def _chave(campos):
+    return (campos.get('media_name'), str(campos.get('participante')))
+
+
+def _ler_posicoes(caminho_jsonl, inicio=0):
+    """
+    Passada no relatório a partir do byte 'inicio': guarda só a posição (offset,
+    tamanho) da linha mais recente de cada (mídia, participante), sem manter os
+    corpos em memória.
+
+    Returns:
+        tuple: (posições por chave, byte logo após a última linha completa lida).
+    """
+    posicoes = {}
+    with open(caminho_jsonl, 'rb') as f:
+        f.seek(inicio)
+        offset = fim = inicio
+        for linha in f:
+            comeco, offset = offset, offset + len(linha)
+            if not linha.endswith(b'\n'):
+                continue  # Linha ainda sendo gravada; fica para a próxima exportação.
+            fim = offset
+            if not linha.strip():
+                continue
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                print(f"AVISO: Linha inválida no byte {comeco} de '{caminho_jsonl}'. Ignorando.")
+                continue
+            campos = {campo: registro.get(campo) for campo in CAMPOS_FILTRO + CAMPOS_CAMINHOS}
+            # Uma chave regravada (ex: nova tentativa após ERRO) mantém a posição da primeira.
+            posicoes[_chave(campos)] = (comeco, len(linha), campos)
+    return posicoes, fim
+
+
+def _assinatura(caminho_jsonl, fim):
+    """Hash dos bytes do relatório logo antes de 'fim' (detecta arquivo truncado ou reescrito)."""
+    with open(caminho_jsonl, 'rb') as f:
+        f.seek(max(0, fim - BYTES_ASSINATURA))
+        return hashlib.sha1(f.read(min(fim, BYTES_ASSINATURA))).hexdigest()
+
+
+def _corpo(registro):
+    return (json.dumps({campo: registro.get(campo) for campo in CAMPOS_CORPO}, ensure_ascii=False) + '\n').encode('utf-8')
+
+
+def _corpos_do_relatorio(f, itens):
+    """(campos, corpo) de cada posição (offset, tamanho, campos) lida do relatório."""
+    corpos = []
+    for inicio, tamanho, campos in itens:
+        f.seek(inicio)
+        corpos.append((campos, _corpo(json.loads(f.read(tamanho)))))
+    return corpos
+
+
+def _gravar_atomico(caminho, dados):
+    temporario = f"{caminho}.tmp"
+    with open(temporario, 'wb') as f:
+        f.write(dados)
+    os.replace(temporario, caminho)
+
+
+def _gravar_shard(destino, grupo, corpos):
+    """
+    Grava o shard do grupo, se ainda não existir um com o mesmo conteúdo.
+
+    Returns:
+        tuple: (nome do shard, informações do shard, entradas do índice, se foi gravado).
+    """
+    conteudo = b''.join(corpo for _, corpo in corpos)
+    nome_shard = f"{grupo}-{hashlib.sha1(conteudo).hexdigest()[:16]}{SUFIXO_SHARD}"
+    caminho_shard = os.path.join(destino, nome_shard)
+    gravado = not os.path.exists(caminho_shard)
+    if gravado:
+        # mtime=0 deixa o .gz idêntico para o mesmo conteúdo.
+        _gravar_atomico(caminho_shard, gzip.compress(conteudo, compresslevel=6, mtime=0))
+
+    entradas, offset = [], 0
+    for campos, corpo in corpos:
+        entradas.append({**campos, "shard": nome_shard, "inicio": offset, "tamanho": len(corpo)})
+        offset += len(corpo)
+    return nome_shard, {"grupo": grupo, "registros": len(corpos), "bytes": len(conteudo)}, entradas, gravado
+
+
+def _carregar_indice_anterior(destino, caminho_jsonl, agrupar_por):
+    """
+    Índice da exportação anterior, se ele puder ser estendido com as linhas novas
+    do relatório (mesma versão e agrupamento, relatório só cresceu e todos os
+    shards ainda existem); senão None.
+    """
+    try:
+        with open(os.path.join(destino, NOME_INDICE), encoding='utf-8') as f:
+            indice = json.load(f)
+    except (OSError, ValueError):
+        return None
+    origem = indice.get('origem') or {}
+    if indice.get('versao') != VERSAO_INDICE or indice.get('agrupamento') != agrupar_por:
+        return None
+    if origem.get('bytes', -1) > os.path.getsize(caminho_jsonl) \
+            or origem.get('assinatura') != _assinatura(caminho_jsonl, origem.get('bytes', 0)):
+        return None
+    if not all(os.path.exists(os.path.join(destino, nome)) for nome in indice['shards']):
+        return None
+    return indice
+
+
+def _registros_do_shard(destino, nome_shard, entradas):
+    """(campos, corpo) das entradas do índice antigo, lidos do shard existente."""
+    with open(os.path.join(destino, nome_shard), 'rb') as f:
+        conteudo = gzip.decompress(f.read())
+    return [({campo: entrada.get(campo) for campo in CAMPOS_FILTRO + CAMPOS_CAMINHOS},
+             conteudo[entrada['inicio']:entrada['inicio'] + entrada['tamanho']]) for entrada in entradas]
+
+
+@medido('dashboard_export.exportar')
+def exportar_dashboard(caminho_jsonl=OUTPUT_JSONL_PATH, destino=DASHBOARD_DIR, agrupar_por=DASHBOARD_AGRUPAR_POR,
+                       completo=False):
+    """
+    Gera (ou atualiza) o índice e os shards do painel a partir do relatório .jsonl.
+    Por padrão só as linhas gravadas depois da exportação anterior são lidas, e só
+    os shards dos grupos que elas alteram são remontados ('completo=True' relê o
+    relatório inteiro). Shards que o novo índice não referencia mais são removidos
+    depois de o índice ser trocado.
+
+    Returns:
+        dict: Contagens de registros e de shards gravados, reaproveitados e removidos,
+        ou None se o relatório não existir.
+    """
+    if agrupar_por not in AGRUPAMENTOS:
+        raise ValueError(f"Agrupamento '{agrupar_por}' inválido. Use um de {AGRUPAMENTOS}.")
+    if not os.path.exists(caminho_jsonl):
+        print(f"AVISO: Relatório '{caminho_jsonl}' não encontrado. Nada a exportar.")
+        return None
+
+    os.makedirs(destino, exist_ok=True)
+    anterior = None if completo else _carregar_indice_anterior(destino, caminho_jsonl, agrupar_por)
+    inicio = anterior['origem']['bytes'] if anterior else 0
+    posicoes, fim = _ler_posicoes(caminho_jsonl, inicio)
+
+    # Entradas do índice por grupo, na ordem em que os grupos apareceram no relatório.
+    entradas_por_grupo, shard_por_grupo = {}, {}
+    if anterior:
+        for entrada in anterior['registros']:
+            entradas_por_grupo.setdefault(anterior['shards'][entrada['shard']]['grupo'], []).append(entrada)
+        shard_por_grupo = {info['grupo']: (nome, info) for nome, info in anterior['shards'].items()}
+    novos_por_grupo = {}
+    for item in posicoes.values():
+        grupo = _nome_grupo(item[2], agrupar_por)
+        entradas_por_grupo.setdefault(grupo, [])
+        novos_por_grupo.setdefault(grupo, []).append(item)
+
+    gravados = 0
+    with open(caminho_jsonl, 'rb') as f:
+        for grupo, itens in novos_por_grupo.items():
+            corpos = _corpos_do_relatorio(f, itens)
+            antigas = entradas_por_grupo[grupo]
+            if antigas:
+                # Registros já exportados do grupo: uma chave regravada é trocada no lugar.
+                nome_antigo = antigas[0]['shard']
+                por_chave = dict((_chave(campos), (campos, corpo))
+                                 for campos, corpo in _registros_do_shard(destino, nome_antigo, antigas))
+                por_chave.update((_chave(campos), (campos, corpo)) for campos, corpo in corpos)
+                corpos = list(por_chave.values())
+            nome_shard, info, entradas, gravado = _gravar_shard(destino, grupo, corpos)
+            shard_por_grupo[grupo] = (nome_shard, info)
+            entradas_por_grupo[grupo] = entradas
+            gravados += gravado
+
+    shards = dict(shard_por_grupo[grupo] for grupo in entradas_por_grupo)
+    registros = [entrada for entradas in entradas_por_grupo.values() for entrada in entradas]
+    indice = {"versao": VERSAO_INDICE, "agrupamento": agrupar_por,
+              "origem": {"bytes": fim, "assinatura": _assinatura(caminho_jsonl, fim)},
+              "shards": shards, "registros": registros}
+    # O índice é trocado só depois de todos os shards que ele referencia existirem.
+    _gravar_atomico(os.path.join(destino, NOME_INDICE),
+                    json.dumps(indice, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    removidos = 0
+    for nome in os.listdir(destino):
+        if nome.endswith(SUFIXO_SHARD) and nome not in shards:
+            os.remove(os.path.join(destino, nome))
+            removidos += 1
+
+    resumo = {"registros": len(registros), "shards": len(shards), "gravados": gravados,
+              "reaproveitados": len(shards) - gravados, "removidos": removidos,
+              "bytes_lidos": fim - inicio}
+    print(f"--- PAINEL EXPORTADO em '{destino}': {resumo} ---")
+    return resumo
+
+
+if __name__ == "__main__":
+    # Uso: python -m eyetracking_analyzer.dashboard_export [--agrupar-por bloco]
+    import argparse
+    parser = argparse.ArgumentParser(description="Exporta o relatório .jsonl em índice + shards gzip para o painel web.")
+    parser.add_argument("--jsonl", default=OUTPUT_JSONL_PATH, help="Relatório de origem")
+    parser.add_argument("--destino", default=DASHBOARD_DIR, help="Diretório do painel")
+    parser.add_argument("--agrupar-por", choices=AGRUPAMENTOS, default=DASHBOARD_AGRUPAR_POR,
+                        help="Um shard por mídia ou por bloco")
+    parser.add_argument("--completo", action="store_true", help="Relê o relatório inteiro em vez de só as linhas novas")
+    args = parser.parse_args()
+    exportar_dashboard(args.jsonl, args.destino, args.agrupar_por, args.completo)
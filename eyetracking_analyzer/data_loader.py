@@ -1,20 +1,178 @@
 # eyetracking_analyzer/data_loader.py
 # eyetracking_analyzer/data_loader.py
 import os
+import numpy as np
 import pandas as pd
-from config import INFO_CSV_PATH, IMAGES_DIR, LOGS_DIR, SALIENCY_MAPS_DIR, SCANPATHS_DIR
+from PIL import Image
+from config import INFO_CSV_PATH, IMAGES_DIR, LOGS_DIR, SALIENCY_MAPS_DIR, SCANPATHS_DIR, FATIAR_FIXACOES_POR_DURACAO
+from eyetracking_analyzer.fixation_index import (
+    carregar_indice_fixacoes, abrir_indice_fixacoes, fixacoes_para_dataframe, segundos_da_duracao
+)
+from eyetracking_analyzer.map_store import imagem_do_pacote
+from eyetracking_analyzer.profiling import medir
 
-def buscar_dados_participante(participante=None, media_name=None, tipo_de_midia=None, duration='7s'):
+
+CAMPOS_CAMINHO = ('image_path', 'scanpath_path', 'heatmap_path', 'fixmap_path', 'overlay_heatmap_path')
+
+
+def caminho_derivado(campo, media_name, participante, duration):
     """
-    Busca e filtra os dados, agora incluindo o caminho para a imagem overlay_heatmap.
+    Caminho de uma imagem do registro (campo de CAMPOS_CAMINHO), derivado só da
+    mídia, do participante, da duração e dos diretórios do config.
+    """
+    if campo == 'image_path':
+        return os.path.join(IMAGES_DIR, media_name)
+    if campo == 'scanpath_path':
+        return os.path.join(SCANPATHS_DIR, f"paths_{duration}", media_name.split(".")[0], f"{participante}.png")
+    if campo == 'heatmap_path':
+        return os.path.join(SALIENCY_MAPS_DIR, f"heatmaps_{duration}", media_name)
+    if campo == 'fixmap_path':
+        return os.path.join(SALIENCY_MAPS_DIR, f"fixmaps_{duration}", media_name)
+    if campo == 'overlay_heatmap_path':
+        return os.path.join(SALIENCY_MAPS_DIR, f"overlay_heatmaps_{duration}", f"overlay_{media_name}")
+    raise KeyError(campo)
+
+
+def _reconstruir_registro(diretorio_indice, participante, media_name, categoria, bloco, duration, inicio, fim):
+    """Recria um RegistroOcular em outro processo, reabrindo o índice por memory-map."""
+    return RegistroOcular(abrir_indice_fixacoes(diretorio_indice), participante, media_name,
+                          categoria, bloco, duration, inicio, fim)
+
+
+class RegistroOcular:
+    """
+    Um conjunto de dados para análise (mídia, participante) em formato compacto.
+
+    Em vez de um DataFrame por registro, guarda apenas o intervalo [inicio, fim)
+    das suas linhas nos arrays colunares compartilhados do índice de fixações.
+    'fixacoes' devolve views sem cópia dessas colunas; 'dados_oculares' monta
+    o DataFrame antigo sob demanda. O acesso por chave (registro['media_name'],
+    registro.get('bloco')) mantém a compatibilidade com o antigo dicionário.
+    """
+
+    __slots__ = ('indice', 'participante', 'media_name', 'categoria', 'bloco', 'duration', 'inicio', 'fim')
+
+    CAMPOS = ('participante', 'media_name', 'categoria', 'bloco', 'image_path', 'scanpath_path',
+              'heatmap_path', 'fixmap_path', 'overlay_heatmap_path', 'dados_oculares')
+
+    def __init__(self, indice, participante, media_name, categoria, bloco, duration, inicio, fim):
+        self.indice = indice
+        self.participante = participante
+        self.media_name = media_name
+        self.categoria = categoria
+        self.bloco = bloco
+        self.duration = duration
+        self.inicio = inicio
+        self.fim = fim
+
+    @property
+    def fixacoes(self):
+        """{coluna: array} com as fixações do registro (views do índice, sem cópia)."""
+        return self.indice.fatia(self.inicio, self.fim)
+
+    @property
+    def dados_oculares(self):
+        """Adaptador de compatibilidade: as fixações como DataFrame (cria uma cópia)."""
+        return fixacoes_para_dataframe(self.fixacoes, self.media_name)
+
+    @property
+    def num_fixacoes(self):
+        return self.fim - self.inicio
+
+    @property
+    def image_path(self):
+        return caminho_derivado('image_path', self.media_name, self.participante, self.duration)
+
+    @property
+    def scanpath_path(self):
+        return caminho_derivado('scanpath_path', self.media_name, self.participante, self.duration)
+
+    @property
+    def heatmap_path(self):
+        return caminho_derivado('heatmap_path', self.media_name, self.participante, self.duration)
+
+    @property
+    def fixmap_path(self):
+        return caminho_derivado('fixmap_path', self.media_name, self.participante, self.duration)
+
+    @property
+    def overlay_heatmap_path(self):
+        return caminho_derivado('overlay_heatmap_path', self.media_name, self.participante, self.duration)
+
+    def janela(self, duration):
+        """
+        Novo registro com as fixações da janela 'duration' (ex: '3s'), contada
+        pelo FPOGS a partir da primeira fixação, e os caminhos dos mapas dessa
+        duração. É só um novo intervalo no índice: nenhuma coluna é copiada.
+        A janela é tomada dentro do intervalo atual (não o estende).
+        """
+        fim = self.indice.fim_janela(self.inicio, self.fim, segundos_da_duracao(duration))
+        return RegistroOcular(self.indice, self.participante, self.media_name, self.categoria, self.bloco,
+                              duration, self.inicio, fim)
+
+    def obter_imagem(self, campo):
+        """
+        Retorna a imagem de um campo de caminho (ex: 'heatmap_path', 'scanpath_path')
+        como array NumPy. Se a família foi empacotada (map_store), é uma view
+        sem cópia do pacote; senão, o PNG é decodificado. None se não existir.
+        """
+        caminho = getattr(self, campo)
+        vista = imagem_do_pacote(caminho)
+        if vista is not None:
+            return vista
+        try:
+            with Image.open(caminho) as img:
+                return np.asarray(img)
+        except FileNotFoundError:
+            return None
+
+    # --- Interface de dicionário (compatibilidade) ---
+    def __getitem__(self, chave):
+        if chave not in self.CAMPOS:
+            raise KeyError(chave)
+        return getattr(self, chave)
+
+    def __contains__(self, chave):
+        return chave in self.CAMPOS
+
+    def get(self, chave, padrao=None):
+        return getattr(self, chave) if chave in self.CAMPOS else padrao
+
+    def keys(self):
+        return iter(self.CAMPOS)
+
+    def para_dict(self):
+        """Converte para o dicionário antigo, com o DataFrame em 'dados_oculares'."""
+        return {campo: getattr(self, campo) for campo in self.CAMPOS}
+
+    def __reduce__(self):
+        # Só metadados e offsets atravessam o pickle; os arrays são reabertos do disco.
+        return (_reconstruir_registro, (self.indice.diretorio, self.participante, self.media_name,
+                                        self.categoria, self.bloco, self.duration, self.inicio, self.fim))
+
+    def __repr__(self):
+        return (f"RegistroOcular(media_name={self.media_name!r}, participante={self.participante!r}, "
+                f"fixacoes={self.num_fixacoes})")
+
+
+def iterar_dados_participante(participante=None, media_name=None, tipo_de_midia=None, duration='7s',
+                              fatiar_por_duracao=FATIAR_FIXACOES_POR_DURACAO):
+    """
+    Versão sob demanda de buscar_dados_participante: gera os RegistroOcular um
+    a um, à medida que cada imagem é verificada, para que o processamento
+    comece antes de a busca terminar.
+
+    Com 'fatiar_por_duracao', as fixações de cada registro são cortadas à
+    janela 'duration' (ver RegistroOcular.janela), de modo que prompt e
+    heatmap usem o mesmo período dos mapas pré-calculados.
     """
-    # ... (o início da função permanece o mesmo) ...
     print("--- INICIANDO BUSCA E FILTRAGEM DE DADOS ---")
     try:
-        df_info = pd.read_csv(INFO_CSV_PATH, sep=';')
+        with medir('data_loader.info_csv'):
+            df_info = pd.read_csv(INFO_CSV_PATH, sep=';')
     except FileNotFoundError:
         print(f"ERRO: Arquivo de informações '{INFO_CSV_PATH}' não encontrado.")
-        return []
+        return
 
     if media_name:
         df_info = df_info[df_info['Image Name'] == media_name]
@@ -23,11 +181,19 @@ def buscar_dados_participante(participante=None, media_name=None, tipo_de_midia=
 
     if df_info.empty:
         print("Nenhuma imagem encontrada em info.csv com os filtros aplicados.")
-        return []
+        return
     
     print(f"Encontradas {len(df_info)} imagens correspondentes em info.csv.")
-    
-    dados_finais = []
+
+    # Os logs são lidos uma única vez para o índice colunar; cada par
+    # (mídia, participante) abaixo é apenas uma consulta O(1).
+    try:
+        with medir('data_loader.indice'):
+            indice = carregar_indice_fixacoes()
+    except Exception as e:
+        print(f"ERRO ao carregar o índice de fixações: {e}")
+        return
+
     for _, row in df_info.iterrows():
         img_name = row['Image Name']
         block = str(row['Block']).zfill(2)
@@ -38,48 +204,36 @@ def buscar_dados_participante(participante=None, media_name=None, tipo_de_midia=
             print(f"AVISO: Imagem '{img_path}' não encontrada. Pulando.")
             continue
 
-        log_files_a_procurar = []
         if participante:
-            log_filename = f"{block}_kh0{str(participante).zfill(2)}_fixations.csv"
-            log_files_a_procurar.append(os.path.join(LOGS_DIR, log_filename))
+            participantes_a_procurar = [str(participante).zfill(2)]
         else:
-            for file in os.listdir(LOGS_DIR):
-                if file.startswith(f"{block}_") and file.endswith("_fixations.csv"):
-                    log_files_a_procurar.append(os.path.join(LOGS_DIR, file))
+            participantes_a_procurar = indice.participantes(img_name, bloco=block)
 
-        for log_path in log_files_a_procurar:
-            if not os.path.exists(log_path):
-                print(f"AVISO: Arquivo de log '{log_path}' não encontrado. Pulando.")
+        for id_participante_log in participantes_a_procurar:
+            if not indice.possui_log(block, id_participante_log):
+                log_filename = f"{block}_kh0{id_participante_log}_fixations.csv"
+                print(f"AVISO: Arquivo de log '{os.path.join(LOGS_DIR, log_filename)}' não encontrado. Pulando.")
                 continue
-            
-            try:
-                df_log = pd.read_csv(log_path)
-                id_participante_log = os.path.basename(log_path).split('_')[1].replace('kh0', '')
-                log_data_imagem = df_log[df_log['MEDIA_NAME'] == img_name]
-                if not log_data_imagem.empty:
-                    print(f"  - Dados encontrados para participante '{id_participante_log}' e imagem '{img_name}'.")
-                    
-                    # --- LÓGICA ADICIONADA PARA ENCONTRAR OS CAMINHOS DAS IMAGENS ---
-                    scanpath_path = os.path.join(SCANPATHS_DIR, f"paths_{duration}", img_name.split(".")[0], f"{id_participante_log}.png")
-                    heatmap_path = os.path.join(SALIENCY_MAPS_DIR, f"heatmaps_{duration}", img_name)
-                    fixmap_path = os.path.join(SALIENCY_MAPS_DIR, f"fixmaps_{duration}", img_name)
-                    # NOVO CAMINHO PARA O OVERLAY HEATMAP
-                    overlay_heatmap_path = os.path.join(SALIENCY_MAPS_DIR, f"overlay_heatmaps_{duration}", f"overlay_{img_name}")
-                    print(overlay_heatmap_path)
-                    dados_finais.append({
-                        "participante": id_participante_log,
-                        "media_name": img_name,
-                        "categoria": category,
-                        "bloco": block,
-                        "image_path": img_path,
-                        "scanpath_path": scanpath_path,
-                        "heatmap_path": heatmap_path,
-                        "fixmap_path": fixmap_path,
-                        "overlay_heatmap_path": overlay_heatmap_path, # Novo
-                        "dados_oculares": log_data_imagem
-                    })
-            except Exception as e:
-                print(f"ERRO ao processar o arquivo de log '{log_path}': {e}")
-                
+
+            intervalo = indice.intervalo(img_name, id_participante_log)
+            if intervalo is not None:
+                print(f"  - Dados encontrados para participante '{id_participante_log}' e imagem '{img_name}'.")
+                registro = RegistroOcular(indice, id_participante_log, img_name, category, block, duration, *intervalo)
+                if fatiar_por_duracao:
+                    registro = registro.janela(duration)
+                print(registro.overlay_heatmap_path)
+                yield registro
+
+
+def buscar_dados_participante(participante=None, media_name=None, tipo_de_midia=None, duration='7s',
+                              fatiar_por_duracao=FATIAR_FIXACOES_POR_DURACAO):
+    """
+    Busca e filtra os dados, agora incluindo o caminho para a imagem overlay_heatmap.
+
+    Retorna uma lista de RegistroOcular; cada um aceita o acesso por chave do
+    antigo dicionário e expõe as fixações como views dos arrays do índice.
+    """
+    dados_finais = list(iterar_dados_participante(participante, media_name, tipo_de_midia, duration,
+                                                  fatiar_por_duracao))
     print(f"--- FIM DA BUSCA. Total de {len(dados_finais)} conjuntos de dados para análise. ---")
-    return dados_finais
\ No newline at end of file
+    return dados_finais
@@ -0,0 +1,96 @@
+# eyetracking_analyzer/execucao.py
+"""
+Partes comuns dos scripts em lote (run_metrics, run_scanpath_similarity e o
+modo em lote de run_visualizations): filtros da linha de comando, seleção das
+mídias de info.csv, execução de uma tarefa por mídia em um pool de processos,
+com a linha de progresso, e gravação do Parquet de resultados.
+"""
+import os
+import sys
+import fnmatch
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+from config import INFO_CSV_PATH
+
+
+def adicionar_argumentos_filtro(parser):
+    """Adiciona ao parser (ou grupo) os filtros de seleção e o número de processos."""
+    parser.add_argument("--categoria", help="Filtra por categoria (ex: webpage)")
+    parser.add_argument("--bloco", nargs="+", help="Um ou mais blocos (ex: 1 2 5)")
+    parser.add_argument("--participantes", nargs="+", help="Conjunto de participantes (ex: 01 07 12)")
+    parser.add_argument("--media-glob", help="Padrão de nome das mídias (ex: 'a*.png')")
+    parser.add_argument("--workers", type=int, default=None, help="Número de processos (padrão: núcleos da CPU)")
+
+
+def tarefas_filtradas(indice, categoria=None, blocos=None, media_glob=None, participantes=None):
+    """
+    Filtra info.csv e gera (mídia, categoria, bloco, [participantes]) para cada
+    mídia selecionada, com os participantes do índice que têm log no bloco da
+    mídia (restritos a 'participantes', se informado). Mídias sem nenhum
+    participante também são geradas; cada script decide o que pular.
+    """
+    df_info = pd.read_csv(INFO_CSV_PATH, sep=';')
+    if categoria:
+        df_info = df_info[df_info['Category'].str.contains(categoria, case=False, na=False)]
+    if blocos:
+        blocos = {str(b).zfill(2) for b in blocos}
+        df_info = df_info[df_info['Block'].astype(str).str.zfill(2).isin(blocos)]
+    if media_glob:
+        df_info = df_info[df_info['Image Name'].map(lambda nome: fnmatch.fnmatch(nome, media_glob))]
+    participantes_filtro = {str(p).zfill(2) for p in participantes} if participantes else None
+
+    for _, row in df_info.iterrows():
+        media_name = row['Image Name']
+        bloco = str(row['Block']).zfill(2)
+        selecionados = [p for p in indice.participantes(media_name, bloco=bloco)
+                        if participantes_filtro is None or p in participantes_filtro]
+        yield media_name, row['Category'], bloco, selecionados
+
+
+def executar_em_processos(funcao, tarefas, workers=None, resumo=None):
+    """
+    Roda funcao(*argumentos) para cada (rótulo, argumentos) de 'tarefas' em um
+    ProcessPoolExecutor e gera (rótulo, resultado, erro) na ordem de conclusão;
+    'erro' é a exceção da tarefa (e 'resultado' None) quando ela falha.
+
+    Depois que quem consome trata cada resultado, a linha de progresso
+    '[i/n] mídias' é reescrita, seguida de resumo() se informado.
+    """
+    total = len(tarefas)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = {executor.submit(funcao, *argumentos): rotulo for rotulo, argumentos in tarefas}
+        for concluidas, futuro in enumerate(as_completed(futuros), start=1):
+            try:
+                resultado, erro = futuro.result(), None
+            except Exception as e:
+                resultado, erro = None, e
+            yield futuros[futuro], resultado, erro
+            sys.stdout.write(f"\r[{concluidas}/{total}] mídias" + (f" | {resumo()}" if resumo else ""))
+            sys.stdout.flush()
+    print()
+
+
+def gravar_parquet_mesclado(df, caminho, chaves):
+    """
+    Grava 'df' em 'caminho' mantendo as linhas do arquivo existente cujas
+    'chaves' (colunas) não foram recalculadas: uma execução filtrada
+    (--participantes, --categoria, ...) atualiza só o que calculou. A gravação
+    é atômica (arquivo temporário + os.replace).
+
+    Returns:
+        pd.DataFrame: O conteúdo gravado, ordenado pelas chaves.
+    """
+    chaves = list(chaves)
+    if os.path.exists(caminho):
+        anterior = pd.read_parquet(caminho)
+        recalculadas = pd.MultiIndex.from_frame(df[chaves].astype(str))
+        mantidas = ~pd.MultiIndex.from_frame(anterior[chaves].astype(str)).isin(recalculadas)
+        if mantidas.any():
+            df = pd.concat([anterior[mantidas], df], ignore_index=True)
+    df = df.sort_values(chaves, ignore_index=True)
+
+    os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+    temporario = f"{caminho}.tmp"
+    df.to_parquet(temporario, index=False)
+    os.replace(temporario, caminho)
+    return df
@@ -0,0 +1,328 @@
+# eyetracking_analyzer/fixation_index.py
+import os
+import glob
+import json
+import shutil
+import tempfile
+import contextlib
+import numpy as np
+import pandas as pd
+from config import LOGS_DIR, FIXATION_INDEX_DIR
+
+# Colunas numéricas guardadas no índice, na ordem usada pelo prompt.
+COLUNAS_FIXACAO = ('FPOGX', 'FPOGY', 'FPOGS', 'FPOGD', 'FPOGID')
+SUFIXO_LOG = '_fixations.csv'
+NOME_MANIFESTO = 'manifesto.json'
+
+# Instância já carregada neste processo (evita reabrir os arquivos a cada busca).
+_indice_carregado = None
+# Índices abertos por diretório, sem checagem dos logs (usado ao despicklar registros).
+_indices_abertos = {}
+
+
+def extrair_id_participante(nome_arquivo_log):
+    """Extrai o ID do participante do nome do log (ex: '01_kh005_fixations.csv' -> '05')."""
+    return os.path.basename(nome_arquivo_log).split('_')[1].replace('kh0', '')
+
+
+def extrair_bloco(nome_arquivo_log):
+    """Extrai o bloco do nome do log (ex: '01_kh005_fixations.csv' -> '01')."""
+    return os.path.basename(nome_arquivo_log).split('_')[0]
+
+
+def assinatura_logs(logs_dir=LOGS_DIR):
+    """
+    Retorna {nome_do_log: [mtime_ns, tamanho]} para todos os logs de fixação.
+    Qualquer alteração nesses valores torna o índice desatualizado.
+    """
+    assinatura = {}
+    with os.scandir(logs_dir) as entradas:
+        for entrada in entradas:
+            if entrada.name.endswith(SUFIXO_LOG) and entrada.is_file():
+                st = entrada.stat()
+                assinatura[entrada.name] = [st.st_mtime_ns, st.st_size]
+    return assinatura
+
+
+@contextlib.contextmanager
+def _trava_indice(diretorio_indice):
+    """
+    Trava exclusiva entre processos (arquivo '<índice>.lock') para reconstruir e
+    trocar o índice. Workers de ProcessPool e de shards abrem o mesmo índice ao
+    mesmo tempo; sem a trava, um poderia apagar ou trocar o diretório de outro.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(diretorio_indice)), exist_ok=True)
+    with open(diretorio_indice + '.lock', 'a+b') as arquivo:
+        if os.name == 'nt':
+            import msvcrt
+            arquivo.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(arquivo.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK desiste após ~10s; a reconstrução pode levar mais
+            try:
+                yield
+            finally:
+                arquivo.seek(0)
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+
+
+def construir_indice_fixacoes(logs_dir=LOGS_DIR, diretorio_indice=FIXATION_INDEX_DIR):
+    """
+    Lê todos os logs do eyetracker uma única vez e grava um pacote colunar de
+    arrays NumPy (.npy) ordenado por (MEDIA_NAME, participante).
+
+    Cada coluna de COLUNAS_FIXACAO vira um array contíguo; as chaves
+    (mídia, participante) guardam apenas o intervalo [inicio, fim) de suas linhas.
+    """
+    with _trava_indice(diretorio_indice):
+        _construir_indice(logs_dir, diretorio_indice)
+
+
+def _construir_indice(logs_dir, diretorio_indice):
+    """Corpo de construir_indice_fixacoes; quem chama já tem a trava do índice."""
+    print(f"--- CONSTRUINDO ÍNDICE DE FIXAÇÕES A PARTIR DE '{logs_dir}' ---")
+    assinatura = assinatura_logs(logs_dir)
+    arquivos = sorted(assinatura)
+    colunas_lidas = ('MEDIA_NAME',) + COLUNAS_FIXACAO
+
+    frames = []
+    for id_arquivo, nome in enumerate(arquivos):
+        try:
+            df_log = pd.read_csv(os.path.join(logs_dir, nome), usecols=lambda c: c in colunas_lidas)
+        except Exception as e:
+            print(f"ERRO ao processar o arquivo de log '{nome}': {e}")
+            continue
+        df_log['participante'] = extrair_id_participante(nome)
+        df_log['id_arquivo'] = id_arquivo
+        frames.append(df_log)
+
+    if frames:
+        df = pd.concat(frames, ignore_index=True)
+    else:
+        df = pd.DataFrame(columns=list(colunas_lidas) + ['participante', 'id_arquivo'])
+    df['MEDIA_NAME'] = df['MEDIA_NAME'].astype(str)
+
+    # Ordenação estável: mantém a sequência original das fixações dentro de cada chave.
+    medias = df['MEDIA_NAME'].to_numpy(dtype=str)
+    participantes = df['participante'].to_numpy(dtype=str)
+    ordem = np.lexsort((participantes, medias))
+    medias, participantes = medias[ordem], participantes[ordem]
+    ids_arquivo = df['id_arquivo'].to_numpy(dtype=np.int32)[ordem]
+
+    # Limites de cada grupo (mídia, participante) no array ordenado.
+    if len(ordem):
+        mudou = (medias[1:] != medias[:-1]) | (participantes[1:] != participantes[:-1])
+        inicio = np.concatenate(([0], np.flatnonzero(mudou) + 1)).astype(np.int64)
+    else:
+        inicio = np.zeros(0, dtype=np.int64)
+    fim = np.append(inicio[1:], len(ordem)).astype(np.int64)
+
+    # Com a trava, qualquer '<índice>.tmp*' que sobrou é de uma reconstrução interrompida.
+    for sobra in glob.glob(glob.escape(diretorio_indice) + '.tmp*'):
+        shutil.rmtree(sobra, ignore_errors=True)
+    diretorio_tmp = tempfile.mkdtemp(prefix=os.path.basename(diretorio_indice) + '.tmp',
+                                     dir=os.path.dirname(os.path.abspath(diretorio_indice)))
+    os.chmod(diretorio_tmp, 0o755)  # mkdtemp cria com 0o700; o índice é lido por outros usuários do cache
+
+    for col in COLUNAS_FIXACAO:
+        valores = df[col].to_numpy()[ordem] if col in df.columns else np.full(len(ordem), np.nan)
+        np.save(os.path.join(diretorio_tmp, f"{col}.npy"), np.ascontiguousarray(valores))
+    np.save(os.path.join(diretorio_tmp, 'chaves_media.npy'), medias[inicio])
+    np.save(os.path.join(diretorio_tmp, 'chaves_participante.npy'), participantes[inicio])
+    np.save(os.path.join(diretorio_tmp, 'id_arquivo.npy'), ids_arquivo[inicio])
+    np.save(os.path.join(diretorio_tmp, 'inicio.npy'), inicio)
+    np.save(os.path.join(diretorio_tmp, 'fim.npy'), fim)
+
+    # O manifesto é gravado por último: sem ele o índice é considerado incompleto.
+    with open(os.path.join(diretorio_tmp, NOME_MANIFESTO), 'w', encoding='utf-8') as f:
+        json.dump({"logs_dir": os.path.abspath(logs_dir), "arquivos": arquivos, "assinatura": assinatura}, f)
+
+    diretorio_antigo = diretorio_indice + '.old'
+    shutil.rmtree(diretorio_antigo, ignore_errors=True)
+    if os.path.exists(diretorio_indice):
+        os.replace(diretorio_indice, diretorio_antigo)
+    os.replace(diretorio_tmp, diretorio_indice)
+    shutil.rmtree(diretorio_antigo, ignore_errors=True)
+
+    print(f"--- ÍNDICE CONSTRUÍDO: {len(inicio)} pares (mídia, participante), {len(ordem)} fixações. ---")
+
+
+class IndiceFixacoes:
+    """
+    Acesso somente-leitura ao pacote gerado por construir_indice_fixacoes.
+    As colunas são abertas com memory-map, então cada consulta devolve
+    apenas uma fatia (view) dos arrays, sem cópia.
+    """
+
+    def __init__(self, diretorio_indice=FIXATION_INDEX_DIR):
+        self.diretorio = diretorio_indice
+        with open(os.path.join(diretorio_indice, NOME_MANIFESTO), encoding='utf-8') as f:
+            manifesto = json.load(f)
+        self.arquivos = manifesto['arquivos']
+        self.assinatura = manifesto['assinatura']
+
+        def abrir(nome):
+            return np.load(os.path.join(diretorio_indice, f"{nome}.npy"), mmap_mode='r')
+
+        self.colunas = {col: abrir(col) for col in COLUNAS_FIXACAO}
+        self.inicio = abrir('inicio')
+        self.fim = abrir('fim')
+
+        medias = np.load(os.path.join(diretorio_indice, 'chaves_media.npy')).tolist()
+        participantes = np.load(os.path.join(diretorio_indice, 'chaves_participante.npy')).tolist()
+        ids_arquivo = np.load(os.path.join(diretorio_indice, 'id_arquivo.npy')).tolist()
+
+        blocos_arquivo = [extrair_bloco(nome) for nome in self.arquivos]
+        self.logs_por_bloco = {}
+        for nome, bloco in zip(self.arquivos, blocos_arquivo):
+            self.logs_por_bloco.setdefault(bloco, set()).add(extrair_id_participante(nome))
+
+        # Tabelas de consulta O(1): (mídia, participante) -> posição da chave.
+        self._posicoes = {}
+        self._por_media = {}
+        for pos, (media, part, id_arq) in enumerate(zip(medias, participantes, ids_arquivo)):
+            self._posicoes[(media, part)] = pos
+            self._por_media.setdefault(media, []).append((part, blocos_arquivo[id_arq], pos))
+
+    def __len__(self):
+        return len(self._posicoes)
+
+    def possui_log(self, bloco, participante):
+        """Indica se existe log de fixações do participante para o bloco."""
+        return participante in self.logs_por_bloco.get(bloco, ())
+
+    def participantes(self, media_name, bloco=None):
+        """Lista os participantes com fixações na mídia (opcionalmente só logs do bloco)."""
+        return [part for part, bloco_log, _ in self._por_media.get(media_name, [])
+                if bloco is None or bloco_log == bloco]
+
+    def intervalo(self, media_name, participante):
+        """Retorna (inicio, fim) das linhas da chave, ou None se não houver dados."""
+        pos = self._posicoes.get((media_name, participante))
+        if pos is None:
+            return None
+        return int(self.inicio[pos]), int(self.fim[pos])
+
+    def obter(self, media_name, participante):
+        """Retorna {coluna: array} com as fixações da chave (views sem cópia), ou None."""
+        intervalo = self.intervalo(media_name, participante)
+        if intervalo is None:
+            return None
+        return self.fatia(*intervalo)
+
+    def fatia(self, inicio, fim):
+        """Retorna {coluna: array} das linhas [inicio, fim), como views sem cópia."""
+        return {col: valores[inicio:fim] for col, valores in self.colunas.items()}
+
+    def fim_janela(self, inicio, fim, segundos):
+        """
+        Fim do prefixo de [inicio, fim) com as fixações iniciadas menos de
+        'segundos' após a primeira (FPOGS relativo). As linhas de uma chave
+        estão em ordem cronológica, então a janela é sempre um prefixo.
+        """
+        return int(inicio + limites_janelas(self.colunas['FPOGS'][inicio:fim], [segundos])[0])
+
+    def obter_dataframe(self, media_name, participante):
+        """Mesma consulta de obter(), mas no formato DataFrame usado pelo restante do código."""
+        dados = self.obter(media_name, participante)
+        if dados is None:
+            return None
+        return fixacoes_para_dataframe(dados, media_name)
+
+
+def segundos_da_duracao(duration):
+    """Converte '7s', '1.5s' ou 7 em segundos (float); None significa a sequência inteira."""
+    if duration is None:
+        return None
+    if isinstance(duration, str):
+        duration = duration.strip().lower().rstrip('s')
+    return float(duration)
+
+
+def limites_janelas(tempos_inicio, lista_segundos):
+    """
+    Quantas fixações (a partir do começo) cabem em cada janela de duração.
+
+    Args:
+        tempos_inicio (np.ndarray): FPOGS das fixações, em ordem cronológica.
+        lista_segundos (list): Durações das janelas, em segundos (None = inteira).
+
+    Returns:
+        np.ndarray: Um limite por janela, pronto para fatiar [0:limite].
+    """
+    tempos_inicio = np.asarray(tempos_inicio, dtype=np.float64)
+    if not len(tempos_inicio):
+        return np.zeros(len(lista_segundos), dtype=np.int64)
+    relativos = tempos_inicio - tempos_inicio[0]
+    segundos = np.array([np.inf if s is None else s for s in lista_segundos], dtype=np.float64)
+    return np.searchsorted(relativos, segundos, side='left')
+
+
+def fixacoes_para_dataframe(fixacoes, media_name):
+    """Converte um dicionário de colunas do índice no DataFrame de fixações (com MEDIA_NAME)."""
+    df = pd.DataFrame({col: np.asarray(valores) for col, valores in fixacoes.items()})
+    df.insert(0, 'MEDIA_NAME', media_name)
+    return df
+
+
+def abrir_indice_fixacoes(diretorio_indice=FIXATION_INDEX_DIR):
+    """
+    Abre (uma vez por processo) o índice já construído em 'diretorio_indice',
+    sem verificar se os logs mudaram. Útil em processos filhos, que recebem
+    registros apontando para um índice que o processo principal já validou.
+    """
+    if _indice_carregado is not None and _indice_carregado.diretorio == diretorio_indice:
+        return _indice_carregado
+    indice = _indices_abertos.get(diretorio_indice)
+    if indice is None:
+        indice = _indices_abertos[diretorio_indice] = IndiceFixacoes(diretorio_indice)
+    return indice
+
+
+def carregar_indice_fixacoes(logs_dir=LOGS_DIR, diretorio_indice=FIXATION_INDEX_DIR):
+    """
+    Retorna o índice de fixações, reconstruindo-o automaticamente quando algum
+    log foi adicionado, removido ou teve mtime/tamanho alterado.
+    """
+    global _indice_carregado
+    assinatura = assinatura_logs(logs_dir)
+
+    if _indice_carregado is not None and _indice_carregado.diretorio == diretorio_indice \
+            and _indice_carregado.assinatura == assinatura:
+        return _indice_carregado
+
+    indice = _abrir_se_atual(diretorio_indice, assinatura)
+    if indice is None:
+        with _trava_indice(diretorio_indice):
+            # Outro processo pode ter reconstruído o índice enquanto esperávamos a trava.
+            indice = _abrir_se_atual(diretorio_indice, assinatura)
+            if indice is None:
+                _construir_indice(logs_dir, diretorio_indice)
+                indice = IndiceFixacoes(diretorio_indice)
+
+    _indice_carregado = indice
+    return indice
+
+
+def _abrir_se_atual(diretorio_indice, assinatura):
+    """Abre o índice gravado se ele corresponder à assinatura dos logs; senão None."""
+    try:
+        indice = IndiceFixacoes(diretorio_indice)
+    except (FileNotFoundError, ValueError, KeyError):
+        # Ausente, incompleto ou trocado por outro processo no meio da leitura.
+        return None
+    return indice if indice.assinatura == assinatura else None
+
+
+if __name__ == "__main__":
+    construir_indice_fixacoes()
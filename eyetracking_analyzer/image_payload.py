@@ -0,0 +1,123 @@
+# eyetracking_analyzer/image_payload.py
+import io
+import os
+import hashlib
+import threading
+from functools import lru_cache
+from PIL import Image
+from config import (
+    PAYLOAD_ARESTA_MAXIMA, PAYLOAD_FORMATO, PAYLOAD_QUALIDADE, PAYLOAD_IMAGENS_EXTRAS,
+    PAYLOAD_CACHE_DIR, PAYLOAD_CACHE_MEMORIA_MAXIMO
+)
+
+TIPOS_MIME = {'JPEG': 'image/jpeg', 'PNG': 'image/png', 'WEBP': 'image/webp'}
+EXTENSOES = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+_lock_hashes = threading.Lock()
+_hashes_arquivos = {}
+
+
+def hash_arquivo(caminho):
+    """
+    Hash SHA-256 dos bytes do arquivo, memorizado por (caminho, mtime, tamanho).
+    Levanta FileNotFoundError se o arquivo não existir.
+    """
+    st = os.stat(caminho)
+    assinatura = (caminho, st.st_mtime_ns, st.st_size)
+    with _lock_hashes:
+        digest = _hashes_arquivos.get(assinatura)
+    if digest is None:
+        h = hashlib.sha256()
+        with open(caminho, 'rb') as f:
+            for bloco in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloco)
+        digest = h.hexdigest()
+        with _lock_hashes:
+            _hashes_arquivos[assinatura] = digest
+    return digest
+
+
+def _tipo_mime_original(caminho):
+    with Image.open(caminho) as img:
+        return TIPOS_MIME.get(img.format, Image.MIME.get(img.format, 'application/octet-stream'))
+
+
+def _codificar(caminho, aresta_maxima, formato, qualidade):
+    """Reduz a imagem para caber em 'aresta_maxima' e a codifica no formato pedido."""
+    with Image.open(caminho) as img:
+        img.load()
+        if aresta_maxima and max(img.size) > aresta_maxima:
+            img.thumbnail((aresta_maxima, aresta_maxima), Image.LANCZOS)
+        if formato == 'JPEG' and img.mode != 'RGB':
+            # JPEG não tem transparência: compõe sobre fundo branco.
+            rgba = img.convert('RGBA')
+            img = Image.new('RGB', rgba.size, (255, 255, 255))
+            img.paste(rgba, mask=rgba.getchannel('A'))
+        buffer = io.BytesIO()
+        opcoes = {'quality': qualidade} if formato in ('JPEG', 'WEBP') else {'optimize': True}
+        img.save(buffer, format=formato, **opcoes)
+    return buffer.getvalue()
+
+
+@lru_cache(maxsize=PAYLOAD_CACHE_MEMORIA_MAXIMO)
+def _preparar_cache(caminho, digest, aresta_maxima, formato, qualidade, diretorio_cache):
+    if formato is None:
+        with open(caminho, 'rb') as f:
+            return f.read(), _tipo_mime_original(caminho)
+
+    chave = hashlib.sha256(f"{digest}|{aresta_maxima}|{formato}|{qualidade}".encode('ascii')).hexdigest()
+    caminho_cache = os.path.join(diretorio_cache, chave[:2], chave + EXTENSOES.get(formato, ''))
+    try:
+        with open(caminho_cache, 'rb') as f:
+            return f.read(), TIPOS_MIME[formato]
+    except FileNotFoundError:
+        pass
+
+    dados = _codificar(caminho, aresta_maxima, formato, qualidade)
+    os.makedirs(os.path.dirname(caminho_cache), exist_ok=True)
+    # Grava em arquivo temporário e renomeia, para nunca expor um payload pela metade.
+    temporario = f"{caminho_cache}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporario, 'wb') as f:
+        f.write(dados)
+    os.replace(temporario, caminho_cache)
+    return dados, TIPOS_MIME[formato]
+
+
+def preparar_imagem(caminho, aresta_maxima=PAYLOAD_ARESTA_MAXIMA, formato=PAYLOAD_FORMATO,
+                    qualidade=PAYLOAD_QUALIDADE, diretorio_cache=PAYLOAD_CACHE_DIR):
+    """
+    Retorna o payload da imagem pronto para o modelo, como {'mime_type', 'data'}.
+
+    O resultado fica em cache em disco (chave: hash do arquivo + configurações)
+    e em memória, então todos os participantes de uma mesma imagem reaproveitam
+    os mesmos bytes codificados. Levanta FileNotFoundError se a imagem não existir.
+    """
+    digest = hash_arquivo(caminho)
+    dados, tipo_mime = _preparar_cache(caminho, digest, aresta_maxima, formato, qualidade, diretorio_cache)
+    return {'mime_type': tipo_mime, 'data': dados}
+
+
+def assinatura_payload(aresta_maxima=PAYLOAD_ARESTA_MAXIMA, formato=PAYLOAD_FORMATO, qualidade=PAYLOAD_QUALIDADE):
+    """
+    Configurações que determinam os bytes enviados ao modelo, para compor chaves de
+    cache. None quando o arquivo original é enviado (PAYLOAD_FORMATO None).
+    """
+    if formato is None:
+        return None
+    return f"{aresta_maxima}|{formato}|{qualidade}"
+
+
+def caminhos_extras_payload(dados_analise, campos=PAYLOAD_IMAGENS_EXTRAS):
+    """Caminhos das imagens extras configuradas para o registro (apenas as que existem)."""
+    caminhos = []
+    for campo in campos:
+        caminho = dados_analise[campo]
+        if os.path.exists(caminho):
+            caminhos.append(caminho)
+        else:
+            print(f"AVISO: Imagem extra '{caminho}' não encontrada. Enviando sem ela.")
+    return tuple(caminhos)
+
+
+def formatar_tamanho(num_bytes):
+    return f"{num_bytes / 1024:.1f} KB" if num_bytes < 1 << 20 else f"{num_bytes / (1 << 20):.2f} MB"
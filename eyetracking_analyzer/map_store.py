@@ -0,0 +1,277 @@
+# eyetracking_analyzer/map_store.py
+import os
+import sys
+import json
+import shutil
+import threading
+import numpy as np
+from PIL import Image
+from config import SALIENCY_MAPS_DIR, SCANPATHS_DIR, MAPAS_PACOTES_DIR
+
+# Diretórios onde ficam as famílias de mapas (ex: 'heatmaps_7s', 'paths_7s').
+DIRETORIOS_ORIGEM = (SALIENCY_MAPS_DIR, SCANPATHS_DIR)
+EXTENSOES_IMAGEM = ('.png', '.jpg', '.jpeg')
+NOME_MANIFESTO = 'manifesto.json'
+
+# Pacotes já abertos neste processo, por diretório (None = não existe pacote).
+_pacotes_abertos = {}
+_lock_pacotes = threading.Lock()
+
+
+def nome_pacote(familia, resolucao=None):
+    """Nome do diretório do pacote: a família, com '@<resolução>' se os mapas forem reduzidos."""
+    return familia if resolucao is None else f"{familia}@{resolucao}"
+
+
+def diretorio_familia(familia):
+    """Encontra o diretório de origem da família em SALIENCY_MAPS_DIR ou SCANPATHS_DIR."""
+    for base in DIRETORIOS_ORIGEM:
+        caminho = os.path.join(base, familia)
+        if os.path.isdir(caminho):
+            return caminho
+    raise FileNotFoundError(f"Família de mapas '{familia}' não encontrada em {DIRETORIOS_ORIGEM}.")
+
+
+def assinatura_familia(diretorio_origem):
+    """
+    Retorna {chave: [mtime_ns, tamanho]} das imagens da família. A chave é o
+    caminho relativo com '/' ('<mídia>' nos mapas, '<mídia sem extensão>/<participante>.png'
+    nos scanpaths). Desce no máximo um nível de subpastas.
+    """
+    assinatura = {}
+    with os.scandir(diretorio_origem) as entradas:
+        for entrada in entradas:
+            if entrada.is_dir():
+                with os.scandir(entrada.path) as internas:
+                    for interna in internas:
+                        if interna.name.lower().endswith(EXTENSOES_IMAGEM) and interna.is_file():
+                            st = interna.stat()
+                            assinatura[f"{entrada.name}/{interna.name}"] = [st.st_mtime_ns, st.st_size]
+            elif entrada.name.lower().endswith(EXTENSOES_IMAGEM) and entrada.is_file():
+                st = entrada.stat()
+                assinatura[entrada.name] = [st.st_mtime_ns, st.st_size]
+    return assinatura
+
+
+def _modo_armazenado(modo):
+    """Mapas em tons de cinza ficam com 1 canal; o restante com RGB ou RGBA."""
+    if modo in ('L', '1', 'I', 'I;16', 'F', 'P;L'):
+        return 'L'
+    if modo in ('RGBA', 'LA', 'PA') or modo.endswith('A'):
+        return 'RGBA'
+    return 'RGB'
+
+
+def _forma_destino(tamanho, resolucao):
+    largura, altura = tamanho
+    if resolucao is None:
+        return altura, largura
+    escala = min(1.0, resolucao / max(largura, altura))
+    return max(1, int(round(altura * escala))), max(1, int(round(largura * escala)))
+
+
+def empacotar_familia(familia, resolucao=None, diretorio_pacotes=MAPAS_PACOTES_DIR):
+    """
+    Empacota todas as imagens de uma família (ex: 'heatmaps_7s') em um único
+    arquivo binário uint8 aberto por memory-map, mais uma tabela de consulta
+    chave -> (offset, altura, largura, canais).
+
+    Cada entrada guarda sua própria resolução; com 'resolucao', o maior lado
+    de cada imagem é reduzido a esse valor. São duas passadas: a primeira lê
+    só os cabeçalhos para dimensionar o arquivo, a segunda decodifica e grava
+    uma imagem por vez, então a memória não cresce com o tamanho da família.
+    """
+    diretorio_origem = diretorio_familia(familia)
+    destino = os.path.join(diretorio_pacotes, nome_pacote(familia, resolucao))
+    print(f"--- EMPACOTANDO '{familia}' ({'resolução original' if resolucao is None else f'maior lado {resolucao}'}) ---")
+    assinatura = assinatura_familia(diretorio_origem)
+    chaves = sorted(assinatura)
+
+    # 1ª passada: dimensões e modo de cada entrada, só pelo cabeçalho.
+    entradas = []
+    offset = 0
+    for chave in chaves:
+        try:
+            with Image.open(os.path.join(diretorio_origem, chave)) as img:
+                modo = _modo_armazenado(img.mode)
+                altura, largura = _forma_destino(img.size, resolucao)
+        except Exception as e:
+            print(f"ERRO ao ler '{chave}': {e}. Pulando.")
+            continue
+        canais = len(modo)
+        entradas.append((chave, offset, altura, largura, canais, modo))
+        offset += altura * largura * canais
+
+    diretorio_tmp = destino + '.tmp'
+    shutil.rmtree(diretorio_tmp, ignore_errors=True)
+    os.makedirs(diretorio_tmp)
+
+    # 2ª passada: decodifica e grava cada imagem na sua fatia do arquivo.
+    dados = np.lib.format.open_memmap(os.path.join(diretorio_tmp, 'dados.npy'), mode='w+',
+                                      dtype=np.uint8, shape=(max(offset, 1),))
+    for i, (chave, inicio, altura, largura, canais, modo) in enumerate(entradas, start=1):
+        with Image.open(os.path.join(diretorio_origem, chave)) as img:
+            img = img.convert(modo)
+            if img.size != (largura, altura):
+                img = img.resize((largura, altura), Image.BOX)
+            dados[inicio:inicio + altura * largura * canais] = np.asarray(img, dtype=np.uint8).ravel()
+        if i % 200 == 0:
+            sys.stdout.write(f"\r  {i}/{len(entradas)} imagens")
+            sys.stdout.flush()
+    dados.flush()
+    del dados
+
+    tabela = np.array(
+        [(chave, inicio, altura, largura, canais) for chave, inicio, altura, largura, canais, _ in entradas],
+        dtype=[('chave', f"U{max([len(e[0]) for e in entradas], default=1)}"), ('offset', np.int64),
+               ('altura', np.int32), ('largura', np.int32), ('canais', np.int8)]
+    )
+    np.save(os.path.join(diretorio_tmp, 'tabela.npy'), tabela)
+
+    # O manifesto é gravado por último: sem ele o pacote é considerado incompleto.
+    with open(os.path.join(diretorio_tmp, NOME_MANIFESTO), 'w', encoding='utf-8') as f:
+        json.dump({"familia": familia, "resolucao": resolucao, "origem": os.path.abspath(diretorio_origem),
+                   "assinatura": assinatura}, f)
+
+    diretorio_antigo = destino + '.old'
+    shutil.rmtree(diretorio_antigo, ignore_errors=True)
+    if os.path.exists(destino):
+        os.replace(destino, diretorio_antigo)
+    os.replace(diretorio_tmp, destino)
+    shutil.rmtree(diretorio_antigo, ignore_errors=True)
+    print(f"\n--- PACOTE '{nome_pacote(familia, resolucao)}' CONSTRUÍDO: {len(entradas)} imagens, "
+          f"{offset / (1 << 20):.1f} MB. ---")
+
+
+class PacoteMapas:
+    """
+    Acesso somente-leitura a um pacote gerado por empacotar_familia. obter()
+    devolve views (sem cópia) do arquivo aberto por memory-map: (h, w) para
+    mapas em tons de cinza e (h, w, 3|4) para imagens coloridas.
+    """
+
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        caminho_manifesto = os.path.join(diretorio, NOME_MANIFESTO)
+        # Muda a cada empacotamento (o diretório inteiro é trocado): identifica esta versão do pacote.
+        self.versao = os.stat(caminho_manifesto).st_mtime_ns
+        with open(caminho_manifesto, encoding='utf-8') as f:
+            manifesto = json.load(f)
+        self.familia = manifesto['familia']
+        self.resolucao = manifesto['resolucao']
+        self.assinatura = manifesto['assinatura']
+        self.dados = np.load(os.path.join(diretorio, 'dados.npy'), mmap_mode='r')
+        tabela = np.load(os.path.join(diretorio, 'tabela.npy'))
+        self._entradas = {
+            chave: (offset, altura, largura, canais)
+            for chave, offset, altura, largura, canais in zip(
+                tabela['chave'].tolist(), tabela['offset'].tolist(), tabela['altura'].tolist(),
+                tabela['largura'].tolist(), tabela['canais'].tolist())
+        }
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def __contains__(self, chave):
+        return chave in self._entradas
+
+    def chaves(self):
+        return self._entradas.keys()
+
+    def obter(self, media_name, participante=None):
+        """
+        Retorna a imagem da mídia (ou, em famílias de scanpath, da mídia e do
+        participante) como view do pacote, ou None se não houver.
+        """
+        chave = media_name if participante is None else f"{os.path.splitext(media_name)[0]}/{participante}.png"
+        return self.obter_por_chave(chave)
+
+    def obter_por_chave(self, chave):
+        entrada = self._entradas.get(chave)
+        if entrada is None:
+            return None
+        offset, altura, largura, canais = entrada
+        vista = self.dados[offset:offset + altura * largura * canais]
+        return vista.reshape((altura, largura) if canais == 1 else (altura, largura, canais))
+
+
+def _versao_no_disco(diretorio):
+    try:
+        return os.stat(os.path.join(diretorio, NOME_MANIFESTO)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def abrir_pacote_mapas(familia, resolucao=None, diretorio_pacotes=MAPAS_PACOTES_DIR):
+    """
+    Abre o pacote da família, sem verificar se as imagens de origem mudaram.
+    O pacote aberto é reaproveitado enquanto o manifesto no disco não muda; se
+    outro processo reempacotar a família, a nova versão é aberta na próxima
+    chamada. Retorna None se a família não foi empacotada.
+    """
+    diretorio = os.path.join(diretorio_pacotes, nome_pacote(familia, resolucao))
+    versao = _versao_no_disco(diretorio)
+    with _lock_pacotes:
+        pacote = _pacotes_abertos.get(diretorio)
+        if versao is None:
+            pacote = None
+        elif pacote is None or pacote.versao != versao:
+            try:
+                pacote = PacoteMapas(diretorio)
+            except (FileNotFoundError, ValueError, KeyError):
+                pacote = None
+        _pacotes_abertos[diretorio] = pacote
+        return pacote
+
+
+def carregar_pacote_mapas(familia, resolucao=None, diretorio_pacotes=MAPAS_PACOTES_DIR):
+    """
+    Retorna o pacote da família, (re)construindo-o quando não existe ou quando
+    alguma imagem foi adicionada, removida ou teve mtime/tamanho alterado.
+    """
+    diretorio = os.path.join(diretorio_pacotes, nome_pacote(familia, resolucao))
+    assinatura = assinatura_familia(diretorio_familia(familia))
+    pacote = abrir_pacote_mapas(familia, resolucao, diretorio_pacotes)
+    if pacote is None or pacote.assinatura != assinatura:
+        empacotar_familia(familia, resolucao, diretorio_pacotes)
+        pacote = PacoteMapas(diretorio)
+        with _lock_pacotes:
+            _pacotes_abertos[diretorio] = pacote
+    return pacote
+
+
+def localizar_no_pacote(caminho):
+    """
+    Traduz o caminho de um PNG de SALIENCY_MAPS_DIR/SCANPATHS_DIR (como os de
+    RegistroOcular) para (pacote, chave) no pacote da família em resolução
+    original, ou (None, None) se o caminho não é de uma família empacotada.
+    """
+    caminho = os.path.abspath(caminho)
+    for base in DIRETORIOS_ORIGEM:
+        base = os.path.abspath(base)
+        if caminho.startswith(base + os.sep):
+            familia, _, chave = os.path.relpath(caminho, base).replace(os.sep, '/').partition('/')
+            pacote = abrir_pacote_mapas(familia)
+            return (pacote, chave) if pacote is not None else (None, None)
+    return None, None
+
+
+def imagem_do_pacote(caminho):
+    """
+    View da imagem no pacote da sua família (ver localizar_no_pacote). Retorna
+    None se a família não foi empacotada ou não contém a imagem; nesse caso
+    quem chamou usa o arquivo.
+    """
+    pacote, chave = localizar_no_pacote(caminho)
+    return pacote.obter_por_chave(chave) if pacote is not None else None
+
+
+if __name__ == "__main__":
+    # Uso: python -m eyetracking_analyzer.map_store heatmaps_7s fixmaps_7s paths_7s [--resolucao 320]
+    import argparse
+    parser = argparse.ArgumentParser(description="Empacota famílias de mapas em arrays abertos por memory-map.")
+    parser.add_argument("familias", nargs="+", help="Famílias a empacotar (ex: heatmaps_7s paths_7s)")
+    parser.add_argument("--resolucao", type=int, default=None, help="Maior lado de cada imagem (padrão: original)")
+    args = parser.parse_args()
+    for familia in args.familias:
+        empacotar_familia(familia, args.resolucao)
@@ -1,8 +1,45 @@
 # eyetracking_analyzer/model_interface.py
 import os
-import google.generativeai as genai
-from PIL import Image
-from config import MODELO_GENERATIVO
+import re
+import json
+import time
+import random
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from eyetracking_analyzer.image_payload import preparar_imagem, formatar_tamanho
+from eyetracking_analyzer.prompt_builder import estimar_tokens_texto
+from eyetracking_analyzer.profiling import medir
+from config import (
+    MODELO_GENERATIVO, BACKEND_MODELO, MAX_CONCORRENCIA_MODELO, LIMITE_REQUISICOES_POR_MINUTO,
+    LIMITE_TOKENS_POR_MINUTO, MAX_TENTATIVAS_MODELO, BACKOFF_BASE_SEGUNDOS, BACKOFF_MAX_SEGUNDOS,
+    BACKEND_FALSO_LATENCIA_SEGUNDOS, BACKEND_FALSO_TAXA_ERRO_429
+)
+
+# Custo aproximado de uma imagem na contagem de tokens do Gemini.
+TOKENS_POR_IMAGEM = 258
+
+# Uma unidade de trabalho para o motor. 'contexto' é devolvido junto com a resposta
+# (ex: o dicionário de dados do registro) e não é enviado ao modelo. 'caminhos_extras'
+# são imagens enviadas como partes adicionais (ex: overlay do heatmap, scanpath).
+# 'validar_resposta', se informado, recebe o texto e levanta ValueError quando a
+# resposta não serve (ex: JSON do lote malformado); ela então é tentada de novo.
+TarefaModelo = namedtuple('TarefaModelo',
+                          ['prompt_texto', 'caminho_imagem', 'contexto', 'caminhos_extras', 'validar_resposta'],
+                          defaults=(None, (), None))
+
+
+class ErroCotaExcedida(Exception):
+    """O modelo recusou a requisição por limite de cota (HTTP 429)."""
+
+
+class ErroTransitorio(Exception):
+    """Falha temporária (timeout, erro 5xx, conexão) que vale a pena tentar de novo."""
+
+
+class ErroRespostaInvalida(ErroTransitorio):
+    """A resposta chegou, mas não passou na validação da tarefa (ex: JSON do lote malformado)."""
+
 
 def setup_genai_api():
     """Configura a API do Gemini usando a chave do ambiente."""
@@ -10,6 +47,8 @@ def setup_genai_api():
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise ValueError("Chave de API do Google não encontrada na variável de ambiente GOOGLE_API_KEY.")
+        # Importado aqui: o SDK leva quase um segundo para carregar e só o backend 'gemini' o usa.
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
         print("API do Gemini configurada com sucesso.")
         return True
@@ -17,21 +56,321 @@ def setup_genai_api():
         print(f"Erro ao configurar a API do Gemini: {e}")
         return False
 
-def submeter_dados_ao_modelo(prompt_texto, caminho_imagem):
+
+def _classificar_erro_gemini(e):
+    """Converte exceções da API do Gemini em ErroCotaExcedida/ErroTransitorio quando aplicável."""
+    nome = type(e).__name__
+    mensagem = str(e)
+    if nome in ('ResourceExhausted', 'TooManyRequests') or '429' in mensagem or 'quota' in mensagem.lower():
+        return ErroCotaExcedida(mensagem)
+    if nome in ('ServiceUnavailable', 'DeadlineExceeded', 'InternalServerError', 'GatewayTimeout') \
+            or isinstance(e, (TimeoutError, ConnectionError)):
+        return ErroTransitorio(mensagem)
+    return e
+
+
+class BackendModelo:
+    """
+    Interface dos backends de modelo usados pelo MotorSubmissao.
+    gerar() deve devolver o texto da resposta ou levantar uma exceção;
+    ErroCotaExcedida e ErroTransitorio são tentados novamente pelo motor.
+    """
+    nome_modelo = None
+
+    def gerar(self, prompt_texto, caminho_imagem, caminhos_extras=()):
+        raise NotImplementedError
+
+    def preparar_partes(self, caminho_imagem, caminhos_extras=()):
+        """Prepara (reduz/recodifica, com cache) as imagens da requisição e registra o tamanho enviado."""
+        with medir('model_interface.payload'):
+            partes = [preparar_imagem(caminho) for caminho in (caminho_imagem, *caminhos_extras)]
+        tamanho = sum(len(parte['data']) for parte in partes)
+        print(f"   - Payload de imagem: {formatar_tamanho(tamanho)} em {len(partes)} parte(s).")
+        return partes
+
+
+class BackendGemini(BackendModelo):
+    """Backend real: envia prompt e imagem ao Gemini."""
+
+    def __init__(self, nome_modelo=MODELO_GENERATIVO):
+        self.nome_modelo = nome_modelo
+
+    def gerar(self, prompt_texto, caminho_imagem, caminhos_extras=()):
+        import google.generativeai as genai
+        partes = self.preparar_partes(caminho_imagem, caminhos_extras)
+        model = genai.GenerativeModel(self.nome_modelo)
+        try:
+            response = model.generate_content([prompt_texto, *partes])
+        except Exception as e:
+            erro = _classificar_erro_gemini(e)
+            if erro is e:
+                raise
+            raise erro from e
+        return response.text
+
+
+class BackendFalso(BackendModelo):
+    """
+    Modelo local simulado para testes de carga do motor: responde após uma
+    latência aleatória e injeta erros 429/transitórios com a taxa configurada.
+    """
+
+    def __init__(self, latencia_segundos=BACKEND_FALSO_LATENCIA_SEGUNDOS, taxa_erro_429=BACKEND_FALSO_TAXA_ERRO_429,
+                 taxa_erro_transitorio=0.0, semente=None):
+        self.nome_modelo = 'modelo-falso'
+        self.latencia_segundos = latencia_segundos
+        self.taxa_erro_429 = taxa_erro_429
+        self.taxa_erro_transitorio = taxa_erro_transitorio
+        self._rng = random.Random(semente)
+        self._lock = threading.Lock()
+
+    def gerar(self, prompt_texto, caminho_imagem, caminhos_extras=()):
+        # Prepara os payloads de verdade, para medir o custo do pré-processamento.
+        self.preparar_partes(caminho_imagem, caminhos_extras)
+        with self._lock:
+            latencia = self._rng.uniform(*self.latencia_segundos)
+            sorteio = self._rng.random()
+        time.sleep(latencia)
+        if sorteio < self.taxa_erro_429:
+            raise ErroCotaExcedida("429 Resource has been exhausted (simulado).")
+        if sorteio < self.taxa_erro_429 + self.taxa_erro_transitorio:
+            raise ErroTransitorio("503 Service Unavailable (simulado).")
+        lote = re.search(r"^- Participantes: (.+)$", prompt_texto, re.MULTILINE)
+        if lote:
+            # Prompt em lote: responde no formato JSON pedido, uma análise por participante.
+            return json.dumps({p.strip(): f"Análise simulada do participante {p.strip()} em "
+                               f"'{os.path.basename(caminho_imagem)}'." for p in lote.group(1).split(',')},
+                              ensure_ascii=False)
+        return (f"Resposta simulada para '{os.path.basename(caminho_imagem)}' "
+                f"({len(prompt_texto)} caracteres de prompt).")
+
+
+def criar_backend(nome=BACKEND_MODELO):
+    """Instancia o backend configurado ('gemini' ou 'falso')."""
+    if nome == 'gemini':
+        return BackendGemini()
+    if nome == 'falso':
+        return BackendFalso()
+    raise ValueError(f"Backend de modelo desconhecido: '{nome}'.")
+
+
+class LimitadorTokenBucket:
+    """
+    Dois baldes de fichas (requisições/minuto e tokens/minuto) compartilhados
+    entre as threads do motor. adquirir() bloqueia até haver saldo nos dois.
+    """
+
+    def __init__(self, requisicoes_por_minuto=LIMITE_REQUISICOES_POR_MINUTO, tokens_por_minuto=LIMITE_TOKENS_POR_MINUTO):
+        self.capacidade_req = float(requisicoes_por_minuto)
+        self.capacidade_tok = float(tokens_por_minuto)
+        self.saldo_req = self.capacidade_req
+        self.saldo_tok = self.capacidade_tok
+        self._ultimo = time.monotonic()
+        self._pausado_ate = 0.0
+        self._lock = threading.Lock()
+
+    def _reabastecer(self, agora):
+        decorrido = agora - self._ultimo
+        self._ultimo = agora
+        self.saldo_req = min(self.capacidade_req, self.saldo_req + decorrido * self.capacidade_req / 60.0)
+        self.saldo_tok = min(self.capacidade_tok, self.saldo_tok + decorrido * self.capacidade_tok / 60.0)
+
+    def adquirir(self, tokens):
+        # Uma requisição maior que o balde inteiro apenas espera o balde encher.
+        tokens = min(float(tokens), self.capacidade_tok)
+        while True:
+            with self._lock:
+                agora = time.monotonic()
+                self._reabastecer(agora)
+                espera = self._pausado_ate - agora
+                if espera <= 0:
+                    if self.saldo_req >= 1 and self.saldo_tok >= tokens:
+                        self.saldo_req -= 1
+                        self.saldo_tok -= tokens
+                        return
+                    falta_req = max(0.0, 1 - self.saldo_req) * 60.0 / self.capacidade_req
+                    falta_tok = max(0.0, tokens - self.saldo_tok) * 60.0 / self.capacidade_tok
+                    espera = max(falta_req, falta_tok)
+            time.sleep(espera)
+
+    def pausar(self, segundos):
+        """Suspende todas as aquisições (usado quando o servidor responde 429)."""
+        with self._lock:
+            self._pausado_ate = max(self._pausado_ate, time.monotonic() + segundos)
+
+
+def estimar_tokens_requisicao(prompt_texto, num_imagens=1):
+    """Estimativa rápida (sem rede) dos tokens de entrada de uma requisição com imagens."""
+    return estimar_tokens_texto(prompt_texto) + TOKENS_POR_IMAGEM * num_imagens
+
+
+def dividir_resposta_lote(resposta, participantes):
+    """
+    Separa a resposta de um prompt em lote (JSON {participante: análise}) em
+    um dicionário por participante. Aceita o JSON dentro de um bloco ```json.
+
+    Levanta ValueError se a resposta não for um objeto JSON ou se faltar algum
+    dos 'participantes'.
+    """
+    texto = resposta.strip()
+    bloco = re.search(r"```(?:json)?\s*(.*?)```", texto, re.DOTALL)
+    if bloco:
+        texto = bloco.group(1)
+    inicio, fim = texto.find('{'), texto.rfind('}')
+    if inicio == -1 or fim <= inicio:
+        raise ValueError("a resposta do lote não contém um objeto JSON")
+    try:
+        analises = json.loads(texto[inicio:fim + 1])
+    except ValueError as e:
+        raise ValueError(f"JSON do lote inválido: {e}") from e
+    if not isinstance(analises, dict):
+        raise ValueError("o JSON do lote não é um objeto")
+
+    # Tolera chaves sem o zero à esquerda ou com prefixo (ex: "1", "Participante 01").
+    normalizadas = {re.sub(r"\D", "", str(chave)).zfill(2): valor for chave, valor in analises.items()}
+    faltando = [p for p in participantes if str(p).zfill(2) not in normalizadas]
+    if faltando:
+        raise ValueError(f"resposta do lote sem a análise dos participantes {', '.join(faltando)}")
+    return {
+        p: valor if isinstance(valor, str) else json.dumps(valor, ensure_ascii=False, indent=2)
+        for p in participantes
+        for valor in [normalizadas[str(p).zfill(2)]]
+    }
+
+
+class MotorSubmissao:
+    """
+    Envia tarefas ao modelo em paralelo (pool de threads), respeitando o
+    limitador de taxa e tentando novamente erros de cota e transitórios com
+    backoff exponencial com jitter. As respostas são entregues na ordem das tarefas.
+    """
+
+    def __init__(self, backend=None, max_concorrencia=MAX_CONCORRENCIA_MODELO, limitador=None,
+                 max_tentativas=MAX_TENTATIVAS_MODELO, backoff_base=BACKOFF_BASE_SEGUNDOS,
+                 backoff_max=BACKOFF_MAX_SEGUNDOS, cache=None):
+        self.backend = backend if backend is not None else criar_backend()
+        self.max_concorrencia = max_concorrencia
+        self.limitador = limitador if limitador is not None else LimitadorTokenBucket()
+        self.max_tentativas = max_tentativas
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_concorrencia, thread_name_prefix='modelo')
+        self._lock = threading.Lock()
+        self.estatisticas = {"enviadas": 0, "sucesso": 0, "falhas": 0, "novas_tentativas": 0}
+
+    def _contar(self, chave):
+        with self._lock:
+            self.estatisticas[chave] += 1
+
+    def _espera_backoff(self, tentativa):
+        # "Full jitter": espera aleatória entre 0 e o teto exponencial.
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** tentativa)))
+
+    def submeter(self, tarefa):
+        """Executa uma tarefa com novas tentativas. Retorna o texto da resposta ou uma string de ERRO."""
+        chave_cache = None
+        if self.cache is not None:
+            try:
+                chave_cache = self.cache.chave(self.backend.nome_modelo, tarefa.prompt_texto, tarefa.caminho_imagem,
+                                               tarefa.caminhos_extras)
+            except FileNotFoundError:
+                self._contar("falhas")
+                return f"ERRO: A imagem não foi encontrada em '{tarefa.caminho_imagem}'."
+            with medir('model_interface.cache'):
+                resposta = self.cache.obter(chave_cache)
+            if resposta is not None:
+                print(f"--- RESPOSTA EM CACHE PARA '{os.path.basename(tarefa.caminho_imagem)}' ---")
+                return resposta
+
+        print(f"--- SUBMETENDO '{os.path.basename(tarefa.caminho_imagem)}' AO MODELO {self.backend.nome_modelo} ---")
+        tokens = estimar_tokens_requisicao(tarefa.prompt_texto, 1 + len(tarefa.caminhos_extras))
+
+        for tentativa in range(self.max_tentativas):
+            self.limitador.adquirir(tokens)
+            self._contar("enviadas")
+            try:
+                with medir('model_interface.chamada', tentativa=tentativa):
+                    resposta = self.backend.gerar(tarefa.prompt_texto, tarefa.caminho_imagem, tarefa.caminhos_extras)
+                if tarefa.validar_resposta is not None:
+                    try:
+                        tarefa.validar_resposta(resposta)
+                    except ValueError as e:
+                        raise ErroRespostaInvalida(str(e)) from e
+                self._contar("sucesso")
+                print("   - Resposta recebida do modelo.")
+                # Só respostas bem-sucedidas entram no cache; as strings de ERRO abaixo nunca.
+                if chave_cache is not None:
+                    self.cache.guardar(chave_cache, resposta)
+                return resposta
+            except FileNotFoundError:
+                self._contar("falhas")
+                return f"ERRO: A imagem não foi encontrada em '{tarefa.caminho_imagem}'."
+            except (ErroCotaExcedida, ErroTransitorio) as e:
+                if tentativa == self.max_tentativas - 1:
+                    self._contar("falhas")
+                    return f"ERRO ao contatar a API do Gemini após {self.max_tentativas} tentativas: {e}"
+                espera = self._espera_backoff(tentativa)
+                if isinstance(e, ErroCotaExcedida):
+                    self.limitador.pausar(espera)
+                self._contar("novas_tentativas")
+                print(f"   - AVISO: {type(e).__name__} ({e}). Nova tentativa em {espera:.1f}s.")
+                time.sleep(espera)
+            except Exception as e:
+                self._contar("falhas")
+                return f"ERRO ao contatar a API do Gemini: {e}"
+
+    def submeter_em_ordem(self, tarefas):
+        """
+        Gera pares (tarefa, resposta) na mesma ordem de 'tarefas'. O iterável é
+        consumido aos poucos: no máximo 2x max_concorrencia tarefas ficam em voo.
+        """
+        em_voo = deque()
+        limite_em_voo = 2 * self.max_concorrencia
+        for tarefa in tarefas:
+            em_voo.append((tarefa, self._executor.submit(self.submeter, tarefa)))
+            if len(em_voo) >= limite_em_voo:
+                tarefa_pronta, futuro = em_voo.popleft()
+                yield tarefa_pronta, futuro.result()
+        while em_voo:
+            tarefa_pronta, futuro = em_voo.popleft()
+            yield tarefa_pronta, futuro.result()
+
+    def submeter_lote(self, tarefas):
+        """Submete todas as tarefas e retorna a lista de respostas, na ordem original."""
+        return [resposta for _, resposta in self.submeter_em_ordem(tarefas)]
+
+    def encerrar(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.encerrar()
+
+
+def submeter_dados_ao_modelo(prompt_texto, caminho_imagem, cache=None):
     """
     Submete a imagem e o prompt de texto ao modelo Gemini Vision.
+    Se um CacheRespostas for informado, respostas já obtidas não são reenviadas.
     """
-    print(f"--- SUBMETENDO '{os.path.basename(caminho_imagem)}' AO MODELO {MODELO_GENERATIVO} ---")
-    
     try:
-        img = Image.open(caminho_imagem)
-        conteudo_prompt = [prompt_texto, img]
-        model = genai.GenerativeModel(MODELO_GENERATIVO)
-        response = model.generate_content(conteudo_prompt)
-        
+        chave_cache = None
+        if cache is not None:
+            chave_cache = cache.chave(MODELO_GENERATIVO, prompt_texto, caminho_imagem)
+            resposta = cache.obter(chave_cache)
+            if resposta is not None:
+                print(f"--- RESPOSTA EM CACHE PARA '{os.path.basename(caminho_imagem)}' ---")
+                return resposta
+
+        print(f"--- SUBMETENDO '{os.path.basename(caminho_imagem)}' AO MODELO {MODELO_GENERATIVO} ---")
+        resposta = BackendGemini().gerar(prompt_texto, caminho_imagem)
         print("   - Resposta recebida do modelo.")
-        return response.text
+        if chave_cache is not None:
+            cache.guardar(chave_cache, resposta)
+        return resposta
     except FileNotFoundError:
         return f"ERRO: A imagem não foi encontrada em '{caminho_imagem}'."
     except Exception as e:
-        return f"ERRO ao contatar a API do Gemini: {e}"
\ No newline at end of file
+        return f"ERRO ao contatar a API do Gemini: {e}"
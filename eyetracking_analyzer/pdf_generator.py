@@ -1,8 +1,143 @@
-# eyetracking_analyzer/pdf_generator.py
 import os
-from PIL import Image, ImageDraw, ImageFont
+import io
+import json
+from collections import deque
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image, ImageDraw
 from fpdf import FPDF
-from config import PDF_REPORTS_DIR
+from config import PDF_REPORTS_DIR, PDF_JPEG_QUALIDADE, PDF_CACHE_MINIATURAS_MAXIMO, PDF_WORKERS, OUTPUT_JSONL_PATH
+from eyetracking_analyzer.visualizer import obter_fonte
+from eyetracking_analyzer.map_store import imagem_do_pacote, localizar_no_pacote
+from eyetracking_analyzer.profiling import medir, medido, perfilar_registro
+
+# Versão do PDF individual: o run_build.py refaz os PDFs quando ela muda.
+# Mude-a ao alterar o conteúdo ou o layout do relatório.
+VERSAO_PDF = 1
+
+# --- Configurações de Layout da Imagem Composta ---
+PADDING = 40
+SPACING = 30
+TITLE_HEIGHT = 40
+THUMB_WIDTH, THUMB_HEIGHT = 800, 600
+COLS = 3
+
+# Modos de agrupamento do relatório consolidado -> campo do registro usado como chave.
+AGRUPAMENTOS_CONSOLIDADOS = {'media': 'media_name', 'categoria': 'categoria', 'bloco': 'bloco'}
+
+# Campos de dados_analise usados no PDF (o resto, como os dados oculares, não vai para os workers).
+CAMPOS_PDF = ('media_name', 'participante', 'categoria', 'image_path', 'heatmap_path',
+              'overlay_heatmap_path', 'scanpath_path', 'fixmap_path')
+
+
+@lru_cache(maxsize=PDF_CACHE_MINIATURAS_MAXIMO)
+def _miniatura_cache(caminho, tamanho, mtime_ns):
+    img = Image.open(caminho)
+    img.draft('RGB', tamanho)  # Decodificação reduzida para JPEG grandes.
+    img = img.convert('RGB')
+    img.thumbnail(tamanho)
+    return img
+
+
+@lru_cache(maxsize=PDF_CACHE_MINIATURAS_MAXIMO)
+def _miniatura_pacote_cache(caminho, tamanho, versao_pacote):
+    img = Image.fromarray(np.asarray(imagem_do_pacote(caminho))).convert('RGB')
+    img.thumbnail(tamanho)
+    return img
+
+
+def _versao_no_pacote(caminho):
+    """Versão do pacote que contém a imagem, ou None se ela não está empacotada."""
+    pacote, chave = localizar_no_pacote(caminho)
+    return pacote.versao if pacote is not None and chave in pacote else None
+
+
+def obter_miniatura(caminho, tamanho=(THUMB_WIDTH, THUMB_HEIGHT)):
+    """
+    Retorna a miniatura da imagem, em cache por (caminho, tamanho, mtime): as
+    imagens comuns a todos os participantes de uma mídia são decodificadas uma vez.
+    Mapas e scanpaths de famílias empacotadas (map_store) são lidos do pacote,
+    sem abrir o PNG, em cache pela versão do pacote no lugar do mtime. Se o
+    arquivo não existir, retorna um placeholder cinza.
+    """
+    versao_pacote = _versao_no_pacote(caminho)
+    if versao_pacote is not None:
+        return _miniatura_pacote_cache(caminho, tamanho, versao_pacote)
+    try:
+        mtime_ns = os.stat(caminho).st_mtime_ns
+    except FileNotFoundError:
+        img = Image.new('RGB', tamanho, (230, 230, 230))
+        d = ImageDraw.Draw(img)
+        d.text((50, 280), f"Imagem não encontrada:\n{os.path.basename(caminho)}", fill=(0, 0, 0))
+        return img
+    return _miniatura_cache(caminho, tamanho, mtime_ns)
+
+
+@lru_cache(maxsize=PDF_CACHE_MINIATURAS_MAXIMO)
+def _miniatura_jpeg_cache(caminho, tamanho, mtime_ns, qualidade):
+    miniatura = obter_miniatura(caminho, tamanho)
+    return _codificar_jpeg(miniatura, qualidade).getvalue(), miniatura.size
+
+
+def obter_miniatura_jpeg(caminho, tamanho=(THUMB_WIDTH, THUMB_HEIGHT), qualidade=PDF_JPEG_QUALIDADE):
+    """
+    Retorna (bytes_jpeg, (largura, altura)) da miniatura. Os bytes são estáveis
+    para a mesma imagem, então o FPDF embute cada imagem distinta uma única vez
+    no documento e apenas a referencia nas demais páginas.
+    """
+    versao_pacote = _versao_no_pacote(caminho)
+    if versao_pacote is not None:
+        mtime_ns = ('pacote', versao_pacote)
+    else:
+        try:
+            mtime_ns = os.stat(caminho).st_mtime_ns
+        except FileNotFoundError:
+            mtime_ns = None
+    return _miniatura_jpeg_cache(caminho, tamanho, mtime_ns, qualidade)
+
+
+def compor_imagem(image_paths_with_titles):
+    """
+    Monta em memória a imagem composta, organizando as miniaturas em uma grade.
+
+    Args:
+        image_paths_with_titles (list): Uma lista de tuplas (título, caminho_da_imagem).
+
+    Returns:
+        PIL.Image.Image: A imagem composta (RGB).
+    """
+    # --- Cálculo das Dimensões da Imagem Final ---
+    num_images = len(image_paths_with_titles)
+    rows = (num_images + COLS - 1) // COLS
+    total_width = (THUMB_WIDTH * COLS) + (SPACING * (COLS - 1)) + (PADDING * 2)
+    total_height = (THUMB_HEIGHT * rows) + (TITLE_HEIGHT * rows) + (SPACING * (rows - 1)) + (PADDING * 2)
+
+    # --- Criação da Tela (Canvas) Branca ---
+    composite_image = Image.new('RGB', (total_width, total_height), 'white')
+    draw = ImageDraw.Draw(composite_image)
+    title_font = obter_fonte(32)
+
+    # --- Montagem da Grade de Imagens ---
+    x, y = PADDING, PADDING
+    for i, (title, path) in enumerate(image_paths_with_titles):
+        img = obter_miniatura(path)
+
+        # Desenha o título na tela principal
+        draw.text((x, y), title, font=title_font, fill=(0, 0, 0))
+
+        # Cola a miniatura da imagem na tela principal
+        composite_image.paste(img, (x, y + TITLE_HEIGHT))
+
+        # Atualiza as coordenadas para a próxima imagem na grade
+        if (i + 1) % COLS == 0:
+            x = PADDING
+            y += THUMB_HEIGHT + TITLE_HEIGHT + SPACING
+        else:
+            x += THUMB_WIDTH + SPACING
+
+    return composite_image
+
 
 def criar_imagem_composta(image_paths_with_titles, output_path):
     """
@@ -16,58 +151,7 @@ def criar_imagem_composta(image_paths_with_titles, output_path):
         bool: True se a imagem foi criada com sucesso, False caso contrário.
     """
     try:
-        # --- Configurações de Layout da Imagem Composta ---
-        PADDING = 40
-        SPACING = 30
-        TITLE_HEIGHT = 40
-        THUMB_WIDTH, THUMB_HEIGHT = 800, 600
-        COLS = 3
-        
-        # --- Cálculo das Dimensões da Imagem Final ---
-        num_images = len(image_paths_with_titles)
-        rows = (num_images + COLS - 1) // COLS
-        total_width = (THUMB_WIDTH * COLS) + (SPACING * (COLS - 1)) + (PADDING * 2)
-        total_height = (THUMB_HEIGHT * rows) + (TITLE_HEIGHT * rows) + (SPACING * (rows - 1)) + (PADDING * 2)
-
-        # --- Criação da Tela (Canvas) Branca ---
-        composite_image = Image.new('RGB', (total_width, total_height), 'white')
-        draw = ImageDraw.Draw(composite_image)
-
-        # --- Carregamento da Fonte ---
-        try:
-            # Tenta usar uma fonte comum. Altere o caminho se necessário.
-            font_path = "arial.ttf" # Em Windows: "C:/Windows/Fonts/arial.ttf"
-            title_font = ImageFont.truetype(font_path, 32)
-        except IOError:
-            print(f"AVISO: Fonte '{font_path}' não encontrada. Usando fonte padrão.")
-            title_font = ImageFont.load_default()
-
-        # --- Montagem da Grade de Imagens ---
-        x, y = PADDING, PADDING
-        for i, (title, path) in enumerate(image_paths_with_titles):
-            # Carrega a imagem ou cria um placeholder se não encontrada
-            try:
-                img = Image.open(path)
-                img.thumbnail((THUMB_WIDTH, THUMB_HEIGHT))
-            except FileNotFoundError:
-                img = Image.new('RGB', (THUMB_WIDTH, THUMB_HEIGHT), (230, 230, 230))
-                d = ImageDraw.Draw(img)
-                d.text((50, 280), f"Imagem não encontrada:\n{os.path.basename(path)}", fill=(0,0,0))
-            
-            # Desenha o título na tela principal
-            draw.text((x, y), title, font=title_font, fill=(0,0,0))
-            
-            # Cola a miniatura da imagem na tela principal
-            composite_image.paste(img, (x, y + TITLE_HEIGHT))
-            
-            # Atualiza as coordenadas para a próxima imagem na grade
-            if (i + 1) % COLS == 0:
-                x = PADDING
-                y += THUMB_HEIGHT + TITLE_HEIGHT + SPACING
-            else:
-                x += THUMB_WIDTH + SPACING
-        
-        composite_image.save(output_path)
+        compor_imagem(image_paths_with_titles).save(output_path)
         print(f"  - Imagem composta criada em: {output_path}")
         return True
 
@@ -76,32 +160,31 @@ def criar_imagem_composta(image_paths_with_titles, output_path):
         return False
 
 
-def criar_relatorio_pdf(dados_analise, resposta_modelo):
-    """
-    Gera um arquivo PDF que inclui uma imagem composta de todas as análises visuais.
-    """
-    os.makedirs(PDF_REPORTS_DIR, exist_ok=True)
-    
-    # --- Define os caminhos e títulos para a imagem composta ---
-    imagens_para_compor = [
+def _codificar_jpeg(imagem, qualidade=PDF_JPEG_QUALIDADE):
+    """Codifica a imagem como JPEG em memória (o FPDF a embute sem recompressão)."""
+    buffer = io.BytesIO()
+    imagem.save(buffer, format='JPEG', quality=qualidade, optimize=True)
+    buffer.seek(0)
+    return buffer
+
+
+def _imagens_para_compor(dados_analise):
+    """Define os caminhos e títulos das imagens da galeria."""
+    return [
         ("Imagem Base", dados_analise['image_path']),
         ("Heatmap (7s)", dados_analise['heatmap_path']),
         ("Overlay Heatmap (7s)", dados_analise['overlay_heatmap_path']),
         ("Scanpath (7s)", dados_analise['scanpath_path']),
         ("Mapa de Fixação (7s)", dados_analise['fixmap_path']),
     ]
-    
-    # Define um caminho temporário para a imagem composta
-    nome_base_arquivo = f"temp_{dados_analise['media_name'].replace('.', '_')}_P{dados_analise['participante']}"
-    caminho_imagem_composta = os.path.join(PDF_REPORTS_DIR, f"{nome_base_arquivo}.png")
 
-    # --- 1. Cria a Imagem Composta ---
-    sucesso_composicao = criar_imagem_composta(imagens_para_compor, caminho_imagem_composta)
 
-    # --- 2. Cria o PDF ---
-    pdf = FPDF(orientation='P', unit='mm', format='A4')
-    pdf.add_page()
-    
+def _adicionar_pagina_texto(pdf, dados_analise, resposta_modelo, secao=None):
+    """Página retrato com o cabeçalho e o texto gerado pelo modelo."""
+    pdf.add_page(orientation='P')
+    if secao is not None:
+        pdf.start_section(secao, level=1)
+
     # Cabeçalho do PDF
     pdf.set_font('Arial', 'B', 16)
     pdf.cell(0, 10, f"Análise de Rastreamento Ocular", 0, 1, 'C')
@@ -119,23 +202,252 @@ def criar_relatorio_pdf(dados_analise, resposta_modelo):
     pdf.set_font('Arial', '', 11)
     pdf.multi_cell(0, 5, texto_processado)
 
+
+def _adicionar_pagina_galeria(pdf, imagem_composta):
+    """Página paisagem com a imagem composta (JPEG em memória)."""
+    pdf.add_page(orientation='L')
+    pdf.set_font('Arial', 'B', 14)
+    pdf.cell(0, 10, 'Galeria de Imagens da Análise', 0, 1, 'C')
+    pdf.image(imagem_composta, x=10, y=30, w=pdf.w - 20) # Largura quase total da página
+
+
+def _adicionar_pagina_galeria_compartilhada(pdf, image_paths_with_titles):
+    """
+    Mesma galeria de _adicionar_pagina_galeria, mas com cada miniatura inserida
+    separadamente: imagens repetidas entre participantes viram referências ao
+    mesmo objeto do PDF em vez de cópias.
+    """
+    pdf.add_page(orientation='L')
+    pdf.set_font('Arial', 'B', 14)
+    pdf.cell(0, 10, 'Galeria de Imagens da Análise', 0, 1, 'C')
+
+    # Reproduz a grade da imagem composta, escalada para a largura da página.
+    total_width = (THUMB_WIDTH * COLS) + (SPACING * (COLS - 1)) + (PADDING * 2)
+    escala = (pdf.w - 20) / total_width
+    pdf.set_font('Arial', '', 32 * escala * 72 / 25.4)
+
+    x, y = PADDING, PADDING
+    for i, (title, path) in enumerate(image_paths_with_titles):
+        dados_jpeg, (largura, altura) = obter_miniatura_jpeg(path)
+        pdf.set_xy(10 + x * escala, 30 + y * escala)
+        pdf.cell(THUMB_WIDTH * escala, TITLE_HEIGHT * escala, title.encode('latin-1', 'replace').decode('latin-1'))
+        pdf.image(io.BytesIO(dados_jpeg), x=10 + x * escala, y=30 + (y + TITLE_HEIGHT) * escala,
+                  w=largura * escala, h=altura * escala)
+
+        if (i + 1) % COLS == 0:
+            x = PADDING
+            y += THUMB_HEIGHT + TITLE_HEIGHT + SPACING
+        else:
+            x += THUMB_WIDTH + SPACING
+
+
+def caminho_relatorio_pdf(dados_analise):
+    """Caminho do PDF individual de um registro (mídia, participante)."""
+    nome_base_arquivo = f"{dados_analise['media_name'].replace('.', '_')}_P{dados_analise['participante']}"
+    return os.path.join(PDF_REPORTS_DIR, f"Relatorio_Final_{nome_base_arquivo}.pdf")
+
+
+def criar_relatorio_pdf(dados_analise, resposta_modelo):
+    """
+    Gera um arquivo PDF que inclui uma imagem composta de todas as análises visuais.
+    A imagem composta é montada e codificada em memória, sem arquivo temporário.
+
+    Returns:
+        bool: True se o PDF foi salvo, False caso contrário.
+    """
+    with perfilar_registro(dados_analise, 'pdf'):
+        return _criar_relatorio_pdf(dados_analise, resposta_modelo)
+
+
+def _criar_relatorio_pdf(dados_analise, resposta_modelo):
+    os.makedirs(PDF_REPORTS_DIR, exist_ok=True)
+
+    # --- 1. Cria a Imagem Composta (em memória, como JPEG) ---
+    try:
+        with medir('pdf_generator.imagem_composta'):
+            imagem_composta = _codificar_jpeg(compor_imagem(_imagens_para_compor(dados_analise)))
+    except Exception as e:
+        print(f"  - ERRO ao criar imagem composta: {e}")
+        imagem_composta = None
+
+    # --- 2. Cria o PDF ---
+    pdf = FPDF(orientation='P', unit='mm', format='A4')
+    _adicionar_pagina_texto(pdf, dados_analise, resposta_modelo)
+
     # Adiciona a imagem composta em uma nova página paisagem
-    if sucesso_composicao:
-        pdf.add_page(orientation='L')
-        pdf.set_font('Arial', 'B', 14)
-        pdf.cell(0, 10, 'Galeria de Imagens da Análise', 0, 1, 'C')
-        pdf.image(caminho_imagem_composta, x=10, y=30, w=pdf.w - 20) # Largura quase total da página
-    
+    if imagem_composta is not None:
+        _adicionar_pagina_galeria(pdf, imagem_composta)
+
     # --- 3. Salva o PDF Final ---
-    nome_arquivo_pdf = f"Relatorio_Final_{nome_base_arquivo.replace('temp_', '')}.pdf"
-    caminho_saida_pdf = os.path.join(PDF_REPORTS_DIR, nome_arquivo_pdf)
-    
+    caminho_saida_pdf = caminho_relatorio_pdf(dados_analise)
+
     try:
-        pdf.output(caminho_saida_pdf)
+        with medir('pdf_generator.escrita'):
+            pdf.output(caminho_saida_pdf)
         print(f"  - Relatório PDF final salvo em: {caminho_saida_pdf}")
+        return True
     except Exception as e:
         print(f"  - ERRO ao salvar PDF final: {e}")
+        return False
+
+
+def _renderizar_sumario(pdf, secoes):
+    """Desenha o sumário com links para cada mídia e participante."""
+    pdf.set_font('Arial', 'B', 16)
+    pdf.cell(0, 10, 'Sumário', 0, 1, 'C')
+    pdf.ln(4)
+    for secao in secoes:
+        pdf.set_font('Arial', 'B' if secao.level == 0 else '', 11 if secao.level == 0 else 10)
+        link = pdf.add_link(page=secao.page_number)
+        recuo = 8 * secao.level
+        pdf.set_x(pdf.l_margin + recuo)
+        largura = pdf.w - pdf.l_margin - pdf.r_margin - recuo
+        pdf.cell(largura - 15, 6, secao.name, link=link)
+        pdf.cell(15, 6, str(secao.page_number), 0, 1, 'R', link=link)
+
+
+@medido('pdf_generator.consolidado')
+def criar_relatorio_pdf_consolidado(registros, caminho_saida_pdf, titulo):
+    """
+    Gera um único PDF com as seções de vários participantes (ex: todos os de uma
+    mídia, categoria ou bloco), com sumário e marcadores. Cada seção mantém as
+    páginas do relatório individual; as imagens da galeria são embutidas uma vez.
+
+    Args:
+        registros (list): Pares (dados_analise, resposta_modelo), agrupados por mídia.
+        caminho_saida_pdf (str): Onde salvar o PDF.
+        titulo (str): Título da capa.
+
+    Returns:
+        bool: True se o PDF foi salvo, False caso contrário.
+    """
+    pdf = FPDF(orientation='P', unit='mm', format='A4')
+    pdf.add_page()
+    pdf.set_font('Arial', 'B', 18)
+    pdf.cell(0, 12, titulo.encode('latin-1', 'replace').decode('latin-1'), 0, 1, 'C')
+    pdf.set_font('Arial', '', 12)
+    pdf.cell(0, 8, f"{len(registros)} análises", 0, 1, 'C')
+
+    # Uma linha do sumário por mídia e por participante (~40 linhas por página).
+    num_secoes = len(registros) + len({dados['media_name'] for dados, _ in registros})
+    pdf.insert_toc_placeholder(_renderizar_sumario, pages=max(1, -(-num_secoes // 40)),
+                               allow_extra_pages=True, reset_page_indices=False)
+
+    media_atual = None
+    for dados_analise, resposta_modelo in registros:
+        if dados_analise['media_name'] != media_atual:
+            media_atual = dados_analise['media_name']
+            pdf.add_page(orientation='P')
+            pdf.start_section(f"Mídia: {media_atual}".encode('latin-1', 'replace').decode('latin-1'), level=0)
+            pdf.set_font('Arial', 'B', 16)
+            pdf.cell(0, 10, f"Mídia: {media_atual}", 0, 1, 'C')
+            pdf.set_font('Arial', '', 12)
+            pdf.cell(0, 8, f"Categoria: {dados_analise['categoria']} | Bloco: {dados_analise.get('bloco', '')}", 0, 1, 'C')
+
+        _adicionar_pagina_texto(pdf, dados_analise, resposta_modelo,
+                                secao=f"Participante {dados_analise['participante']}")
+        try:
+            _adicionar_pagina_galeria_compartilhada(pdf, _imagens_para_compor(dados_analise))
+        except Exception as e:
+            print(f"  - ERRO ao montar a galeria de '{media_atual}' (participante {dados_analise['participante']}): {e}")
+
+    try:
+        os.makedirs(os.path.dirname(caminho_saida_pdf) or '.', exist_ok=True)
+        pdf.output(caminho_saida_pdf)
+        print(f"  - Relatório PDF consolidado salvo em: {caminho_saida_pdf}")
+        return True
+    except Exception as e:
+        print(f"  - ERRO ao salvar PDF consolidado: {e}")
+        return False
+
+
+def gerar_relatorios_consolidados(agrupar_por='media', caminho_jsonl=OUTPUT_JSONL_PATH, grupos=None):
+    """
+    Gera um PDF consolidado por mídia, categoria ou bloco a partir do relatório
+    .jsonl. O arquivo é lido duas vezes: a primeira guarda só a posição de cada
+    linha por grupo, a segunda carrega um grupo por vez, então a memória não
+    cresce com o tamanho do relatório.
+
+    Args:
+        agrupar_por (str): 'media', 'categoria' ou 'bloco'.
+        grupos (set): Se informado, gera apenas os grupos com essas chaves.
+    """
+    campo = AGRUPAMENTOS_CONSOLIDADOS[agrupar_por]
+    if not os.path.exists(caminho_jsonl):
+        print(f"ERRO: Relatório '{caminho_jsonl}' não encontrado.")
+        return
+
+    # --- 1. Posições das linhas de cada grupo (a última linha de cada par vale) ---
+    posicoes = {}
+    with open(caminho_jsonl, 'rb') as f:
+        while True:
+            offset = f.tell()
+            linha = f.readline()
+            if not linha:
+                break
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                continue
+            chave_grupo = str(registro.get(campo))
+            if grupos is not None and chave_grupo not in grupos:
+                continue
+            chave_par = (registro['media_name'], str(registro['participante']))
+            posicoes.setdefault(chave_grupo, {})[chave_par] = offset
+
+    # --- 2. Um PDF por grupo ---
+    with open(caminho_jsonl, 'rb') as f:
+        for chave_grupo, por_par in sorted(posicoes.items()):
+            registros = []
+            for chave_par in sorted(por_par):
+                f.seek(por_par[chave_par])
+                registro = json.loads(f.readline())
+                registros.append((registro, registro['Resposta']))
+
+            nome_arquivo = f"Relatorio_Consolidado_{agrupar_por}_{chave_grupo.replace('.', '_').replace(' ', '_')}.pdf"
+            titulo = f"Análise de Rastreamento Ocular - {agrupar_por.capitalize()}: {chave_grupo}"
+            criar_relatorio_pdf_consolidado(registros, os.path.join(PDF_REPORTS_DIR, nome_arquivo), titulo)
+
+
+class GeradorPdfParalelo:
+    """
+    Gera os relatórios PDF em um pool de processos, em paralelo ao laço do
+    modelo. concluidos() devolve os relatórios prontos na ordem de submissão;
+    quando há mais de 'max_pendentes' na fila, a submissão passa a esperar.
+    """
+
+    def __init__(self, max_workers=PDF_WORKERS, max_pendentes=None):
+        self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        self._pendentes = deque()
+        self.max_pendentes = max_pendentes or 4 * max_workers
+
+    def submeter(self, dados_analise, resposta_modelo, contexto=None):
+        """Agenda um PDF. 'contexto' é devolvido por concluidos() junto com o resultado."""
+        campos = {campo: dados_analise[campo] for campo in CAMPOS_PDF}
+        self._pendentes.append((contexto, self._executor.submit(criar_relatorio_pdf, campos, resposta_modelo)))
+
+    def concluidos(self, bloquear=False):
+        """
+        Gera pares (contexto, sucesso) dos PDFs já terminados, em ordem. Sem
+        'bloquear', para no primeiro ainda em andamento (exceto se a fila estiver cheia).
+        """
+        while self._pendentes:
+            contexto, futuro = self._pendentes[0]
+            if not (bloquear or futuro.done() or len(self._pendentes) > self.max_pendentes):
+                break
+            self._pendentes.popleft()
+            try:
+                sucesso = futuro.result()
+            except Exception as e:
+                print(f"  - ERRO ao gerar PDF: {e}")
+                sucesso = False
+            yield contexto, sucesso
+
+    def encerrar(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
 
-    # --- 4. Limpeza (remove a imagem composta temporária) ---
-    if os.path.exists(caminho_imagem_composta):
-        os.remove(caminho_imagem_composta)
\ No newline at end of file
+    def __exit__(self, *exc):
+        self.encerrar()
@@ -0,0 +1,69 @@
+# eyetracking_analyzer/pipeline.py
+import queue
+import threading
+from config import PIPELINE_TAMANHO_FILA
+
+# Marca de fim de fluxo colocada na fila pela thread da etapa.
+_FIM = object()
+
+
+class _FalhaEtapa:
+    """Leva para o consumidor uma exceção ocorrida dentro da thread da etapa."""
+    __slots__ = ('erro',)
+
+    def __init__(self, erro):
+        self.erro = erro
+
+
+def etapa_em_thread(itens, funcao=None, tamanho_fila=PIPELINE_TAMANHO_FILA, nome="etapa"):
+    """
+    Executa uma etapa do pipeline em uma thread própria.
+
+    A thread consome 'itens', aplica 'funcao' (se informada) e coloca os
+    resultados em uma fila limitada, consumida pelo gerador retornado. Quando a
+    fila enche, a thread espera: a etapa seguinte controla o ritmo (backpressure)
+    e nunca há mais que 'tamanho_fila' itens prontos em memória.
+
+    Exceções da etapa são relançadas no consumidor. Se o consumidor parar antes
+    do fim (break, erro), a thread é avisada e encerra.
+    """
+    fila = queue.Queue(maxsize=tamanho_fila)
+    parar = threading.Event()
+
+    def colocar(item):
+        # put com timeout para perceber um pedido de parada com a fila cheia.
+        while not parar.is_set():
+            try:
+                fila.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produzir():
+        try:
+            for item in itens:
+                if not colocar(funcao(item) if funcao is not None else item):
+                    return
+        except BaseException as e:
+            colocar(_FalhaEtapa(e))
+            return
+        colocar(_FIM)
+
+    thread = threading.Thread(target=produzir, name=f"pipeline-{nome}", daemon=True)
+    thread.start()
+
+    def consumir():
+        try:
+            while True:
+                item = fila.get()
+                if item is _FIM:
+                    return
+                if isinstance(item, _FalhaEtapa):
+                    raise item.erro
+                yield item
+        finally:
+            parar.set()
+            thread.join()
+
+    return consumir()
@@ -0,0 +1,286 @@
+# eyetracking_analyzer/profiling.py
+import os
+import io
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import functools
+import itertools
+from contextlib import nullcontext
+from config import PERFIL_ATIVO, PERFIL_FORMATO, PERFIL_DIR, PERFIL_CPROFILE_REGISTRO
+
+try:
+    import resource
+except ImportError:  # Windows: sem pico de RSS
+    resource = None
+
+# Identificador da execução, herdado pelos processos filhos (pool de PDFs) pelo ambiente.
+VARIAVEL_EXECUCAO = 'UEYES_PERFIL_EXECUCAO'
+# /proc/thread-self/io mede só a thread atual (as etapas rodam em threads diferentes).
+_CAMINHOS_IO = ('/proc/thread-self/io', '/proc/self/io')
+_CAMPOS_IO = {'rchar': 'bytes_lidos', 'wchar': 'bytes_escritos',
+              'read_bytes': 'bytes_lidos_disco', 'write_bytes': 'bytes_escritos_disco'}
+
+_NULO = nullcontext()
+_lock_arquivo = threading.Lock()
+_arquivo = None  # (pid, execução, descritor) do JSONL deste processo
+_lock_cprofile = threading.Lock()
+_sequencia_execucoes = itertools.count(1)  # execuções iniciadas no mesmo segundo têm IDs distintos
+
+
+def _caminho_perfil(execucao):
+    return os.path.join(PERFIL_DIR, f"perfil_{execucao}.jsonl")
+
+
+def _ler_io():
+    """Contadores de E/S da thread (ou do processo); {} fora do Linux."""
+    for caminho in _CAMINHOS_IO:
+        try:
+            with open(caminho, 'rb') as f:
+                conteudo = f.read()
+        except OSError:
+            continue
+        valores = {}
+        for linha in conteudo.splitlines():
+            nome, _, valor = linha.partition(b':')
+            campo = _CAMPOS_IO.get(nome.decode())
+            if campo:
+                valores[campo] = int(valor)
+        return valores
+    return {}
+
+
+def _pico_rss_mb():
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss vem em KB no Linux e em bytes no macOS.
+    return round(pico / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+
+
+def _registrar(linha):
+    """Acrescenta um span ao JSONL da execução (O_APPEND: seguro entre processos)."""
+    global _arquivo
+    dados = (json.dumps(linha, ensure_ascii=False) + '\n').encode('utf-8')
+    with _lock_arquivo:
+        # Um processo pode perfilar várias execuções seguidas (ex: o worker do 'serve').
+        if _arquivo is None or _arquivo[:2] != (os.getpid(), linha['execucao']):
+            if _arquivo is not None and _arquivo[0] == os.getpid():
+                os.close(_arquivo[2])
+            os.makedirs(PERFIL_DIR, exist_ok=True)
+            _arquivo = (os.getpid(), linha['execucao'], os.open(_caminho_perfil(linha['execucao']),
+                                                                os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644))
+        os.write(_arquivo[2], dados)
+
+
+class _Span:
+    """Mede uma etapa: tempo de parede, CPU da thread, E/S da thread e pico de RSS."""
+
+    __slots__ = ('execucao', 'etapa', 'atributos', 'inicio', 'parede', 'cpu', 'io')
+
+    def __init__(self, execucao, etapa, atributos):
+        self.execucao = execucao
+        self.etapa = etapa
+        self.atributos = atributos
+
+    def __enter__(self):
+        self.io = _ler_io()
+        self.inicio = time.time()
+        self.cpu = time.thread_time()
+        self.parede = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_erro, erro, _):
+        parede = time.perf_counter() - self.parede
+        cpu = time.thread_time() - self.cpu
+        io_fim = _ler_io()
+        linha = {"execucao": self.execucao, "etapa": self.etapa, "pid": os.getpid(),
+                 "thread": threading.current_thread().name, "inicio": round(self.inicio, 6),
+                 "parede_s": round(parede, 6), "cpu_s": round(cpu, 6), "pico_rss_mb": _pico_rss_mb()}
+        linha.update({campo: io_fim[campo] - self.io.get(campo, 0) for campo in io_fim})
+        linha.update(self.atributos)
+        if tipo_erro is not None:
+            linha["erro"] = tipo_erro.__name__
+        try:
+            _registrar(linha)
+        except OSError as e:
+            print(f"AVISO: Não foi possível gravar o perfil: {e}")
+        return False
+
+
+def perfil_ativo():
+    """ID da execução sendo perfilada, ou None."""
+    return os.environ.get(VARIAVEL_EXECUCAO)
+
+
+def medir(etapa, **atributos):
+    """
+    Context manager que grava um span da 'etapa' (ex: 'pdf_generator.escrita')
+    no perfil da execução. Sem perfil ativo é um nullcontext, sem custo.
+
+    Exemplo:
+        with medir('data_loader.indice'):
+            indice = carregar_indice_fixacoes()
+    """
+    execucao = os.environ.get(VARIAVEL_EXECUCAO)
+    if execucao is None:
+        return _NULO
+    return _Span(execucao, etapa, atributos)
+
+
+def medido(etapa):
+    """Decorador equivalente a envolver a função inteira em medir(etapa)."""
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def envolvida(*args, **kwargs):
+            with medir(etapa):
+                return funcao(*args, **kwargs)
+        return envolvida
+    return decorador
+
+
+def iniciar_perfil(ativo=PERFIL_ATIVO):
+    """
+    Inicia o perfil da execução (se 'ativo'), exportando o ID pelo ambiente
+    para que os processos criados depois também gravem seus spans.
+
+    Returns:
+        str: ID da execução, ou None se o perfil estiver desativado.
+    """
+    if not ativo:
+        return None
+    execucao = time.strftime('%Y%m%d-%H%M%S') + f"-{os.getpid()}-{next(_sequencia_execucoes)}"
+    os.environ[VARIAVEL_EXECUCAO] = execucao
+    print(f"--- PERFIL ATIVO: spans em '{_caminho_perfil(execucao)}' ---")
+    return execucao
+
+
+def carregar_spans(execucao):
+    """Lê os spans de uma execução (de todos os processos)."""
+    try:
+        with open(_caminho_perfil(execucao), encoding='utf-8') as f:
+            return [json.loads(linha) for linha in f if linha.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def resumir_spans(spans):
+    """
+    Agrega os spans por etapa.
+
+    Returns:
+        list: Dicionários por etapa (chamadas, totais, p50/p95 de parede, E/S e pico
+        de RSS), ordenados pelo tempo de parede total.
+    """
+    import numpy as np
+    por_etapa = {}
+    for span in spans:
+        por_etapa.setdefault(span['etapa'], []).append(span)
+
+    resumo = []
+    for etapa, lista in por_etapa.items():
+        parede = np.array([s['parede_s'] for s in lista])
+        resumo.append({
+            "etapa": etapa,
+            "chamadas": len(lista),
+            "erros": sum(1 for s in lista if 'erro' in s),
+            "parede_total_s": float(parede.sum()),
+            "parede_p50_s": float(np.percentile(parede, 50)),
+            "parede_p95_s": float(np.percentile(parede, 95)),
+            "cpu_total_s": float(sum(s['cpu_s'] for s in lista)),
+            "bytes_lidos": sum(s.get('bytes_lidos', 0) for s in lista),
+            "bytes_escritos": sum(s.get('bytes_escritos', 0) for s in lista),
+            "pico_rss_mb": max((s['pico_rss_mb'] for s in lista if s.get('pico_rss_mb') is not None), default=None),
+        })
+    return sorted(resumo, key=lambda r: r['parede_total_s'], reverse=True)
+
+
+def formatar_prometheus(resumo, execucao):
+    """Totais por etapa no formato texto de exposição do Prometheus."""
+    metricas = (
+        ('chamadas', 'ueyes_etapa_chamadas_total', 'counter', 'Spans registrados por etapa'),
+        ('erros', 'ueyes_etapa_erros_total', 'counter', 'Spans encerrados por exceção'),
+        ('parede_total_s', 'ueyes_etapa_parede_segundos_total', 'counter', 'Tempo de parede somado'),
+        ('cpu_total_s', 'ueyes_etapa_cpu_segundos_total', 'counter', 'Tempo de CPU (thread) somado'),
+        ('parede_p95_s', 'ueyes_etapa_parede_p95_segundos', 'gauge', 'Percentil 95 do tempo de parede'),
+        ('bytes_lidos', 'ueyes_etapa_bytes_lidos_total', 'counter', 'Bytes lidos (rchar)'),
+        ('bytes_escritos', 'ueyes_etapa_bytes_escritos_total', 'counter', 'Bytes escritos (wchar)'),
+        ('pico_rss_mb', 'ueyes_etapa_pico_rss_megabytes', 'gauge', 'Maior pico de RSS observado'),
+    )
+    saida = io.StringIO()
+    for campo, nome, tipo, ajuda in metricas:
+        saida.write(f"# HELP {nome} {ajuda}\n# TYPE {nome} {tipo}\n")
+        for linha in resumo:
+            if linha[campo] is not None:
+                saida.write(f'{nome}{{execucao="{execucao}",etapa="{linha["etapa"]}"}} {linha[campo]}\n')
+    return saida.getvalue()
+
+
+def finalizar_perfil(execucao, formato=PERFIL_FORMATO):
+    """Imprime a tabela-resumo da execução e, no formato 'prometheus', grava o .prom."""
+    if execucao is None:
+        return
+    os.environ.pop(VARIAVEL_EXECUCAO, None)
+    resumo = resumir_spans(carregar_spans(execucao))
+    if not resumo:
+        print("Nenhum span registrado no perfil.")
+        return
+
+    print(f"--- PERFIL DA EXECUÇÃO {execucao} ---")
+    print(f"{'etapa':<34}{'chamadas':>9}{'parede(s)':>11}{'p95(s)':>9}{'cpu(s)':>9}{'lido(MB)':>10}{'escrito(MB)':>12}{'rss(MB)':>9}")
+    for r in resumo:
+        print(f"{r['etapa']:<34}{r['chamadas']:>9}{r['parede_total_s']:>11.2f}{r['parede_p95_s']:>9.3f}"
+              f"{r['cpu_total_s']:>9.2f}{r['bytes_lidos'] / 1e6:>10.1f}{r['bytes_escritos'] / 1e6:>12.1f}"
+              f"{r['pico_rss_mb'] if r['pico_rss_mb'] is not None else '-':>9}")
+
+    if formato == 'prometheus':
+        caminho = os.path.join(PERFIL_DIR, f"perfil_{execucao}.prom")
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write(formatar_prometheus(resumo, execucao))
+        print(f"Perfil no formato Prometheus salvo em: '{caminho}'")
+
+
+def perfilar_registro(dados_analise, etapa, registro_alvo=PERFIL_CPROFILE_REGISTRO):
+    """
+    Context manager que roda a etapa sob cProfile quando o registro é o
+    escolhido em PERFIL_CPROFILE_REGISTRO ('mídia:participante'). Grava o .prof
+    em PERFIL_DIR e imprime as 15 funções de maior tempo acumulado. Só uma
+    etapa é perfilada por vez (o cProfile não aceita perfis simultâneos).
+    """
+    if registro_alvo is None or f"{dados_analise['media_name']}:{dados_analise['participante']}" != registro_alvo:
+        return _NULO
+    return _PerfilRegistro(registro_alvo, etapa)
+
+
+class _PerfilRegistro:
+
+    def __init__(self, registro, etapa):
+        self.registro = registro
+        self.etapa = etapa
+        self.perfil = None
+
+    def __enter__(self):
+        if _lock_cprofile.acquire(blocking=False):
+            self.perfil = cProfile.Profile()
+            self.perfil.enable()
+        else:
+            print(f"AVISO: cProfile já em uso; etapa '{self.etapa}' de '{self.registro}' não será perfilada.")
+        return self
+
+    def __exit__(self, *exc):
+        if self.perfil is None:
+            return False
+        self.perfil.disable()
+        _lock_cprofile.release()
+        os.makedirs(PERFIL_DIR, exist_ok=True)
+        nome = self.registro.replace(':', '_P').replace('.', '_')
+        caminho = os.path.join(PERFIL_DIR, f"cprofile_{nome}_{self.etapa}.prof")
+        self.perfil.dump_stats(caminho)
+        texto = io.StringIO()
+        pstats.Stats(self.perfil, stream=texto).sort_stats('cumulative').print_stats(15)
+        print(f"--- cPROFILE de '{self.registro}' na etapa '{self.etapa}' (salvo em '{caminho}') ---")
+        print(texto.getvalue())
+        return False
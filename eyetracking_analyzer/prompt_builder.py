@@ -1,14 +1,58 @@
 # eyetracking_analyzer/prompt_builder.py
 # eyetracking_analyzer/prompt_builder.py
+import numpy as np
+from config import (
+    FORMATO_FIXACOES, FIXACOES_ORCAMENTO_TOKENS, FIXACOES_GRADE_QUANTIZACAO, FIXACOES_RAIO_FUSAO,
+    PROMPT_INCLUIR_CONSISTENCIA
+)
+from eyetracking_analyzer.profiling import medido
+
+# Caracteres que os tokenizadores do tipo SentencePiece (Gemini) costumam
+# separar em tokens próprios: cada dígito e a pontuação usada nas listas.
+_PONTUACAO_NUMERICA = np.array([ord(c) for c in ',;.:[]()+-='], dtype=np.uint32)
+
+
+def _colunas(dados_oculares):
+    """
+    Aceita as fixações como DataFrame, dicionário {coluna: array} (views do
+    índice) ou RegistroOcular, e devolve um dicionário de arrays sem copiar.
+    """
+    dados_oculares = getattr(dados_oculares, 'fixacoes', dados_oculares)
+    if hasattr(dados_oculares, 'columns'):
+        return {col: dados_oculares[col].to_numpy() for col in dados_oculares.columns}
+    return dados_oculares
+
+
+def _fixacoes_do_registro(dados_analise):
+    """Registros compactos expõem as colunas do índice sem montar um DataFrame."""
+    dados_oculares = getattr(dados_analise, 'fixacoes', None)
+    if dados_oculares is None:
+        dados_oculares = dados_analise['dados_oculares']
+    return dados_oculares
+
+
+def estimar_tokens_texto(texto):
+    """
+    Estimativa rápida (sem rede) de tokens de um texto. Dígitos e pontuação
+    das listas contam um token cada (o Gemini separa os números dígito a
+    dígito); o restante do texto conta ~4 caracteres por token.
+    """
+    codigos = np.frombuffer(texto.encode('utf-32-le'), dtype=np.uint32)
+    digitos = np.count_nonzero((codigos >= 48) & (codigos <= 57))
+    pontuacao = np.count_nonzero(np.isin(codigos, _PONTUACAO_NUMERICA))
+    return int(digitos + pontuacao + (len(codigos) - digitos - pontuacao) // 4)
+
 
 def sumarizar_dados_oculares(df_dados):
     """Cria um resumo quantitativo geral dos dados de rastreamento ocular."""
-    if df_dados.empty:
+    colunas = _colunas(df_dados)
+    num_fixacoes = len(colunas['FPOGD']) if 'FPOGD' in colunas else 0
+    if num_fixacoes == 0:
         return "Nenhum dado ocular disponível."
     
-    num_fixacoes = len(df_dados)
-    duracao_total = df_dados['FPOGD'].sum()
-    duracao_media_fixacao = df_dados['FPOGD'].mean()
+    # nansum/nanmean: mesmo comportamento do pandas com valores ausentes.
+    duracao_total = np.nansum(colunas['FPOGD'])
+    duracao_media_fixacao = np.nanmean(colunas['FPOGD'])
     
     return (
         f"**Resumo Quantitativo Geral:**\n"
@@ -21,7 +65,8 @@ def formatar_dados_oculares_como_listas(df_dados):
     """
     Formata as colunas de dados oculares especificadas como listas de strings separadas.
     """
-    if df_dados.empty:
+    colunas = _colunas(df_dados)
+    if not colunas or len(next(iter(colunas.values()))) == 0:
         return "Nenhum dado de fixação disponível para formatar."
 
     # Define as colunas a serem formatadas e seu respectivo formato de string
@@ -39,9 +84,10 @@ def formatar_dados_oculares_como_listas(df_dados):
     listas_formatadas = []
     
     for col, fmt in formatos.items():
-        if col in df_dados.columns:
+        if col in colunas:
             # Converte cada valor na coluna para uma string, usando o formato definido
-            valores_str = [fmt.format(v) for v in df_dados[col]]
+            # (tolist() produz escalares Python, que formatam igual aos do NumPy)
+            valores_str = [fmt.format(v) for v in colunas[col].tolist()]
             # Junta todos os valores de string com um ponto e vírgula
             valores_juntos = ';'.join(valores_str)
             # Cria a string final no formato "COLUNA = [valores]"
@@ -51,19 +97,139 @@ def formatar_dados_oculares_como_listas(df_dados):
     return "\n".join(listas_formatadas)
 
 
-def construir_prompt_completo(dados_analise):
+def _num_caracteres_inteiros(valores):
+    """Quantidade de caracteres de cada inteiro quando escrito em decimal (com sinal)."""
+    absolutos = np.abs(valores)
+    digitos = np.floor(np.log10(np.maximum(absolutos, 1))).astype(np.int64) + 1
+    return digitos + (valores < 0)
+
+
+def _linhas_compactas(x, y, inicio, duracao):
+    """Matriz (n, 4) de inteiros: x, y, dt e d, com x/y/dt em delta da fixação anterior."""
+    dx = np.diff(x, prepend=0)
+    dy = np.diff(y, prepend=0)
+    dt = np.diff(inicio, prepend=inicio[:1])
+    return np.column_stack((dx, dy, dt, duracao))
+
+
+def _custo_linhas(linhas):
+    """Caracteres (= tokens estimados) de cada linha 'x,y,dt,d;'."""
+    return _num_caracteres_inteiros(linhas).sum(axis=1) + linhas.shape[1]
+
+
+def codificar_fixacoes(df_dados, orcamento_tokens=FIXACOES_ORCAMENTO_TOKENS, grade=FIXACOES_GRADE_QUANTIZACAO,
+                       raio_fusao=FIXACOES_RAIO_FUSAO):
     """
-    Monta o prompt final com um resumo geral e os dados sequenciais
-    formatados como listas.
+    Codifica a sequência de fixações em formato compacto, dentro de um orçamento de tokens.
+
+    Passos (todos vetorizados):
+      1. Funde fixações consecutivas a menos de 'raio_fusao' (coordenadas
+         normalizadas) uma da outra: posição média ponderada pela duração,
+         início da primeira e soma das durações.
+      2. Quantiza x/y para inteiros em 0..grade-1 e tempos para milissegundos.
+      3. Escreve x, y e o início (dt) como diferença em relação à fixação anterior.
+      4. Se passar de 'orcamento_tokens', mantém as fixações de maior duração
+         (em ordem temporal, sempre com a primeira e a última) até caber.
+
+    A primeira e a última fixação nunca são descartadas: se nem elas couberem
+    (orçamento de poucas dezenas de tokens), o texto sai acima do orçamento,
+    'excedeu_orcamento' fica True no relatório e um AVISO é impresso.
+
+    Returns:
+        tuple: (texto, relatorio). 'relatorio' diz quanto foi descartado:
+        fixações originais/após fusão/enviadas, fração da duração mantida,
+        erro máximo de quantização, tokens do texto e se o orçamento foi excedido.
     """
-    # Gera o resumo geral
-    sumarizacao_geral = sumarizar_dados_oculares(dados_analise['dados_oculares'])
-    
-    # Formata os dados brutos no formato de lista solicitado
-    dados_como_listas = formatar_dados_oculares_como_listas(dados_analise['dados_oculares'])
+    colunas = _colunas(df_dados)
+    x = np.asarray(colunas['FPOGX'], dtype=np.float64)
+    y = np.asarray(colunas['FPOGY'], dtype=np.float64)
+    inicio = np.asarray(colunas['FPOGS'], dtype=np.float64)
+    duracao = np.asarray(colunas['FPOGD'], dtype=np.float64)
+    num_originais = len(x)
+
+    validas = np.isfinite(x) & np.isfinite(y) & np.isfinite(inicio) & np.isfinite(duracao)
+    x, y, inicio, duracao = x[validas], y[validas], inicio[validas], duracao[validas]
+    duracao_total = float(duracao.sum())
+
+    # 1. Fusão de fixações consecutivas próximas.
+    if len(x) > 1 and raio_fusao > 0:
+        distancia = np.hypot(np.diff(x), np.diff(y))
+        grupos = np.concatenate(([0], np.cumsum(distancia > raio_fusao)))
+        peso = np.maximum(duracao, 1e-6)
+        soma_peso = np.bincount(grupos, weights=peso)
+        x = np.bincount(grupos, weights=x * peso) / soma_peso
+        y = np.bincount(grupos, weights=y * peso) / soma_peso
+        primeiro = np.flatnonzero(np.diff(grupos, prepend=-1))
+        inicio = inicio[primeiro]
+        duracao = np.bincount(grupos, weights=duracao)
+    num_fundidas = len(x)
+
+    # 2. Quantização.
+    xq = np.clip(np.rint(x * grade), 0, grade - 1).astype(np.int64)
+    yq = np.clip(np.rint(y * grade), 0, grade - 1).astype(np.int64)
+    inicio_ms = np.rint(inicio * 1000).astype(np.int64)
+    duracao_ms = np.rint(duracao * 1000).astype(np.int64)
+
+    # 3 e 4. Delta + corte por orçamento (o custo muda com os deltas, então recalcula).
+    orcamento_linhas = orcamento_tokens - estimar_tokens_texto("x,y,dt,d = []")
+    manter = np.arange(num_fundidas)
+    linhas = _linhas_compactas(xq, yq, inicio_ms, duracao_ms)
+    custo = int(_custo_linhas(linhas).sum())
+    if custo > orcamento_linhas and num_fundidas > 2:
+        prioridade = duracao_ms.astype(np.float64)
+        prioridade[[0, -1]] = np.inf
+        ordem_prioridade = np.argsort(-prioridade, kind='stable')
+        k = num_fundidas
+        while custo > orcamento_linhas and k > 2:
+            k = max(2, min(k - 1, int(k * orcamento_linhas / custo)))
+            manter = np.sort(ordem_prioridade[:k])
+            linhas = _linhas_compactas(xq[manter], yq[manter], inicio_ms[manter], duracao_ms[manter])
+            custo = int(_custo_linhas(linhas).sum())
 
-    # Descrição das colunas para dar contexto ao modelo
-    descricao_colunas_contexto = """
+    texto = "x,y,dt,d = [" + ";".join(",".join(map(str, linha)) for linha in linhas.tolist()) + "]"
+    duracao_mantida = float(duracao[manter].sum())
+    relatorio = {
+        "fixacoes_originais": num_originais,
+        "fixacoes_invalidas": int(num_originais - validas.sum()),
+        "fixacoes_apos_fusao": num_fundidas,
+        "fixacoes_enviadas": len(manter),
+        "fracao_duracao_mantida": duracao_mantida / duracao_total if duracao_total > 0 else 1.0,
+        "erro_max_quantizacao": 0.5 / grade,
+        "tokens_estimados": estimar_tokens_texto(texto),
+    }
+    relatorio["excedeu_orcamento"] = relatorio["tokens_estimados"] > orcamento_tokens
+    if relatorio["excedeu_orcamento"]:
+        print(f"AVISO: Fixações codificadas com {relatorio['tokens_estimados']} tokens estimados, acima do "
+              f"orçamento de {orcamento_tokens} (a primeira e a última fixação são sempre enviadas).")
+    return texto, relatorio
+
+
+def descrever_relatorio_codificacao(relatorio):
+    """Linha do prompt que informa ao modelo o que foi resumido na codificação."""
+    return (
+        f"(Codificação: {relatorio['fixacoes_originais']} fixações registradas, "
+        f"{relatorio['fixacoes_apos_fusao']} após fundir fixações consecutivas próximas, "
+        f"{relatorio['fixacoes_enviadas']} enviadas, cobrindo "
+        f"{relatorio['fracao_duracao_mantida']:.0%} do tempo total de fixação.)"
+    )
+
+
+def formatar_sequencia_fixacoes(dados_oculares, formato=FORMATO_FIXACOES):
+    """
+    Retorna (texto da sequência de fixações, descrição das colunas) no
+    formato configurado: 'listas' (cinco listas com 4 casas decimais, o
+    formato original) ou 'compacto' (codificar_fixacoes, com orçamento de tokens).
+    """
+    if formato == 'compacto':
+        texto, relatorio = codificar_fixacoes(dados_oculares)
+        if relatorio['fixacoes_enviadas'] == 0:
+            return "Nenhum dado de fixação disponível para formatar.", DESCRICAO_FORMATO_COMPACTO
+        return f"{texto}\n{descrever_relatorio_codificacao(relatorio)}", DESCRICAO_FORMATO_COMPACTO
+    return formatar_dados_oculares_como_listas(dados_oculares), DESCRICAO_COLUNAS_CONTEXTO
+
+
+# Descrição das colunas, compartilhada pelos prompts individual e em lote.
+DESCRICAO_COLUNAS_CONTEXTO = """
 **Contexto das Métricas Oculares:**
 As listas de dados sequenciais representam:
 - **FPOGX**: A sequência de coordenadas X (horizontal) de cada fixação.
@@ -73,14 +239,75 @@ As listas de dados sequenciais representam:
 - **FPOGID**: O identificador sequencial de cada fixação.
 """
 
-    # Monta o prompt final
-    prompt = f"""
+DESCRICAO_FORMATO_COMPACTO = """
+**Contexto das Métricas Oculares:**
+Cada item da lista "x,y,dt,d" é uma fixação, em ordem temporal:
+- **x, y** (equivalem a FPOGX e FPOGY): posição em milésimos da largura e da altura da imagem (0 a 999). A primeira fixação traz o valor absoluto; as seguintes, a DIFERENÇA em relação à fixação anterior.
+- **dt** (equivale a FPOGS): milissegundos entre o início desta fixação e o da anterior (0 na primeira).
+- **d** (equivale a FPOGD): duração da fixação em milissegundos.
+"""
+
+# Itens da análise pedida ao modelo para cada participante.
+ITENS_ANALISE = """1.  **Análise Qualitativa:**
+    - Descreva o padrão da trajetória ocular (scanpath) do participante. Use as listas de coordenadas FPOGX e FPOGY para descrever o caminho que o olhar percorreu na imagem (ex: "começou no centro, moveu-se para o canto superior esquerdo, depois para uma área de texto à direita").
+    - Analise a cena na imagem. Identifique os objetos, textos ou elementos gráficos mais proeminentes.
+    - Correlacione a trajetória ocular com os elementos da cena. As sequências de fixações se concentram em áreas específicas da imagem? Essas áreas correspondem aos elementos que você identificou como importantes?
+
+2.  **Análise Quantitativa:**
+    - Analise as listas de FPOGS e FPOGD. Existem fixações de longa duração em pontos específicos da trajetória? O que isso pode indicar sobre o interesse ou dificuldade do participante naqueles pontos da imagem?
+    - A sequência de fixações é rápida e dispersa (muitas fixações curtas) ou lenta e focada (poucas fixações longas)? Relacione isso com o tipo de conteúdo da imagem (ex: uma imagem complexa pode gerar mais fixações exploratórias).
+"""
+
+# Mesmos itens para o formato 'compacto', que não envia as listas FPOGX/FPOGY/FPOGS/FPOGD.
+ITENS_ANALISE_COMPACTO = """1.  **Análise Qualitativa:**
+    - Descreva o padrão da trajetória ocular (scanpath) do participante. Acumule as diferenças x, y a partir da primeira fixação para reconstruir o caminho que o olhar percorreu na imagem (ex: "começou no centro, moveu-se para o canto superior esquerdo, depois para uma área de texto à direita").
+    - Analise a cena na imagem. Identifique os objetos, textos ou elementos gráficos mais proeminentes.
+    - Correlacione a trajetória ocular com os elementos da cena. As sequências de fixações se concentram em áreas específicas da imagem? Essas áreas correspondem aos elementos que você identificou como importantes?
+
+2.  **Análise Quantitativa:**
+    - Analise os tempos dt e d de cada fixação. Existem fixações de longa duração em pontos específicos da trajetória? O que isso pode indicar sobre o interesse ou dificuldade do participante naqueles pontos da imagem?
+    - A sequência de fixações é rápida e dispersa (muitas fixações curtas) ou lenta e focada (poucas fixações longas)? Relacione isso com o tipo de conteúdo da imagem (ex: uma imagem complexa pode gerar mais fixações exploratórias).
+"""
+
+# (descrição das colunas, itens da análise) de cada formato de fixações.
+TEXTOS_POR_FORMATO = {
+    'listas': (DESCRICAO_COLUNAS_CONTEXTO, ITENS_ANALISE),
+    'compacto': (DESCRICAO_FORMATO_COMPACTO, ITENS_ANALISE_COMPACTO),
+}
+
+
+def descrever_consistencia(dados_analise, incluir=PROMPT_INCLUIR_CONSISTENCIA):
+    """
+    Linha com a consistência de scanpath entre os participantes da imagem e a
+    similaridade deste participante com os demais (ver scanpath_similarity.py).
+    Retorna '' quando desativado ou quando não há resultado para o par.
+    """
+    if not incluir:
+        return ""
+    from eyetracking_analyzer.scanpath_similarity import obter_consistencia
+    resultado = obter_consistencia(dados_analise['media_name'], dados_analise['participante'])
+    if resultado is None or np.isnan(resultado[0]):
+        return ""
+    consistencia_imagem, similaridade, num_participantes = resultado
+    return (f"\n- Consistência de scanpath entre os {num_participantes} participantes desta imagem: "
+            f"{consistencia_imagem:.2f} (0 = trajetos sem relação, 1 = idênticos); "
+            f"similaridade média deste participante com os demais: {similaridade:.2f}")
+
+
+# Versão da montagem do prompt (sumarização, formatação das fixações). O run_build.py
+# refaz prompts e respostas quando ela muda; mude-a ao alterar essa montagem. Os textos
+# dos modelos abaixo entram na versão por conta própria (ver modelos_de_prompt).
+VERSAO_PROMPT = 1
+
+# Modelos dos prompts. Os campos de CAMPOS_VARIAVEIS_PROMPT mudam a cada registro;
+# os demais (descrição das colunas e itens da análise) são fixos para um formato.
+MODELO_PROMPT_COMPLETO = """
 **Análise de Comportamento Ocular e Cena**
 
 **Contexto da Tarefa:**
-- Mídia Analisada: {dados_analise['media_name']}
-- Categoria: {dados_analise['categoria']}
-- Participante: {dados_analise['participante']}
+- Mídia Analisada: {media_name}
+- Categoria: {categoria}
+- Participante: {participante}
 
 **Dados de Rastreamento Ocular:**
 {sumarizacao_geral}
@@ -93,15 +320,144 @@ As listas de dados sequenciais representam:
 **Tarefa de Análise Solicitada:**
 Com base na IMAGEM FORNECIDA e nos DADOS OCULARES SEQUENCIAIS acima, realize a seguinte análise:
 
-1.  **Análise Qualitativa:**
-    - Descreva o padrão da trajetória ocular (scanpath) do participante. Use as listas de coordenadas FPOGX e FPOGY para descrever o caminho que o olhar percorreu na imagem (ex: "começou no centro, moveu-se para o canto superior esquerdo, depois para uma área de texto à direita").
-    - Analise a cena na imagem. Identifique os objetos, textos ou elementos gráficos mais proeminentes.
-    - Correlacione a trajetória ocular com os elementos da cena. As sequências de fixações se concentram em áreas específicas da imagem? Essas áreas correspondem aos elementos que você identificou como importantes?
+{itens_analise}
+Por favor, estruture sua resposta de forma clara, separando a análise qualitativa da quantitativa.
+"""
 
-2.  **Análise Quantitativa:**
-    - Analise as listas de FPOGS e FPOGD. Existem fixações de longa duração em pontos específicos da trajetória? O que isso pode indicar sobre o interesse ou dificuldade do participante naqueles pontos da imagem?
-    - A sequência de fixações é rápida e dispersa (muitas fixações curtas) ou lenta e focada (poucas fixações longas)? Relacione isso com o tipo de conteúdo da imagem (ex: uma imagem complexa pode gerar mais fixações exploratórias).
+MODELO_PROMPT_LOTE = """
+**Análise de Comportamento Ocular e Cena (lote de participantes)**
 
-Por favor, estruture sua resposta de forma clara, separando a análise qualitativa da quantitativa.
+**Contexto da Tarefa:**
+- Mídia Analisada: {media_name}
+- Categoria: {categoria}
+- Participantes: {ids}
+
+{descricao_colunas_contexto}
+**Dados de Rastreamento Ocular por Participante:**
+{secoes}
+**Tarefa de Análise Solicitada:**
+Com base na IMAGEM FORNECIDA e nos DADOS OCULARES SEQUENCIAIS de cada participante acima, realize, PARA CADA PARTICIPANTE SEPARADAMENTE, a seguinte análise:
+
+{itens_analise}
+**Formato da Resposta:**
+Responda APENAS com um objeto JSON válido, sem texto fora dele. Cada chave é o ID de um participante ({ids}) e o valor é a análise desse participante em texto (Markdown), separando a análise qualitativa da quantitativa. Exemplo: {{{exemplo}}}
 """
-    return prompt
\ No newline at end of file
+
+CAMPOS_VARIAVEIS_PROMPT = ('media_name', 'categoria', 'participante', 'sumarizacao_geral', 'dados_como_listas',
+                           'ids', 'secoes', 'exemplo')
+
+
+def modelos_de_prompt():
+    """
+    Os modelos de prompt com as partes fixas já preenchidas (uma variante por
+    descrição de colunas), mantendo só os campos variáveis como '{campo}'.
+    Usado pelo armazém de resultados para guardar o texto fixo uma única vez.
+    """
+    modelos = []
+    for modelo in (MODELO_PROMPT_COMPLETO, MODELO_PROMPT_LOTE):
+        for descricao, itens_analise in TEXTOS_POR_FORMATO.values():
+            # Marcadores sem chaves: depois de escapar as chaves literais, viram '{campo}' de novo.
+            marcadores = {campo: f"\x00{campo}\x00" for campo in CAMPOS_VARIAVEIS_PROMPT}
+            texto = modelo.format(descricao_colunas_contexto=descricao, itens_analise=itens_analise, **marcadores)
+            texto = texto.replace('{', '{{').replace('}', '}}')
+            for campo, marcador in marcadores.items():
+                texto = texto.replace(marcador, f"{{{campo}}}")
+            modelos.append(texto)
+    return modelos
+
+
+@medido('prompt_builder.prompt')
+def construir_prompt_completo(dados_analise):
+    """
+    Monta o prompt final com um resumo geral e os dados sequenciais
+    formatados como listas.
+    """
+    dados_oculares = _fixacoes_do_registro(dados_analise)
+
+    # Gera o resumo geral
+    sumarizacao_geral = sumarizar_dados_oculares(dados_oculares)
+    
+    # Formata os dados brutos no formato de lista solicitado (e a descrição das colunas
+    # correspondente, para dar contexto ao modelo)
+    dados_como_listas, descricao_colunas_contexto = formatar_sequencia_fixacoes(dados_oculares)
+
+    # Monta o prompt final
+    return MODELO_PROMPT_COMPLETO.format(
+        media_name=dados_analise['media_name'],
+        categoria=dados_analise['categoria'],
+        participante=dados_analise['participante'],
+        sumarizacao_geral=sumarizacao_geral + descrever_consistencia(dados_analise),
+        dados_como_listas=dados_como_listas,
+        descricao_colunas_contexto=descricao_colunas_contexto,
+        itens_analise=TEXTOS_POR_FORMATO[FORMATO_FIXACOES][1],
+    )
+
+def construir_secao_participante(dados_analise):
+    """Bloco de dados de um participante dentro do prompt em lote."""
+    dados_oculares = _fixacoes_do_registro(dados_analise)
+    return f"""
+### Participante {dados_analise['participante']}
+{sumarizar_dados_oculares(dados_oculares)}
+
+**Sequência de Fixações (formato de lista):**
+{formatar_sequencia_fixacoes(dados_oculares)[0]}
+"""
+
+
+@medido('prompt_builder.prompt_lote')
+def construir_prompt_lote(lista_dados, secoes=None):
+    """
+    Monta um único prompt para vários participantes da MESMA mídia: a imagem,
+    o contexto e as instruções aparecem uma vez, seguidos das listas de
+    fixações de cada participante. A resposta é pedida em JSON, com uma
+    análise por ID de participante (ver dividir_resposta_lote).
+    """
+    if secoes is None:
+        secoes = [construir_secao_participante(dados) for dados in lista_dados]
+    primeiro = lista_dados[0]
+
+    return MODELO_PROMPT_LOTE.format(
+        media_name=primeiro['media_name'],
+        categoria=primeiro['categoria'],
+        ids=", ".join(dados['participante'] for dados in lista_dados),
+        descricao_colunas_contexto=TEXTOS_POR_FORMATO[FORMATO_FIXACOES][0],
+        secoes="".join(secoes),
+        itens_analise=TEXTOS_POR_FORMATO[FORMATO_FIXACOES][1],
+        exemplo=", ".join(f'"{dados["participante"]}": "..."' for dados in lista_dados[:2]),
+    )
+
+
+def agrupar_em_lotes(registros, orcamento_tokens, max_participantes, tokens_fixos=0):
+    """
+    Agrupa registros consecutivos da mesma mídia em lotes para construir_prompt_lote.
+
+    O tamanho de cada lote é escolhido para que o prompt estimado (instruções +
+    seções dos participantes + 'tokens_fixos', ex: imagens) caiba em
+    'orcamento_tokens', com no máximo 'max_participantes' (limita a resposta).
+    Um participante que sozinho passa do orçamento vai em um lote próprio.
+
+    Gera tuplas (lista_dados, prompt).
+    """
+    lote, secoes, tokens_lote = [], [], 0
+
+    def fechar():
+        return lote, construir_prompt_lote(lote, secoes)
+
+    for dados in registros:
+        secao = construir_secao_participante(dados)
+        tokens_secao = estimar_tokens_texto(secao)
+        if lote:
+            mudou_midia = dados['media_name'] != lote[0]['media_name']
+            estourou = tokens_lote + tokens_secao > orcamento_tokens or len(lote) >= max_participantes
+            if mudou_midia or estourou:
+                yield fechar()
+                lote, secoes = [], []
+        if not lote:
+            # Custo do cabeçalho e das instruções, medido com o próprio participante.
+            tokens_lote = tokens_fixos + estimar_tokens_texto(construir_prompt_lote([dados], [""]))
+        lote.append(dados)
+        secoes.append(secao)
+        tokens_lote += tokens_secao
+
+    if lote:
+        yield fechar()
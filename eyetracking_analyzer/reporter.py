@@ -1,7 +1,116 @@
 # eyetracking_analyzer/reporter.py
 import os
-import pandas as pd
-from config import OUTPUT_CSV_PATH, OUTPUT_DIR
+import json
+import time
+from config import (
+    OUTPUT_JSONL_PATH, OUTPUT_DIR, RELATORIO_FLUSH_A_CADA, RELATORIO_FSYNC_SEGUNDOS, DASHBOARD_EXPORTAR_AO_FINAL
+)
+from eyetracking_analyzer.profiling import medir, medido
+from eyetracking_analyzer.dashboard_export import exportar_dashboard
+
+
+def _eh_resposta_de_erro(resposta):
+    """As falhas do modelo chegam como strings que começam com 'ERRO'."""
+    return isinstance(resposta, str) and resposta.startswith("ERRO")
+
+
+@medido('reporter.retomada')
+def carregar_chaves_concluidas(caminho=OUTPUT_JSONL_PATH):
+    """
+    Lê um relatório .jsonl existente e retorna o conjunto de chaves
+    (media_name, participante) já concluídas com sucesso.
+
+    Uma última linha incompleta (processo interrompido no meio da escrita) é
+    removida do arquivo. Registros com resposta de ERRO não contam como
+    concluídos, para serem tentados novamente; nesse caso a linha mais
+    recente de cada chave é a que vale.
+    """
+    concluidas = set()
+    if not os.path.exists(caminho):
+        return concluidas
+
+    with open(caminho, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        tamanho = f.tell()
+        if tamanho:
+            # Procura o último '\n' a partir do fim, em blocos.
+            pos = tamanho
+            fim_valido = 0
+            while pos > 0:
+                inicio = max(0, pos - 65536)
+                f.seek(inicio)
+                trecho = f.read(pos - inicio)
+                idx = trecho.rfind(b'\n')
+                if idx != -1:
+                    fim_valido = inicio + idx + 1
+                    break
+                pos = inicio
+            if fim_valido < tamanho:
+                print(f"AVISO: Linha incompleta no fim de '{caminho}' removida ({tamanho - fim_valido} bytes).")
+                f.truncate(fim_valido)
+
+        f.seek(0)
+        for numero, linha in enumerate(f, start=1):
+            if not linha.strip():
+                continue
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                print(f"AVISO: Linha {numero} inválida em '{caminho}'. Ignorando.")
+                continue
+            chave = (registro.get('media_name'), str(registro.get('participante')))
+            if _eh_resposta_de_erro(registro.get('Resposta')):
+                concluidas.discard(chave)
+            else:
+                concluidas.add(chave)
+
+    print(f"Encontrados {len(concluidas)} registros já concluídos em '{caminho}'.")
+    return concluidas
+
+
+class EscritorRelatorioJsonl:
+    """
+    Grava os resultados em JSON Lines à medida que ficam prontos.
+    A escrita é bufferizada; a cada 'flush_a_cada' registros o buffer é
+    descarregado e, a cada 'fsync_segundos', os dados são forçados ao disco.
+    """
+
+    def __init__(self, caminho=OUTPUT_JSONL_PATH, modo='a', flush_a_cada=RELATORIO_FLUSH_A_CADA,
+                 fsync_segundos=RELATORIO_FSYNC_SEGUNDOS):
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        self.caminho = caminho
+        self.flush_a_cada = flush_a_cada
+        self.fsync_segundos = fsync_segundos
+        self.total_escritos = 0
+        self._arquivo = open(caminho, modo, encoding='utf-8', buffering=1 << 16)
+        self._ultimo_fsync = time.monotonic()
+
+    def escrever(self, resultado):
+        self._arquivo.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+        self.total_escritos += 1
+        if self.total_escritos % self.flush_a_cada == 0:
+            self._arquivo.flush()
+        if time.monotonic() - self._ultimo_fsync >= self.fsync_segundos:
+            self.sincronizar()
+
+    def sincronizar(self):
+        """Descarrega o buffer e força a gravação em disco."""
+        with medir('reporter.fsync'):
+            self._arquivo.flush()
+            os.fsync(self._arquivo.fileno())
+        self._ultimo_fsync = time.monotonic()
+
+    def fechar(self):
+        if not self._arquivo.closed:
+            self.sincronizar()
+            self._arquivo.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
 
 # Renomeando a função para maior clareza
 def salvar_relatorio_jsonl(lista_resultados):
@@ -13,22 +122,16 @@ def salvar_relatorio_jsonl(lista_resultados):
         return
 
     os.makedirs(OUTPUT_DIR, exist_ok=True)
-    
-    # O nome do arquivo agora será .jsonl
-    caminho_saida_robusto = OUTPUT_CSV_PATH.replace('.csv', '.jsonl')
 
     try:
-        df_resultados = pd.DataFrame(lista_resultados)
-        
-        df_resultados.to_json(
-            caminho_saida_robusto,
-            orient='records',
-            lines=True,
-            force_ascii=False,
-            indent=None
-        )
-        
-        print(f"--- ANÁLISE COMPLETA. Relatório robusto salvo em: '{caminho_saida_robusto}' ---")
-    
+        with EscritorRelatorioJsonl(OUTPUT_JSONL_PATH, modo='w') as escritor:
+            for resultado in lista_resultados:
+                escritor.escrever(resultado)
+
+        print(f"--- ANÁLISE COMPLETA. Relatório robusto salvo em: '{OUTPUT_JSONL_PATH}' ---")
+        if DASHBOARD_EXPORTAR_AO_FINAL:
+            # O relatório foi regravado do zero: a exportação incremental não se aplica.
+            exportar_dashboard(OUTPUT_JSONL_PATH, completo=True)
+
     except Exception as e:
-        print(f"ERRO ao salvar o relatório em JSON Lines: {e}")
\ No newline at end of file
+        print(f"ERRO ao salvar o relatório em JSON Lines: {e}")
@@ -0,0 +1,107 @@
+# eyetracking_analyzer/response_cache.py
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from eyetracking_analyzer.image_payload import hash_arquivo, assinatura_payload
+from config import RESPONSE_CACHE_PATH, RESPONSE_CACHE_MAX_BYTES
+
+
+class CacheRespostas:
+    """
+    Cache persistente (SQLite) das respostas do modelo, endereçado pelo
+    conteúdo: a chave é o hash do nome do modelo, do texto do prompt, dos
+    bytes da imagem e das configurações com que a imagem é reduzida e
+    recodificada antes do envio (assinatura_payload). Quando o tamanho total
+    passa do limite, as entradas usadas há mais tempo são removidas (LRU).
+
+    Apenas respostas bem-sucedidas devem ser guardadas; as strings de ERRO
+    nunca chegam a guardar().
+    """
+
+    def __init__(self, caminho=RESPONSE_CACHE_PATH, tamanho_max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                 payload=assinatura_payload()):
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        self.caminho = caminho
+        self.payload = payload
+        self.tamanho_max_bytes = tamanho_max_bytes
+        self.acertos = 0
+        self.falhas = 0
+        self._lock = threading.Lock()
+
+        # Os workers de shard de várias máquinas compartilham este arquivo: journal DELETE
+        # (o WAL não funciona em disco de rede) e espera longa pelo lock de escrita.
+        self._conexao = sqlite3.connect(caminho, check_same_thread=False, isolation_level=None, timeout=60)
+        self._conexao.execute("PRAGMA journal_mode=DELETE")
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS respostas ("
+            " chave TEXT PRIMARY KEY, resposta TEXT NOT NULL,"
+            " tamanho INTEGER NOT NULL, ultimo_acesso REAL NOT NULL)"
+        )
+        self._conexao.execute("CREATE INDEX IF NOT EXISTS idx_ultimo_acesso ON respostas (ultimo_acesso)")
+        self._tamanho_total = self._total_no_banco()
+
+    def chave(self, nome_modelo, prompt_texto, caminho_imagem, caminhos_extras=()):
+        """Calcula a chave do cache. Levanta FileNotFoundError se alguma imagem não existir."""
+        h = hashlib.sha256()
+        h.update(nome_modelo.encode('utf-8'))
+        h.update(b'\0')
+        h.update(prompt_texto.encode('utf-8'))
+        h.update(b'\0')
+        h.update(hash_arquivo(caminho_imagem).encode('ascii'))
+        # Sem imagens extras a chave é a mesma de antes, preservando o cache existente.
+        for caminho in caminhos_extras:
+            h.update(b'\0')
+            h.update(hash_arquivo(caminho).encode('ascii'))
+        # Com PAYLOAD_FORMATO None o modelo recebe o arquivo original e a chave continua a de antes.
+        if self.payload is not None:
+            h.update(b'\0payload:')
+            h.update(self.payload.encode('ascii'))
+        return h.hexdigest()
+
+    def obter(self, chave):
+        """Retorna a resposta guardada para a chave, ou None."""
+        with self._lock:
+            linha = self._conexao.execute("SELECT resposta FROM respostas WHERE chave = ?", (chave,)).fetchone()
+            if linha is None:
+                self.falhas += 1
+                return None
+            self.acertos += 1
+            self._conexao.execute("UPDATE respostas SET ultimo_acesso = ? WHERE chave = ?", (time.time(), chave))
+            return linha[0]
+
+    def guardar(self, chave, resposta):
+        """Guarda uma resposta bem-sucedida e aplica a remoção LRU se necessário."""
+        tamanho = len(resposta.encode('utf-8'))
+        with self._lock:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO respostas (chave, resposta, tamanho, ultimo_acesso) VALUES (?, ?, ?, ?)",
+                (chave, resposta, tamanho, time.time())
+            )
+            # Outros processos (ex.: workers de shard) gravam no mesmo arquivo; o total é relido do banco.
+            self._tamanho_total = self._total_no_banco()
+            if self._tamanho_total > self.tamanho_max_bytes:
+                self._remover_menos_usadas()
+
+    def _total_no_banco(self):
+        return self._conexao.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+
+    def _remover_menos_usadas(self):
+        cursor = self._conexao.execute("SELECT chave, tamanho FROM respostas ORDER BY ultimo_acesso")
+        a_remover = []
+        for chave, tamanho in cursor:
+            if self._tamanho_total <= self.tamanho_max_bytes:
+                break
+            a_remover.append((chave,))
+            self._tamanho_total -= tamanho
+        cursor.close()
+        self._conexao.executemany("DELETE FROM respostas WHERE chave = ?", a_remover)
+
+    @property
+    def estatisticas(self):
+        return {"acertos": self.acertos, "falhas": self.falhas, "bytes": self._tamanho_total}
+
+    def fechar(self):
+        with self._lock:
+            self._conexao.close()
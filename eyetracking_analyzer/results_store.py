@@ -0,0 +1,353 @@
+# eyetracking_analyzer/results_store.py
+"""
+Armazém de resultados em Parquet, alternativa ao relatório .jsonl:
+
+    <RESULTADOS_PARQUET_DIR>/categoria=<c>/bloco=<b>/parte-<...>.parquet
+    <RESULTADOS_PARQUET_DIR>/_modelos_prompt/<hash>.txt
+
+Cada linha guarda só a parte variável do prompt (JSON com os campos de
+prompt_builder.CAMPOS_VARIAVEIS_PROMPT) e o hash do modelo de onde ele saiu;
+o texto fixo do modelo fica uma única vez em _modelos_prompt/. Os cinco
+caminhos de imagem são derivados do config (data_loader.caminho_derivado) e só
+são gravados quando diferem do derivado. Cada descarga acrescenta novos
+arquivos, sem reescrever os anteriores; consultas por categoria/bloco pulam
+partições inteiras e as por mídia/participante usam as estatísticas dos row groups.
+"""
+import os
+import re
+import json
+import time
+import string
+import hashlib
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from config import (
+    OUTPUT_JSONL_PATH, RESULTADOS_PARQUET_DIR, RESULTADOS_LINHAS_POR_ARQUIVO, RESULTADOS_DESCARGA_SEGUNDOS
+)
+from eyetracking_analyzer.data_loader import CAMPOS_CAMINHO, caminho_derivado
+from eyetracking_analyzer.prompt_builder import modelos_de_prompt
+from eyetracking_analyzer.profiling import medir, medido
+
+# O prefixo '_' faz o pyarrow (e o pandas.read_parquet) ignorar o diretório ao ler o armazém.
+DIRETORIO_MODELOS = '_modelos_prompt'
+ESQUEMA_PARTICOES = pa.schema([('categoria', pa.string()), ('bloco', pa.string())])
+ESQUEMA = pa.schema([
+    ('participante', pa.string()),
+    ('media_name', pa.string()),
+    ('duracao', pa.string()),
+    ('hash_modelo', pa.string()),       # None: prompt fora dos modelos, guardado inteiro em 'prompt'
+    ('variaveis_prompt', pa.string()),
+    ('prompt', pa.string()),
+    ('caminhos', pa.string()),          # None: caminhos iguais aos derivados do config
+    ('Resposta', pa.string()),
+    ('erro', pa.bool_()),
+    ('gravado_em', pa.int64()),
+    ('categoria', pa.string()),
+    ('bloco', pa.string()),
+])
+# Ordem das chaves dos registros devolvidos, igual à do relatório .jsonl.
+CAMPOS_REGISTRO = ('participante', 'media_name', 'categoria', 'bloco', 'prompt', *CAMPOS_CAMINHO, 'Resposta')
+_PADRAO_DURACAO = re.compile(r"heatmaps_([^/\\]+)")
+
+_modelos = {}   # hash -> texto do modelo
+_partes = {}    # hash -> [(literal, campo)] do string.Formatter
+
+
+def _hash_modelo(modelo):
+    return hashlib.sha1(modelo.encode('utf-8')).hexdigest()[:16]
+
+
+def _carregar_modelos_conhecidos():
+    if not _modelos:
+        for modelo in modelos_de_prompt():
+            _modelos[_hash_modelo(modelo)] = modelo
+    return _modelos
+
+
+def _partes_modelo(hash_modelo):
+    if hash_modelo not in _partes:
+        _partes[hash_modelo] = list(string.Formatter().parse(_modelos[hash_modelo]))
+    return _partes[hash_modelo]
+
+
+def _extrair_variaveis(partes, prompt):
+    """Casa os trechos literais do modelo em ordem e recorta os valores entre eles; None se não casar."""
+    variaveis, pos = {}, 0
+    for i, (literal, campo, _, _) in enumerate(partes):
+        if not prompt.startswith(literal, pos):
+            return None
+        pos += len(literal)
+        if campo is None:
+            continue
+        proximo = partes[i + 1][0] if i + 1 < len(partes) else ''
+        if i + 1 == len(partes):
+            fim = len(prompt)
+        elif not proximo:
+            return None  # campos adjacentes: recorte ambíguo
+        elif i + 2 == len(partes) and partes[-1][1] is None:
+            fim = len(prompt) - len(proximo)  # último trecho literal: ancorado no fim
+        else:
+            fim = prompt.find(proximo, pos)
+        if fim < pos:
+            return None
+        if variaveis.setdefault(campo, prompt[pos:fim]) != prompt[pos:fim]:
+            return None
+        pos = fim
+    return variaveis if pos == len(prompt) else None
+
+
+def decompor_prompt(prompt):
+    """
+    Separa o prompt no modelo de onde ele saiu e nos seus campos variáveis.
+
+    Returns:
+        tuple: (hash_modelo, variaveis), ou (None, None) se o prompt não vier de
+        nenhum modelo conhecido (ex: gerado por outra versão do prompt_builder).
+    """
+    for hash_modelo, modelo in _carregar_modelos_conhecidos().items():
+        variaveis = _extrair_variaveis(_partes_modelo(hash_modelo), prompt)
+        # Confere a reconstrução: o recorte por literais pode ser ambíguo.
+        if variaveis is not None and modelo.format(**variaveis) == prompt:
+            return hash_modelo, variaveis
+    return None, None
+
+
+def _duracao_dos_caminhos(resultado):
+    encontrado = _PADRAO_DURACAO.search(str(resultado.get('heatmap_path') or ''))
+    return encontrado.group(1) if encontrado else None
+
+
+class ArmazemResultados:
+    """
+    Grava os resultados no armazém Parquet, com a mesma interface do
+    EscritorRelatorioJsonl (escrever, sincronizar, fechar), e consulta o que já
+    foi gravado. Os registros ficam em memória até a próxima descarga.
+    """
+
+    def __init__(self, diretorio=RESULTADOS_PARQUET_DIR, linhas_por_arquivo=RESULTADOS_LINHAS_POR_ARQUIVO,
+                 descarga_segundos=RESULTADOS_DESCARGA_SEGUNDOS):
+        self.caminho = diretorio
+        self.linhas_por_arquivo = linhas_por_arquivo
+        self.descarga_segundos = descarga_segundos
+        self.total_escritos = 0
+        self._pendentes = []
+        self._ultima_descarga = time.monotonic()
+        self._descargas = 0
+
+    # --- Escrita ---
+    def _gravar_modelo(self, hash_modelo):
+        caminho = os.path.join(self.caminho, DIRETORIO_MODELOS, f"{hash_modelo}.txt")
+        if not os.path.exists(caminho):
+            os.makedirs(os.path.dirname(caminho), exist_ok=True)
+            with open(f"{caminho}.tmp", 'w', encoding='utf-8') as f:
+                f.write(_modelos[hash_modelo])
+            os.replace(f"{caminho}.tmp", caminho)
+
+    def _linha(self, resultado, gravado_em):
+        media_name = str(resultado['media_name'])
+        participante = str(resultado['participante'])
+        prompt = resultado.get('prompt')
+        hash_modelo, variaveis = decompor_prompt(prompt) if isinstance(prompt, str) else (None, None)
+        if hash_modelo is not None:
+            self._gravar_modelo(hash_modelo)
+        duracao = _duracao_dos_caminhos(resultado)
+        caminhos = {campo: resultado.get(campo) for campo in CAMPOS_CAMINHO}
+        derivaveis = duracao is not None and all(
+            caminhos[campo] == caminho_derivado(campo, media_name, participante, duracao) for campo in CAMPOS_CAMINHO
+        )
+        resposta = resultado.get('Resposta')
+        return {
+            "participante": participante,
+            "media_name": media_name,
+            "duracao": duracao,
+            "hash_modelo": hash_modelo,
+            "variaveis_prompt": json.dumps(variaveis, ensure_ascii=False) if hash_modelo else None,
+            "prompt": None if hash_modelo else prompt,
+            "caminhos": None if derivaveis else json.dumps(caminhos, ensure_ascii=False),
+            "Resposta": resposta,
+            "erro": isinstance(resposta, str) and resposta.startswith("ERRO"),
+            "gravado_em": gravado_em,
+            "categoria": str(resultado.get('categoria')),
+            "bloco": str(resultado.get('bloco')).zfill(2),
+        }
+
+    def escrever(self, resultado, gravado_em=None):
+        self._pendentes.append(self._linha(resultado, gravado_em or time.time_ns()))
+        self.total_escritos += 1
+        if (len(self._pendentes) >= self.linhas_por_arquivo
+                or time.monotonic() - self._ultima_descarga >= self.descarga_segundos):
+            self.sincronizar()
+
+    def sincronizar(self):
+        """Grava os registros pendentes como novos arquivos, um por partição."""
+        self._ultima_descarga = time.monotonic()
+        if not self._pendentes:
+            return
+        with medir('results_store.descarga', registros=len(self._pendentes)):
+            tabela = pa.Table.from_pylist(self._pendentes, schema=ESQUEMA)
+            # Ordenar por mídia/participante deixa as estatísticas dos row groups seletivas.
+            tabela = tabela.sort_by([('media_name', 'ascending'), ('participante', 'ascending')])
+            self._descargas += 1
+            ds.write_dataset(
+                tabela, self.caminho, format='parquet',
+                partitioning=ds.partitioning(ESQUEMA_PARTICOES, flavor='hive'),
+                basename_template=f"parte-{time.time_ns()}-{os.getpid()}-{self._descargas}-{{i}}.parquet",
+                existing_data_behavior='overwrite_or_ignore',
+                file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'),
+            )
+        self._pendentes = []
+
+    def fechar(self):
+        self.sincronizar()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+    # --- Consulta ---
+    def _dataset(self):
+        if not os.path.isdir(self.caminho):
+            return None
+        dataset = ds.dataset(self.caminho, schema=ESQUEMA, format='parquet',
+                             partitioning=ds.partitioning(ESQUEMA_PARTICOES, flavor='hive'))
+        return dataset if dataset.files else None
+
+    def _texto_modelo(self, hash_modelo):
+        if hash_modelo not in _modelos:
+            with open(os.path.join(self.caminho, DIRETORIO_MODELOS, f"{hash_modelo}.txt"), encoding='utf-8') as f:
+                _modelos[hash_modelo] = f.read()
+        return _modelos[hash_modelo]
+
+    @medido('results_store.consulta')
+    def consultar(self, participante=None, media_name=None, categoria=None, bloco=None,
+                  com_prompt=False, com_caminhos=False, apenas_recentes=True):
+        """
+        Lê do armazém só as linhas e colunas pedidas. Cada filtro aceita um valor
+        ou uma lista. Com 'apenas_recentes', vale a gravação mais recente de cada
+        (mídia, participante), como na retomada do relatório .jsonl.
+
+        Returns:
+            pd.DataFrame: participante, media_name, categoria, bloco, Resposta, erro,
+            gravado_em e, se pedidos, 'prompt' e as colunas de caminho.
+        """
+        colunas = ['participante', 'media_name', 'categoria', 'bloco', 'Resposta', 'erro', 'gravado_em']
+        if com_prompt:
+            colunas += ['hash_modelo', 'variaveis_prompt', 'prompt']
+        if com_caminhos:
+            colunas += ['duracao', 'caminhos']
+        dataset = self._dataset()
+        if dataset is None:
+            return pd.DataFrame(columns=colunas)
+
+        filtro = None
+        for coluna, valor in (('participante', participante), ('media_name', media_name),
+                              ('categoria', categoria), ('bloco', bloco)):
+            if valor is None:
+                continue
+            valores = [str(v) for v in (valor if isinstance(valor, (list, tuple, set)) else [valor])]
+            if coluna in ('participante', 'bloco'):
+                valores = [v.zfill(2) for v in valores]
+            condicao = ds.field(coluna).isin(valores)
+            filtro = condicao if filtro is None else filtro & condicao
+
+        df = dataset.to_table(columns=colunas, filter=filtro).to_pandas()
+        df = df.sort_values('gravado_em', kind='stable')
+        if apenas_recentes:
+            df = df.drop_duplicates(['media_name', 'participante'], keep='last')
+        df = df.reset_index(drop=True)
+
+        if com_prompt:
+            df['prompt'] = [
+                self._texto_modelo(h).format(**json.loads(v)) if isinstance(h, str) else p
+                for h, v, p in zip(df.pop('hash_modelo'), df.pop('variaveis_prompt'), df['prompt'])
+            ]
+        if com_caminhos:
+            caminhos = [
+                json.loads(c) if isinstance(c, str)
+                else {campo: caminho_derivado(campo, m, p, d) for campo in CAMPOS_CAMINHO}
+                for m, p, d, c in zip(df['media_name'], df['participante'], df.pop('duracao'), df.pop('caminhos'))
+            ]
+            for campo in CAMPOS_CAMINHO:
+                df[campo] = [c[campo] for c in caminhos]
+        return df
+
+    def iterar_resultados(self, **filtros):
+        """Os resultados como dicionários no formato do relatório .jsonl."""
+        df = self.consultar(com_prompt=True, com_caminhos=True, **filtros)
+        for registro in df[list(CAMPOS_REGISTRO)].to_dict('records'):
+            yield registro
+
+    def chaves_concluidas(self):
+        """
+        Conjunto de (media_name, participante) concluídos com sucesso, com a mesma
+        regra de reporter.carregar_chaves_concluidas (vale a gravação mais recente;
+        respostas de ERRO não contam). Lê só as colunas de chave.
+        """
+        dataset = self._dataset()
+        if dataset is None:
+            return set()
+        df = dataset.to_table(columns=['media_name', 'participante', 'erro', 'gravado_em']).to_pandas()
+        df = df.sort_values('gravado_em', kind='stable').drop_duplicates(['media_name', 'participante'], keep='last')
+        concluidas = set(zip(df.loc[~df['erro'], 'media_name'], df.loc[~df['erro'], 'participante']))
+        print(f"Encontrados {len(concluidas)} registros já concluídos em '{self.caminho}'.")
+        return concluidas
+
+
+def importar_jsonl(caminho_jsonl=OUTPUT_JSONL_PATH, diretorio=RESULTADOS_PARQUET_DIR):
+    """Acrescenta ao armazém os registros de um relatório .jsonl, preservando a ordem de gravação."""
+    if not os.path.exists(caminho_jsonl):
+        print(f"ERRO: Relatório '{caminho_jsonl}' não encontrado.")
+        return 0
+    base = time.time_ns()
+    with ArmazemResultados(diretorio) as armazem, open(caminho_jsonl, encoding='utf-8') as f:
+        for numero, linha in enumerate(f, start=1):
+            if not linha.strip():
+                continue
+            try:
+                resultado = json.loads(linha)
+            except ValueError:
+                print(f"AVISO: Linha {numero} inválida em '{caminho_jsonl}'. Ignorando.")
+                continue
+            armazem.escrever(resultado, gravado_em=base + numero)
+    print(f"--- {armazem.total_escritos} registros importados de '{caminho_jsonl}' para '{diretorio}' ---")
+    return armazem.total_escritos
+
+
+if __name__ == "__main__":
+    # Uso: python -m eyetracking_analyzer.results_store importar
+    #      python -m eyetracking_analyzer.results_store consultar --categoria webpage --participante 01 03
+    import argparse
+    parser = argparse.ArgumentParser(description="Armazém Parquet dos resultados da análise.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+    importar = subparsers.add_parser("importar", help="Importa um relatório .jsonl para o armazém")
+    importar.add_argument("--jsonl", default=OUTPUT_JSONL_PATH, help="Relatório de origem")
+    consultar = subparsers.add_parser("consultar", help="Filtra os resultados do armazém")
+    consultar.add_argument("-p", "--participante", nargs="+", help="Um ou mais participantes (ex: 01 07)")
+    consultar.add_argument("-m", "--media", nargs="+", help="Uma ou mais mídias")
+    consultar.add_argument("-c", "--categoria", nargs="+", help="Uma ou mais categorias")
+    consultar.add_argument("-b", "--bloco", nargs="+", help="Um ou mais blocos")
+    consultar.add_argument("--com-prompt", action="store_true", help="Reconstrói o prompt completo")
+    consultar.add_argument("--saida", help="Salva o resultado em .csv, .parquet ou .jsonl")
+    for sub in (importar, consultar):
+        sub.add_argument("--diretorio", default=RESULTADOS_PARQUET_DIR, help="Diretório do armazém")
+    args = parser.parse_args()
+
+    if args.comando == "importar":
+        importar_jsonl(args.jsonl, args.diretorio)
+    else:
+        df = ArmazemResultados(args.diretorio).consultar(args.participante, args.media, args.categoria, args.bloco,
+                                                          com_prompt=args.com_prompt, com_caminhos=bool(args.saida))
+        print(f"{len(df)} resultado(s) encontrado(s).")
+        if args.saida:
+            if args.saida.endswith('.parquet'):
+                df.to_parquet(args.saida, index=False)
+            elif args.saida.endswith('.jsonl'):
+                df.to_json(args.saida, orient='records', lines=True, force_ascii=False)
+            else:
+                df.to_csv(args.saida, index=False)
+            print(f"Resultado salvo em: '{args.saida}'")
+        else:
+            print(df[['participante', 'media_name', 'categoria', 'bloco', 'erro']].to_string(index=False))
@@ -0,0 +1,190 @@
+# eyetracking_analyzer/saliency_metrics.py
+import numpy as np
+from config import METRICAS_RESOLUCAO
+from eyetracking_analyzer.fixation_index import abrir_indice_fixacoes
+from eyetracking_analyzer.map_store import abrir_pacote_mapas
+from eyetracking_analyzer.visualizer import calcular_densidades
+
+# Métricas entre as fixações de um participante e um mapa, e entre dois mapas.
+METRICAS_FIXACOES = ('nss', 'auc_judd')
+METRICAS_MAPAS = ('cc', 'kl', 'sim')
+EPS = np.finfo(np.float32).eps
+
+
+def familia_mapa(tipo='heatmaps', duration='7s'):
+    """Nome da família de mapas distribuída com o dataset (ex: 'heatmaps_7s')."""
+    return f"{tipo}_{duration}"
+
+
+def obter_mapa(media_name, familia, resolucao=METRICAS_RESOLUCAO):
+    """
+    Retorna o mapa de saliência da mídia em escala de cinza (0-1), reduzido
+    à grade de trabalho, lido do pacote da família (memory-map, sem decodificar
+    PNG). O pacote deve ter sido preparado com carregar_pacote_mapas no
+    processo principal. Retorna None se a mídia não estiver no pacote.
+    """
+    pacote = abrir_pacote_mapas(familia, resolucao)
+    vista = pacote.obter(media_name) if pacote is not None else None
+    if vista is None:
+        return None
+    if vista.ndim == 3:
+        vista = vista[..., :3].mean(axis=2)
+    return np.asarray(vista, dtype=np.float32) / 255.0
+
+
+def _como_distribuicao(mapas):
+    """Normaliza cada mapa (..., h, w) para somar 1."""
+    mapas = np.asarray(mapas, dtype=np.float64)
+    soma = mapas.sum(axis=(-2, -1), keepdims=True)
+    return mapas / np.maximum(soma, EPS)
+
+
+def metricas_entre_mapas(mapa, outros):
+    """
+    CC, KL e SIM entre 'mapa' (h, w), tratado como predição, e um ou vários
+    mapas de referência 'outros' (h, w) ou (B, h, w), tudo vetorizado.
+
+    Returns:
+        dict: {'cc': array(B), 'kl': array(B), 'sim': array(B)}.
+    """
+    outros = np.asarray(outros, dtype=np.float64)
+    if outros.ndim == 2:
+        outros = outros[None]
+    mapa = np.asarray(mapa, dtype=np.float64)
+
+    # CC: correlação de Pearson entre os mapas padronizados.
+    a = (mapa - mapa.mean()) / max(mapa.std(), EPS)
+    b = outros - outros.mean(axis=(1, 2), keepdims=True)
+    b /= np.maximum(b.std(axis=(1, 2), keepdims=True), EPS)
+    cc = (a[None] * b).mean(axis=(1, 2))
+
+    # KL(referência || predição) e SIM sobre os mapas como distribuições.
+    p = _como_distribuicao(mapa)[None]
+    q = _como_distribuicao(outros)
+    kl = (q * np.log(EPS + q / (p + EPS))).sum(axis=(1, 2))
+    sim = np.minimum(p, q).sum(axis=(1, 2))
+    return {'cc': cc, 'kl': kl, 'sim': sim}
+
+
+def metricas_de_fixacoes(mapa, lista_coordenadas):
+    """
+    NSS e AUC-Judd do 'mapa' (h, w) para vários conjuntos de fixações de uma
+    vez. As fixações de todos os conjuntos são concatenadas e as médias e
+    áreas por conjunto saem de bincount, sem laço em Python por fixação.
+
+    Args:
+        lista_coordenadas (list): Pares (x, y) de arrays com coordenadas normalizadas (0-1).
+
+    Returns:
+        dict: {'nss': array(B), 'auc_judd': array(B), 'num_fixacoes': array(B)}.
+    """
+    mapa = np.asarray(mapa, dtype=np.float64)
+    h, w = mapa.shape
+    total = len(lista_coordenadas)
+    valores = mapa.ravel()
+
+    posicoes, grupos = [], []
+    for b, (xs, ys) in enumerate(lista_coordenadas):
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        validos = (xs >= 0) & (xs <= 1) & (ys >= 0) & (ys <= 1)
+        xi = np.minimum((xs[validos] * w).astype(np.int64), w - 1)
+        yi = np.minimum((ys[validos] * h).astype(np.int64), h - 1)
+        posicoes.append(yi * w + xi)
+        grupos.append(np.full(len(xi), b, dtype=np.int64))
+    posicoes = np.concatenate(posicoes) if posicoes else np.zeros(0, dtype=np.int64)
+    grupos = np.concatenate(grupos) if grupos else np.zeros(0, dtype=np.int64)
+    num_fixacoes = np.bincount(grupos, minlength=total)
+    com_fixacoes = num_fixacoes > 0
+    contagem = np.maximum(num_fixacoes, 1)
+
+    # NSS: média do mapa padronizado (média 0, desvio 1) nos pontos fixados.
+    padronizado = (valores - valores.mean()) / max(valores.std(), EPS)
+    nss = np.bincount(grupos, weights=padronizado[posicoes], minlength=total) / contagem
+
+    # AUC-Judd: os limiares são os valores do mapa nas fixações; para cada um,
+    # TP = fração das fixações acima dele e FP = fração dos demais pixels acima dele.
+    saliencia = valores[posicoes]
+    ordem = np.lexsort((-saliencia, grupos))
+    saliencia, grupos_ord = saliencia[ordem], grupos[ordem]
+    inicio_grupo = np.concatenate(([0], np.cumsum(num_fixacoes)[:-1]))
+    rank = np.arange(1, len(saliencia) + 1) - inicio_grupo[grupos_ord]
+    n_fix = num_fixacoes[grupos_ord]
+    n_pix = valores.size
+    acima = n_pix - np.searchsorted(np.sort(valores), saliencia, side='left')
+    tp = rank / n_fix
+    fp = np.clip((acima - rank) / np.maximum(n_pix - n_fix, 1), 0.0, 1.0)
+
+    # Trapézios da curva (0,0) -> pontos -> (1,1), somados por conjunto.
+    primeiro = rank == 1
+    tp_ant = np.where(primeiro, 0.0, np.roll(tp, 1))
+    fp_ant = np.where(primeiro, 0.0, np.roll(fp, 1))
+    area = np.bincount(grupos_ord, weights=(fp - fp_ant) * (tp + tp_ant) / 2, minlength=total)
+    ultimo = np.flatnonzero(rank == n_fix)
+    area[grupos_ord[ultimo]] += 1.0 - fp[ultimo]
+
+    nss = np.where(com_fixacoes, nss, np.nan)
+    auc = np.where(com_fixacoes, area, np.nan)
+    return {'nss': nss, 'auc_judd': auc, 'num_fixacoes': num_fixacoes}
+
+
+def avaliar_mapa(mapa, lista_coordenadas):
+    """
+    Todas as métricas de um mapa contra vários participantes: NSS e AUC-Judd
+    sobre as fixações e CC, KL e SIM contra o mapa de densidade de cada um.
+
+    Returns:
+        dict: {métrica: array(B)}, incluindo 'num_fixacoes'.
+    """
+    h, w = mapa.shape
+    resultado = metricas_de_fixacoes(mapa, lista_coordenadas)
+    densidades = calcular_densidades(lista_coordenadas, w, h, resolucao=max(h, w))
+    resultado.update(metricas_entre_mapas(mapa, densidades))
+    return resultado
+
+
+def avaliar_midia(media_name, participantes, duration='7s', tipo_mapa='heatmaps', comparar_com=None,
+                  resolucao=METRICAS_RESOLUCAO):
+    """
+    Tarefa de um processo do pool: avalia o mapa de uma mídia contra as
+    fixações de todos os participantes informados em uma passada vetorizada.
+
+    Args:
+        participantes (list): IDs dos participantes ('01', ...).
+        comparar_com (str): Outra família de mapas (ex: 'heatmaps_3s') para
+            uma linha extra de CC/KL/SIM mapa-contra-mapa (participante '*').
+
+    Returns:
+        list: Linhas (dicionários) de resultados.
+    """
+    indice = abrir_indice_fixacoes()
+    nome_mapa = familia_mapa(tipo_mapa, duration)
+    mapa = obter_mapa(media_name, nome_mapa, resolucao)
+    if mapa is None:
+        raise FileNotFoundError(f"mapa '{nome_mapa}' não empacotado para '{media_name}'")
+    linhas = []
+
+    validos, coordenadas = [], []
+    for participante in participantes:
+        fixacoes = indice.obter(media_name, participante)
+        if fixacoes is not None:
+            validos.append(participante)
+            coordenadas.append((fixacoes['FPOGX'], fixacoes['FPOGY']))
+
+    if validos:
+        resultado = avaliar_mapa(mapa, coordenadas)
+        for i, participante in enumerate(validos):
+            linha = {"media_name": media_name, "participante": participante, "mapa": nome_mapa,
+                     "num_fixacoes": int(resultado['num_fixacoes'][i])}
+            linha.update({m: float(resultado[m][i]) for m in METRICAS_FIXACOES + METRICAS_MAPAS})
+            linhas.append(linha)
+
+    if comparar_com:
+        referencia = obter_mapa(media_name, comparar_com, resolucao)
+        if referencia is not None and referencia.shape == mapa.shape:
+            resultado = metricas_entre_mapas(mapa, referencia)
+            linha = {"media_name": media_name, "participante": '*', "mapa": f"{nome_mapa} x {comparar_com}",
+                     "num_fixacoes": 0, "nss": np.nan, "auc_judd": np.nan}
+            linha.update({m: float(resultado[m][0]) for m in METRICAS_MAPAS})
+            linhas.append(linha)
+    return linhas
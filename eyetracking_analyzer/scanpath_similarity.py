@@ -0,0 +1,224 @@
+# eyetracking_analyzer/scanpath_similarity.py
+import os
+import hashlib
+from functools import lru_cache
+import numpy as np
+from config import (
+    SIMILARIDADE_CACHE_DIR, SIMILARIDADE_GRADE_COLUNAS, SIMILARIDADE_GRADE_LINHAS,
+    SIMILARIDADE_MAX_ELEMENTOS, OUTPUT_SIMILARIDADE_PATH
+)
+from eyetracking_analyzer.fixation_index import abrir_indice_fixacoes
+
+MEDIDAS = ('dtw', 'frechet', 'edicao')
+# Versão do formato do cache; mude ao alterar o cálculo para invalidar resultados antigos.
+VERSAO_CACHE = 1
+
+
+def _empilhar_sequencias(lista_coordenadas):
+    """Preenche as sequências (x, y) até o mesmo tamanho: (P, N, 2) e os comprimentos (P,)."""
+    comprimentos = np.array([len(xs) for xs, _ in lista_coordenadas], dtype=np.int64)
+    n = max(int(comprimentos.max(initial=0)), 1)
+    pontos = np.zeros((len(lista_coordenadas), n, 2), dtype=np.float32)
+    for p, (xs, ys) in enumerate(lista_coordenadas):
+        pontos[p, :len(xs), 0] = xs
+        pontos[p, :len(ys), 1] = ys
+    return pontos, comprimentos
+
+
+def _celulas_grade(pontos, colunas=SIMILARIDADE_GRADE_COLUNAS, linhas=SIMILARIDADE_GRADE_LINHAS):
+    """Centros (normalizados) das células da grade em que cada fixação cai, como no ScanMatch."""
+    cx = (np.clip(np.floor(pontos[..., 0] * colunas), 0, colunas - 1) + 0.5) / colunas
+    cy = (np.clip(np.floor(pontos[..., 1] * linhas), 0, linhas - 1) + 0.5) / linhas
+    return np.stack((cx, cy), axis=-1)
+
+
+def _programacao_dinamica(custo, comprimentos_a, comprimentos_b, medida):
+    """
+    Resolve a recorrência de DTW, Fréchet discreto ou distância de edição para
+    K pares de uma vez, percorrendo a matriz por antidiagonais: cada célula de
+    uma antidiagonal depende só das duas anteriores, então a antidiagonal
+    inteira de todos os pares é calculada em uma operação vetorizada
+    (2N passos em Python em vez de K·N² iterações).
+
+    Args:
+        custo (np.ndarray): (K, N, M) custo local entre os elementos de cada par.
+        comprimentos_a, comprimentos_b (np.ndarray): Tamanho real de cada sequência (K,).
+
+    Returns:
+        np.ndarray: (K,) valor da recorrência no canto (len_a, len_b) de cada par.
+    """
+    k, n, m = custo.shape
+    tabela = np.full((k, n + 1, m + 1), np.inf, dtype=np.float32)
+    if medida == 'edicao':
+        # Inserções e remoções custam 1; as bordas são o custo de apagar o prefixo.
+        tabela[:, :, 0] = np.arange(n + 1, dtype=np.float32)
+        tabela[:, 0, :] = np.arange(m + 1, dtype=np.float32)
+    else:
+        tabela[:, 0, 0] = 0.0
+
+    for d in range(2, n + m + 1):
+        i = np.arange(max(1, d - m), min(n, d - 1) + 1)
+        j = d - i
+        local = custo[:, i - 1, j - 1]
+        if medida == 'edicao':
+            tabela[:, i, j] = np.minimum(np.minimum(tabela[:, i - 1, j] + 1, tabela[:, i, j - 1] + 1),
+                                         tabela[:, i - 1, j - 1] + local)
+        else:
+            anterior = np.minimum(np.minimum(tabela[:, i - 1, j], tabela[:, i, j - 1]), tabela[:, i - 1, j - 1])
+            tabela[:, i, j] = local + anterior if medida == 'dtw' else np.maximum(local, anterior)
+    return tabela[np.arange(k), comprimentos_a, comprimentos_b]
+
+
+def matrizes_similaridade(lista_coordenadas, max_elementos=SIMILARIDADE_MAX_ELEMENTOS):
+    """
+    Calcula as matrizes P x P de distância entre os scanpaths de P participantes:
+
+    - 'dtw': Dynamic Time Warping sobre as posições (normalizado pelo comprimento
+      do caminho mais curto possível, len_a + len_b).
+    - 'frechet': distância de Fréchet discreta (maior salto no melhor alinhamento).
+    - 'edicao': distância de edição no estilo ScanMatch sobre uma grade, com
+      substituição custando a distância entre as células (0 na mesma célula, até 1)
+      e normalizada por max(len_a, len_b); 1 - edicao é a similaridade.
+
+    Os pares são processados em blocos de até 'max_elementos' células de custo.
+
+    Returns:
+        dict: {medida: np.ndarray (P, P) float32, simétrica, diagonal 0}.
+    """
+    total = len(lista_coordenadas)
+    matrizes = {medida: np.zeros((total, total), dtype=np.float32) for medida in MEDIDAS}
+    if total < 2:
+        return matrizes
+
+    pontos, comprimentos = _empilhar_sequencias(lista_coordenadas)
+    celulas = _celulas_grade(pontos)
+    diagonal_grade = np.float32(np.sqrt(2.0))
+    pares_a, pares_b = np.triu_indices(total, k=1)
+    n = pontos.shape[1]
+    tamanho_bloco = max(1, max_elementos // (n * n))
+
+    for ini in range(0, len(pares_a), tamanho_bloco):
+        a, b = pares_a[ini:ini + tamanho_bloco], pares_b[ini:ini + tamanho_bloco]
+        la, lb = comprimentos[a], comprimentos[b]
+        distancias = np.linalg.norm(pontos[a][:, :, None, :] - pontos[b][:, None, :, :], axis=-1)
+        subst = np.linalg.norm(celulas[a][:, :, None, :] - celulas[b][:, None, :, :], axis=-1) / diagonal_grade
+
+        valores = {
+            'dtw': _programacao_dinamica(distancias, la, lb, 'dtw') / np.maximum(la + lb, 1),
+            'frechet': _programacao_dinamica(distancias, la, lb, 'frechet'),
+            'edicao': _programacao_dinamica(subst, la, lb, 'edicao') / np.maximum(np.maximum(la, lb), 1),
+        }
+        for medida, valor in valores.items():
+            # Pares com uma sequência vazia não têm alinhamento: ficam como NaN.
+            valor = np.where((la > 0) & (lb > 0), valor, np.nan)
+            matrizes[medida][a, b] = valor
+            matrizes[medida][b, a] = valor
+    return matrizes
+
+
+def consistencia(matrizes):
+    """
+    Resume as matrizes de uma imagem: consistência entre participantes (média
+    da similaridade de edição, 1 - edicao, em todos os pares; 0 a 1) e, por
+    participante, a média de cada medida contra os demais.
+
+    Returns:
+        tuple: (consistencia_imagem, {medida: np.ndarray (P,)} com as médias por participante).
+    """
+    total = len(matrizes['edicao'])
+    if total < 2:
+        return np.nan, {medida: np.full(total, np.nan) for medida in MEDIDAS}
+    fora_diagonal = ~np.eye(total, dtype=bool)
+    similaridade = 1.0 - matrizes['edicao']
+    por_participante = {medida: np.nanmean(np.where(fora_diagonal, matriz, np.nan), axis=1)
+                        for medida, matriz in matrizes.items()}
+    por_participante['similaridade'] = np.nanmean(np.where(fora_diagonal, similaridade, np.nan), axis=1)
+    return float(np.nanmean(similaridade[fora_diagonal])), por_participante
+
+
+def _chave_cache(media_name, participantes, lista_coordenadas):
+    """Hash do conteúdo: participantes, coordenadas e parâmetros que afetam o resultado."""
+    h = hashlib.sha256(f"{VERSAO_CACHE}|{media_name}|{SIMILARIDADE_GRADE_COLUNAS}x{SIMILARIDADE_GRADE_LINHAS}".encode('utf-8'))
+    for participante, (xs, ys) in zip(participantes, lista_coordenadas):
+        h.update(participante.encode('ascii'))
+        h.update(np.ascontiguousarray(xs, dtype=np.float32).tobytes())
+        h.update(np.ascontiguousarray(ys, dtype=np.float32).tobytes())
+    return h.hexdigest()
+
+
+def calcular_matrizes_midia(media_name, participantes, lista_coordenadas, diretorio_cache=SIMILARIDADE_CACHE_DIR):
+    """
+    matrizes_similaridade com cache em disco (.npz por mídia), endereçado pelo
+    conteúdo das fixações: reexecuções só recalculam as imagens cujos dados mudaram.
+    """
+    chave = _chave_cache(media_name, participantes, lista_coordenadas)
+    caminho = os.path.join(diretorio_cache, f"{os.path.splitext(media_name)[0]}_{chave[:16]}.npz")
+    try:
+        with np.load(caminho) as arquivo:
+            return {medida: arquivo[medida] for medida in MEDIDAS}
+    except (FileNotFoundError, KeyError, ValueError):
+        pass
+
+    matrizes = matrizes_similaridade(lista_coordenadas)
+    os.makedirs(diretorio_cache, exist_ok=True)
+    temporario = f"{caminho[:-4]}.{os.getpid()}.tmp.npz"
+    np.savez(temporario, participantes=np.array(participantes), **matrizes)
+    os.replace(temporario, caminho)
+    return matrizes
+
+
+def avaliar_midia(media_name, participantes):
+    """
+    Tarefa de um processo do pool: matrizes e consistência de uma imagem.
+
+    Returns:
+        list: Uma linha (dicionário) por participante.
+    """
+    indice = abrir_indice_fixacoes()
+    validos, coordenadas = [], []
+    for participante in participantes:
+        fixacoes = indice.obter(media_name, participante)
+        if fixacoes is not None:
+            validos.append(participante)
+            coordenadas.append((np.asarray(fixacoes['FPOGX']), np.asarray(fixacoes['FPOGY'])))
+
+    matrizes = calcular_matrizes_midia(media_name, validos, coordenadas)
+    consistencia_imagem, por_participante = consistencia(matrizes)
+    return [
+        {
+            "media_name": media_name,
+            "participante": participante,
+            "num_participantes": len(validos),
+            "consistencia_imagem": consistencia_imagem,
+            "similaridade_participante": float(por_participante['similaridade'][i]),
+            "dtw_medio": float(por_participante['dtw'][i]),
+            "frechet_medio": float(por_participante['frechet'][i]),
+            "edicao_media": float(por_participante['edicao'][i]),
+        }
+        for i, participante in enumerate(validos)
+    ]
+
+
+@lru_cache(maxsize=4)
+def _tabela_consistencia(caminho, mtime_ns):
+    import pandas as pd
+    df = pd.read_parquet(caminho, columns=['media_name', 'participante', 'consistencia_imagem',
+                                           'similaridade_participante', 'num_participantes'])
+    return {
+        (media, str(participante)): (consistencia_imagem, similaridade, int(num))
+        for media, participante, consistencia_imagem, similaridade, num in df.itertuples(index=False)
+    }
+
+
+def obter_consistencia(media_name, participante, caminho=OUTPUT_SIMILARIDADE_PATH):
+    """
+    Consulta o resultado exportado por run_scanpath_similarity.py.
+
+    Returns:
+        tuple: (consistencia_imagem, similaridade_participante, num_participantes), ou None.
+    """
+    try:
+        mtime_ns = os.stat(caminho).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    return _tabela_consistencia(caminho, mtime_ns).get((media_name, str(participante)))
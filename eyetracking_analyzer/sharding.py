@@ -0,0 +1,429 @@
+# eyetracking_analyzer/sharding.py
+"""
+Execução da análise completa em várias máquinas que compartilham o disco,
+sem serviço externo:
+
+    1. planejar: transforma a busca em um plano determinístico de shards
+       (<SHARDS_DIR>/plano_<hash>/plano.json). A unidade de trabalho é a mídia,
+       com todos os seus participantes (mantém os lotes de prompt e o cache
+       da imagem juntos); as unidades são distribuídas pelo peso (fixações ou
+       tokens estimados) com o guloso do maior para o menor.
+    2. trabalhar: cada worker assume um shard por lease no SQLite do plano,
+       roda 'main.py --plano <dir> --shard <n>' com as saídas desviadas para
+       saidas/shard_<n>/ (UEYES_SAIDA_DIR) e renova o lease enquanto ele roda.
+       Se o worker morre, o lease vence e outro assume o shard, retomando do
+       .jsonl do shard. O cache de respostas é o global, compartilhado por
+       todos os workers. Um shard só é concluído se o main.py sair com código 0.
+    3. mesclar: junta os .jsonl (e os arquivos Parquet) dos shards concluídos
+       no relatório canônico e move os PDFs para PDF_REPORTS_DIR.
+
+Uso (em qualquer máquina, com o mesmo diretório de dados):
+    python -m eyetracking_analyzer.sharding planejar --shards 16 --peso tokens
+    python -m eyetracking_analyzer.sharding trabalhar <plano>
+    python -m eyetracking_analyzer.sharding status <plano>
+    python -m eyetracking_analyzer.sharding mesclar <plano>
+"""
+import io
+import os
+import sys
+import json
+import time
+import heapq
+import shutil
+import socket
+import sqlite3
+import hashlib
+import subprocess
+import contextlib
+from config import (
+    BASE_DIR, SHARDS_DIR, SHARD_LEASE_SEGUNDOS, SHARD_MAX_TENTATIVAS, OUTPUT_JSONL_PATH, PDF_REPORTS_DIR,
+    RESULTADOS_PARQUET_DIR, DASHBOARD_EXPORTAR_AO_FINAL, MODO_RELATORIO_PDF, PAYLOAD_IMAGENS_EXTRAS
+)
+
+PESOS = ('fixacoes', 'tokens')
+NOME_PLANO = 'plano.json'
+NOME_LEASES = 'leases.sqlite'
+
+
+def _chave_plano(parametros, peso, num_shards):
+    return json.dumps({"parametros": parametros, "peso": peso, "shards": num_shards}, sort_keys=True)
+
+
+def _peso_registro(registro, peso):
+    if peso == 'fixacoes':
+        return int(registro.num_fixacoes)
+    from eyetracking_analyzer.prompt_builder import construir_prompt_completo
+    from eyetracking_analyzer.model_interface import estimar_tokens_requisicao
+    return estimar_tokens_requisicao(construir_prompt_completo(registro), 1 + len(PAYLOAD_IMAGENS_EXTRAS))
+
+
+def distribuir(unidades, num_shards):
+    """
+    Distribui as unidades entre os shards: da mais pesada para a mais leve, cada
+    uma vai para o shard menos carregado (empates pelo menor índice e pela
+    chave da unidade, então o resultado é determinístico).
+    """
+    shards = [{"shard": i, "peso": 0, "unidades": []} for i in range(num_shards)]
+    cargas = [(0, i) for i in range(num_shards)]
+    for unidade in sorted(unidades, key=lambda u: (-u['peso'], u['media_name'])):
+        carga, i = heapq.heappop(cargas)
+        shards[i]['unidades'].append(unidade)
+        shards[i]['peso'] += unidade['peso']
+        heapq.heappush(cargas, (carga + unidade['peso'], i))
+    for shard in shards:
+        shard['unidades'].sort(key=lambda u: u['media_name'])
+    return shards
+
+
+def planejar_shards(parametros_busca, num_shards, peso='fixacoes', diretorio=SHARDS_DIR):
+    """
+    Cria (ou reaproveita, se a mesma busca já foi planejada) o plano de shards.
+
+    Args:
+        parametros_busca (dict): Argumentos de iterar_dados_participante
+            (participante, media_name, tipo_de_midia).
+        num_shards (int): Número de shards.
+        peso (str): 'fixacoes' (número de fixações) ou 'tokens' (tokens estimados do
+            prompt e das imagens; monta cada prompt, então é mais lento).
+
+    Returns:
+        str: Diretório do plano.
+    """
+    if peso not in PESOS:
+        raise ValueError(f"Peso '{peso}' inválido. Use um de {PESOS}.")
+    from eyetracking_analyzer.data_loader import iterar_dados_participante
+    from eyetracking_analyzer.fixation_index import carregar_indice_fixacoes
+
+    chave = _chave_plano(parametros_busca, peso, num_shards)
+    diretorio_plano = os.path.join(diretorio, f"plano_{hashlib.sha1(chave.encode('utf-8')).hexdigest()[:12]}")
+    if os.path.exists(os.path.join(diretorio_plano, NOME_PLANO)):
+        print(f"Plano já existente em '{diretorio_plano}'; reaproveitando (leases preservados).")
+        return diretorio_plano
+
+    # O índice é construído aqui, uma vez, antes de os workers o abrirem em paralelo.
+    carregar_indice_fixacoes()
+    por_midia = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for registro in iterar_dados_participante(**parametros_busca):
+            unidade = por_midia.setdefault(registro.media_name, {
+                "media_name": registro.media_name, "categoria": registro.categoria, "bloco": registro.bloco,
+                "participantes": [], "peso": 0,
+            })
+            unidade['participantes'].append(registro.participante)
+            unidade['peso'] += _peso_registro(registro, peso)
+    if not por_midia:
+        print("Nenhum registro corresponde à busca; nenhum plano criado.")
+        return None
+
+    shards = distribuir(por_midia.values(), num_shards)
+    plano = {"parametros": parametros_busca, "peso": peso, "num_shards": num_shards,
+             "criado_em": time.strftime('%Y-%m-%d %H:%M:%S'), "shards": shards}
+    os.makedirs(diretorio_plano, exist_ok=True)
+    temporario = os.path.join(diretorio_plano, f"{NOME_PLANO}.tmp")
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(plano, f, ensure_ascii=False, indent=1)
+    with Leases(diretorio_plano) as leases:
+        leases.inicializar(num_shards)
+    os.replace(temporario, os.path.join(diretorio_plano, NOME_PLANO))
+
+    pesos = [shard['peso'] for shard in shards]
+    print(f"--- PLANO CRIADO em '{diretorio_plano}': {len(por_midia)} mídias, "
+          f"{sum(len(u['participantes']) for u in por_midia.values())} registros em {num_shards} shards "
+          f"(peso por shard: mín {min(pesos)}, máx {max(pesos)}) ---")
+    return diretorio_plano
+
+
+def carregar_plano(diretorio_plano):
+    with open(os.path.join(diretorio_plano, NOME_PLANO), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def unidades_do_shard(plano, shard):
+    """Conjunto de pares (mídia, participante) do shard."""
+    return {(unidade['media_name'], participante)
+            for unidade in plano['shards'][shard]['unidades'] for participante in unidade['participantes']}
+
+
+def diretorio_saida_shard(diretorio_plano, shard):
+    return os.path.join(diretorio_plano, 'saidas', f"shard_{shard:03d}")
+
+
+class Leases:
+    """
+    Leases dos shards em um SQLite no diretório do plano. Toda mudança de
+    estado é uma transação IMMEDIATE, então dois workers nunca assumem o mesmo
+    shard. Usa o journal padrão (DELETE): o modo WAL não funciona em disco de rede.
+    """
+
+    def __init__(self, diretorio_plano, lease_segundos=SHARD_LEASE_SEGUNDOS, max_tentativas=SHARD_MAX_TENTATIVAS):
+        self.lease_segundos = lease_segundos
+        self.max_tentativas = max_tentativas
+        self.dono = f"{socket.gethostname()}:{os.getpid()}"
+        self._conexao = sqlite3.connect(os.path.join(diretorio_plano, NOME_LEASES), timeout=60, isolation_level=None)
+        self._conexao.execute(
+            "CREATE TABLE IF NOT EXISTS shards ("
+            " shard INTEGER PRIMARY KEY, estado TEXT NOT NULL, dono TEXT, expira_em REAL,"
+            " tentativas INTEGER NOT NULL DEFAULT 0, atualizado_em REAL)"
+        )
+
+    def _transacao(self, funcao):
+        self._conexao.execute("BEGIN IMMEDIATE")
+        try:
+            resultado = funcao()
+            self._conexao.execute("COMMIT")
+            return resultado
+        except BaseException:
+            self._conexao.execute("ROLLBACK")
+            raise
+
+    def inicializar(self, num_shards):
+        agora = time.time()
+        self._transacao(lambda: self._conexao.executemany(
+            "INSERT OR IGNORE INTO shards (shard, estado, atualizado_em) VALUES (?, 'pendente', ?)",
+            [(i, agora) for i in range(num_shards)]
+        ))
+
+    def _marcar_esgotados(self, agora):
+        """Shards com lease vencido e sem tentativas restantes (o worker morreu na última) falharam."""
+        self._conexao.execute(
+            "UPDATE shards SET estado = 'falhou', dono = NULL, expira_em = NULL, atualizado_em = ?"
+            " WHERE estado = 'em_andamento' AND expira_em < ? AND tentativas >= ?",
+            (agora, agora, self.max_tentativas)
+        )
+
+    def assumir(self):
+        """Assume o próximo shard pendente (ou com lease vencido). Retorna o número ou None."""
+        def assumir():
+            agora = time.time()
+            self._marcar_esgotados(agora)
+            linha = self._conexao.execute(
+                "SELECT shard FROM shards WHERE (estado = 'pendente')"
+                " OR (estado = 'em_andamento' AND expira_em < ? AND tentativas < ?) ORDER BY shard LIMIT 1",
+                (agora, self.max_tentativas)
+            ).fetchone()
+            if linha is None:
+                return None
+            self._conexao.execute(
+                "UPDATE shards SET estado = 'em_andamento', dono = ?, expira_em = ?, tentativas = tentativas + 1,"
+                " atualizado_em = ? WHERE shard = ?",
+                (self.dono, agora + self.lease_segundos, agora, linha[0])
+            )
+            return linha[0]
+        return self._transacao(assumir)
+
+    def renovar(self, shard):
+        """Estende o lease; False se o shard não é mais deste worker (lease vencido e assumido)."""
+        agora = time.time()
+        cursor = self._transacao(lambda: self._conexao.execute(
+            "UPDATE shards SET expira_em = ?, atualizado_em = ? WHERE shard = ? AND dono = ? AND estado = 'em_andamento'",
+            (agora + self.lease_segundos, agora, shard, self.dono)
+        ))
+        return cursor.rowcount == 1
+
+    def encerrar(self, shard, sucesso):
+        """Marca o shard como concluído ou, na falha, devolve-o à fila (até max_tentativas)."""
+        self._transacao(lambda: self._conexao.execute(
+            "UPDATE shards SET estado = CASE WHEN ? THEN 'concluido' WHEN tentativas < ? THEN 'pendente'"
+            " ELSE 'falhou' END, dono = NULL, expira_em = NULL, atualizado_em = ? WHERE shard = ? AND dono = ?",
+            (sucesso, self.max_tentativas, time.time(), shard, self.dono)
+        ))
+
+    def estados(self):
+        self._transacao(lambda: self._marcar_esgotados(time.time()))
+        return self._conexao.execute(
+            "SELECT shard, estado, dono, expira_em, tentativas FROM shards ORDER BY shard").fetchall()
+
+    def fechar(self):
+        self._conexao.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fechar()
+
+
+def _executar_shard(leases, diretorio_plano, shard):
+    """Roda main.py para o shard em um processo filho, renovando o lease até ele terminar."""
+    saida = diretorio_saida_shard(diretorio_plano, shard)
+    os.makedirs(saida, exist_ok=True)
+    # Só as saídas são desviadas: o cache de respostas (SQLite, em CACHE_DIR) é o mesmo para
+    # todos os shards, então respostas já pagas em execuções anteriores continuam valendo.
+    ambiente = dict(os.environ, UEYES_SAIDA_DIR=saida)
+    comando = [sys.executable, os.path.join(BASE_DIR, 'main.py'), '--plano', diretorio_plano, '--shard', str(shard)]
+    with open(os.path.join(saida, 'execucao.log'), 'a', encoding='utf-8') as log:
+        log.write(f"\n=== {time.strftime('%Y-%m-%d %H:%M:%S')} {leases.dono} ===\n")
+        log.flush()
+        processo = subprocess.Popen(comando, cwd=BASE_DIR, env=ambiente, stdout=log, stderr=subprocess.STDOUT)
+        while True:
+            try:
+                return processo.wait(timeout=leases.lease_segundos / 3) == 0
+            except subprocess.TimeoutExpired:
+                if not leases.renovar(shard):
+                    print(f"AVISO: Lease do shard {shard} perdido; interrompendo a execução local.")
+                    processo.terminate()
+                    processo.wait()
+                    return False
+
+
+def trabalhar(diretorio_plano, max_shards=None):
+    """
+    Loop de um worker: assume shards até não haver mais nenhum disponível
+    (ou até processar 'max_shards').
+
+    Returns:
+        int: Número de shards concluídos por este worker.
+    """
+    concluidos = 0
+    with Leases(diretorio_plano) as leases:
+        while max_shards is None or concluidos < max_shards:
+            shard = leases.assumir()
+            if shard is None:
+                print("Nenhum shard disponível.")
+                break
+            print(f"--- {leases.dono} ASSUMIU O SHARD {shard} ---")
+            inicio = time.perf_counter()
+            sucesso = _executar_shard(leases, diretorio_plano, shard)
+            leases.encerrar(shard, sucesso)
+            if sucesso:
+                concluidos += 1
+                print(f"  - Shard {shard} concluído em {time.perf_counter() - inicio:.1f}s.")
+            else:
+                print(f"  - FALHA no shard {shard}; veja '{os.path.join(diretorio_saida_shard(diretorio_plano, shard), 'execucao.log')}'.")
+    return concluidos
+
+
+def status(diretorio_plano):
+    """Imprime o estado de cada shard e retorna a contagem por estado."""
+    plano = carregar_plano(diretorio_plano)
+    contagem = {}
+    with Leases(diretorio_plano) as leases:
+        for shard, estado, dono, expira_em, tentativas in leases.estados():
+            contagem[estado] = contagem.get(estado, 0) + 1
+            detalhe = f" ({dono}, lease até {time.strftime('%H:%M:%S', time.localtime(expira_em))})" if dono else ""
+            print(f"  shard {shard:>3}: {estado:<13} peso {plano['shards'][shard]['peso']:>10} "
+                  f"tentativas {tentativas}{detalhe}")
+    print(f"--- {contagem} ---")
+    return contagem
+
+
+def _linhas_recentes(caminho_jsonl):
+    """Linhas (bytes) do .jsonl de um shard, só a mais recente de cada (mídia, participante)."""
+    linhas = {}
+    with open(caminho_jsonl, 'rb') as f:
+        for linha in f:
+            if not linha.endswith(b'\n'):
+                continue  # Linha incompleta de uma execução interrompida
+            try:
+                registro = json.loads(linha)
+            except ValueError:
+                continue
+            linhas[(registro.get('media_name'), str(registro.get('participante')))] = linha
+    return linhas
+
+
+def _mover_arvore(origem, destino):
+    """Move os arquivos de 'origem' para 'destino', mantendo os subdiretórios."""
+    movidos = 0
+    for raiz, _, nomes in os.walk(origem):
+        for nome in nomes:
+            relativo = os.path.relpath(os.path.join(raiz, nome), origem)
+            alvo = os.path.join(destino, relativo)
+            os.makedirs(os.path.dirname(alvo), exist_ok=True)
+            shutil.move(os.path.join(raiz, nome), alvo)
+            movidos += 1
+    return movidos
+
+
+def mesclar_shards(diretorio_plano, caminho_jsonl=OUTPUT_JSONL_PATH, incluir_parciais=False):
+    """
+    Junta as saídas dos shards concluídos nos arquivos canônicos: o .jsonl final
+    tem os registros do relatório atual que nenhum shard refez, seguidos dos
+    registros dos shards em ordem (regravado de forma atômica, então mesclar de
+    novo não duplica nada). PDFs e arquivos Parquet são movidos. Com
+    'incluir_parciais', shards ainda não concluídos também entram.
+    """
+    with Leases(diretorio_plano) as leases:
+        estados = {shard: estado for shard, estado, *_ in leases.estados()}
+    selecionados = [s for s, e in sorted(estados.items()) if e == 'concluido' or incluir_parciais]
+    faltando = [s for s, e in sorted(estados.items()) if e != 'concluido']
+    if faltando:
+        print(f"AVISO: {len(faltando)} shard(s) não concluído(s): {faltando[:10]}"
+              f"{' (incluídos parcialmente)' if incluir_parciais else ' (ignorados)'}.")
+
+    # --- 1. Relatório .jsonl ---
+    linhas_shards = {}
+    for shard in selecionados:
+        caminho_shard = os.path.join(diretorio_saida_shard(diretorio_plano, shard), os.path.basename(caminho_jsonl))
+        if os.path.exists(caminho_shard):
+            linhas_shards.update(_linhas_recentes(caminho_shard))
+    if linhas_shards:
+        os.makedirs(os.path.dirname(caminho_jsonl), exist_ok=True)
+        temporario = f"{caminho_jsonl}.mescla.tmp"
+        mantidos = 0
+        with open(temporario, 'wb') as saida:
+            if os.path.exists(caminho_jsonl):
+                with open(caminho_jsonl, 'rb') as atual:
+                    for linha in atual:
+                        try:
+                            registro = json.loads(linha)
+                        except ValueError:
+                            continue
+                        if (registro.get('media_name'), str(registro.get('participante'))) not in linhas_shards:
+                            saida.write(linha if linha.endswith(b'\n') else linha + b'\n')
+                            mantidos += 1
+            saida.writelines(linhas_shards.values())
+            saida.flush()
+            os.fsync(saida.fileno())
+        os.replace(temporario, caminho_jsonl)
+        print(f"Relatório '{caminho_jsonl}': {mantidos} registros mantidos + {len(linhas_shards)} dos shards.")
+
+    # --- 2. PDFs e armazém Parquet ---
+    pdfs = parquet = 0
+    for shard in selecionados:
+        saida_shard = diretorio_saida_shard(diretorio_plano, shard)
+        pdfs += _mover_arvore(os.path.join(saida_shard, os.path.basename(PDF_REPORTS_DIR)), PDF_REPORTS_DIR)
+        parquet += _mover_arvore(os.path.join(saida_shard, os.path.basename(RESULTADOS_PARQUET_DIR)),
+                                 RESULTADOS_PARQUET_DIR)
+    print(f"--- MESCLA CONCLUÍDA: {len(selecionados)} shards, {len(linhas_shards)} registros, "
+          f"{pdfs} PDFs e {parquet} arquivos Parquet movidos ---")
+
+    if linhas_shards and MODO_RELATORIO_PDF != 'individual':
+        from eyetracking_analyzer.pdf_generator import gerar_relatorios_consolidados
+        gerar_relatorios_consolidados(agrupar_por=MODO_RELATORIO_PDF, caminho_jsonl=caminho_jsonl)
+    if linhas_shards and DASHBOARD_EXPORTAR_AO_FINAL:
+        from eyetracking_analyzer.dashboard_export import exportar_dashboard
+        # A mescla reescreve o relatório (linhas substituídas saem do meio), então a exportação é completa.
+        exportar_dashboard(caminho_jsonl, completo=True)
+    return len(linhas_shards)
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Divide a análise completa em shards executados por vários workers.")
+    subparsers = parser.add_subparsers(dest="comando", required=True)
+    planejar = subparsers.add_parser("planejar", help="Cria o plano de shards para uma busca")
+    planejar.add_argument("--shards", type=int, required=True, help="Número de shards")
+    planejar.add_argument("--peso", choices=PESOS, default='fixacoes', help="Critério de balanceamento")
+    planejar.add_argument("-p", "--participante", help="ID do participante (ex: 01)")
+    planejar.add_argument("-m", "--media", help="Nome do arquivo da imagem")
+    planejar.add_argument("-c", "--categoria", help="Filtra por categoria (ex: webpage)")
+    trabalhar_parser = subparsers.add_parser("trabalhar", help="Assume e executa shards até acabarem")
+    trabalhar_parser.add_argument("plano", help="Diretório do plano")
+    trabalhar_parser.add_argument("--max-shards", type=int, default=None, help="Para depois de N shards")
+    status_parser = subparsers.add_parser("status", help="Mostra o estado dos shards")
+    status_parser.add_argument("plano", help="Diretório do plano")
+    mesclar = subparsers.add_parser("mesclar", help="Junta as saídas dos shards nos arquivos canônicos")
+    mesclar.add_argument("plano", help="Diretório do plano")
+    mesclar.add_argument("--incluir-parciais", action="store_true", help="Inclui shards ainda não concluídos")
+    args = parser.parse_args()
+
+    if args.comando == "planejar":
+        parametros = {"participante": args.participante, "media_name": args.media, "tipo_de_midia": args.categoria}
+        planejar_shards(parametros, args.shards, args.peso)
+    elif args.comando == "trabalhar":
+        trabalhar(args.plano, args.max_shards)
+    elif args.comando == "status":
+        status(args.plano)
+    else:
+        mesclar_shards(args.plano, incluir_parciais=args.incluir_parciais)
@@ -1,93 +1,470 @@
 # eyetracking_analyzer/visualizer.py
 import os
-import io
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+from functools import lru_cache
+import numpy as np
 from PIL import Image, ImageDraw, ImageFont
+from config import (
+    HEATMAP_RESOLUCAO_GRADE, HEATMAP_ALPHA, HEATMAP_LIMIAR_MASSA, HEATMAP_LOTE_MAXIMO, CACHE_IMAGENS_BASE_MAXIMO,
+    FONTES_CANDIDATAS, DURACOES_JANELA, OUTPUT_VIS_DIR
+)
+from eyetracking_analyzer.fixation_index import segundos_da_duracao
+from eyetracking_analyzer.profiling import medido
 
-def gerar_heatmap(fixations_df, base_image_path, output_path):
+# Versões da renderização: o run_build.py refaz heatmaps/scanpaths quando elas mudam.
+# Mude a do tipo afetado ao alterar o cálculo ou o desenho.
+VERSAO_HEATMAP = 1
+VERSAO_SCANPATH = 2
+
+# Cores do scanpath (RGBA).
+COR_LINHA_SCANPATH = (66, 135, 245, 200)
+COR_INICIO = (46, 204, 113, 255)   # Verde
+COR_FIM = (231, 76, 60, 255)       # Vermelho
+COR_MEIO = (52, 152, 219, 255)     # Azul
+# Uma cor por participante na sobreposição de vários scanpaths.
+PALETA_PARTICIPANTES = [
+    (31, 119, 180), (255, 127, 14), (44, 160, 44), (214, 39, 40), (148, 103, 189),
+    (140, 86, 75), (227, 119, 194), (127, 127, 127), (188, 189, 34), (23, 190, 207),
+]
+
+
+def _nome_base_saida(media_name, participante):
+    return f"{media_name.split('.')[0]}_P{participante.zfill(2)}"
+
+
+def caminhos_visualizacao(media_name, participante, diretorio=OUTPUT_VIS_DIR):
+    """Caminhos (heatmap, scanpath) das visualizações de um registro (ex: heatmap_<mídia>_P01.png)."""
+    base_output_name = _nome_base_saida(media_name, participante)
+    return (
+        os.path.join(diretorio, f"heatmap_{base_output_name}.png"),
+        os.path.join(diretorio, f"scanpath_{base_output_name}.png"),
+    )
+
+
+def caminhos_heatmap_duracoes(media_name, participante, duracoes, diretorio=OUTPUT_VIS_DIR):
+    """Um heatmap por janela de duração (ex: heatmap_<mídia>_P01_3s.png)."""
+    base_output_name = _nome_base_saida(media_name, participante)
+    return [os.path.join(diretorio, f"heatmap_{base_output_name}_{duracao}.png") for duracao in duracoes]
+
+
+@lru_cache(maxsize=CACHE_IMAGENS_BASE_MAXIMO)
+def _abrir_imagem_base_cache(caminho, mtime_ns):
+    imagem = Image.open(caminho)
+    imagem.load()
+    return imagem
+
+
+def abrir_imagem_base(caminho):
     """
-    Gera um mapa de calor (heatmap) a partir dos dados de fixação e o sobrepõe
-    à imagem base.
+    Abre a imagem base já decodificada, reaproveitando-a entre chamadas
+    (cache LRU por processo, invalidado quando o arquivo muda).
+    A imagem retornada é compartilhada: não deve ser alterada.
+    """
+    return _abrir_imagem_base_cache(caminho, os.stat(caminho).st_mtime_ns)
+
+
+@lru_cache(maxsize=None)
+def obter_fonte(tamanho):
     """
+    Carrega a fonte dos rótulos uma única vez por processo e tamanho, tentando
+    as fontes de FONTES_CANDIDATAS antes de cair na fonte padrão do Pillow.
+    """
+    for nome_fonte in FONTES_CANDIDATAS:
+        try:
+            return ImageFont.truetype(nome_fonte, size=tamanho)
+        except IOError:
+            continue
     try:
-        base_image = Image.open(base_image_path)
-        width, height = base_image.size
-
-        pixel_x = fixations_df['FPOGX'] * width
-        pixel_y = fixations_df['FPOGY'] * height
-        
-        fig, ax = plt.subplots(figsize=(width/100, height/100))
-        
-        sns.kdeplot(
-            x=pixel_x, y=pixel_y, ax=ax, fill=True, cmap="jet",
-            alpha=0.6, levels=100, thresh=0.05
+        return ImageFont.load_default(size=tamanho)
+    except TypeError:
+        # Pillow < 10.1 não aceita tamanho na fonte padrão.
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=4096)
+def _deslocamento_rotulo(tamanho, texto):
+    """Metade da largura/altura do rótulo, para centralizá-lo no círculo."""
+    esquerda, topo, direita, base = obter_fonte(tamanho).getbbox(texto)
+    return (direita - esquerda) / 2, (base - topo) / 2
+
+
+def _coordenadas(fixacoes):
+    """Extrai os arrays FPOGX/FPOGY de um DataFrame, dicionário de arrays ou RegistroOcular."""
+    fixacoes = getattr(fixacoes, 'fixacoes', fixacoes)
+    return np.asarray(fixacoes['FPOGX'], dtype=np.float64), np.asarray(fixacoes['FPOGY'], dtype=np.float64)
+
+
+def _tabela_cores_jet(n=256):
+    """Tabela (LUT) n x 3 do mapa de cores 'jet', sem depender do matplotlib."""
+    x = np.linspace(0.0, 1.0, n)
+    canais = [np.clip(1.5 - np.abs(4 * x - c), 0.0, 1.0) for c in (3, 2, 1)]
+    return (np.stack(canais, axis=1) * 255).round().astype(np.uint8)
+
+
+_LUT_JET = _tabela_cores_jet()
+
+
+def _largura_de_banda(xs, ys, pesos, largura, altura):
+    """
+    Desvio-padrão (em pixels) do kernel gaussiano pela regra de Scott, como no
+    kdeplot do seaborn: sigma = desvio dos dados * n_efetivo^(-1/6).
+    """
+    minimo = 0.02 * max(largura, altura)
+    if len(xs) < 2:
+        return minimo, minimo
+    w = np.ones(len(xs)) if pesos is None else np.asarray(pesos, dtype=np.float64)
+    if w.sum() <= 0:
+        w = np.ones(len(xs))
+    n_efetivo = w.sum() ** 2 / (w ** 2).sum()
+    fator = n_efetivo ** (-1.0 / 6.0)
+    sx = np.sqrt(np.cov(xs, aweights=w)) * fator
+    sy = np.sqrt(np.cov(ys, aweights=w)) * fator
+    return max(sx, minimo), max(sy, minimo)
+
+
+def _matrizes_gaussianas(n, sigmas):
+    """
+    Empilha B matrizes n x n de convolução gaussiana 1D (uma por sigma). O kernel
+    é normalizado na reta inteira, então a massa que cai fora da grade se perde.
+    """
+    i = np.arange(n, dtype=np.float32)
+    dist = (i[:, None] - i[None, :]) ** 2
+    sig = np.asarray(sigmas, dtype=np.float32)[:, None, None]
+    return np.exp(-0.5 * dist[None] / (sig ** 2)) / (sig * np.float32(np.sqrt(2 * np.pi)))
+
+
+def calcular_densidades(lista_coordenadas, largura, altura, lista_pesos=None, resolucao=HEATMAP_RESOLUCAO_GRADE):
+    """
+    Calcula, em uma passada vetorizada, a densidade de fixações de vários
+    conjuntos sobre uma grade reduzida da imagem.
+
+    Args:
+        lista_coordenadas (list): Pares (x, y) de arrays com coordenadas normalizadas (0-1).
+        largura, altura (int): Dimensões da imagem base, em pixels.
+        lista_pesos (list): Pesos por fixação (ex: FPOGD) para cada conjunto, ou None.
+        resolucao (int): Tamanho do maior lado da grade.
+
+    Returns:
+        np.ndarray: Array (B, h, w) float32 com a probabilidade de cada célula. A
+        soma no plano inteiro é 1; a soma na grade é a fração da massa dentro da imagem.
+    """
+    escala = min(1.0, resolucao / max(largura, altura))
+    gw, gh = max(1, int(round(largura * escala))), max(1, int(round(altura * escala)))
+    total = len(lista_coordenadas)
+    if lista_pesos is None:
+        lista_pesos = [None] * total
+
+    # Acumula todas as fixações do lote em uma grade única com um bincount.
+    indices, valores, sigmas_x, sigmas_y = [], [], [], []
+    for b, ((xs, ys), pesos) in enumerate(zip(lista_coordenadas, lista_pesos)):
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        w = np.ones(len(xs)) if pesos is None else np.asarray(pesos, dtype=np.float64)
+        validos = (xs >= 0) & (xs <= 1) & (ys >= 0) & (ys <= 1) & np.isfinite(w)
+        xs, ys, w = xs[validos], ys[validos], w[validos]
+
+        sx, sy = _largura_de_banda(xs * largura, ys * altura, w, largura, altura)
+        sigmas_x.append(sx * escala)
+        sigmas_y.append(sy * escala)
+
+        xi = np.minimum((xs * gw).astype(np.int64), gw - 1)
+        yi = np.minimum((ys * gh).astype(np.int64), gh - 1)
+        indices.append(b * gh * gw + yi * gw + xi)
+        valores.append(w / w.sum() if w.sum() > 0 else w)
+
+    grades = np.bincount(
+        np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64),
+        weights=np.concatenate(valores) if valores else None,
+        minlength=total * gh * gw
+    ).astype(np.float32).reshape(total, gh, gw)
+
+    # Desfoque gaussiano separável: Gy @ grade @ Gx^T, em lotes para limitar a memória.
+    for ini in range(0, total, HEATMAP_LOTE_MAXIMO):
+        fim = min(total, ini + HEATMAP_LOTE_MAXIMO)
+        gy = _matrizes_gaussianas(gh, sigmas_y[ini:fim])
+        gx = _matrizes_gaussianas(gw, sigmas_x[ini:fim])
+        grades[ini:fim] = gy @ grades[ini:fim] @ gx.transpose(0, 2, 1)
+    return grades
+
+
+def calcular_densidades_janelas(lista_coordenadas, lista_tempos, lista_segundos, largura, altura, lista_pesos=None,
+                                resolucao=HEATMAP_RESOLUCAO_GRADE):
+    """
+    Densidades de várias janelas de duração (ex: 1s, 3s e 7s) de cada conjunto
+    de fixações, de forma incremental: cada fixação entra uma única vez, na
+    grade da primeira janela que a contém, e as janelas seguintes são a soma
+    cumulativa das anteriores (a de 7s = a de 3s + as fixações entre 3s e 7s).
+    Cada janela usa o sigma das suas próprias fixações, como calcular_densidades,
+    e as grades de todas as janelas são desfocadas juntas, em uma multiplicação
+    por lote, em vez de uma renderização completa por duração.
+
+    Args:
+        lista_tempos (list): FPOGS de cada conjunto (ordem cronológica).
+        lista_segundos (list): Duração de cada janela, em segundos (None = sequência inteira).
+
+    Returns:
+        np.ndarray: Array (B, J, h, w) float32. Cada janela é igual a
+        calcular_densidades das fixações iniciadas dentro dela.
+    """
+    escala = min(1.0, resolucao / max(largura, altura))
+    gw, gh = max(1, int(round(largura * escala))), max(1, int(round(altura * escala)))
+    total, num_janelas = len(lista_coordenadas), len(lista_segundos)
+    if lista_pesos is None:
+        lista_pesos = [None] * total
+    segundos = np.array([np.inf if s is None else s for s in lista_segundos], dtype=np.float64)
+    ordem = np.argsort(segundos, kind='stable')
+
+    indices, valores, grupos, sigmas_x, sigmas_y = [], [], [], [], []
+    for b, ((xs, ys), tempos, pesos) in enumerate(zip(lista_coordenadas, lista_tempos, lista_pesos)):
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        tempos = np.asarray(tempos, dtype=np.float64)
+        w = np.ones(len(xs)) if pesos is None else np.asarray(pesos, dtype=np.float64)
+        # Posição (na ordem crescente) da primeira janela que contém cada fixação;
+        # num_janelas = fora de todas.
+        relativos = tempos - tempos[0] if len(tempos) else tempos
+        janela = np.searchsorted(segundos[ordem], relativos, side='right')
+        validos = (xs >= 0) & (xs <= 1) & (ys >= 0) & (ys <= 1) & np.isfinite(w) & (janela < num_janelas)
+        xs, ys, w, janela = xs[validos], ys[validos], w[validos], janela[validos]
+
+        # Sigma de cada janela (na ordem crescente), pelas fixações que ela contém.
+        for j in range(num_janelas):
+            dentro = janela <= j
+            sx, sy = _largura_de_banda(xs[dentro] * largura, ys[dentro] * altura, w[dentro], largura, altura)
+            sigmas_x.append(sx * escala)
+            sigmas_y.append(sy * escala)
+
+        xi = np.minimum((xs * gw).astype(np.int64), gw - 1)
+        yi = np.minimum((ys * gh).astype(np.int64), gh - 1)
+        grupo = b * num_janelas + janela
+        indices.append(grupo * gh * gw + yi * gw + xi)
+        valores.append(w)
+        grupos.append(grupo)
+
+    indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+    valores = np.concatenate(valores) if valores else np.zeros(0)
+    grupos = np.concatenate(grupos) if grupos else np.zeros(0, dtype=np.int64)
+
+    # Incrementos por janela em um bincount e acumulação ao longo das janelas.
+    grades = np.bincount(indices, weights=valores, minlength=total * num_janelas * gh * gw)
+    grades = np.cumsum(grades.reshape(total, num_janelas, gh, gw), axis=1, dtype=np.float64)
+    massas = np.cumsum(np.bincount(grupos, weights=valores, minlength=total * num_janelas).reshape(total, num_janelas), axis=1)
+    grades = (grades / np.where(massas > 0, massas, 1.0)[:, :, None, None]).astype(np.float32)
+
+    # Mesmo desfoque separável de calcular_densidades, uma matriz por (conjunto, janela);
+    # o lote conta matrizes, então cada passo cobre HEATMAP_LOTE_MAXIMO // J conjuntos.
+    grades = grades.reshape(total * num_janelas, gh, gw)
+    passo = max(1, HEATMAP_LOTE_MAXIMO // max(1, num_janelas)) * num_janelas
+    for ini in range(0, total * num_janelas, passo):
+        fim = min(total * num_janelas, ini + passo)
+        gy = _matrizes_gaussianas(gh, sigmas_y[ini:fim])
+        gx = _matrizes_gaussianas(gw, sigmas_x[ini:fim])
+        grades[ini:fim] = gy @ grades[ini:fim] @ gx.transpose(0, 2, 1)
+    grades = grades.reshape(total, num_janelas, gh, gw)
+
+    # Devolve as janelas na ordem pedida.
+    resultado = np.empty_like(grades)
+    resultado[:, ordem] = grades
+    return resultado
+
+
+def _colorir_densidade(densidade, alpha=HEATMAP_ALPHA, limiar_massa=HEATMAP_LIMIAR_MASSA):
+    """
+    Converte uma densidade (h, w) de calcular_densidades em RGBA pela LUT 'jet'.
+    Como no kdeplot, a região que contém só a fração 'limiar_massa' da massa
+    (contando a que ficou fora da imagem) fica transparente, e a cor varia
+    linearmente da densidade desse limiar até a densidade máxima.
+    """
+    valores = np.sort(densidade.ravel())
+    acumulado = np.cumsum(valores, dtype=np.float64)
+    if acumulado[-1] <= 0:
+        return np.zeros(densidade.shape + (4,), dtype=np.uint8)
+
+    # Massa abaixo de cada valor = 1 - massa (dentro da imagem) acima dele.
+    massa_abaixo = 1.0 - (acumulado[-1] - acumulado)
+    limiar = valores[min(np.searchsorted(massa_abaixo, limiar_massa), len(valores) - 1)]
+    escala = max(valores[-1] - limiar, 1e-30)
+    niveis = np.clip((densidade - limiar) / escala, 0.0, 1.0)
+
+    rgba = np.empty(densidade.shape + (4,), dtype=np.uint8)
+    rgba[..., :3] = _LUT_JET[(niveis * 255).astype(np.uint8)]
+    rgba[..., 3] = np.where(densidade >= limiar, int(round(alpha * 255)), 0)
+    return rgba
+
+
+def renderizar_heatmaps(lista_coordenadas, base_image, lista_pesos=None):
+    """
+    Renderiza vários heatmaps sobre a mesma imagem base em uma passada.
+
+    Returns:
+        list: Imagens PIL RGBA (imagem base + heatmap), uma por conjunto de fixações.
+    """
+    base_rgba = base_image.convert('RGBA')
+    largura, altura = base_rgba.size
+    densidades = calcular_densidades(lista_coordenadas, largura, altura, lista_pesos)
+
+    compostas = []
+    for densidade in densidades:
+        camada = Image.fromarray(_colorir_densidade(densidade), 'RGBA').resize((largura, altura), Image.BILINEAR)
+        compostas.append(Image.alpha_composite(base_rgba, camada))
+    return compostas
+
+
+@medido('visualizer.heatmaps')
+def gerar_heatmaps_em_lote(lista_fixations_df, base_image_path, output_paths, ponderar_por_duracao=False):
+    """
+    Gera e salva um heatmap por DataFrame de fixações, todos sobre a mesma
+    imagem base (decodificada uma única vez).
+
+    Returns:
+        bool: True se todos os heatmaps foram salvos, False caso contrário.
+    """
+    try:
+        base_image = abrir_imagem_base(base_image_path)
+        coordenadas = [_coordenadas(df) for df in lista_fixations_df]
+        pesos = [np.asarray(getattr(df, 'fixacoes', df)['FPOGD']) for df in lista_fixations_df] if ponderar_por_duracao else None
+
+        for imagem, output_path in zip(renderizar_heatmaps(coordenadas, base_image, pesos), output_paths):
+            imagem.convert('RGB').save(output_path)
+            print(f"  - Heatmap salvo em: {output_path}")
+        return True
+
+    except Exception as e:
+        print(f"  - ERRO ao gerar heatmap: {e}")
+        return False
+
+
+@medido('visualizer.heatmaps_duracoes')
+def gerar_heatmaps_por_duracao(lista_fixacoes, base_image_path, lista_saidas, duracoes=DURACOES_JANELA,
+                               ponderar_por_duracao=False):
+    """
+    Gera, para cada conjunto de fixações, um heatmap por janela de duração
+    (ex: 1s, 3s, 7s) com uma única passada incremental (calcular_densidades_janelas).
+
+    Args:
+        lista_saidas (list): Para cada conjunto, os caminhos de saída na ordem de 'duracoes'.
+        duracoes (tuple): Durações das janelas ('1s', '3s', ... ou None para a sequência inteira).
+
+    Returns:
+        bool: True se todos os heatmaps foram salvos, False caso contrário.
+    """
+    try:
+        base_rgba = abrir_imagem_base(base_image_path).convert('RGBA')
+        largura, altura = base_rgba.size
+        fixacoes = [getattr(f, 'fixacoes', f) for f in lista_fixacoes]
+        densidades = calcular_densidades_janelas(
+            [_coordenadas(f) for f in fixacoes], [f['FPOGS'] for f in fixacoes],
+            [segundos_da_duracao(d) for d in duracoes], largura, altura,
+            [np.asarray(f['FPOGD']) for f in fixacoes] if ponderar_por_duracao else None
         )
-        
-        ax.set_xlim(0, width)
-        ax.set_ylim(height, 0)
-        ax.axis('off')
-        fig.patch.set_alpha(0)
-        
-        buf = io.BytesIO()
-        plt.savefig(buf, format='png', dpi=100, bbox_inches='tight', pad_inches=0)
-        buf.seek(0)
-        heatmap_image = Image.open(buf)
-        plt.close(fig)
-
-        base_image_rgba = base_image.convert('RGBA')
-        heatmap_rgba = heatmap_image.resize(base_image.size)
-        
-        composite_image = Image.alpha_composite(base_image_rgba, heatmap_rgba)
-        
-        composite_image.convert('RGB').save(output_path)
-        print(f"  - Heatmap salvo em: {output_path}")
+
+        for janelas, saidas in zip(densidades, lista_saidas):
+            for densidade, output_path in zip(janelas, saidas):
+                camada = Image.fromarray(_colorir_densidade(densidade), 'RGBA').resize((largura, altura), Image.BILINEAR)
+                Image.alpha_composite(base_rgba, camada).convert('RGB').save(output_path)
+                print(f"  - Heatmap salvo em: {output_path}")
+        return True
 
     except Exception as e:
         print(f"  - ERRO ao gerar heatmap: {e}")
+        return False
 
-def gerar_scanpath(fixations_df, base_image_path, output_path, radius=15):
+
+def gerar_heatmap(fixations_df, base_image_path, output_path, ponderar_por_duracao=False):
     """
-    Desenha o caminho do olhar (scanpath) sobre a imagem base.
+    Gera um mapa de calor (heatmap) a partir dos dados de fixação e o sobrepõe
+    à imagem base. Opcionalmente pondera cada fixação pela duração (FPOGD).
+    """
+    return gerar_heatmaps_em_lote([fixations_df], base_image_path, [output_path], ponderar_por_duracao)
+
+def desenhar_scanpath(imagem_rgba, xs, ys, radius=15, cor=None):
+    """
+    Desenha um scanpath sobre 'imagem_rgba' (alterada no lugar).
+
+    Args:
+        xs, ys (np.ndarray): Coordenadas normalizadas (0-1) das fixações, em ordem.
+        cor (tuple): Cor RGB única para linha e círculos (modo sobreposição). Se None,
+            usa o esquema padrão: início verde, meio azul, fim vermelho.
+    """
+    width, height = imagem_rgba.size
+    draw = ImageDraw.Draw(imagem_rgba)
+    font = obter_fonte(radius)
+
+    pontos = np.column_stack((np.asarray(xs) * width, np.asarray(ys) * height))
+    n = len(pontos)
+    if n > 1:
+        cor_linha = COR_LINHA_SCANPATH if cor is None else tuple(cor) + (200,)
+        draw.line(pontos.ravel().tolist(), fill=cor_linha, width=3)
+
+    if cor is None:
+        cores = [COR_MEIO] * n
+        if n:
+            # Com uma única fixação ela é o início (verde), como no desenho original.
+            cores[-1] = COR_FIM
+            cores[0] = COR_INICIO
+    else:
+        cores = [tuple(cor) + (255,)] * n
+
+    caixas = np.concatenate((pontos - radius, pontos + radius), axis=1).tolist()
+    for i, ((x, y), caixa, cor_ponto) in enumerate(zip(pontos.tolist(), caixas, cores)):
+        draw.ellipse(caixa, fill=cor_ponto, outline=(255, 255, 255, 255), width=2)
+        text = str(i + 1)
+        meia_largura, meia_altura = _deslocamento_rotulo(radius, text)
+        draw.text((x - meia_largura, y - meia_altura), text, font=font, fill="white")
+
+
+def renderizar_scanpaths(lista_coordenadas, base_image, radius=15, sobrepor=False):
+    """
+    Renderiza os scanpaths de vários participantes sobre a mesma imagem base,
+    convertida para RGBA uma única vez.
+
+    Args:
+        lista_coordenadas (list): Pares (xs, ys) de arrays normalizados, um por participante.
+        sobrepor (bool): Se True, desenha todos em uma única imagem, um participante por cor.
+
+    Returns:
+        list: Imagens PIL RGBA (uma por participante, ou uma única na sobreposição).
+    """
+    base_rgba = base_image.convert('RGBA')
+    if sobrepor:
+        for i, (xs, ys) in enumerate(lista_coordenadas):
+            desenhar_scanpath(base_rgba, xs, ys, radius, cor=PALETA_PARTICIPANTES[i % len(PALETA_PARTICIPANTES)])
+        return [base_rgba]
+
+    imagens = []
+    for xs, ys in lista_coordenadas:
+        imagem = base_rgba.copy()
+        desenhar_scanpath(imagem, xs, ys, radius)
+        imagens.append(imagem)
+    return imagens
+
+
+@medido('visualizer.scanpaths')
+def gerar_scanpaths_em_lote(lista_fixacoes, base_image_path, output_paths, radius=15, sobrepor=False):
+    """
+    Gera os scanpaths de vários participantes de uma mesma imagem com uma única
+    decodificação da imagem base. 'lista_fixacoes' aceita DataFrames ou
+    dicionários de arrays (ex: IndiceFixacoes.obter). Na sobreposição,
+    'output_paths' deve ter um único caminho.
+
+    Returns:
+        bool: True se todos os scanpaths foram salvos, False caso contrário.
     """
     try:
-        base_image = Image.open(base_image_path).convert('RGBA')
-        width, height = base_image.size
-        
-        draw = ImageDraw.Draw(base_image)
+        base_image = abrir_imagem_base(base_image_path)
+        coordenadas = [_coordenadas(fixacoes) for fixacoes in lista_fixacoes]
 
-        try:
-            font = ImageFont.truetype("arial.ttf", size=radius)
-        except IOError:
-            font = ImageFont.load_default()
-
-        fixations = []
-        for _, row in fixations_df.iterrows():
-            fixations.append((row['FPOGX'] * width, row['FPOGY'] * height))
-
-        if len(fixations) > 1:
-            draw.line(fixations, fill=(66, 135, 245, 200), width=3)
-
-        for i, (x, y) in enumerate(fixations):
-            if i == 0:
-                color = (46, 204, 113, 255) # Verde
-            elif i == len(fixations) - 1:
-                color = (231, 76, 60, 255) # Vermelho
-            else:
-                color = (52, 152, 219, 255) # Azul
-            
-            bbox = [x - radius, y - radius, x + radius, y + radius]
-            draw.ellipse(bbox, fill=color, outline=(255, 255, 255, 255), width=2)
-            
-            text = str(i + 1)
-            text_bbox = draw.textbbox((0,0), text, font=font)
-            text_width = text_bbox[2] - text_bbox[0]
-            text_height = text_bbox[3] - text_bbox[1]
-            draw.text((x - text_width / 2, y - text_height / 2), text, font=font, fill="white")
-            
-        base_image.convert('RGB').save(output_path)
-        print(f"  - Scanpath salvo em: {output_path}")
+        for imagem, output_path in zip(renderizar_scanpaths(coordenadas, base_image, radius, sobrepor), output_paths):
+            imagem.convert('RGB').save(output_path)
+            print(f"  - Scanpath salvo em: {output_path}")
+        return True
 
     except Exception as e:
-        print(f"  - ERRO ao gerar scanpath: {e}")
\ No newline at end of file
+        print(f"  - ERRO ao gerar scanpath: {e}")
+        return False
+
+
+def gerar_scanpath(fixations_df, base_image_path, output_path, radius=15):
+    """
+    Desenha o caminho do olhar (scanpath) sobre a imagem base.
+    """
+    return gerar_scanpaths_em_lote([fixations_df], base_image_path, [output_path], radius)
@@ -1,70 +1,191 @@
 # main.py
+import sys
 from dotenv import load_dotenv
-from eyetracking_analyzer.data_loader import buscar_dados_participante
-from eyetracking_analyzer.model_interface import setup_genai_api, submeter_dados_ao_modelo
-from eyetracking_analyzer.prompt_builder import construir_prompt_completo
-# Atualizando o nome da função importada
-from eyetracking_analyzer.reporter import salvar_relatorio_jsonl
-from eyetracking_analyzer.pdf_generator import criar_relatorio_pdf
-import time
-
-def executar_analise_completa(parametros_busca):
+from eyetracking_analyzer.data_loader import iterar_dados_participante
+from functools import partial
+from eyetracking_analyzer.model_interface import (
+    setup_genai_api, MotorSubmissao, TarefaModelo, dividir_resposta_lote, TOKENS_POR_IMAGEM
+)
+from eyetracking_analyzer.prompt_builder import construir_prompt_completo, agrupar_em_lotes
+from eyetracking_analyzer.reporter import EscritorRelatorioJsonl, carregar_chaves_concluidas
+from eyetracking_analyzer.dashboard_export import exportar_dashboard
+from eyetracking_analyzer.results_store import ArmazemResultados
+from eyetracking_analyzer.pdf_generator import GeradorPdfParalelo, gerar_relatorios_consolidados, AGRUPAMENTOS_CONSOLIDADOS
+from eyetracking_analyzer.response_cache import CacheRespostas
+from eyetracking_analyzer.pipeline import etapa_em_thread
+from eyetracking_analyzer.image_payload import caminhos_extras_payload
+from eyetracking_analyzer.profiling import iniciar_perfil, finalizar_perfil, perfilar_registro
+from config import (
+    BACKEND_MODELO, USAR_CACHE_RESPOSTAS, MODO_RELATORIO_PDF, MODO_PROMPT, PROMPT_LOTE_ORCAMENTO_TOKENS,
+    PROMPT_LOTE_MAX_PARTICIPANTES, PAYLOAD_IMAGENS_EXTRAS, DASHBOARD_EXPORTAR_AO_FINAL,
+    BACKEND_RESULTADOS
+)
+
+
+def montar_tarefas(registros):
     """
-    Função principal que orquestra a busca, submissão e armazenamento com dados enriquecidos.
+    Gera as TarefaModelo conforme MODO_PROMPT. No modo 'lote', cada tarefa cobre
+    vários participantes da mesma mídia e seu 'contexto' é a lista de registros.
     """
-    if not setup_genai_api():
-        print("Falha na configuração da API. Encerrando o script.")
+    if MODO_PROMPT != 'lote':
+        for dados in registros:
+            with perfilar_registro(dados, 'prompt'):
+                prompt = construir_prompt_completo(dados)
+            yield TarefaModelo(prompt, dados['image_path'], dados, caminhos_extras_payload(dados))
         return
 
-    dados_para_analise = buscar_dados_participante(**parametros_busca)
-    if not dados_para_analise:
-        print("Nenhum dado encontrado para processar. Encerrando.")
+    tokens_imagens = TOKENS_POR_IMAGEM * (1 + len(PAYLOAD_IMAGENS_EXTRAS))
+    for lista_dados, prompt in agrupar_em_lotes(registros, PROMPT_LOTE_ORCAMENTO_TOKENS,
+                                                PROMPT_LOTE_MAX_PARTICIPANTES, tokens_imagens):
+        participantes = [dados['participante'] for dados in lista_dados]
+        print(f"--- LOTE de {len(participantes)} participantes para '{lista_dados[0]['media_name']}' ---")
+        # As imagens extras vêm do primeiro registro; use apenas as que são da mídia (ex: overlay).
+        yield TarefaModelo(prompt, lista_dados[0]['image_path'], lista_dados,
+                           caminhos_extras_payload(lista_dados[0]),
+                           partial(dividir_resposta_lote, participantes=participantes))
+
+
+def respostas_por_registro(tarefa, resposta_modelo):
+    """Gera (dados, resposta) por registro, separando a resposta JSON das tarefas em lote."""
+    if not isinstance(tarefa.contexto, list):
+        yield tarefa.contexto, resposta_modelo
         return
+    participantes = [dados['participante'] for dados in tarefa.contexto]
+    if resposta_modelo.startswith("ERRO"):
+        analises = dict.fromkeys(participantes, resposta_modelo)
+    else:
+        try:
+            analises = dividir_resposta_lote(resposta_modelo, participantes)
+        except ValueError as e:
+            analises = dict.fromkeys(participantes, f"ERRO ao separar a resposta do lote: {e}")
+    for dados in tarefa.contexto:
+        yield dados, analises[dados['participante']]
 
-    # Renomeando a lista para maior clareza
-    lista_de_resultados = []
-    
-    for dados in dados_para_analise:
-        prompt = construir_prompt_completo(dados)
-        #resposta_modelo = submeter_dados_ao_modelo(prompt, dados['image_path'])
-        resposta_modelo = "Resposta do modelo..........."
-        
-        # --- MONTAGEM DO DICIONÁRIO COMPLETO ---
-        # Este dicionário agora contém todos os campos que você solicitou.
-        resultado_completo = {
-            "participante": dados['participante'],
-            "media_name": dados['media_name'],
-            "categoria": dados['categoria'],
-            "bloco": dados['bloco'],
-            "prompt": prompt,
-            "image_path": dados['image_path'],
-            "scanpath_path": dados['scanpath_path'],
-            "heatmap_path": dados['heatmap_path'],
-            "fixmap_path": dados['fixmap_path'],
-            "overlay_heatmap_path": dados['overlay_heatmap_path'],
-            "Resposta": resposta_modelo 
-            # Note que não é mais necessário o .replace("\n", " ") pois o JSON lida com isso
-        }
-        
-        lista_de_resultados.append(resultado_completo)
-        
-        criar_relatorio_pdf(dados, resposta_modelo)
-        
-        print("Aguardando 2 segundos para evitar limite de requisições...")
-        time.sleep(2) 
-    
-    # Chamando a função renomeada com a lista de resultados completos.
-    salvar_relatorio_jsonl(lista_de_resultados)
+
+def executar_analise_completa(parametros_busca, unidades=None):
+    """
+    Função principal que orquestra a busca, submissão e armazenamento com dados enriquecidos.
+    Com 'unidades' (conjunto de pares (mídia, participante) de um shard), só esses pares
+    são analisados, e os PDFs consolidados e o painel ficam para a mescla dos shards.
+
+    Returns:
+        bool: False se a execução não pôde começar (ex.: falha na configuração da API).
+    """
+    if BACKEND_MODELO == 'gemini' and not setup_genai_api():
+        print("Falha na configuração da API. Encerrando o script.")
+        return False
+
+    execucao_perfil = iniciar_perfil()
+
+    # Retomada: pares (mídia, participante) já gravados no relatório são pulados.
+    # Os resultados vão para o .jsonl ou para o armazém Parquet (mesma interface de escrita).
+    if BACKEND_RESULTADOS == 'parquet':
+        escritor = ArmazemResultados()
+        concluidas = escritor.chaves_concluidas()
+    else:
+        concluidas = carregar_chaves_concluidas()
+        escritor = EscritorRelatorioJsonl()
+
+    # Pipeline em etapas ligadas por filas limitadas, todas em paralelo:
+    #   busca + prompt (thread) -> modelo (pool de threads) -> PDF (pool de processos) -> relatório.
+    # Os registros são gerados à medida que a busca avança, então a primeira
+    # requisição sai antes de a busca terminar e nunca há o conjunto inteiro em memória.
+    pendentes = (
+        dados for dados in iterar_dados_participante(**parametros_busca)
+        if (dados['media_name'], dados['participante']) not in concluidas
+        and (unidades is None or (dados['media_name'], dados['participante']) in unidades)
+    )
+    tarefas = etapa_em_thread(montar_tarefas(pendentes), nome="prompts")
+
+    # Com o cache, uma execução reiniciada só paga pelas respostas que ainda faltam.
+    cache = CacheRespostas() if USAR_CACHE_RESPOSTAS else None
+
+    # No modo consolidado os PDFs são gerados no fim, um por grupo alterado nesta execução.
+    pdf_individual = MODO_RELATORIO_PDF == 'individual'
+    grupos_alterados = set()
+
+    processados = 0
+    with MotorSubmissao(cache=cache) as motor, GeradorPdfParalelo() as pdfs, escritor:
+        respostas = (
+            (tarefa, dados, resposta_modelo)
+            for tarefa, resposta_lote in motor.submeter_em_ordem(tarefas)
+            for dados, resposta_modelo in respostas_por_registro(tarefa, resposta_lote)
+        )
+        for tarefa, dados, resposta_modelo in respostas:
+            processados += 1
+
+            # --- MONTAGEM DO DICIONÁRIO COMPLETO ---
+            # Este dicionário agora contém todos os campos que você solicitou.
+            resultado_completo = {
+                "participante": dados['participante'],
+                "media_name": dados['media_name'],
+                "categoria": dados['categoria'],
+                "bloco": dados['bloco'],
+                "prompt": tarefa.prompt_texto,
+                "image_path": dados['image_path'],
+                "scanpath_path": dados['scanpath_path'],
+                "heatmap_path": dados['heatmap_path'],
+                "fixmap_path": dados['fixmap_path'],
+                "overlay_heatmap_path": dados['overlay_heatmap_path'],
+                "Resposta": resposta_modelo
+                # Note que não é mais necessário o .replace("\n", " ") pois o JSON lida com isso
+            }
+
+            if pdf_individual:
+                # O PDF é gerado em outro processo; o resultado só vai para o relatório
+                # depois que o PDF fica pronto, para que um registro gravado signifique
+                # trabalho completo na retomada.
+                pdfs.submeter(dados, resposta_modelo, contexto=resultado_completo)
+                for resultado, _ in pdfs.concluidos():
+                    escritor.escrever(resultado)
+            else:
+                escritor.escrever(resultado_completo)
+                grupos_alterados.add(str(resultado_completo[AGRUPAMENTOS_CONSOLIDADOS[MODO_RELATORIO_PDF]]))
+
+        for resultado, _ in pdfs.concluidos(bloquear=True):
+            escritor.escrever(resultado)
+
+        print(f"Estatísticas de submissão: {motor.estatisticas}")
+        if cache is not None:
+            print(f"Estatísticas do cache de respostas: {cache.estatisticas}")
+            cache.fechar()
+
+    if not processados:
+        print("Nenhum dado novo encontrado para processar.")
+    print(f"--- ANÁLISE COMPLETA. {escritor.total_escritos} novos registros salvos em: '{escritor.caminho}' ---")
+
+    if not pdf_individual and grupos_alterados and unidades is None:
+        gerar_relatorios_consolidados(agrupar_por=MODO_RELATORIO_PDF, grupos=grupos_alterados)
+
+    # O painel web lê o índice e os shards; só os grupos com registros novos são regravados.
+    if DASHBOARD_EXPORTAR_AO_FINAL and BACKEND_RESULTADOS == 'jsonl' and escritor.total_escritos and unidades is None:
+        exportar_dashboard(escritor.caminho)
+
+    finalizar_perfil(execucao_perfil)
+    return True
 
 
 # --- PONTO DE ENTRADA DO SCRIPT ---
 if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Análise dos registros pelo modelo, com relatório e PDFs.")
+    parser.add_argument("--plano", help="Diretório de um plano de shards (ver eyetracking_analyzer/sharding.py)")
+    parser.add_argument("--shard", type=int, help="Número do shard do plano a analisar")
+    args = parser.parse_args()
     load_dotenv()
-    
-    parametros = {
-        "participante": None,
-        "media_name": "1a27f3.png", 
-        "tipo_de_midia": None
-    }
-    
-    executar_analise_completa(parametros)
\ No newline at end of file
+
+    if args.plano is not None:
+        from eyetracking_analyzer.sharding import carregar_plano, unidades_do_shard
+        plano = carregar_plano(args.plano)
+        sucesso = executar_analise_completa(plano['parametros'], unidades=unidades_do_shard(plano, args.shard))
+    else:
+        parametros = {
+            "participante": None,
+            "media_name": "1a27f3.png",
+            "tipo_de_midia": None
+        }
+
+        sucesso = executar_analise_completa(parametros)
+
+    # Código de saída diferente de zero: o worker de shards não marca o shard como concluído.
+    sys.exit(0 if sucesso else 1)
\ No newline at end of file
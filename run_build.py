@@ -0,0 +1,240 @@
+# run_build.py
+"""
+Build incremental de todos os artefatos derivados dos registros selecionados:
+
+    prompt -> resposta (modelo) -> PDF individual
+    heatmap, scanpath (visualizações de run_visualizations.py)
+
+Cada artefato declara suas entradas (hash da fatia do log, hash das imagens,
+versão do prompt e seus textos, nome do modelo, parâmetros de renderização e
+a constante de versão da etapa, ex. VERSAO_PROMPT); só os desatualizados em relação ao manifesto
+(MANIFESTO_ARTEFATOS_PATH) são refeitos, em ordem topológica, em um pool de
+threads (modelo) e de processos (renderização e PDFs).
+
+Uso:
+    python run_build.py --dry-run
+    python run_build.py --categoria webpage --alvos heatmap scanpath --workers 8
+"""
+import io
+import os
+import json
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor
+
+from eyetracking_analyzer.data_loader import iterar_dados_participante
+from eyetracking_analyzer.build_graph import (
+    Artefato, ManifestoArtefatos, planejar, descrever_plano, executar_grafo, hash_dados
+)
+from eyetracking_analyzer.image_payload import hash_arquivo
+from eyetracking_analyzer.prompt_builder import (
+    construir_prompt_completo, descrever_consistencia, modelos_de_prompt, VERSAO_PROMPT
+)
+from eyetracking_analyzer.model_interface import MotorSubmissao, TarefaModelo, setup_genai_api
+from eyetracking_analyzer.response_cache import CacheRespostas
+from eyetracking_analyzer.reporter import EscritorRelatorioJsonl
+from eyetracking_analyzer.results_store import ArmazemResultados, CAMPOS_REGISTRO
+from eyetracking_analyzer.pdf_generator import criar_relatorio_pdf, caminho_relatorio_pdf, VERSAO_PDF
+from eyetracking_analyzer.visualizer import (
+    gerar_heatmaps_em_lote, gerar_scanpaths_em_lote, caminhos_visualizacao, VERSAO_HEATMAP, VERSAO_SCANPATH,
+    COR_LINHA_SCANPATH, COR_INICIO, COR_FIM, COR_MEIO
+)
+from config import (
+    BACKEND_MODELO, MODELO_GENERATIVO, USAR_CACHE_RESPOSTAS, BACKEND_RESULTADOS, FORMATO_FIXACOES,
+    FIXACOES_ORCAMENTO_TOKENS, FIXACOES_GRADE_QUANTIZACAO, FIXACOES_RAIO_FUSAO, PROMPT_INCLUIR_CONSISTENCIA,
+    PAYLOAD_IMAGENS_EXTRAS, PAYLOAD_ARESTA_MAXIMA, PAYLOAD_FORMATO, PAYLOAD_QUALIDADE,
+    PDF_JPEG_QUALIDADE, HEATMAP_RESOLUCAO_GRADE, HEATMAP_ALPHA, HEATMAP_LIMIAR_MASSA, OUTPUT_VIS_DIR
+)
+
+ALVOS = ('prompt', 'resposta', 'pdf', 'heatmap', 'scanpath')
+
+
+def _hash_ou_ausente(caminho):
+    try:
+        return hash_arquivo(caminho)
+    except FileNotFoundError:
+        return 'ausente'
+
+
+def _hash_fatia(registro):
+    """Hash das colunas de fixação do registro (a fatia do log que ele usa)."""
+    fixacoes = registro.fixacoes
+    return hash_dados(*(fixacoes[coluna] for coluna in sorted(fixacoes)))
+
+
+def _versoes():
+    """
+    Entradas comuns a todos os registros: versão de cada etapa. É a constante
+    VERSAO_* do módulo da etapa mais a configuração (e os textos) que ela usa,
+    e não o código-fonte, para que editar um módulo não invalide respostas já pagas.
+    """
+    return {
+        "prompt": hash_dados(str(VERSAO_PROMPT), json.dumps(modelos_de_prompt()), json.dumps([
+            FORMATO_FIXACOES, FIXACOES_ORCAMENTO_TOKENS, FIXACOES_GRADE_QUANTIZACAO, FIXACOES_RAIO_FUSAO,
+            PROMPT_INCLUIR_CONSISTENCIA,
+        ])),
+        "modelo": MODELO_GENERATIVO if BACKEND_MODELO == 'gemini' else BACKEND_MODELO,
+        "payload": json.dumps([PAYLOAD_IMAGENS_EXTRAS, PAYLOAD_ARESTA_MAXIMA, PAYLOAD_FORMATO, PAYLOAD_QUALIDADE]),
+        "pdf": json.dumps([VERSAO_PDF, PDF_JPEG_QUALIDADE]),
+        "heatmap": json.dumps([VERSAO_HEATMAP, HEATMAP_RESOLUCAO_GRADE, HEATMAP_ALPHA, HEATMAP_LIMIAR_MASSA]),
+        "scanpath": json.dumps([VERSAO_SCANPATH, COR_LINHA_SCANPATH, COR_INICIO, COR_FIM, COR_MEIO]),
+    }
+
+
+def _renderizar(tipo, registro, caminho_saida):
+    """Tarefa de um processo do pool: gera um heatmap ou scanpath de um registro."""
+    saida = io.StringIO()
+    with contextlib.redirect_stdout(saida):
+        funcao = gerar_heatmaps_em_lote if tipo == 'heatmap' else gerar_scanpaths_em_lote
+        ok = funcao([registro], registro.image_path, [caminho_saida])
+    if not ok:
+        linhas = saida.getvalue().strip().splitlines()
+        raise RuntimeError(linhas[-1].strip() if linhas else "erro desconhecido")
+    return caminho_saida
+
+
+def _gerar_pdf(registro, resposta):
+    if not criar_relatorio_pdf(registro, resposta):
+        raise RuntimeError(f"PDF de '{registro.media_name}' (participante {registro.participante}) não foi salvo")
+    return caminho_relatorio_pdf(registro)
+
+
+class ConstrutorPipeline:
+    """Declara os artefatos de cada registro e guarda os recursos usados para construí-los."""
+
+    def __init__(self, alvos, processos=None):
+        self.alvos = set(alvos)
+        self.versoes = _versoes()
+        self.processos = processos
+        self.pool = None
+        self.motor = None
+        self.cache = None
+
+    def artefatos_do_registro(self, registro):
+        media, participante = registro.media_name, registro.participante
+        base = f"{media}:{participante}"
+        fatia = _hash_fatia(registro)
+        imagem = _hash_ou_ausente(registro.image_path)
+        artefatos = []
+
+        if self.alvos & {'prompt', 'resposta', 'pdf'}:
+            artefatos.append(Artefato(
+                f"prompt:{base}", 'prompt',
+                # A linha de consistência do próprio par, não o arquivo inteiro de similaridades.
+                {"fatia_log": fatia, "versao_prompt": self.versoes['prompt'],
+                 "consistencia": descrever_consistencia(registro)},
+                lambda deps, r=registro: construir_prompt_completo(r), guardar_valor=True,
+            ))
+        if self.alvos & {'resposta', 'pdf'}:
+            extras = {campo: _hash_ou_ausente(registro[campo]) for campo in PAYLOAD_IMAGENS_EXTRAS}
+            artefatos.append(Artefato(
+                f"resposta:{base}", 'resposta',
+                {"imagem": imagem, "imagens_extras": extras, "modelo": self.versoes['modelo'],
+                 "payload": self.versoes['payload']},
+                lambda deps, r=registro: self._responder(r, deps[f"prompt:{base}"]),
+                dependencias=[f"prompt:{base}"], guardar_valor=True,
+            ))
+        if 'pdf' in self.alvos:
+            imagens = {campo: _hash_ou_ausente(caminho) for campo, caminho in (
+                ('heatmap', registro.heatmap_path), ('overlay', registro.overlay_heatmap_path),
+                ('scanpath', registro.scanpath_path), ('fixmap', registro.fixmap_path))}
+            artefatos.append(Artefato(
+                f"pdf:{base}", 'pdf', {"imagem": imagem, "mapas": imagens, "versao_pdf": self.versoes['pdf']},
+                lambda deps, r=registro: self.pool.submit(_gerar_pdf, r, deps[f"resposta:{base}"]).result(),
+                dependencias=[f"resposta:{base}"], saida=caminho_relatorio_pdf(registro),
+            ))
+        caminho_heatmap, caminho_scanpath = caminhos_visualizacao(media, participante)
+        for tipo, caminho in (('heatmap', caminho_heatmap), ('scanpath', caminho_scanpath)):
+            if tipo in self.alvos:
+                artefatos.append(Artefato(
+                    f"{tipo}:{base}", tipo, {"fatia_log": fatia, "imagem": imagem, "versao_render": self.versoes[tipo]},
+                    lambda deps, t=tipo, r=registro, c=caminho: self.pool.submit(_renderizar, t, r, c).result(),
+                    saida=caminho,
+                ))
+        return artefatos
+
+    def _responder(self, registro, prompt):
+        resposta = self.motor.submeter(TarefaModelo(prompt, registro.image_path, registro,
+                                                    tuple(registro[campo] for campo in PAYLOAD_IMAGENS_EXTRAS)))
+        if resposta.startswith("ERRO"):
+            # A falha não entra no manifesto: a resposta continua desatualizada.
+            raise RuntimeError(resposta)
+        return resposta
+
+    def iniciar(self, precisa_modelo):
+        self.pool = ProcessPoolExecutor(max_workers=self.processos)
+        if precisa_modelo:
+            self.cache = CacheRespostas() if USAR_CACHE_RESPOSTAS else None
+            self.motor = MotorSubmissao(cache=self.cache)
+
+    def encerrar(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=True)
+        if self.motor is not None:
+            self.motor.encerrar()
+            print(f"Estatísticas de submissão: {self.motor.estatisticas}")
+        if self.cache is not None:
+            self.cache.fechar()
+
+
+def main(args):
+    alvos = args.alvos or ALVOS
+    construtor = ConstrutorPipeline(alvos, args.workers)
+    registros = {}
+    # As mensagens da busca são capturadas para não poluir o plano.
+    with contextlib.redirect_stdout(io.StringIO()):
+        for registro in iterar_dados_participante(args.participante, args.media, args.categoria):
+            registros[f"{registro.media_name}:{registro.participante}"] = registro
+    if not registros:
+        print("Nenhum par (mídia, participante) corresponde aos filtros.")
+        return
+
+    artefatos = [artefato for registro in registros.values() for artefato in construtor.artefatos_do_registro(registro)]
+    with ManifestoArtefatos() as manifesto:
+        plano = planejar(artefatos, manifesto)
+        print(f"--- PLANO: {len(artefatos)} artefatos de {len(registros)} registros ---")
+        descrever_plano(plano, detalhar=args.dry_run or args.detalhar)
+        desatualizados = [artefato for artefato, _, motivos in plano if motivos]
+        if args.dry_run or not desatualizados:
+            if not desatualizados:
+                print("Todos os artefatos estão atualizados.")
+            return
+
+        precisa_modelo = any(artefato.tipo == 'resposta' for artefato in desatualizados)
+        if precisa_modelo and BACKEND_MODELO == 'gemini' and not setup_genai_api():
+            print("Falha na configuração da API. Encerrando o script.")
+            return
+
+        # Respostas novas também vão para o relatório (a mais recente de cada par é a que vale).
+        escritor = ArmazemResultados() if BACKEND_RESULTADOS == 'parquet' else EscritorRelatorioJsonl()
+
+        def ao_concluir(artefato, valor, valores_dependencias):
+            if artefato.tipo != 'resposta':
+                return
+            base = artefato.chave.split(':', 1)[1]
+            registro = registros[base]
+            texto = {"prompt": valores_dependencias[f"prompt:{base}"], "Resposta": valor}
+            escritor.escrever({campo: texto[campo] if campo in texto else registro[campo] for campo in CAMPOS_REGISTRO})
+
+        os.makedirs(OUTPUT_VIS_DIR, exist_ok=True)
+        construtor.iniciar(precisa_modelo)
+        try:
+            with escritor:
+                resumo = executar_grafo(plano, manifesto, workers=args.workers, ao_concluir=ao_concluir)
+        finally:
+            construtor.encerrar()
+
+    print(f"--- FIM DO BUILD. {resumo['construidos']} construídos, {resumo['atualizados']} já atualizados, "
+          f"{resumo['falhas']} falhas, {resumo['pulados']} pulados por falha em dependência. ---")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build incremental de prompts, respostas, PDFs e visualizações.")
+    parser.add_argument("-p", "--participante", help="ID do participante (ex: 01)")
+    parser.add_argument("-m", "--media", help="Nome do arquivo da imagem (ex: 1a27f3.png)")
+    parser.add_argument("-c", "--categoria", help="Filtra por categoria (ex: webpage)")
+    parser.add_argument("--alvos", nargs="+", choices=ALVOS, help="Tipos de artefato a construir (padrão: todos)")
+    parser.add_argument("--workers", type=int, default=None, help="Threads do grafo e processos de renderização")
+    parser.add_argument("--dry-run", action="store_true", help="Só mostra o que seria refeito e por quê")
+    parser.add_argument("--detalhar", action="store_true", help="Lista cada artefato refeito, não só o resumo")
+    main(parser.parse_args())
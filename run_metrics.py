@@ -0,0 +1,83 @@
+import os
+import argparse
+import pandas as pd
+
+# Importa as funções da nossa biblioteca e as configurações
+from eyetracking_analyzer.saliency_metrics import avaliar_midia, familia_mapa
+from eyetracking_analyzer.map_store import carregar_pacote_mapas
+from eyetracking_analyzer.fixation_index import carregar_indice_fixacoes
+from eyetracking_analyzer.execucao import (
+    adicionar_argumentos_filtro, tarefas_filtradas, executar_em_processos, gravar_parquet_mesclado
+)
+from config import OUTPUT_METRICAS_PATH, METRICAS_RESOLUCAO
+
+
+def selecionar_tarefas(args):
+    """Filtra info.csv e retorna [(mídia, categoria, bloco, [participantes])] com mapa disponível."""
+    # Garante o índice e os pacotes de mapas atualizados aqui, antes de os workers os abrirem.
+    indice = carregar_indice_fixacoes()
+    pacote = carregar_pacote_mapas(familia_mapa(args.mapa, args.duration), args.resolucao)
+    if args.comparar:
+        carregar_pacote_mapas(args.comparar, args.resolucao)
+
+    tarefas = []
+    for media_name, categoria, bloco, participantes in tarefas_filtradas(indice, args.categoria, args.bloco,
+                                                                         args.media_glob, args.participantes):
+        if media_name not in pacote:
+            print(f"AVISO: Mapa '{args.mapa}_{args.duration}' de '{media_name}' não encontrado. Pulando.")
+            continue
+        if participantes or args.comparar:
+            tarefas.append((media_name, categoria, bloco, participantes))
+    return tarefas
+
+
+def main(args):
+    """
+    Calcula NSS, CC, KL, SIM e AUC-Judd para todos os pares (mídia, participante)
+    selecionados, distribuindo as mídias entre processos, e grava um Parquet.
+    """
+    tarefas = selecionar_tarefas(args)
+    if not tarefas:
+        print("Nenhuma mídia corresponde aos filtros.")
+        return
+
+    total = len(tarefas)
+    print(f"Avaliando {sum(len(p) for *_, p in tarefas)} pares em {total} mídias com {args.workers or os.cpu_count()} processos...")
+    linhas, falhas = [], []
+    tarefas_pool = [((media, categoria, bloco), (media, participantes, args.duration, args.mapa, args.comparar,
+                                                 args.resolucao))
+                    for media, categoria, bloco, participantes in tarefas]
+    for (media_name, categoria, bloco), resultado, erro in executar_em_processos(
+            avaliar_midia, tarefas_pool, args.workers, lambda: f"{len(linhas)} linhas | {len(falhas)} falhas"):
+        if erro is not None:
+            falhas.append((media_name, str(erro)))
+            continue
+        for linha in resultado:
+            linha.update({"categoria": categoria, "bloco": bloco})
+            linhas.append(linha)
+
+    if linhas:
+        colunas = ['media_name', 'participante', 'categoria', 'bloco', 'mapa', 'num_fixacoes',
+                   'nss', 'auc_judd', 'cc', 'kl', 'sim']
+        df = pd.DataFrame(linhas, columns=colunas)
+        # As linhas já existentes de outros pares (ou de outros mapas) são mantidas.
+        total_arquivo = len(gravar_parquet_mesclado(df, args.saida, ['media_name', 'participante', 'mapa']))
+        print(f"--- MÉTRICAS SALVAS EM: '{args.saida}' ({len(df)} linhas novas, {total_arquivo} no arquivo) ---")
+        por_participante = df[df['participante'] != '*']
+        if not por_participante.empty:
+            print(por_participante[['nss', 'auc_judd', 'cc', 'kl', 'sim']].mean().round(4).to_string())
+
+    for media_name, msg in falhas:
+        print(f"  - FALHA em '{media_name}': {msg}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calcula métricas de saliência (NSS, CC, KL, SIM, AUC-Judd) para o dataset.")
+    adicionar_argumentos_filtro(parser)
+    parser.add_argument("--mapa", default="heatmaps", help="Tipo de mapa avaliado (padrão: heatmaps)")
+    parser.add_argument("--duration", default="7s", help="Duração do mapa (ex: 3s, 7s)")
+    parser.add_argument("--comparar", help="Outro mapa para CC/KL/SIM mapa-contra-mapa (ex: heatmaps_3s)")
+    parser.add_argument("--resolucao", type=int, default=METRICAS_RESOLUCAO, help="Maior lado da grade de comparação")
+    parser.add_argument("--saida", default=OUTPUT_METRICAS_PATH, help="Arquivo Parquet de saída")
+
+    main(parser.parse_args())
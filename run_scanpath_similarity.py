@@ -0,0 +1,69 @@
+import os
+import argparse
+import pandas as pd
+
+# Importa as funções da nossa biblioteca e as configurações
+from eyetracking_analyzer.scanpath_similarity import avaliar_midia
+from eyetracking_analyzer.fixation_index import carregar_indice_fixacoes
+from eyetracking_analyzer.execucao import (
+    adicionar_argumentos_filtro, tarefas_filtradas, executar_em_processos, gravar_parquet_mesclado
+)
+from config import OUTPUT_SIMILARIDADE_PATH
+
+
+def selecionar_tarefas(args):
+    """Filtra info.csv e retorna [(mídia, categoria, bloco, [participantes])] com ao menos 2 participantes."""
+    # Garante o índice atualizado aqui, antes de os workers o abrirem.
+    indice = carregar_indice_fixacoes()
+    return [tarefa for tarefa in tarefas_filtradas(indice, args.categoria, args.bloco, args.media_glob,
+                                                   args.participantes)
+            if len(tarefa[3]) >= 2]
+
+
+def main(args):
+    """
+    Calcula, para cada mídia selecionada, as matrizes de similaridade entre os
+    scanpaths de todos os participantes (uma mídia por tarefa do pool) e grava
+    um Parquet com a consistência da imagem e a similaridade de cada participante.
+    """
+    tarefas = selecionar_tarefas(args)
+    if not tarefas:
+        print("Nenhuma mídia com dois ou mais participantes corresponde aos filtros.")
+        return
+
+    total = len(tarefas)
+    pares = sum(len(p) * (len(p) - 1) // 2 for *_, p in tarefas)
+    print(f"Comparando {pares} pares de scanpaths em {total} mídias com {args.workers or os.cpu_count()} processos...")
+    linhas, falhas = [], []
+    tarefas_pool = [((media, categoria, bloco), (media, participantes))
+                    for media, categoria, bloco, participantes in tarefas]
+    for (media_name, categoria, bloco), resultado, erro in executar_em_processos(
+            avaliar_midia, tarefas_pool, args.workers, lambda: f"{len(linhas)} linhas | {len(falhas)} falhas"):
+        if erro is not None:
+            falhas.append((media_name, str(erro)))
+            continue
+        for linha in resultado:
+            linha.update({"categoria": categoria, "bloco": bloco})
+            linhas.append(linha)
+
+    if linhas:
+        colunas = ['media_name', 'participante', 'categoria', 'bloco', 'num_participantes', 'consistencia_imagem',
+                   'similaridade_participante', 'dtw_medio', 'frechet_medio', 'edicao_media']
+        df = pd.DataFrame(linhas, columns=colunas).sort_values(['media_name', 'participante'], ignore_index=True)
+        # A consistência depende do conjunto de participantes, então cada mídia recalculada
+        # substitui todas as suas linhas; as demais mídias do arquivo são mantidas.
+        total_arquivo = len(gravar_parquet_mesclado(df, args.saida, ['media_name']))
+        print(f"--- SIMILARIDADES SALVAS EM: '{args.saida}' ({len(df)} linhas novas, {total_arquivo} no arquivo) ---")
+        por_imagem = df.drop_duplicates('media_name')
+        print(por_imagem.groupby('categoria')['consistencia_imagem'].mean().round(4).to_string())
+
+    for media_name, msg in falhas:
+        print(f"  - FALHA em '{media_name}': {msg}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calcula a similaridade entre scanpaths (DTW, Fréchet, edição em grade) e a consistência por imagem.")
+    adicionar_argumentos_filtro(parser)
+    parser.add_argument("--saida", default=OUTPUT_SIMILARIDADE_PATH, help="Arquivo Parquet de saída")
+
+    main(parser.parse_args())
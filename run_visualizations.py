@@ -1,59 +1,197 @@
 import os
-import pandas as pd
+import io
+import contextlib
 import argparse
 
 # Importa as funções da nossa biblioteca e as configurações
-from eyetracking_analyzer.visualizer import gerar_heatmap, gerar_scanpath
-from config import IMAGES_DIR, LOGS_DIR, OUTPUT_VIS_DIR
+from eyetracking_analyzer.visualizer import (
+    gerar_heatmap, gerar_heatmaps_em_lote, gerar_heatmaps_por_duracao, gerar_scanpath, gerar_scanpaths_em_lote,
+    caminhos_visualizacao, caminhos_heatmap_duracoes
+)
+from eyetracking_analyzer.fixation_index import carregar_indice_fixacoes, abrir_indice_fixacoes
+from eyetracking_analyzer.execucao import adicionar_argumentos_filtro, tarefas_filtradas, executar_em_processos
+from config import IMAGES_DIR, OUTPUT_VIS_DIR
+
+
+def _esta_atualizado(caminho_saida, mtime_fontes_ns):
+    """Uma saída está atualizada se existe e é mais nova que todas as suas fontes."""
+    try:
+        return os.stat(caminho_saida).st_mtime_ns >= mtime_fontes_ns
+    except FileNotFoundError:
+        return False
+
+
+def _renderizar_midia(media_name, participantes_e_mtimes, forcar, sobrepor=False, duracoes=None):
+    """
+    Tarefa de um processo do pool: gera heatmaps e scanpaths de todos os
+    participantes selecionados de uma mídia. A imagem base é decodificada uma
+    vez e reaproveitada por todos os participantes; a fonte fica em cache no processo.
+    Com 'duracoes' (ex: ['1s', '3s', '7s']), os heatmaps são gerados por janela
+    de duração, todas em uma única passada incremental por participante.
+
+    Returns:
+        tuple: (gerados, pulados, falhas), onde falhas é uma lista de (participante, mensagem).
+    """
+    # Índice aberto uma vez por processo do pool (memory-map, sem reler os logs).
+    indice = abrir_indice_fixacoes()
+
+    base_image_path = os.path.join(IMAGES_DIR, media_name)
+    mtime_imagem = os.stat(base_image_path).st_mtime_ns
+    gerados, pulados, falhas = 0, 0, []
+
+    heatmaps, heatmaps_saida = [], []
+    scanpaths, scanpaths_saida = [], []
+    todas_fixacoes = []
+    mtime_fontes_midia = mtime_imagem
+    for participante, mtime_log in participantes_e_mtimes:
+        heatmap_output_path, scanpath_output_path = caminhos_visualizacao(media_name, participante)
+        mtime_fontes = max(mtime_imagem, mtime_log)
+        mtime_fontes_midia = max(mtime_fontes_midia, mtime_log)
+        # Views das colunas do índice, sem criar DataFrames.
+        fixacoes = indice.obter(media_name, participante)
+        if fixacoes is None:
+            falhas.append((participante, "sem fixações no índice"))
+            continue
+        todas_fixacoes.append(fixacoes)
+
+        saidas_heatmap = caminhos_heatmap_duracoes(media_name, participante, duracoes) if duracoes else [heatmap_output_path]
+        if forcar or not all(_esta_atualizado(caminho, mtime_fontes) for caminho in saidas_heatmap):
+            heatmaps.append(fixacoes)
+            heatmaps_saida.append(saidas_heatmap)
+        else:
+            pulados += len(saidas_heatmap)
+        if forcar or not _esta_atualizado(scanpath_output_path, mtime_fontes):
+            scanpaths.append(fixacoes)
+            scanpaths_saida.append(scanpath_output_path)
+        else:
+            pulados += 1
+
+    # As mensagens das funções da biblioteca são capturadas para não poluir o progresso.
+    saida = io.StringIO()
+
+    def ultima_mensagem():
+        linhas = saida.getvalue().strip().splitlines()
+        return linhas[-1].strip() if linhas else "erro desconhecido"
+
+    with contextlib.redirect_stdout(saida):
+        if heatmaps:
+            if duracoes:
+                ok = gerar_heatmaps_por_duracao(heatmaps, base_image_path, heatmaps_saida, duracoes)
+            else:
+                ok = gerar_heatmaps_em_lote(heatmaps, base_image_path, [saidas[0] for saidas in heatmaps_saida])
+            if ok:
+                gerados += sum(len(saidas) for saidas in heatmaps_saida)
+            else:
+                falhas.append(("*", ultima_mensagem()))
+        if scanpaths:
+            if gerar_scanpaths_em_lote(scanpaths, base_image_path, scanpaths_saida):
+                gerados += len(scanpaths)
+            else:
+                falhas.append(("*", ultima_mensagem()))
+        if sobrepor and todas_fixacoes:
+            sobreposicao_path = os.path.join(OUTPUT_VIS_DIR, f"scanpaths_{media_name.split('.')[0]}_todos.png")
+            if not forcar and _esta_atualizado(sobreposicao_path, mtime_fontes_midia):
+                pulados += 1
+            elif gerar_scanpaths_em_lote(todas_fixacoes, base_image_path, [sobreposicao_path], sobrepor=True):
+                gerados += 1
+            else:
+                falhas.append(("*", ultima_mensagem()))
+
+    return gerados, pulados, falhas
+
+
+def executar_lote(args):
+    """
+    Modo em lote: seleciona mídias e participantes pelos filtros, lê os logs
+    uma única vez (via índice de fixações) e distribui a renderização entre processos.
+    """
+    os.makedirs(OUTPUT_VIS_DIR, exist_ok=True)
+
+    # Garante o índice atualizado aqui, antes de os workers o abrirem.
+    indice = carregar_indice_fixacoes()
+    participantes_filtro = set(args.participantes or []) | ({args.participante} if args.participante else set())
+
+    tarefas = []
+    for media_name, _, bloco, participantes in tarefas_filtradas(indice, args.categoria, args.bloco,
+                                                                 args.media_glob or args.media, participantes_filtro):
+        if not os.path.exists(os.path.join(IMAGES_DIR, media_name)):
+            print(f"AVISO: Imagem base '{media_name}' não encontrada. Pulando.")
+            continue
+        if participantes:
+            tarefas.append((media_name, [(p, indice.assinatura[f"{bloco}_kh0{p}_fixations.csv"][0])
+                                         for p in participantes]))
+
+    total = len(tarefas)
+    if not total:
+        print("Nenhum par (mídia, participante) corresponde aos filtros.")
+        return
+
+    print(f"Renderizando {sum(len(p) for _, p in tarefas)} pares em {total} mídias com {args.workers or os.cpu_count()} processos...")
+    gerados = pulados = 0
+    falhas = []
+    tarefas_pool = [(media, (media, parts, args.forcar, args.sobrepor, args.duracoes)) for media, parts in tarefas]
+    for media_name, resultado, erro in executar_em_processos(
+            _renderizar_midia, tarefas_pool, args.workers,
+            lambda: f"{gerados} geradas | {pulados} atualizadas | {len(falhas)} falhas"):
+        if erro is not None:
+            falhas.append((media_name, "*", str(erro)))
+            continue
+        g, p, f = resultado
+        gerados += g
+        pulados += p
+        falhas.extend((media_name, participante, msg) for participante, msg in f)
+
+    print(f"--- FIM DO LOTE. {gerados} imagens geradas, {pulados} já atualizadas, {len(falhas)} falhas. ---")
+    for media_name, participante, msg in falhas:
+        print(f"  - FALHA em '{media_name}' (participante {participante}): {msg}")
+
 
 def main(args):
     """
     Encontra os arquivos de dados necessários e chama as funções de geração de visualizações.
     """
-    participante = args.participante
+    participante = args.participante.zfill(2)
     media_name = args.media
 
     # Cria o diretório de saída, se não existir
     os.makedirs(OUTPUT_VIS_DIR, exist_ok=True)
 
-    log_file_found = False
-    for log_filename in os.listdir(LOGS_DIR):
-        # Procura por um participante específico
-        if f"_kh0{participante.zfill(2)}_" not in log_filename:
-            continue
-        
-        try:
-            df_log = pd.read_csv(os.path.join(LOGS_DIR, log_filename))
-            fixations_df = df_log[df_log['MEDIA_NAME'] == media_name]
-            
-            if not fixations_df.empty:
-                base_image_path = os.path.join(IMAGES_DIR, media_name)
-                if not os.path.exists(base_image_path):
-                    print(f"ERRO: Imagem base '{media_name}' não encontrada.")
-                    continue
-                
-                print(f"\nProcessando dados de '{log_filename}' para a mídia '{media_name}'...")
-                log_file_found = True
-                
-                # Define os nomes dos arquivos de saída.
-                base_output_name = f"{media_name.split('.')[0]}_P{participante.zfill(2)}"
-                heatmap_output_path = os.path.join(OUTPUT_VIS_DIR, f"heatmap_{base_output_name}.png")
-                scanpath_output_path = os.path.join(OUTPUT_VIS_DIR, f"scanpath_{base_output_name}.png")
-                
-                # Chama as funções da biblioteca
-                gerar_heatmap(fixations_df, base_image_path, heatmap_output_path)
-                gerar_scanpath(fixations_df, base_image_path, scanpath_output_path)
-                break 
-        except Exception as e:
-            print(f"Erro ao processar {log_filename}: {e}")
-            
-    if not log_file_found:
+    fixations_df = carregar_indice_fixacoes().obter_dataframe(media_name, participante)
+    if fixations_df is None:
         print(f"Não foram encontrados dados de fixação para o participante '{participante}' e a mídia '{media_name}'.")
+        return
+
+    base_image_path = os.path.join(IMAGES_DIR, media_name)
+    if not os.path.exists(base_image_path):
+        print(f"ERRO: Imagem base '{media_name}' não encontrada.")
+        return
+
+    print(f"\nProcessando dados do participante '{participante}' para a mídia '{media_name}'...")
+    heatmap_output_path, scanpath_output_path = caminhos_visualizacao(media_name, participante)
+
+    # Chama as funções da biblioteca
+    gerar_heatmap(fixations_df, base_image_path, heatmap_output_path)
+    gerar_scanpath(fixations_df, base_image_path, scanpath_output_path)
+
+
+def executar_cli(argv=None, prog=None):
+    """Interpreta os argumentos (padrão: sys.argv[1:]) e gera as visualizações pedidas."""
+    parser = argparse.ArgumentParser(prog=prog, description="Gera visualizações de Heatmap e Scanpath a partir de dados de rastreamento ocular.")
+    parser.add_argument("-p", "--participante", help="ID do participante (ex: 01)")
+    parser.add_argument("-m", "--media", help="Nome do arquivo da imagem (ex: desktop_ui_02.png)")
+
+    lote = parser.add_argument_group("modo em lote", "Usado quando --participante/--media não são informados juntos.")
+    adicionar_argumentos_filtro(lote)
+    lote.add_argument("--forcar", action="store_true", help="Regera também as saídas já atualizadas")
+    lote.add_argument("--sobrepor", action="store_true", help="Gera também um scanpath com todos os participantes por mídia")
+    lote.add_argument("--duracoes", nargs="+", help="Gera um heatmap por janela de duração (ex: 1s 3s 7s)")
+
+    args = parser.parse_args(argv)
+    if args.participante and args.media:
+        main(args)
+    else:
+        executar_lote(args)
+
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Gera visualizações de Heatmap e Scanpath a partir de dados de rastreamento ocular.")
-    parser.add_argument("-p", "--participante", required=True, help="ID do participante (ex: 01)")
-    parser.add_argument("-m", "--media", required=True, help="Nome do arquivo da imagem (ex: desktop_ui_02.png)")
-    
-    args = parser.parse_args()
-    main(args)
\ No newline at end of file
+    executar_cli()
@@ -10,14 +10,32 @@ document.addEventListener('DOMContentLoaded', () => {
 
     let allReports = [];
     let allLogs = {}; // Para armazenar os logs carregados e evitar recarregá-los
+    const shardCache = new Map(); // Shards do painel já baixados (ou em download), por nome
+    const decoder = new TextDecoder();
+
+    // Os corpos (prompt e resposta) só são baixados quando o card fica visível.
+    const bodyObserver = new IntersectionObserver(entries => {
+        entries.forEach(entry => {
+            if (!entry.isIntersecting) return;
+            bodyObserver.unobserve(entry.target);
+            fillReportText(entry.target, entry.target.report);
+        });
+    }, { rootMargin: '400px' });
 
     // Função principal para carregar todos os dados iniciais
     async function loadInitialData() {
         try {
-            // Carrega o arquivo de resultados da análise de IA
-            const response = await fetch('./reports/relatorio_analise_modelos.jsonl');
-            const text = await response.text();
-            allReports = text.trim().split('\n').map(line => JSON.parse(line));
+            // Carrega o índice do painel (gerado por eyetracking_analyzer/dashboard_export.py):
+            // só os campos de filtro e a posição de cada registro no seu shard.
+            const indexResponse = await fetch('./reports/dashboard/indice.json');
+            if (indexResponse.ok) {
+                allReports = (await indexResponse.json()).registros;
+            } else {
+                // Sem o índice exportado, lê o arquivo de resultados da análise de IA inteiro
+                const response = await fetch('./reports/relatorio_analise_modelos.jsonl');
+                const text = await response.text();
+                allReports = text.trim().split('\n').map(line => JSON.parse(line));
+            }
             
             populateFilters();
             displayResults();
@@ -27,6 +45,41 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     }
 
+    // Baixa um shard gzip uma única vez. Se o servidor já o entregou descomprimido
+    // (Content-Encoding: gzip), os bytes não começam com a assinatura do gzip.
+    function loadShard(name) {
+        if (!shardCache.has(name)) {
+            const promise = fetch(`./reports/dashboard/${name}`).then(async response => {
+                if (!response.ok) throw new Error(`HTTP ${response.status} ao carregar ${name}`);
+                const bytes = new Uint8Array(await response.arrayBuffer());
+                if (bytes[0] !== 0x1f || bytes[1] !== 0x8b) return bytes;
+                const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream('gzip'));
+                return new Uint8Array(await new Response(stream).arrayBuffer());
+            });
+            promise.catch(() => shardCache.delete(name)); // Permite tentar de novo
+            shardCache.set(name, promise);
+        }
+        return shardCache.get(name);
+    }
+
+    // Completa o registro do índice com o prompt e a resposta lidos do seu shard.
+    async function loadReportBody(report) {
+        if (report.Resposta !== undefined) return report;
+        const bytes = await loadShard(report.shard);
+        const body = JSON.parse(decoder.decode(bytes.subarray(report.inicio, report.inicio + report.tamanho)));
+        return Object.assign(report, body);
+    }
+
+    async function fillReportText(card, report) {
+        const reportText = card.querySelector('.report-text');
+        try {
+            reportText.textContent = (await loadReportBody(report)).Resposta;
+        } catch (error) {
+            reportText.textContent = `Erro ao carregar o relatório: ${error}`;
+            console.error(error);
+        }
+    }
+
     // Preenche os menus de filtro com base nos dados carregados
     function populateFilters() {
         const participantes = [...new Set(allReports.map(r => r.participante))].sort();
@@ -54,6 +107,7 @@ document.addEventListener('DOMContentLoaded', () => {
             (bVal === 'all' || r.bloco == bVal)
         );
 
+        bodyObserver.disconnect();
         resultsContainer.innerHTML = ''; // Limpa os resultados anteriores
         resultsCount.textContent = `${filteredReports.length} resultado(s) encontrado(s).`;
 
@@ -68,7 +122,7 @@ document.addEventListener('DOMContentLoaded', () => {
                 <div class="report-content">
                     <div class="text-container">
                         <h4>Relatório do Modelo</h4>
-                        <pre class="report-text">${report.Resposta}</pre>
+                        <pre class="report-text">${report.Resposta ?? 'Carregando relatório...'}</pre>
                     </div>
                     <div class="visuals-container">
                         <h4>Visualizações Interativas</h4>
@@ -79,6 +133,10 @@ document.addEventListener('DOMContentLoaded', () => {
                 </div>
             `;
             resultsContainer.appendChild(card);
+            if (report.Resposta === undefined) {
+                card.report = report;
+                bodyObserver.observe(card);
+            }
             // Gera os gráficos para este card
             generateVisualizations(report);
         });
@@ -0,0 +1,15 @@
+# tests/conftest.py
+"""
+Configuração comum dos testes. Roda antes de qualquer import do projeto:
+coloca a raiz do repositório no sys.path (o config.py fica lá) e aponta
+UEYES_DADOS_DIR para um diretório temporário, para que caches, manifestos e
+relatórios criados com os caminhos padrão do config não caiam no repositório.
+"""
+import os
+import sys
+import tempfile
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RAIZ not in sys.path:
+    sys.path.insert(0, RAIZ)
+os.environ.setdefault('UEYES_DADOS_DIR', tempfile.mkdtemp(prefix='ueyes_testes_'))
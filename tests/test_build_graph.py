@@ -0,0 +1,108 @@
+# tests/test_build_graph.py
+import pytest
+from eyetracking_analyzer.build_graph import Artefato, ManifestoArtefatos, executar_grafo, ordem_topologica, planejar
+
+
+@pytest.fixture
+def manifesto(tmp_path):
+    with ManifestoArtefatos(str(tmp_path / 'manifesto.sqlite')) as manifesto:
+        yield manifesto
+
+
+def _grafo(versao_prompt=1, versao_pdf=1, saida_pdf=None, construidos=None, falhar=()):
+    """prompt -> resposta -> pdf, com um heatmap independente."""
+    construidos = construidos if construidos is not None else []
+
+    def construtor(chave, valor):
+        def construir(dependencias):
+            construidos.append(chave)
+            if chave in falhar:
+                raise RuntimeError(f"falha simulada em {chave}")
+            return valor(dependencias)
+        return construir
+
+    return [
+        Artefato('prompt:a', 'prompt', {'versao': versao_prompt}, construtor('prompt:a', lambda d: f"prompt v{versao_prompt}"),
+                 guardar_valor=True),
+        Artefato('resposta:a', 'resposta', {'modelo': 'falso'},
+                 construtor('resposta:a', lambda d: f"resposta para {d['prompt:a']}"), ('prompt:a',), guardar_valor=True),
+        Artefato('pdf:a', 'pdf', {'versao': versao_pdf}, construtor('pdf:a', lambda d: d['resposta:a']),
+                 ('resposta:a',), saida=saida_pdf),
+        Artefato('heatmap:a', 'heatmap', {'grade': 64}, construtor('heatmap:a', lambda d: None)),
+    ]
+
+
+def _motivos(plano):
+    return {artefato.chave: motivos for artefato, _, motivos in plano}
+
+
+def test_primeira_execucao_constroi_tudo_e_a_segunda_nada(manifesto):
+    construidos = []
+    plano = planejar(_grafo(construidos=construidos), manifesto)
+    assert all(motivos == ["novo"] for motivos in _motivos(plano).values())
+    resumo = executar_grafo(plano, manifesto, workers=2)
+    assert resumo['construidos'] == 4 and resumo['falhas'] == 0
+    assert construidos.index('prompt:a') < construidos.index('resposta:a') < construidos.index('pdf:a')
+
+    plano = planejar(_grafo(), manifesto)
+    assert not any(_motivos(plano).values())
+    assert executar_grafo(plano, manifesto)['atualizados'] == 4
+
+
+def test_mudanca_de_entrada_propaga_so_para_os_dependentes(manifesto):
+    executar_grafo(planejar(_grafo(), manifesto), manifesto)
+    motivos = _motivos(planejar(_grafo(versao_prompt=2), manifesto))
+    assert motivos['prompt:a'] == ["entradas alteradas: versao"]
+    assert motivos['resposta:a'] == ["dependência refeita: prompt:a"]
+    assert motivos['pdf:a'] == ["dependência refeita: resposta:a"]
+    assert motivos['heatmap:a'] == []
+
+    motivos = _motivos(planejar(_grafo(versao_pdf=2), manifesto))
+    assert [chave for chave, m in motivos.items() if m] == ['pdf:a']
+
+
+def test_saida_ausente_refaz_o_artefato(manifesto, tmp_path):
+    saida = tmp_path / 'a.pdf'
+    saida.write_bytes(b'%PDF')
+    executar_grafo(planejar(_grafo(saida_pdf=str(saida)), manifesto), manifesto)
+    assert not any(_motivos(planejar(_grafo(saida_pdf=str(saida)), manifesto)).values())
+    saida.unlink()
+    assert _motivos(planejar(_grafo(saida_pdf=str(saida)), manifesto))['pdf:a'] == ["saída ausente"]
+
+
+def test_falha_pula_dependentes_que_continuam_desatualizados(manifesto):
+    construidos = []
+    resumo = executar_grafo(planejar(_grafo(construidos=construidos, falhar=('resposta:a',)), manifesto), manifesto)
+    assert resumo['falhas'] == 1 and resumo['pulados'] == 1 and resumo['construidos'] == 2
+    assert 'pdf:a' not in construidos
+    assert [chave for chave, _ in resumo['lista_falhas']] == ['resposta:a']
+
+    motivos = _motivos(planejar(_grafo(), manifesto))
+    assert motivos['resposta:a'] == ["novo"] and motivos['pdf:a'] == ["novo"]
+    assert motivos['prompt:a'] == []
+
+
+def test_valor_guardado_chega_ao_dependente_refeito(manifesto):
+    executar_grafo(planejar(_grafo(), manifesto), manifesto)
+    concluidos = {}
+    executar_grafo(planejar(_grafo(versao_pdf=2), manifesto), manifesto,
+                   ao_concluir=lambda artefato, valor, deps: concluidos.update({artefato.chave: (valor, deps)}))
+    assert concluidos == {'pdf:a': ("resposta para prompt v1", {'resposta:a': "resposta para prompt v1"})}
+
+
+def test_ciclo_e_dependencia_ausente_sao_rejeitados():
+    nada = lambda deps: None  # noqa: E731
+    with pytest.raises(ValueError, match="Ciclo"):
+        ordem_topologica([Artefato('a', 't', {}, nada, ('b',)), Artefato('b', 't', {}, nada, ('a',))])
+    with pytest.raises(ValueError, match="não está no grafo"):
+        ordem_topologica([Artefato('a', 't', {}, nada, ('x',))])
+
+
+def test_versoes_do_run_build_dependem_das_constantes_e_nao_do_codigo(monkeypatch):
+    import run_build
+    versoes = run_build._versoes()
+    assert run_build._versoes() == versoes
+    monkeypatch.setattr(run_build, 'VERSAO_PROMPT', run_build.VERSAO_PROMPT + 1)
+    monkeypatch.setattr(run_build, 'VERSAO_HEATMAP', run_build.VERSAO_HEATMAP + 1)
+    alteradas = {etapa for etapa, valor in run_build._versoes().items() if valor != versoes[etapa]}
+    assert alteradas == {'prompt', 'heatmap'}
@@ -0,0 +1,99 @@
+# tests/test_cli.py
+import os
+import json
+import time
+import subprocess
+import sys
+import pytest
+from eyetracking_analyzer.cli import executar_comando, enviar_ao_worker
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULOS_PESADOS = ('pandas', 'numpy', 'pyarrow', 'fpdf', 'PIL', 'google.generativeai')
+
+
+def _registro(media, participante, resposta="Análise", categoria='webpage', bloco='01'):
+    return {"participante": participante, "media_name": media, "categoria": categoria, "bloco": bloco,
+            "prompt": "p", "Resposta": resposta}
+
+
+@pytest.fixture
+def relatorio(tmp_path):
+    caminho = tmp_path / 'relatorio.jsonl'
+    linhas = [_registro('a.png', '01', "ERRO: cota"), _registro('a.png', '02'), _registro('b.png', '01', categoria='jogo'),
+              _registro('a.png', '01', "Refeita")]
+    caminho.write_text(''.join(json.dumps(linha, ensure_ascii=False) + '\n' for linha in linhas), encoding='utf-8')
+    return str(caminho)
+
+
+def _python(codigo, *argumentos):
+    return subprocess.run([sys.executable, '-c', codigo, *argumentos], cwd=RAIZ, capture_output=True, text=True)
+
+
+def test_importar_a_cli_e_consultar_nao_carrega_os_backends(relatorio):
+    processo = _python(
+        "import sys, contextlib, io\n"
+        "import eyetracking_analyzer.cli as cli\n"
+        "with contextlib.redirect_stdout(io.StringIO()):\n"
+        "    cli.main(['query', '--backend', 'jsonl', '--jsonl', sys.argv[1]])\n"
+        "    try:\n"
+        "        cli.main(['--help'])\n"
+        "    except SystemExit:\n"
+        "        pass\n"
+        f"print([m for m in {MODULOS_PESADOS!r} if m in sys.modules])\n",
+        relatorio
+    )
+    assert processo.returncode == 0, processo.stderr
+    assert processo.stdout.strip() == "[]"
+
+
+def test_executar_comando_captura_saida_e_codigo(relatorio):
+    codigo, saida = executar_comando(['query', '--backend', 'jsonl', '--jsonl', relatorio, '-p', '01'])
+    assert codigo == 0 and "2 resultado(s) encontrado(s)." in saida
+    assert "Refeita" in saida and "ERRO: cota" not in saida  # vale a gravação mais recente
+
+    codigo, saida = executar_comando(['query', '--backend', 'jsonl', '--jsonl', relatorio, '--json', '-c', 'webpage'])
+    registros = [json.loads(linha) for linha in saida.splitlines()]
+    assert codigo == 0 and {(r['media_name'], r['participante'], r['erro']) for r in registros} == \
+        {('a.png', '01', False), ('a.png', '02', False)}
+
+    assert executar_comando(['query', '--backend', 'jsonl', '--jsonl', relatorio + '.x'])[0] == 1
+    codigo, saida = executar_comando(['query', '--opcao-inexistente'])
+    assert codigo == 2 and 'opcao-inexistente' in saida
+    assert executar_comando(['--help'])[0] == 0
+
+
+def test_serve_pela_entrada_padrao(relatorio):
+    pedidos = [{"argv": ['query', '--backend', 'jsonl', '--jsonl', relatorio, '-m', 'b.png']},
+               {"argv": ['serve']}, {"sem_argv": True}]
+    processo = subprocess.run([sys.executable, '-m', 'eyetracking_analyzer', 'serve', '--sem-precarregar'], cwd=RAIZ,
+                              input=''.join(json.dumps(p) + '\n' for p in pedidos) + '\n', capture_output=True,
+                              text=True, timeout=60)
+    assert processo.returncode == 0, processo.stderr
+    respostas = [json.loads(linha) for linha in processo.stdout.splitlines()]
+    assert [r['codigo'] for r in respostas] == [0, 2, 2]
+    assert "1 resultado(s) encontrado(s)." in respostas[0]['saida'] and "b.png" in respostas[0]['saida']
+    assert respostas[1]['saida'].startswith("ERRO no pedido")
+
+
+@pytest.mark.skipif(not hasattr(__import__('socket'), 'AF_UNIX'), reason="sem sockets Unix")
+def test_serve_por_socket_atende_varios_clientes(relatorio, tmp_path, capsys):
+    endereco = str(tmp_path / 'worker.sock')
+    worker = subprocess.Popen([sys.executable, '-m', 'eyetracking_analyzer', 'serve', '--socket', endereco,
+                               '--sem-precarregar'], cwd=RAIZ, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        for _ in range(200):
+            if os.path.exists(endereco):
+                break
+            time.sleep(0.05)
+        for participante, esperado in (('01', "Refeita"), ('02', "a.png")):
+            assert enviar_ao_worker(endereco, ['query', '--backend', 'jsonl', '--jsonl', relatorio,
+                                               '-p', participante]) == 0
+            assert esperado in capsys.readouterr().out
+        # O cliente da linha de comando encaminha o subcomando com --worker.
+        processo = _python(f"import sys; from eyetracking_analyzer.cli import main; "
+                           f"sys.exit(main(['--worker', {endereco!r}, 'query', '--jsonl', {relatorio + '.x'!r}, "
+                           f"'--backend', 'jsonl']))")
+        assert processo.returncode == 1 and "não encontrado" in processo.stdout
+    finally:
+        worker.terminate()
+        worker.wait(timeout=10)
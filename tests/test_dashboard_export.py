@@ -0,0 +1,111 @@
+# tests/test_dashboard_export.py
+import os
+import gzip
+import json
+from eyetracking_analyzer.dashboard_export import exportar_dashboard, NOME_INDICE, CAMPOS_FILTRO, CAMPOS_CAMINHOS
+
+
+def _registro(media, participante, resposta="Análise", bloco='01'):
+    return {"participante": participante, "media_name": media, "categoria": "webpage", "bloco": bloco,
+            "prompt": f"Prompt de {participante} em {media}", "image_path": f"images/{media}",
+            "scanpath_path": None, "heatmap_path": None, "fixmap_path": None, "overlay_heatmap_path": None,
+            "Resposta": resposta}
+
+
+def _anexar(caminho, registros):
+    with open(caminho, 'ab') as f:
+        for registro in registros:
+            f.write((json.dumps(registro, ensure_ascii=False) + '\n').encode('utf-8'))
+
+
+def _ler_painel(destino):
+    """Lê o painel como o script.js: índice, depois o trecho [inicio, inicio+tamanho) do shard descomprimido."""
+    with open(os.path.join(destino, NOME_INDICE), encoding='utf-8') as f:
+        indice = json.load(f)
+    cards = {}
+    for registro in indice['registros']:
+        with open(os.path.join(destino, registro['shard']), 'rb') as f:
+            conteudo = gzip.decompress(f.read())
+        corpo = json.loads(conteudo[registro['inicio']:registro['inicio'] + registro['tamanho']].decode('utf-8'))
+        cards[(registro['media_name'], registro['participante'])] = {**registro, **corpo}
+    return indice, cards
+
+
+def _esperado(registros):
+    ultimos = {}
+    for registro in registros:
+        ultimos[(registro['media_name'], registro['participante'])] = registro
+    return ultimos
+
+
+def test_indice_e_shards_no_formato_do_painel(tmp_path):
+    relatorio, destino = tmp_path / 'relatorio.jsonl', tmp_path / 'painel'
+    registros = [_registro('a.png', '01'), _registro('b.png', '01', bloco='02'), _registro('a.png', '02', "Acentuação ✓"),
+                 _registro('a.png', '01', "Nova tentativa")]
+    _anexar(relatorio, registros)
+
+    resumo = exportar_dashboard(str(relatorio), str(destino), 'media')
+    indice, cards = _ler_painel(str(destino))
+
+    assert resumo['registros'] == 3 and resumo['shards'] == 2
+    assert {info['grupo'] for info in indice['shards'].values()} == {'a', 'b'}
+    assert set(cards) == set(_esperado(registros))
+    for chave, registro in _esperado(registros).items():
+        for campo in CAMPOS_FILTRO + CAMPOS_CAMINHOS + ('prompt', 'Resposta'):
+            assert cards[chave][campo] == registro[campo]
+    # Cada shard só tem prompt e resposta; os filtros e caminhos ficam no índice.
+    assert all(set(registro) == set(CAMPOS_FILTRO + CAMPOS_CAMINHOS) | {'shard', 'inicio', 'tamanho'}
+               for registro in indice['registros'])
+
+
+def test_exportacao_incremental_igual_a_completa(tmp_path):
+    relatorio, destino, referencia = tmp_path / 'relatorio.jsonl', tmp_path / 'painel', tmp_path / 'completo'
+    lote1 = [_registro(f'm{i}.png', p) for i in range(4) for p in ('01', '02')]
+    _anexar(relatorio, lote1)
+    exportar_dashboard(str(relatorio), str(destino), 'media')
+    shards_antes = {nome: os.path.getmtime(destino / nome) for nome in os.listdir(destino) if nome != NOME_INDICE}
+
+    # Uma mídia nova, um participante novo em m1 e uma nova tentativa em m2.
+    lote2 = [_registro('m9.png', '01'), _registro('m1.png', '03'), _registro('m2.png', '02', "Refeita")]
+    _anexar(relatorio, lote2)
+    resumo = exportar_dashboard(str(relatorio), str(destino), 'media')
+
+    assert resumo['bytes_lidos'] < os.path.getsize(relatorio) / 2  # só as linhas novas
+    assert resumo['gravados'] == 3 and resumo['removidos'] == 2
+    for nome, mtime in shards_antes.items():
+        if nome.startswith(('m0-', 'm3-')):
+            assert os.path.getmtime(destino / nome) == mtime  # grupos intocados não são regravados
+
+    exportar_dashboard(str(relatorio), str(referencia), 'media', completo=True)
+    assert (destino / NOME_INDICE).read_bytes() == (referencia / NOME_INDICE).read_bytes()
+    assert sorted(os.listdir(destino)) == sorted(os.listdir(referencia))
+    _, cards = _ler_painel(str(destino))
+    assert cards[('m2.png', '02')]['Resposta'] == "Refeita"
+
+
+def test_linha_incompleta_fica_para_a_proxima_exportacao(tmp_path):
+    relatorio, destino = tmp_path / 'relatorio.jsonl', tmp_path / 'painel'
+    _anexar(relatorio, [_registro('a.png', '01')])
+    linha = (json.dumps(_registro('b.png', '01')) + '\n').encode('utf-8')
+    with open(relatorio, 'ab') as f:
+        f.write(linha[:20])
+    assert exportar_dashboard(str(relatorio), str(destino))['registros'] == 1
+
+    with open(relatorio, 'ab') as f:
+        f.write(linha[20:])
+    assert exportar_dashboard(str(relatorio), str(destino))['registros'] == 2
+
+
+def test_relatorio_reescrito_refaz_a_exportacao(tmp_path):
+    relatorio, destino = tmp_path / 'relatorio.jsonl', tmp_path / 'painel'
+    _anexar(relatorio, [_registro('a.png', '01'), _registro('b.png', '01')])
+    exportar_dashboard(str(relatorio), str(destino))
+
+    relatorio.unlink()
+    _anexar(relatorio, [_registro('c.png', '01'), _registro('d.png', '01'), _registro('e.png', '01')])
+    resumo = exportar_dashboard(str(relatorio), str(destino))
+    _, cards = _ler_painel(str(destino))
+
+    assert resumo['bytes_lidos'] == os.path.getsize(relatorio)
+    assert set(cards) == {('c.png', '01'), ('d.png', '01'), ('e.png', '01')}
+    assert resumo['removidos'] == 2
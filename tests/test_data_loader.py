@@ -0,0 +1,68 @@
+# tests/test_data_loader.py
+import os
+import pickle
+import numpy as np
+import pytest
+from eyetracking_analyzer.data_loader import RegistroOcular, caminho_derivado
+from eyetracking_analyzer.fixation_index import IndiceFixacoes, construir_indice_fixacoes
+
+
+@pytest.fixture
+def indice(tmp_path):
+    logs = tmp_path / 'logs'
+    logs.mkdir()
+    linhas = [('a.png', 0.1 * i, 0.05 * i, 2.0 + 0.9 * i, 0.2 + 0.01 * i, i) for i in range(10)]
+    linhas.insert(4, ('b.png', 0.5, 0.5, 40.0, 0.3, 99))
+    with open(logs / '03_kh007_fixations.csv', 'w', encoding='utf-8') as f:
+        f.write("MEDIA_NAME,FPOGX,FPOGY,FPOGS,FPOGD,FPOGID\n")
+        f.writelines(f"{m},{x},{y},{s},{d},{i}\n" for m, x, y, s, d, i in linhas)
+    construir_indice_fixacoes(str(logs), str(tmp_path / 'indice'))
+    return IndiceFixacoes(str(tmp_path / 'indice'))
+
+
+def _registro(indice, duration='7s'):
+    return RegistroOcular(indice, '07', 'a.png', 'webpage', '03', duration, *indice.intervalo('a.png', '07'))
+
+
+def test_fixacoes_sao_views_do_indice(indice):
+    registro = _registro(indice)
+    assert registro.num_fixacoes == 10
+    for coluna, valores in registro.fixacoes.items():
+        assert np.shares_memory(valores, indice.colunas[coluna])
+    np.testing.assert_allclose(registro.fixacoes['FPOGX'], 0.1 * np.arange(10))
+    df = registro.dados_oculares
+    assert df['MEDIA_NAME'].eq('a.png').all() and df['FPOGID'].tolist() == list(range(10))
+
+
+def test_interface_de_dicionario_e_caminhos_derivados(indice):
+    registro = _registro(indice, duration='3s')
+    assert registro['media_name'] == registro.get('media_name') == 'a.png' and registro['bloco'] == '03'
+    assert 'heatmap_path' in registro and 'inexistente' not in registro and registro.get('inexistente', 1) == 1
+    with pytest.raises(KeyError):
+        registro['inexistente']
+    assert registro['scanpath_path'] == caminho_derivado('scanpath_path', 'a.png', '07', '3s')
+    assert registro['scanpath_path'].endswith(os.path.join('paths_3s', 'a', '07.png'))
+    dicionario = registro.para_dict()
+    assert list(dicionario) == list(RegistroOcular.CAMPOS) and dicionario['overlay_heatmap_path'].endswith('overlay_a.png')
+
+
+def test_janela_e_um_prefixo_pelo_fpogs_relativo(indice):
+    registro = _registro(indice)
+    inicios = np.asarray(registro.fixacoes['FPOGS'])
+    for duracao, segundos in (('1s', 1.0), ('3s', 3.0), ('7s', 7.0)):
+        janela = registro.janela(duracao)
+        esperado = int(np.sum(inicios - inicios[0] < segundos))
+        assert janela.num_fixacoes == esperado and janela.inicio == registro.inicio
+        assert janela.heatmap_path == caminho_derivado('heatmap_path', 'a.png', '07', duracao)
+    # A janela de uma janela não cresce além do intervalo atual.
+    assert registro.janela('1s').janela('7s').num_fixacoes == registro.janela('1s').num_fixacoes
+
+
+def test_pickle_leva_so_offsets_e_reabre_o_indice(indice):
+    registro = _registro(indice).janela('3s')
+    serializado = pickle.dumps(registro)
+    assert len(serializado) < 1024
+    copia = pickle.loads(serializado)
+    assert (copia.media_name, copia.participante, copia.duration) == ('a.png', '07', '3s')
+    for coluna in registro.fixacoes:
+        np.testing.assert_array_equal(copia.fixacoes[coluna], registro.fixacoes[coluna])
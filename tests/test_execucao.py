@@ -0,0 +1,32 @@
+# tests/test_execucao.py
+import pandas as pd
+from eyetracking_analyzer.execucao import gravar_parquet_mesclado
+
+
+def _df(linhas):
+    return pd.DataFrame(linhas, columns=['media_name', 'participante', 'mapa', 'nss'])
+
+
+def test_execucao_filtrada_substitui_so_as_chaves_recalculadas(tmp_path):
+    caminho = str(tmp_path / 'saida' / 'metricas.parquet')
+    chaves = ['media_name', 'participante', 'mapa']
+    gravar_parquet_mesclado(_df([('a.png', '01', 'h', 1.0), ('a.png', '02', 'h', 2.0), ('b.png', '01', 'h', 3.0)]),
+                            caminho, chaves)
+
+    # Execução com --participantes 02 e outra com outro mapa: o resto do arquivo continua lá.
+    gravar_parquet_mesclado(_df([('a.png', '02', 'h', 20.0)]), caminho, chaves)
+    gravado = gravar_parquet_mesclado(_df([('b.png', '01', 'f', 30.0)]), caminho, chaves)
+
+    esperado = [('a.png', '01', 'h', 1.0), ('a.png', '02', 'h', 20.0), ('b.png', '01', 'f', 30.0),
+                ('b.png', '01', 'h', 3.0)]
+    assert list(gravado.itertuples(index=False, name=None)) == esperado
+    assert list(pd.read_parquet(caminho).itertuples(index=False, name=None)) == esperado
+    assert not (tmp_path / 'saida' / 'metricas.parquet.tmp').exists()
+
+
+def test_chave_por_midia_substitui_a_midia_inteira(tmp_path):
+    caminho = str(tmp_path / 'similaridade.parquet')
+    gravar_parquet_mesclado(_df([('a.png', '01', '', 1.0), ('a.png', '02', '', 2.0), ('b.png', '01', '', 3.0)]),
+                            caminho, ['media_name'])
+    gravado = gravar_parquet_mesclado(_df([('a.png', '01', '', 9.0)]), caminho, ['media_name'])
+    assert list(gravado.itertuples(index=False, name=None)) == [('a.png', '01', '', 9.0), ('b.png', '01', '', 3.0)]
@@ -0,0 +1,95 @@
+# tests/test_fixation_index.py
+import os
+import multiprocessing
+import numpy as np
+import pytest
+from eyetracking_analyzer import fixation_index
+from eyetracking_analyzer.fixation_index import (
+    IndiceFixacoes, carregar_indice_fixacoes, construir_indice_fixacoes, limites_janelas
+)
+
+CABECALHO = "MEDIA_NAME,FPOGX,FPOGY,FPOGS,FPOGD,FPOGID,OUTRA\n"
+
+
+def _gravar_log(logs_dir, nome, linhas):
+    with open(os.path.join(logs_dir, nome), 'w', encoding='utf-8') as f:
+        f.write(CABECALHO)
+        for media, x, y, s, d, i in linhas:
+            f.write(f"{media},{x},{y},{s},{d},{i},lixo\n")
+
+
+@pytest.fixture
+def logs_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(fixation_index, '_indice_carregado', None)
+    logs = tmp_path / 'logs'
+    logs.mkdir()
+    _gravar_log(logs, '01_kh005_fixations.csv', [
+        ('b.png', 0.5, 0.5, 10.0, 0.2, 1), ('a.png', 0.1, 0.2, 1.0, 0.3, 2),
+        ('b.png', 0.6, 0.4, 10.5, 0.1, 3), ('a.png', 0.3, 0.4, 1.5, 0.2, 4),
+    ])
+    _gravar_log(logs, '02_kh012_fixations.csv', [('a.png', 0.9, 0.8, 3.0, 0.4, 1)])
+    return str(logs)
+
+
+def test_construir_e_consultar(logs_dir, tmp_path):
+    diretorio = str(tmp_path / 'indice')
+    construir_indice_fixacoes(logs_dir, diretorio)
+    indice = IndiceFixacoes(diretorio)
+
+    assert len(indice) == 3
+    a05 = indice.obter('a.png', '05')
+    # Ordem original das fixações dentro da chave, colunas extras ignoradas.
+    np.testing.assert_array_equal(a05['FPOGX'], [0.1, 0.3])
+    np.testing.assert_array_equal(a05['FPOGID'], [2, 4])
+    np.testing.assert_array_equal(indice.obter('b.png', '05')['FPOGS'], [10.0, 10.5])
+    assert indice.obter('b.png', '12') is None
+    assert sorted(indice.participantes('a.png')) == ['05', '12']
+    assert indice.participantes('a.png', bloco='02') == ['12']
+    assert indice.possui_log('01', '05') and not indice.possui_log('01', '12')
+    df = indice.obter_dataframe('a.png', '12')
+    assert list(df.columns[:3]) == ['MEDIA_NAME', 'FPOGX', 'FPOGY'] and df['MEDIA_NAME'].tolist() == ['a.png']
+    assert not [nome for nome in os.listdir(tmp_path) if '.tmp' in nome or nome.endswith('.old')]
+
+
+def test_assinatura_invalida_o_indice(logs_dir, tmp_path):
+    diretorio = str(tmp_path / 'indice')
+    primeiro = carregar_indice_fixacoes(logs_dir, diretorio)
+    assert carregar_indice_fixacoes(logs_dir, diretorio) is primeiro
+
+    # Log alterado: reconstrói. Log novo: reconstrói e passa a conter o participante.
+    _gravar_log(logs_dir, '02_kh012_fixations.csv', [('a.png', 0.9, 0.8, 3.0, 0.4, 1), ('c.png', 0, 0, 4.0, 0.1, 2)])
+    segundo = carregar_indice_fixacoes(logs_dir, diretorio)
+    assert segundo is not primeiro and segundo.obter('c.png', '12') is not None
+    _gravar_log(logs_dir, '02_kh020_fixations.csv', [('c.png', 0.2, 0.2, 0.0, 0.1, 1)])
+    assert carregar_indice_fixacoes(logs_dir, diretorio).participantes('c.png') == ['12', '20']
+
+    # Outro processo (outro _indice_carregado) reaproveita o índice gravado em vez de reconstruir.
+    fixation_index._indice_carregado = None
+    mtime = os.stat(os.path.join(diretorio, fixation_index.NOME_MANIFESTO)).st_mtime_ns
+    carregar_indice_fixacoes(logs_dir, diretorio)
+    assert os.stat(os.path.join(diretorio, fixation_index.NOME_MANIFESTO)).st_mtime_ns == mtime
+
+
+def _carregar_em_outro_processo(argumentos):
+    logs_dir, diretorio = argumentos
+    indice = carregar_indice_fixacoes(logs_dir, diretorio)
+    return len(indice), indice.obter('a.png', '05')['FPOGX'].tolist()
+
+
+def test_reconstrucoes_concorrentes(logs_dir, tmp_path):
+    diretorio = str(tmp_path / 'indice')
+    construir_indice_fixacoes(logs_dir, diretorio)
+    contexto = multiprocessing.get_context('fork' if hasattr(os, 'fork') else 'spawn')
+    with contexto.Pool(6) as pool:
+        for rodada in range(4):
+            # Índice desatualizado: todos os processos tentam reconstruir ao mesmo tempo.
+            _gravar_log(logs_dir, f'03_kh0{30 + rodada}_fixations.csv', [('d.png', 0, 0, 0.0, 0.1, 1)])
+            resultados = pool.map(_carregar_em_outro_processo, [(logs_dir, diretorio)] * 12)
+            assert set(map(tuple, ((n, tuple(x)) for n, x in resultados))) == {(4 + rodada, (0.1, 0.3))}
+    assert sorted(os.listdir(tmp_path)) == ['indice', 'indice.lock', 'logs']
+
+
+def test_limites_janelas():
+    tempos = np.array([5.0, 5.5, 6.9, 7.0, 12.0])
+    np.testing.assert_array_equal(limites_janelas(tempos, [1, 2, None]), [2, 3, 5])
+    np.testing.assert_array_equal(limites_janelas([], [1]), [0])
@@ -0,0 +1,83 @@
+# tests/test_map_store.py
+import os
+import uuid
+import numpy as np
+import pytest
+from PIL import Image
+from config import SALIENCY_MAPS_DIR, SCANPATHS_DIR
+from eyetracking_analyzer import map_store
+from eyetracking_analyzer.map_store import (
+    carregar_pacote_mapas, abrir_pacote_mapas, empacotar_familia, imagem_do_pacote, localizar_no_pacote
+)
+
+
+@pytest.fixture(autouse=True)
+def pacotes_limpos(monkeypatch):
+    monkeypatch.setattr(map_store, '_pacotes_abertos', {})
+
+
+def _familia(base, prefixo):
+    familia = f"{prefixo}_{uuid.uuid4().hex[:8]}"
+    os.makedirs(os.path.join(base, familia))
+    return familia, os.path.join(base, familia)
+
+
+def _imagem(caminho, modo, tamanho, semente):
+    gerador = np.random.default_rng(semente)
+    canais = {'L': (), 'RGB': (3,), 'RGBA': (4,)}[modo]
+    array = gerador.integers(0, 256, (tamanho[1], tamanho[0]) + canais, dtype=np.uint8)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    Image.fromarray(array, modo).save(caminho)
+    return array
+
+
+def test_empacota_e_consulta_views_iguais_aos_pngs():
+    familia, origem = _familia(SALIENCY_MAPS_DIR, 'heatmaps')
+    esperados = {
+        'cinza.png': _imagem(os.path.join(origem, 'cinza.png'), 'L', (40, 30), 1),
+        'cor.png': _imagem(os.path.join(origem, 'cor.png'), 'RGB', (17, 23), 2),
+        'alfa.png': _imagem(os.path.join(origem, 'alfa.png'), 'RGBA', (9, 31), 3),
+    }
+    pacote = carregar_pacote_mapas(familia)
+    assert len(pacote) == 3 and set(pacote.chaves()) == set(esperados)
+    for nome, array in esperados.items():
+        vista = pacote.obter(nome)
+        assert vista.dtype == np.uint8 and np.array_equal(vista, array)
+        assert np.shares_memory(vista, pacote.dados)
+    assert pacote.obter('ausente.png') is None
+
+
+def test_scanpaths_por_participante_e_resolucao_reduzida():
+    familia, origem = _familia(SCANPATHS_DIR, 'paths')
+    esperado = _imagem(os.path.join(origem, 'midia', '07.png'), 'RGB', (200, 100), 4)
+    _imagem(os.path.join(origem, 'midia', '08.png'), 'RGB', (200, 100), 5)
+
+    completo = carregar_pacote_mapas(familia)
+    assert np.array_equal(completo.obter('midia.png', '07'), esperado)
+
+    empacotar_familia(familia, resolucao=50, diretorio_pacotes=map_store.MAPAS_PACOTES_DIR)
+    reduzido = abrir_pacote_mapas(familia, resolucao=50)
+    referencia = np.asarray(Image.fromarray(esperado).resize((50, 25), Image.BOX))
+    assert np.array_equal(reduzido.obter('midia.png', '07'), referencia)
+    # Os dois pacotes convivem: a resolução faz parte do nome.
+    assert abrir_pacote_mapas(familia).obter('midia.png', '07').shape == (100, 200, 3)
+
+
+def test_imagem_alterada_reempacota_e_caminhos_sao_traduzidos():
+    familia, origem = _familia(SALIENCY_MAPS_DIR, 'fixmaps')
+    caminho = os.path.join(origem, 'a.png')
+    _imagem(caminho, 'L', (12, 12), 6)
+    primeiro = carregar_pacote_mapas(familia)
+    assert carregar_pacote_mapas(familia) is primeiro
+
+    novo = _imagem(caminho, 'L', (12, 12), 7)
+    os.utime(caminho, ns=(os.stat(caminho).st_atime_ns, os.stat(caminho).st_mtime_ns + 10 ** 9))
+    atualizado = carregar_pacote_mapas(familia)
+    assert atualizado is not primeiro and np.array_equal(atualizado.obter('a.png'), novo)
+
+    pacote, chave = localizar_no_pacote(caminho)
+    assert pacote is atualizado and chave == 'a.png'
+    assert np.array_equal(imagem_do_pacote(caminho), novo)
+    assert imagem_do_pacote(os.path.join(origem, 'nao_existe.png')) is None
+    nao_empacotada, _ = _familia(SALIENCY_MAPS_DIR, 'overlay')
+    assert localizar_no_pacote(os.path.join(SALIENCY_MAPS_DIR, nao_empacotada, 'a.png')) == (None, None)
@@ -0,0 +1,206 @@
+# tests/test_model_interface.py
+import types
+import pytest
+from PIL import Image
+from eyetracking_analyzer import model_interface
+from eyetracking_analyzer.model_interface import (
+    BackendFalso, BackendModelo, ErroCotaExcedida, ErroTransitorio, LimitadorTokenBucket, MotorSubmissao, TarefaModelo,
+    dividir_resposta_lote
+)
+from eyetracking_analyzer.response_cache import CacheRespostas
+
+
+@pytest.fixture
+def imagem(tmp_path):
+    caminho = tmp_path / 'midia.png'
+    Image.new('RGB', (64, 48), (200, 120, 40)).save(caminho)
+    return str(caminho)
+
+
+def _motor(backend, **kwargs):
+    # Limitador folgado e backoff desprezível: os testes medem a lógica, não a espera.
+    return MotorSubmissao(backend, max_concorrencia=4, limitador=LimitadorTokenBucket(60_000, 10 ** 9),
+                          backoff_base=0.001, backoff_max=0.002, **kwargs)
+
+
+def test_respostas_saem_na_ordem_das_tarefas(imagem):
+    backend = BackendFalso(latencia_segundos=(0.0, 0.01), taxa_erro_429=0.0, semente=1)
+    tarefas = [TarefaModelo(f"prompt {i}" + "x" * i, imagem, contexto=i) for i in range(20)]
+    with _motor(backend) as motor:
+        pares = list(motor.submeter_em_ordem(tarefas))
+    assert [tarefa.contexto for tarefa, _ in pares] == list(range(20))
+    assert all(f"({len(tarefa.prompt_texto)} caracteres de prompt)" in resposta for tarefa, resposta in pares)
+
+
+def test_erros_429_sao_tentados_novamente(imagem):
+    backend = BackendFalso(latencia_segundos=(0.0, 0.0), taxa_erro_429=0.5, semente=3)
+    with _motor(backend, max_tentativas=20) as motor:
+        respostas = motor.submeter_lote([TarefaModelo("prompt", imagem, None)] * 10)
+    assert not any(resposta.startswith("ERRO") for resposta in respostas)
+    assert motor.estatisticas["novas_tentativas"] > 0
+    assert motor.estatisticas["sucesso"] == 10
+
+
+class BackendSempreFalha(BackendModelo):
+    nome_modelo = 'sempre-falha'
+
+    def __init__(self):
+        self.chamadas = 0
+
+    def gerar(self, prompt_texto, caminho_imagem, caminhos_extras=()):
+        self.chamadas += 1
+        raise ErroTransitorio("503")
+
+
+def test_tentativas_esgotadas_viram_string_de_erro(imagem):
+    backend = BackendSempreFalha()
+    with _motor(backend, max_tentativas=3) as motor:
+        resposta = motor.submeter(TarefaModelo("prompt", imagem, None))
+    assert resposta.startswith("ERRO")
+    assert backend.chamadas == 3
+
+
+def test_validacao_reprovada_e_tentada_novamente(imagem):
+    backend = BackendFalso(latencia_segundos=(0.0, 0.0), taxa_erro_429=0.0)
+    vistas = []
+
+    def validar(resposta):
+        vistas.append(resposta)
+        if len(vistas) < 2:
+            raise ValueError("formato inesperado")
+
+    with _motor(backend, max_tentativas=3) as motor:
+        resposta = motor.submeter(TarefaModelo("prompt", imagem, None, validar_resposta=validar))
+    assert not resposta.startswith("ERRO")
+    assert len(vistas) == 2
+
+
+def test_cache_evita_nova_chamada_e_nao_guarda_erros(imagem, tmp_path):
+    cache = CacheRespostas(str(tmp_path / 'cache.sqlite'))
+    backend = BackendFalso(latencia_segundos=(0.0, 0.0), taxa_erro_429=0.0)
+    with _motor(backend, cache=cache) as motor:
+        primeira = motor.submeter(TarefaModelo("prompt", imagem, None))
+        segunda = motor.submeter(TarefaModelo("prompt", imagem, None))
+    assert primeira == segunda
+    assert motor.estatisticas["enviadas"] == 1
+
+    falha = BackendSempreFalha()
+    with _motor(falha, cache=cache, max_tentativas=1) as motor:
+        assert motor.submeter(TarefaModelo("outro prompt", imagem, None)).startswith("ERRO")
+        assert motor.submeter(TarefaModelo("outro prompt", imagem, None)).startswith("ERRO")
+    assert falha.chamadas == 2
+
+
+def test_imagem_ausente_vira_erro_sem_novas_tentativas(tmp_path):
+    backend = BackendFalso(latencia_segundos=(0.0, 0.0), taxa_erro_429=0.0)
+    with _motor(backend) as motor:
+        resposta = motor.submeter(TarefaModelo("prompt", str(tmp_path / 'nao_existe.png'), None))
+    assert resposta.startswith("ERRO: A imagem não foi encontrada")
+    assert motor.estatisticas["novas_tentativas"] == 0
+
+
+# --- dividir_resposta_lote ---
+
+def test_lote_em_bloco_json_com_texto_em_volta():
+    resposta = 'Segue a análise:\n```json\n{"01": "Olhou o topo.", "02": "Olhou o rodapé."}\n```\nFim.'
+    assert dividir_resposta_lote(resposta, ['01', '02']) == {'01': "Olhou o topo.", '02': "Olhou o rodapé."}
+
+
+def test_lote_aceita_chaves_sem_zero_ou_com_prefixo():
+    resposta = '{"1": "A", "Participante 12": "B"}'
+    assert dividir_resposta_lote(resposta, ['01', '12']) == {'01': "A", '12': "B"}
+
+
+def test_lote_serializa_valores_estruturados():
+    resposta = '{"01": {"qualitativa": "A", "quantitativa": "B"}}'
+    analise = dividir_resposta_lote(resposta, ['01'])['01']
+    assert '"qualitativa": "A"' in analise and '"quantitativa": "B"' in analise
+
+
+def test_lote_ignora_participantes_extras():
+    assert dividir_resposta_lote('{"01": "A", "07": "X"}', ['01']) == {'01': "A"}
+
+
+@pytest.mark.parametrize("resposta, mensagem", [
+    ("Não consegui analisar a imagem.", "não contém um objeto JSON"),
+    ('{"01": "A", }', "JSON do lote inválido"),
+    ('{"01": "A"}', "participantes 02"),
+])
+def test_lote_invalido_levanta_value_error(resposta, mensagem):
+    with pytest.raises(ValueError, match=mensagem):
+        dividir_resposta_lote(resposta, ['01', '02'])
+
+
+class _Relogio:
+    """Relógio falso para o limitador: sleep() só avança o tempo e registra a espera."""
+
+    def __init__(self):
+        self.agora = 1000.0
+        self.esperas = []
+
+    def monotonic(self):
+        return self.agora
+
+    def sleep(self, segundos):
+        self.esperas.append(segundos)
+        self.agora += segundos
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = _Relogio()
+    monkeypatch.setattr(model_interface, 'time', types.SimpleNamespace(monotonic=relogio.monotonic, sleep=relogio.sleep))
+    return relogio
+
+
+def test_token_bucket_espera_o_balde_mais_restritivo(relogio):
+    limitador = LimitadorTokenBucket(requisicoes_por_minuto=2, tokens_por_minuto=600)
+    limitador.adquirir(100)
+    limitador.adquirir(100)
+    assert relogio.esperas == []  # os dois cabem no balde cheio
+    limitador.adquirir(100)
+    assert sum(relogio.esperas) == pytest.approx(30.0)  # requisições: uma volta a cada 30 s
+
+    relogio.esperas.clear()
+    limitador = LimitadorTokenBucket(requisicoes_por_minuto=60, tokens_por_minuto=600)
+    limitador.adquirir(600)
+    limitador.adquirir(300)
+    assert sum(relogio.esperas) == pytest.approx(30.0)  # tokens: 300 a 10 por segundo
+    assert limitador.saldo_tok == pytest.approx(0.0)
+
+
+def test_token_bucket_nao_acumula_alem_da_capacidade_e_respeita_pausa(relogio):
+    limitador = LimitadorTokenBucket(requisicoes_por_minuto=60, tokens_por_minuto=10 ** 6)
+    relogio.agora += 3600
+    limitador.adquirir(1)
+    assert limitador.saldo_req == pytest.approx(59.0)  # uma hora parada não passa da capacidade
+
+    limitador.pausar(5.0)
+    limitador.adquirir(1)
+    assert sum(relogio.esperas) == pytest.approx(5.0)
+
+
+def test_backoff_exponencial_limitado_e_429_pausa_o_limitador(imagem, monkeypatch):
+    motor = MotorSubmissao(BackendFalso(latencia_segundos=(0.0, 0.0), taxa_erro_429=0.0), max_concorrencia=1,
+                           limitador=LimitadorTokenBucket(60_000, 10 ** 9), backoff_base=1.0, backoff_max=8.0)
+    monkeypatch.setattr(model_interface.random, 'uniform', lambda inicio, fim: fim)  # sempre o teto
+    assert [motor._espera_backoff(t) for t in range(6)] == [1.0, 2.0, 4.0, 8.0, 8.0, 8.0]
+
+    class BackendCota(BackendModelo):
+        nome_modelo = 'cota'
+        chamadas = 0
+
+        def gerar(self, prompt_texto, caminho_imagem, caminhos_extras=()):
+            self.chamadas += 1
+            if self.chamadas < 3:
+                raise ErroCotaExcedida("429")
+            return "ok"
+
+    esperas, pausas = [], []
+    monkeypatch.setattr(model_interface.time, 'sleep', esperas.append)
+    motor.backend = BackendCota()
+    monkeypatch.setattr(motor.limitador, 'pausar', pausas.append)
+    with motor:
+        assert motor.submeter(TarefaModelo("p", imagem, contexto=None)) == "ok"
+    assert esperas == pausas == [1.0, 2.0]
+    assert motor.estatisticas["novas_tentativas"] == 2
@@ -0,0 +1,127 @@
+# tests/test_pdf_generator.py
+import os
+import json
+import pytest
+from PIL import Image
+from eyetracking_analyzer import pdf_generator
+from eyetracking_analyzer.pdf_generator import (
+    obter_miniatura, obter_miniatura_jpeg, compor_imagem, criar_relatorio_pdf, criar_relatorio_pdf_consolidado,
+    gerar_relatorios_consolidados,
+    THUMB_WIDTH, THUMB_HEIGHT, COLS
+)
+
+CORES = {'image_path': (200, 40, 40), 'heatmap_path': (40, 200, 40), 'overlay_heatmap_path': (40, 40, 200),
+         'scanpath_path': (200, 200, 40), 'fixmap_path': (40, 200, 200)}
+
+
+class _FPDFRegistrado(pdf_generator.FPDF):
+    """FPDF que guarda as instâncias criadas, para inspecionar o documento depois de gravado."""
+    instancias = []
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.instancias.append(self)
+
+
+@pytest.fixture
+def imagens(tmp_path):
+    caminhos = {}
+    for campo, cor in CORES.items():
+        caminhos[campo] = str(tmp_path / f'{campo}.png')
+        Image.new('RGB', (1600, 900), cor).save(caminhos[campo])
+    return caminhos
+
+
+@pytest.fixture
+def fpdf_registrado(monkeypatch):
+    _FPDFRegistrado.instancias = []
+    monkeypatch.setattr(pdf_generator, 'FPDF', _FPDFRegistrado)
+    return _FPDFRegistrado.instancias
+
+
+def _dados(imagens, media='a.png', participante='01'):
+    return {'media_name': media, 'participante': participante, 'categoria': 'webpage', 'bloco': '01', **imagens}
+
+
+def _imagens_embutidas(pdf):
+    return len(pdf.image_cache.images)
+
+
+def test_miniatura_em_cache_ate_o_arquivo_mudar(imagens):
+    caminho = imagens['image_path']
+    primeira = obter_miniatura(caminho)
+    assert obter_miniatura(caminho) is primeira
+    assert primeira.size[0] <= THUMB_WIDTH and primeira.size[1] <= THUMB_HEIGHT
+    assert obter_miniatura_jpeg(caminho)[0] is obter_miniatura_jpeg(caminho)[0]  # bytes estáveis
+
+    Image.new('RGB', (800, 600), (0, 0, 0)).save(caminho)
+    os.utime(caminho, ns=(os.stat(caminho).st_atime_ns, os.stat(caminho).st_mtime_ns + 10 ** 9))
+    nova = obter_miniatura(caminho)
+    assert nova is not primeira and nova.getpixel((0, 0)) == (0, 0, 0)
+
+
+def test_imagem_ausente_vira_placeholder_na_grade(imagens, tmp_path):
+    titulos = [("Base", imagens['image_path']), ("Ausente", str(tmp_path / 'nao_existe.png'))] * 2
+    composta = compor_imagem(titulos)
+    assert obter_miniatura(str(tmp_path / 'nao_existe.png')).size == (THUMB_WIDTH, THUMB_HEIGHT)
+    linhas = -(-len(titulos) // COLS)
+    assert composta.size[0] > COLS * THUMB_WIDTH and composta.size[1] > linhas * THUMB_HEIGHT
+
+
+def test_pdf_individual_sem_arquivos_temporarios(imagens, tmp_path, monkeypatch, fpdf_registrado):
+    saida = tmp_path / 'pdfs'
+    monkeypatch.setattr(pdf_generator, 'PDF_REPORTS_DIR', str(saida))
+    assert criar_relatorio_pdf(_dados(imagens), "Resposta do modelo")
+    assert os.listdir(saida) == ['Relatorio_Final_a_png_P01.pdf']
+    assert (saida / 'Relatorio_Final_a_png_P01.pdf').read_bytes().startswith(b'%PDF')
+    [pdf] = fpdf_registrado
+    assert pdf.pages_count == 2 and _imagens_embutidas(pdf) == 1  # texto + galeria composta
+
+
+def test_consolidado_embute_cada_imagem_uma_vez(imagens, tmp_path, fpdf_registrado):
+    registros = [(_dados(imagens, participante=p), f"Resposta {p}") for p in ('01', '02', '03', '04')]
+    assert criar_relatorio_pdf_consolidado(registros, str(tmp_path / 'consolidado.pdf'), "Mídia a.png")
+    [pdf] = fpdf_registrado
+    # As cinco miniaturas se repetem entre os quatro participantes, mas entram no PDF uma vez só.
+    assert _imagens_embutidas(pdf) == len(CORES)
+
+
+def test_sumario_e_marcadores_do_consolidado(imagens, tmp_path, fpdf_registrado):
+    registros = [(_dados(imagens, media=media, participante=p), "Resposta")
+                 for media in ('a.png', 'b.png') for p in ('01', '02', '03')]
+    assert criar_relatorio_pdf_consolidado(registros, str(tmp_path / 'consolidado.pdf'), "Bloco 01")
+    [pdf] = fpdf_registrado
+
+    secoes = [(secao.level, secao.name, secao.page_number) for secao in pdf._outline]
+    assert [(nivel, nome) for nivel, nome, _ in secoes] == [
+        (nivel, nome) for media in ('a.png', 'b.png')
+        for nivel, nome in [(0, f"M\xeddia: {media}")] + [(1, f"Participante {p}") for p in ('01', '02', '03')]
+    ]
+    # Capa e sumário vêm antes; cada participante tem a página de texto e a da galeria.
+    paginas = [pagina for _, _, pagina in secoes]
+    assert paginas[0] == 3 and paginas == sorted(paginas)
+    assert paginas[2] - paginas[1] == 2 and pdf.pages_count == paginas[-1] + 1
+
+
+def test_consolidados_agrupam_a_ultima_linha_de_cada_par(tmp_path, monkeypatch):
+    relatorio = tmp_path / 'relatorio.jsonl'
+    linhas = [
+        {'media_name': 'a.png', 'participante': '02', 'categoria': 'web', 'bloco': '01', 'Resposta': 'a02'},
+        {'media_name': 'a.png', 'participante': '01', 'categoria': 'web', 'bloco': '01', 'Resposta': 'ERRO'},
+        {'media_name': 'b.png', 'participante': '01', 'categoria': 'jogo', 'bloco': '01', 'Resposta': 'b01'},
+        {'media_name': 'a.png', 'participante': '01', 'categoria': 'web', 'bloco': '01', 'Resposta': 'a01'},
+    ]
+    relatorio.write_text(''.join(json.dumps(linha) + '\n' for linha in linhas) + '{"incompleta', encoding='utf-8')
+    gerados = {}
+    monkeypatch.setattr(pdf_generator, 'PDF_REPORTS_DIR', str(tmp_path / 'pdfs'))
+    monkeypatch.setattr(pdf_generator, 'criar_relatorio_pdf_consolidado',
+                        lambda registros, caminho, titulo: gerados.setdefault(os.path.basename(caminho), registros))
+
+    gerar_relatorios_consolidados('media', str(relatorio))
+    assert [(d['participante'], r) for d, r in gerados.pop('Relatorio_Consolidado_media_a_png.pdf')] == \
+        [('01', 'a01'), ('02', 'a02')]
+    assert list(gerados) == ['Relatorio_Consolidado_media_b_png.pdf']
+
+    gerados.clear()
+    gerar_relatorios_consolidados('categoria', str(relatorio), grupos={'jogo'})
+    assert list(gerados) == ['Relatorio_Consolidado_categoria_jogo.pdf']
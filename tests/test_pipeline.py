@@ -0,0 +1,106 @@
+# tests/test_pipeline.py
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import pytest
+from benchmarks.gerar_dataset import gerar_dataset
+from eyetracking_analyzer.pipeline import etapa_em_thread
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Roda main.py em um processo novo, já que o config é lido na importação dos módulos.
+EXECUTAR_MAIN = """
+import contextlib, io, json
+from benchmarks.run_benchmarks import _configurar_execucao_sem_modelo
+_configurar_execucao_sem_modelo()
+import main
+from config import OUTPUT_JSONL_PATH
+from eyetracking_analyzer.data_loader import iterar_dados_participante
+with contextlib.redirect_stdout(io.StringIO()):
+    main.executar_analise_completa({"participante": None, "media_name": None, "tipo_de_midia": None})
+esperados = {(d['media_name'], d['participante']) for d in iterar_dados_participante(None, None, None)}
+with open(OUTPUT_JSONL_PATH, encoding='utf-8') as f:
+    registros = [json.loads(linha) for linha in f if linha.strip()]
+print(json.dumps({"esperados": len(esperados), "registros": registros}))
+"""
+
+
+def _executar(dados):
+    processo = subprocess.run([sys.executable, '-c', EXECUTAR_MAIN], cwd=RAIZ, capture_output=True, text=True,
+                              env=dict(os.environ, UEYES_DADOS_DIR=str(dados)))
+    assert processo.returncode == 0, processo.stderr
+    return json.loads(processo.stdout.strip().splitlines()[-1])
+
+
+@pytest.fixture(scope='module')
+def dados(tmp_path_factory):
+    destino = tmp_path_factory.mktemp('ueyes') / 'dados'
+    gerar_dataset(str(destino), num_imagens=4, num_participantes=3, num_blocos=2, fixacoes_por_imagem=(5, 10),
+                  escala_imagens=0.2, com_mapas=False)
+    return destino
+
+
+def test_execucao_com_backend_falso_grava_um_registro_por_par(dados):
+    saida = _executar(dados)
+    chaves = [(r['media_name'], r['participante']) for r in saida['registros']]
+    assert saida['esperados'] > 0
+    assert len(chaves) == len(set(chaves)) == saida['esperados']
+    assert not [r for r in saida['registros'] if r['Resposta'].startswith('ERRO')]
+
+    # Retomada: uma segunda execução não envia nem grava nada de novo.
+    assert _executar(dados)['registros'] == saida['registros']
+
+
+def test_etapa_aplica_a_funcao_em_ordem_e_em_outra_thread():
+    threads = set()
+
+    def dobrar(x):
+        threads.add(threading.current_thread().name)
+        return 2 * x
+
+    assert list(etapa_em_thread(range(50), dobrar, tamanho_fila=3, nome="teste")) == [2 * x for x in range(50)]
+    assert threads == {"pipeline-teste"}
+
+
+def test_fila_limitada_segura_o_produtor():
+    produzidos = []
+
+    def fonte():
+        for i in range(100):
+            produzidos.append(i)
+            yield i
+
+    consumidor = etapa_em_thread(fonte(), tamanho_fila=4)
+    for consumidos in range(1, 6):
+        next(consumidor)
+        time.sleep(0.05)  # tempo de sobra para o produtor encher a fila
+        # Na fila cabem 4 itens; o produtor ainda segura 1 esperando vaga.
+        assert len(produzidos) <= consumidos + 4 + 1
+    consumidor.close()
+    assert len(produzidos) < 100
+
+
+def test_erro_da_etapa_chega_ao_consumidor():
+    def falhar(x):
+        if x == 3:
+            raise ValueError("registro inválido")
+        return x
+
+    recebidos = []
+    with pytest.raises(ValueError, match="registro inválido"):
+        for item in etapa_em_thread(range(10), falhar):
+            recebidos.append(item)
+    assert recebidos == [0, 1, 2]
+
+
+def test_consumidor_que_para_antes_encerra_a_thread():
+    antes = {t.name for t in threading.enumerate()}
+    consumidor = etapa_em_thread(iter(range(10 ** 6)), tamanho_fila=2, nome="interrompida")
+    for item in consumidor:
+        if item == 5:
+            break
+    consumidor.close()
+    assert "pipeline-interrompida" not in {t.name for t in threading.enumerate()} - antes
@@ -0,0 +1,94 @@
+# tests/test_profiling.py
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import pytest
+from eyetracking_analyzer import profiling
+from eyetracking_analyzer.profiling import (
+    medir, medido, iniciar_perfil, finalizar_perfil, carregar_spans, resumir_spans, formatar_prometheus,
+    VARIAVEL_EXECUCAO
+)
+
+
+@pytest.fixture
+def perfil_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, 'PERFIL_DIR', str(tmp_path))
+    monkeypatch.delenv(VARIAVEL_EXECUCAO, raising=False)
+    yield tmp_path
+    os.environ.pop(VARIAVEL_EXECUCAO, None)
+
+
+@medido('teste.decorada')
+def _decorada(x):
+    return x + 1
+
+
+def _span_no_filho(etapa):
+    with medir(etapa, origem='filho'):
+        return os.getpid()
+
+
+def test_sem_perfil_nao_grava_nada(perfil_dir):
+    assert iniciar_perfil(ativo=False) is None
+    with medir('teste.etapa') as span:
+        assert span is None
+    assert _decorada(1) == 2
+    assert os.listdir(perfil_dir) == []
+
+
+def test_spans_de_threads_e_processos_vao_para_a_mesma_execucao(perfil_dir):
+    execucao = iniciar_perfil(ativo=True)
+    with medir('teste.principal', registro='a.png'):
+        pass
+    assert _decorada(1) == 2
+    linha = threading.Thread(target=lambda: medir('teste.thread').__enter__().__exit__(None, None, None),
+                             name='etapa-teste')
+    linha.start()
+    linha.join()
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        pid_filho = executor.submit(_span_no_filho, 'teste.processo').result()
+    with pytest.raises(ValueError):
+        with medir('teste.falha'):
+            raise ValueError("falhou")
+
+    spans = {span['etapa']: span for span in carregar_spans(execucao)}
+    assert set(spans) == {'teste.principal', 'teste.decorada', 'teste.thread', 'teste.processo', 'teste.falha'}
+    assert spans['teste.principal']['registro'] == 'a.png' and spans['teste.thread']['thread'] == 'etapa-teste'
+    assert spans['teste.processo']['pid'] == pid_filho != os.getpid() and spans['teste.processo']['origem'] == 'filho'
+    assert spans['teste.falha']['erro'] == 'ValueError' and 'erro' not in spans['teste.principal']
+    assert all(span['execucao'] == execucao and span['parede_s'] >= 0 for span in spans.values())
+
+
+def test_execucoes_seguidas_no_mesmo_processo_ficam_separadas(perfil_dir):
+    primeira = iniciar_perfil(ativo=True)
+    with medir('teste.primeira'):
+        pass
+    finalizar_perfil(primeira, formato='tabela')
+    assert VARIAVEL_EXECUCAO not in os.environ
+
+    os.environ[VARIAVEL_EXECUCAO] = segunda = primeira + '-2'
+    with medir('teste.segunda'):
+        pass
+    assert [span['etapa'] for span in carregar_spans(primeira)] == ['teste.primeira']
+    assert [span['etapa'] for span in carregar_spans(segunda)] == ['teste.segunda']
+
+
+def test_resumo_e_formato_prometheus(perfil_dir):
+    spans = [{'etapa': 'a', 'parede_s': p, 'cpu_s': 0.5, 'bytes_lidos': 10, 'pico_rss_mb': 50.0} for p in (1, 2, 3, 4)]
+    spans += [{'etapa': 'b', 'parede_s': 20.0, 'cpu_s': 1.0, 'erro': 'OSError', 'pico_rss_mb': None}]
+    resumo = resumir_spans(spans)
+    assert [r['etapa'] for r in resumo] == ['b', 'a']  # maior tempo de parede primeiro
+    a = resumo[1]
+    assert (a['chamadas'], a['parede_total_s'], a['parede_p50_s'], a['cpu_total_s'], a['bytes_lidos']) == (4, 10, 2.5, 2, 40)
+    assert resumo[0]['erros'] == 1 and resumo[0]['pico_rss_mb'] is None
+
+    texto = formatar_prometheus(resumo, 'exec1')
+    assert 'ueyes_etapa_chamadas_total{execucao="exec1",etapa="a"} 4\n' in texto
+    assert '# TYPE ueyes_etapa_parede_p95_segundos gauge\n' in texto
+    assert 'ueyes_etapa_pico_rss_megabytes{execucao="exec1",etapa="b"}' not in texto
+
+    os.environ[VARIAVEL_EXECUCAO] = 'exec1'
+    with medir('c'):
+        pass
+    finalizar_perfil('exec1', formato='prometheus')
+    assert 'etapa="c"' in (perfil_dir / 'perfil_exec1.prom').read_text(encoding='utf-8')
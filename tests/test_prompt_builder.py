@@ -0,0 +1,81 @@
+# tests/test_prompt_builder.py
+import numpy as np
+import pytest
+from eyetracking_analyzer.prompt_builder import (
+    codificar_fixacoes, formatar_sequencia_fixacoes, DESCRICAO_FORMATO_COMPACTO, TEXTOS_POR_FORMATO
+)
+
+
+def _fixacoes(x, y, inicio, duracao):
+    return {'FPOGX': np.asarray(x, dtype=float), 'FPOGY': np.asarray(y, dtype=float),
+            'FPOGS': np.asarray(inicio, dtype=float), 'FPOGD': np.asarray(duracao, dtype=float)}
+
+
+def _decodificar(texto):
+    """Desfaz os deltas: (x, y, início em ms, duração em ms) de cada fixação enviada."""
+    corpo = texto[texto.index('[') + 1:texto.rindex(']')]
+    linhas = np.array([[int(v) for v in item.split(',')] for item in corpo.split(';')])
+    return np.cumsum(linhas[:, 0]), np.cumsum(linhas[:, 1]), np.cumsum(linhas[:, 2]), linhas[:, 3]
+
+
+def _aleatorias(n, semente=0):
+    gerador = np.random.default_rng(semente)
+    duracao = gerador.uniform(0.05, 0.8, n)
+    inicio = 12.0 + np.concatenate(([0.0], np.cumsum(duracao[:-1] + 0.02)))
+    return _fixacoes(gerador.uniform(0, 1, n), gerador.uniform(0, 1, n), inicio, duracao)
+
+
+def test_quantizacao_e_deltas_ida_e_volta():
+    dados = _aleatorias(30)
+    texto, relatorio = codificar_fixacoes(dados, orcamento_tokens=10 ** 6, grade=1000, raio_fusao=0)
+    x, y, inicio_ms, duracao_ms = _decodificar(texto)
+    assert relatorio['fixacoes_enviadas'] == 30 and not relatorio['excedeu_orcamento']
+    assert np.abs(x / 1000 - dados['FPOGX']).max() <= relatorio['erro_max_quantizacao'] + 1e-12
+    assert np.abs(y / 1000 - dados['FPOGY']).max() <= relatorio['erro_max_quantizacao'] + 1e-12
+    np.testing.assert_array_equal(inicio_ms - inicio_ms[0], np.rint(dados['FPOGS'] * 1000) - np.rint(dados['FPOGS'][0] * 1000))
+    np.testing.assert_array_equal(duracao_ms, np.rint(dados['FPOGD'] * 1000))
+
+
+def test_fusao_de_fixacoes_consecutivas_proximas():
+    # 0 e 1 estão a 0.005 (fundem); 2 está longe; 3 volta para perto de 0, mas não é consecutiva.
+    dados = _fixacoes([0.100, 0.105, 0.600, 0.101], [0.2, 0.2, 0.6, 0.2], [1.0, 1.3, 1.5, 2.0], [0.1, 0.3, 0.2, 0.4])
+    texto, relatorio = codificar_fixacoes(dados, orcamento_tokens=10 ** 6, grade=1000, raio_fusao=0.01)
+    x, y, inicio_ms, duracao_ms = _decodificar(texto)
+    assert relatorio['fixacoes_apos_fusao'] == relatorio['fixacoes_enviadas'] == 3
+    assert x[0] == round((0.100 * 0.1 + 0.105 * 0.3) / 0.4 * 1000)  # média ponderada pela duração
+    np.testing.assert_array_equal(duracao_ms, [400, 200, 400])        # soma das durações fundidas
+    np.testing.assert_array_equal(inicio_ms - inicio_ms[0], [0, 500, 1000])  # início da primeira
+    assert relatorio['fracao_duracao_mantida'] == pytest.approx(1.0)
+
+
+def test_corte_por_orcamento_mantem_primeira_ultima_e_as_mais_longas():
+    dados = _aleatorias(300, semente=1)
+    texto, relatorio = codificar_fixacoes(dados, orcamento_tokens=600, grade=1000, raio_fusao=0)
+    assert relatorio['tokens_estimados'] <= 600 and not relatorio['excedeu_orcamento']
+    assert 2 < relatorio['fixacoes_enviadas'] < 300
+
+    _, _, inicio_ms, duracao_ms = _decodificar(texto)
+    inicios_originais = np.rint(dados['FPOGS'] * 1000)
+    enviados = np.searchsorted(inicios_originais - inicios_originais[0], inicio_ms - inicio_ms[0])
+    assert enviados[0] == 0 and enviados[-1] == 299 and np.all(np.diff(enviados) > 0)  # ordem temporal
+    meio = np.rint(dados['FPOGD'][1:-1] * 1000)
+    descartados = np.setdiff1d(np.arange(1, 299), enviados) - 1
+    assert meio[enviados[1:-1] - 1].min() >= meio[descartados].max()
+    assert relatorio['fracao_duracao_mantida'] == pytest.approx(
+        dados['FPOGD'][enviados].sum() / dados['FPOGD'].sum())
+
+
+def test_orcamento_impossivel_e_informado(capsys):
+    texto, relatorio = codificar_fixacoes(_aleatorias(50), orcamento_tokens=10, raio_fusao=0)
+    assert relatorio['fixacoes_enviadas'] == 2 and relatorio['excedeu_orcamento']
+    assert relatorio['tokens_estimados'] > 10
+    assert 'AVISO' in capsys.readouterr().out
+
+
+def test_formato_compacto_usa_instrucoes_proprias():
+    texto, descricao = formatar_sequencia_fixacoes(_aleatorias(5), formato='compacto')
+    assert texto.startswith('x,y,dt,d = [') and descricao is DESCRICAO_FORMATO_COMPACTO
+    descricao_compacta, itens_compactos = TEXTOS_POR_FORMATO['compacto']
+    # As instruções só citam o que o formato compacto envia (nada das listas FPOGX/FPOGS/FPOGD).
+    assert 'listas' not in itens_compactos and 'FPOGS e FPOGD' not in itens_compactos
+    assert 'dt' in itens_compactos and 'dt' in descricao_compacta
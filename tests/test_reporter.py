@@ -0,0 +1,69 @@
+# tests/test_reporter.py
+import json
+from eyetracking_analyzer.reporter import EscritorRelatorioJsonl, carregar_chaves_concluidas
+
+
+def _registro(media, participante, resposta="Análise"):
+    return {"media_name": media, "participante": participante, "Resposta": resposta}
+
+
+def _gravar(caminho, registros, sufixo=b""):
+    with open(caminho, 'wb') as f:
+        for registro in registros:
+            f.write((json.dumps(registro, ensure_ascii=False) + '\n').encode('utf-8'))
+        f.write(sufixo)
+
+
+def test_relatorio_inexistente_nao_tem_chaves(tmp_path):
+    assert carregar_chaves_concluidas(str(tmp_path / 'nao_existe.jsonl')) == set()
+
+
+def test_linha_incompleta_no_fim_e_removida(tmp_path):
+    caminho = tmp_path / 'relatorio.jsonl'
+    _gravar(caminho, [_registro('a.png', '01'), _registro('b.png', '02')], sufixo=b'{"media_name": "c.png", "partic')
+    tamanho_valido = len(caminho.read_bytes()) - len(b'{"media_name": "c.png", "partic')
+
+    assert carregar_chaves_concluidas(str(caminho)) == {('a.png', '01'), ('b.png', '02')}
+    assert len(caminho.read_bytes()) == tamanho_valido
+    assert caminho.read_bytes().endswith(b'\n')
+
+
+def test_arquivo_so_com_linha_incompleta_fica_vazio(tmp_path):
+    caminho = tmp_path / 'relatorio.jsonl'
+    caminho.write_bytes(b'{"media_name": "a.png"')
+    assert carregar_chaves_concluidas(str(caminho)) == set()
+    assert caminho.read_bytes() == b''
+
+
+def test_respostas_de_erro_sao_tentadas_novamente(tmp_path):
+    caminho = tmp_path / 'relatorio.jsonl'
+    _gravar(caminho, [
+        _registro('a.png', '01', "ERRO: cota excedida"),
+        _registro('b.png', '02'),
+        _registro('b.png', '02', "ERRO: timeout"),   # a linha mais recente vale
+        _registro('c.png', '03', "ERRO: timeout"),
+        _registro('c.png', '03'),
+    ])
+    assert carregar_chaves_concluidas(str(caminho)) == {('c.png', '03')}
+
+
+def test_linhas_invalidas_sao_ignoradas(tmp_path):
+    caminho = tmp_path / 'relatorio.jsonl'
+    caminho.write_bytes(b'nao e json\n\n' + (json.dumps(_registro('a.png', 1)) + '\n').encode('utf-8'))
+    # O participante é comparado como texto, como as chaves de iterar_dados_participante.
+    assert carregar_chaves_concluidas(str(caminho)) == {('a.png', '1')}
+
+
+def test_escritor_acrescenta_e_retomada_le_o_que_foi_escrito(tmp_path):
+    caminho = str(tmp_path / 'saida' / 'relatorio.jsonl')
+    with EscritorRelatorioJsonl(caminho, flush_a_cada=1) as escritor:
+        escritor.escrever(_registro('a.png', '01', "Análise com acentuação"))
+    with EscritorRelatorioJsonl(caminho) as escritor:
+        escritor.escrever(_registro('b.png', '02'))
+        assert escritor.total_escritos == 1
+
+    with open(caminho, encoding='utf-8') as f:
+        linhas = [json.loads(linha) for linha in f]
+    assert [linha['media_name'] for linha in linhas] == ['a.png', 'b.png']
+    assert linhas[0]['Resposta'] == "Análise com acentuação"
+    assert carregar_chaves_concluidas(caminho) == {('a.png', '01'), ('b.png', '02')}
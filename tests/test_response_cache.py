@@ -0,0 +1,61 @@
+# tests/test_response_cache.py
+import pytest
+from eyetracking_analyzer.response_cache import CacheRespostas
+
+
+@pytest.fixture
+def imagem(tmp_path):
+    caminho = tmp_path / 'midia.png'
+    caminho.write_bytes(b'bytes da imagem')
+    return str(caminho)
+
+
+def _cache(tmp_path, nome='cache.sqlite', **kwargs):
+    return CacheRespostas(str(tmp_path / nome), **kwargs)
+
+
+def test_chave_muda_com_modelo_prompt_e_imagem(tmp_path, imagem):
+    cache = _cache(tmp_path)
+    outra = tmp_path / 'outra.png'
+    outra.write_bytes(b'outros bytes')
+    chaves = {
+        cache.chave('modelo-a', 'prompt', imagem),
+        cache.chave('modelo-b', 'prompt', imagem),
+        cache.chave('modelo-a', 'prompt 2', imagem),
+        cache.chave('modelo-a', 'prompt', str(outra)),
+        cache.chave('modelo-a', 'prompt', imagem, (str(outra),)),
+    }
+    assert len(chaves) == 5
+    assert cache.chave('modelo-a', 'prompt', imagem) == cache.chave('modelo-a', 'prompt', imagem)
+
+
+def test_chave_muda_com_configuracao_do_payload(tmp_path, imagem):
+    jpeg = _cache(tmp_path, 'a.sqlite', payload='1536|JPEG|85')
+    menor = _cache(tmp_path, 'b.sqlite', payload='768|JPEG|85')
+    original = _cache(tmp_path, 'c.sqlite', payload=None)
+    chaves = {c.chave('modelo', 'prompt', imagem) for c in (jpeg, menor, original)}
+    assert len(chaves) == 3
+
+
+def test_guardar_obter_e_remocao_lru(tmp_path):
+    cache = _cache(tmp_path, tamanho_max_bytes=25)
+    cache.guardar('a', 'x' * 10)
+    cache.guardar('b', 'y' * 10)
+    assert cache.obter('a') == 'x' * 10  # 'a' passa a ser a mais recente
+    cache.guardar('c', 'z' * 10)         # passa do limite: sai a menos usada ('b')
+    assert cache.obter('b') is None
+    assert cache.obter('a') == 'x' * 10 and cache.obter('c') == 'z' * 10
+    assert cache.acertos == 3 and cache.falhas == 1
+
+
+def test_arquivo_compartilhado_entre_processos(tmp_path):
+    # Dois workers de shard usam o mesmo arquivo: um vê o que o outro guardou e a
+    # remoção LRU conta o que todos gravaram, não só o que este processo gravou.
+    a = _cache(tmp_path, tamanho_max_bytes=25)
+    b = _cache(tmp_path, tamanho_max_bytes=25)
+    a.guardar('a', 'x' * 10)
+    assert b.obter('a') == 'x' * 10
+    b.guardar('b', 'y' * 10)
+    a.guardar('c', 'z' * 10)  # 'a' conta 10 bytes, mas o arquivo já tem 30: sai a menos usada ('a')
+    assert b.obter('a') is None
+    assert b.obter('b') == 'y' * 10 and b.obter('c') == 'z' * 10
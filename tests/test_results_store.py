@@ -0,0 +1,88 @@
+# tests/test_results_store.py
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from eyetracking_analyzer.data_loader import CAMPOS_CAMINHO, caminho_derivado
+from eyetracking_analyzer.prompt_builder import construir_prompt_completo, modelos_de_prompt
+from eyetracking_analyzer.results_store import ArmazemResultados, decompor_prompt, importar_jsonl, CAMPOS_REGISTRO
+
+
+def _prompt(media, participante, semente):
+    gerador = np.random.default_rng(semente)
+    n = 6
+    fixacoes = pd.DataFrame({'FPOGX': gerador.uniform(0, 1, n), 'FPOGY': gerador.uniform(0, 1, n),
+                             'FPOGS': np.cumsum(gerador.uniform(0.1, 0.5, n)), 'FPOGD': gerador.uniform(0.1, 0.4, n),
+                             'FPOGID': np.arange(n)})
+    return construir_prompt_completo({'media_name': media, 'participante': participante, 'categoria': 'webpage',
+                                      'dados_oculares': fixacoes})
+
+
+def _resultado(media, participante, resposta="Análise", categoria='webpage', bloco='01', prompt=None, duracao='7s'):
+    return {"participante": participante, "media_name": media, "categoria": categoria, "bloco": bloco,
+            "prompt": prompt if prompt is not None else _prompt(media, participante, int(participante) + ord(media[0])),
+            **{campo: caminho_derivado(campo, media, participante, duracao) for campo in CAMPOS_CAMINHO},
+            "Resposta": resposta}
+
+
+def test_decompor_prompt_reconstroi_o_texto():
+    prompt = _prompt('a.png', '03', 1)
+    hash_modelo, variaveis = decompor_prompt(prompt)
+    assert hash_modelo is not None and variaveis['participante'] == '03' and variaveis['media_name'] == 'a.png'
+    modelo = next(m for m in modelos_de_prompt() if m.format(**variaveis) == prompt)
+    assert len(modelo) > len(prompt) / 4  # o texto fixo é uma boa parte do prompt
+    assert decompor_prompt("Um prompt escrito à mão.") == (None, None)
+    assert decompor_prompt(prompt + " (editado)") == (None, None)
+
+
+def test_escrever_e_consultar_devolvem_os_mesmos_registros(tmp_path):
+    caminho_fora = {campo: f"/outro/lugar/{campo}.png" for campo in CAMPOS_CAMINHO}
+    resultados = [
+        _resultado('a.png', '01'),
+        _resultado('a.png', '02', "ERRO: cota", bloco='1'),
+        _resultado('b.png', '01', categoria='jogo', bloco='03', prompt="Prompt livre {com chaves}"),
+        {**_resultado('c.png', '04', duracao='3s'), **caminho_fora},
+    ]
+    with ArmazemResultados(str(tmp_path), linhas_por_arquivo=2, descarga_segundos=3600) as armazem:
+        for i, resultado in enumerate(resultados):
+            armazem.escrever(resultado, gravado_em=i + 1)
+
+    lidos = {(r['media_name'], r['participante']): r for r in ArmazemResultados(str(tmp_path)).iterar_resultados()}
+    assert len(lidos) == len(resultados)
+    for resultado in resultados:
+        esperado = {**resultado, 'bloco': resultado['bloco'].zfill(2)}
+        assert lidos[(resultado['media_name'], resultado['participante'])] == {c: esperado[c] for c in CAMPOS_REGISTRO}
+
+    # Só o prompt livre e os caminhos fora do padrão são gravados por extenso.
+    bruto = pd.read_parquet(str(tmp_path))
+    assert bruto['prompt'].notna().sum() == 1 and bruto['caminhos'].notna().sum() == 1
+    assert json.loads(bruto.loc[bruto['caminhos'].notna(), 'caminhos'].iloc[0]) == caminho_fora
+
+
+def test_consulta_filtrada_e_gravacao_mais_recente(tmp_path):
+    armazem = ArmazemResultados(str(tmp_path), linhas_por_arquivo=100, descarga_segundos=3600)
+    armazem.escrever(_resultado('a.png', '01', "ERRO: timeout"), gravado_em=1)
+    armazem.escrever(_resultado('a.png', '02', bloco='02'), gravado_em=2)
+    armazem.escrever(_resultado('b.png', '01', categoria='jogo'), gravado_em=3)
+    armazem.sincronizar()
+    assert armazem.chaves_concluidas() == {('a.png', '02'), ('b.png', '01')}
+
+    armazem.escrever(_resultado('a.png', '01', "Refeita"), gravado_em=4)
+    armazem.fechar()
+    assert armazem.chaves_concluidas() == {('a.png', '01'), ('a.png', '02'), ('b.png', '01')}
+
+    df = armazem.consultar(participante=1)
+    assert df[['media_name', 'Resposta']].values.tolist() == [['b.png', 'Análise'], ['a.png', 'Refeita']]
+    assert len(armazem.consultar(participante='01', apenas_recentes=False)) == 3
+    assert armazem.consultar(categoria='jogo')['media_name'].tolist() == ['b.png']
+    assert armazem.consultar(bloco=[2, 5])['participante'].tolist() == ['02']
+    assert armazem.consultar(media_name='z.png').empty
+
+
+def test_importar_jsonl_preserva_a_ordem_de_gravacao(tmp_path):
+    relatorio = tmp_path / 'relatorio.jsonl'
+    linhas = [_resultado('a.png', '01', "ERRO"), _resultado('a.png', '01', "Segunda")]
+    relatorio.write_text(''.join(json.dumps(linha) + '\n' for linha in linhas) + 'inválida\n', encoding='utf-8')
+    assert importar_jsonl(str(relatorio), str(tmp_path / 'armazem')) == 2
+    [registro] = ArmazemResultados(str(tmp_path / 'armazem')).iterar_resultados()
+    assert registro['Resposta'] == "Segunda" and registro['prompt'] == linhas[1]['prompt']
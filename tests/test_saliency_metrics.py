@@ -0,0 +1,91 @@
+# tests/test_saliency_metrics.py
+"""Métricas vetorizadas comparadas com implementações diretas (um conjunto por vez, em laço)."""
+import numpy as np
+import pytest
+from eyetracking_analyzer.saliency_metrics import EPS, metricas_de_fixacoes, metricas_entre_mapas
+
+
+def _pixels(mapa, xs, ys):
+    h, w = mapa.shape
+    xs, ys = np.asarray(xs), np.asarray(ys)
+    validos = (xs >= 0) & (xs <= 1) & (ys >= 0) & (ys <= 1)
+    return (np.minimum((ys[validos] * h).astype(int), h - 1), np.minimum((xs[validos] * w).astype(int), w - 1))
+
+
+def _nss_referencia(mapa, xs, ys):
+    padronizado = (mapa - mapa.mean()) / mapa.std()
+    return padronizado[_pixels(mapa, xs, ys)].mean()
+
+
+def _auc_judd_referencia(mapa, xs, ys):
+    """AUC-Judd como no MIT Saliency Benchmark: um limiar por fixação."""
+    saliencia = np.sort(mapa[_pixels(mapa, xs, ys)])[::-1]
+    n_fix, n_pix = len(saliencia), mapa.size
+    tp, fp = [0.0], [0.0]
+    for i, limiar in enumerate(saliencia, start=1):
+        acima = (mapa >= limiar).sum()
+        tp.append(i / n_fix)
+        fp.append((acima - i) / (n_pix - n_fix))
+    tp.append(1.0)
+    fp.append(1.0)
+    return sum((fp[k] - fp[k - 1]) * (tp[k] + tp[k - 1]) / 2 for k in range(1, len(tp)))
+
+
+def _kl_referencia(predicao, referencia):
+    p = predicao / predicao.sum()
+    q = referencia / referencia.sum()
+    return float((q * np.log(EPS + q / (p + EPS))).sum())
+
+
+@pytest.fixture
+def rng():
+    return np.random.default_rng(42)
+
+
+def test_nss_e_auc_batem_com_a_referencia(rng):
+    mapa = rng.random((30, 40))
+    conjuntos = [(rng.random(n), rng.random(n)) for n in (1, 5, 17, 60)]
+    resultado = metricas_de_fixacoes(mapa, conjuntos)
+    for b, (xs, ys) in enumerate(conjuntos):
+        assert resultado['num_fixacoes'][b] == len(xs)
+        assert resultado['nss'][b] == pytest.approx(_nss_referencia(mapa, xs, ys), rel=1e-9)
+        assert resultado['auc_judd'][b] == pytest.approx(_auc_judd_referencia(mapa, xs, ys), rel=1e-9)
+
+
+def test_fixacoes_fora_da_imagem_sao_ignoradas_e_conjunto_vazio_e_nan(rng):
+    mapa = rng.random((10, 10))
+    xs, ys = np.array([0.5, 1.5, -0.1, 0.2]), np.array([0.5, 0.5, 0.3, 1.0])
+    resultado = metricas_de_fixacoes(mapa, [(xs, ys), (np.array([2.0]), np.array([2.0]))])
+    assert list(resultado['num_fixacoes']) == [2, 0]
+    assert resultado['nss'][0] == pytest.approx(_nss_referencia(mapa, xs, ys))
+    assert np.isnan(resultado['nss'][1]) and np.isnan(resultado['auc_judd'][1])
+
+
+def test_auc_de_mapa_que_acerta_as_fixacoes_e_alta():
+    mapa = np.zeros((20, 20))
+    mapa[5, 5] = mapa[10, 12] = 1.0
+    xs, ys = np.array([5.5, 12.5]) / 20, np.array([5.5, 10.5]) / 20
+    resultado = metricas_de_fixacoes(mapa, [(xs, ys)])
+    # Saliências empatadas nas fixações: como no benchmark, o 1º limiar já conta o outro pixel como FP.
+    assert resultado['auc_judd'][0] == pytest.approx(_auc_judd_referencia(mapa, xs, ys))
+    assert resultado['auc_judd'][0] > 0.99
+    assert resultado['nss'][0] > 5
+
+
+def test_cc_kl_sim_batem_com_a_referencia(rng):
+    mapa = rng.random((24, 32))
+    outros = rng.random((3, 24, 32)) ** 3
+    resultado = metricas_entre_mapas(mapa, outros)
+    for b, outro in enumerate(outros):
+        p, q = mapa / mapa.sum(), outro / outro.sum()
+        assert resultado['cc'][b] == pytest.approx(np.corrcoef(mapa.ravel(), outro.ravel())[0, 1], rel=1e-9)
+        assert resultado['kl'][b] == pytest.approx(_kl_referencia(mapa, outro), rel=1e-9)
+        assert resultado['sim'][b] == pytest.approx(np.minimum(p, q).sum(), rel=1e-9)
+
+
+def test_mapa_contra_ele_mesmo(rng):
+    mapa = rng.random((16, 16))
+    resultado = metricas_entre_mapas(mapa, mapa)
+    assert resultado['cc'][0] == pytest.approx(1.0)
+    assert resultado['kl'][0] == pytest.approx(0.0, abs=1e-4)
+    assert resultado['sim'][0] == pytest.approx(1.0)
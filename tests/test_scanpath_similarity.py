@@ -0,0 +1,97 @@
+# tests/test_scanpath_similarity.py
+"""Recorrências por antidiagonais comparadas com a programação dinâmica direta, par a par."""
+import math
+import numpy as np
+import pytest
+from eyetracking_analyzer.scanpath_similarity import MEDIDAS, consistencia, matrizes_similaridade
+from config import SIMILARIDADE_GRADE_COLUNAS, SIMILARIDADE_GRADE_LINHAS
+
+
+def _tabela(a, b, custo, inicio, passo):
+    n, m = len(a), len(b)
+    t = [[math.inf] * (m + 1) for _ in range(n + 1)]
+    inicio(t, n, m)
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            t[i][j] = passo(t, i, j, custo(a[i - 1], b[j - 1]))
+    return t[n][m]
+
+
+def _distancia(p, q):
+    return math.hypot(p[0] - q[0], p[1] - q[1])
+
+
+def _zerar_origem(t, n, m):
+    t[0][0] = 0.0
+
+
+def _dtw(a, b):
+    total = _tabela(a, b, _distancia, _zerar_origem,
+                    lambda t, i, j, c: c + min(t[i - 1][j], t[i][j - 1], t[i - 1][j - 1]))
+    return total / (len(a) + len(b))
+
+
+def _frechet(a, b):
+    return _tabela(a, b, _distancia, _zerar_origem,
+                   lambda t, i, j, c: max(c, min(t[i - 1][j], t[i][j - 1], t[i - 1][j - 1])))
+
+
+def _celula(p):
+    cx = (min(max(math.floor(p[0] * SIMILARIDADE_GRADE_COLUNAS), 0), SIMILARIDADE_GRADE_COLUNAS - 1) + 0.5)
+    cy = (min(max(math.floor(p[1] * SIMILARIDADE_GRADE_LINHAS), 0), SIMILARIDADE_GRADE_LINHAS - 1) + 0.5)
+    return cx / SIMILARIDADE_GRADE_COLUNAS, cy / SIMILARIDADE_GRADE_LINHAS
+
+
+def _edicao(a, b):
+    def bordas(t, n, m):
+        for i in range(n + 1):
+            t[i][0] = float(i)
+        for j in range(m + 1):
+            t[0][j] = float(j)
+
+    total = _tabela(a, b, lambda p, q: _distancia(_celula(p), _celula(q)) / math.sqrt(2), bordas,
+                    lambda t, i, j, c: min(t[i - 1][j] + 1, t[i][j - 1] + 1, t[i - 1][j - 1] + c))
+    return total / max(len(a), len(b))
+
+
+REFERENCIAS = {'dtw': _dtw, 'frechet': _frechet, 'edicao': _edicao}
+
+
+@pytest.fixture
+def scanpaths():
+    rng = np.random.default_rng(7)
+    # Comprimentos diferentes (inclusive 1) exercitam o preenchimento das sequências.
+    return [(rng.random(n), rng.random(n)) for n in (1, 4, 9, 15, 6)]
+
+
+@pytest.mark.parametrize("max_elementos", [4_000_000, 300])
+def test_matrizes_batem_com_a_referencia(scanpaths, max_elementos):
+    matrizes = matrizes_similaridade(scanpaths, max_elementos=max_elementos)
+    pontos = [list(zip(xs.astype(np.float32), ys.astype(np.float32))) for xs, ys in scanpaths]
+    for medida in MEDIDAS:
+        matriz = matrizes[medida]
+        assert matriz.shape == (5, 5)
+        assert np.allclose(matriz, matriz.T) and np.all(np.diag(matriz) == 0)
+        for a in range(5):
+            for b in range(a + 1, 5):
+                esperado = REFERENCIAS[medida](pontos[a], pontos[b])
+                assert matriz[a, b] == pytest.approx(esperado, rel=1e-4, abs=1e-6), (medida, a, b)
+
+
+def test_scanpath_vazio_fica_nan():
+    matrizes = matrizes_similaridade([(np.array([0.1, 0.2]), np.array([0.3, 0.4])), (np.array([]), np.array([]))])
+    for medida in MEDIDAS:
+        assert np.isnan(matrizes[medida][0, 1])
+
+
+def test_consistencia_de_trajetos_identicos_e_1():
+    xs, ys = np.array([0.1, 0.5, 0.9]), np.array([0.2, 0.6, 0.4])
+    matrizes = matrizes_similaridade([(xs, ys)] * 3)
+    valor, por_participante = consistencia(matrizes)
+    assert valor == pytest.approx(1.0)
+    assert np.allclose(por_participante['dtw'], 0.0) and np.allclose(por_participante['similaridade'], 1.0)
+
+
+def test_consistencia_com_um_participante_e_nan():
+    valor, por_participante = consistencia(matrizes_similaridade([(np.array([0.5]), np.array([0.5]))]))
+    assert np.isnan(valor) and np.isnan(por_participante['edicao']).all()
@@ -0,0 +1,127 @@
+# tests/test_sharding.py
+import json
+import time
+import pytest
+from config import SHARD_MAX_TENTATIVAS
+from eyetracking_analyzer.sharding import Leases, diretorio_saida_shard, distribuir, mesclar_shards
+
+
+def _leases(diretorio, dono, lease_segundos=60, max_tentativas=3):
+    leases = Leases(str(diretorio), lease_segundos=lease_segundos, max_tentativas=max_tentativas)
+    leases.dono = dono  # Simula workers diferentes no mesmo processo.
+    return leases
+
+
+def _estado(leases, shard):
+    return {s: estado for s, estado, *_ in leases.estados()}[shard]
+
+
+def test_cada_shard_e_assumido_por_um_worker_so(tmp_path):
+    a, b = _leases(tmp_path, 'a:1'), _leases(tmp_path, 'b:1')
+    a.inicializar(3)
+    assumidos = [a.assumir(), b.assumir(), a.assumir(), b.assumir()]
+    assert assumidos == [0, 1, 2, None]
+    assert a.renovar(0) and not b.renovar(0)
+
+
+def test_lease_vencido_passa_para_outro_worker(tmp_path):
+    a, b = _leases(tmp_path, 'a:1', lease_segundos=0.05), _leases(tmp_path, 'b:1', lease_segundos=0.05)
+    a.inicializar(1)
+    assert a.assumir() == 0 and b.assumir() is None
+    time.sleep(0.1)
+    assert b.assumir() == 0
+    assert not a.renovar(0)           # o worker antigo descobre que perdeu o shard
+    a.encerrar(0, True)               # e não consegue concluí-lo
+    assert _estado(b, 0) == 'em_andamento'
+    b.encerrar(0, True)
+    assert _estado(b, 0) == 'concluido'
+
+
+def test_falhas_devolvem_o_shard_ate_o_limite(tmp_path):
+    leases = _leases(tmp_path, 'a:1', max_tentativas=2)
+    leases.inicializar(1)
+    leases.assumir()
+    leases.encerrar(0, False)
+    assert _estado(leases, 0) == 'pendente'
+    leases.assumir()
+    leases.encerrar(0, False)
+    assert _estado(leases, 0) == 'falhou'
+    assert leases.assumir() is None
+
+
+def test_worker_morto_na_ultima_tentativa_vira_falhou(tmp_path):
+    morto = _leases(tmp_path, 'morto:1', lease_segundos=0.05, max_tentativas=1)
+    morto.inicializar(2)
+    assert morto.assumir() == 0
+    time.sleep(0.1)
+    outro = _leases(tmp_path, 'b:1', max_tentativas=1)
+    assert outro.assumir() == 1
+    assert _estado(outro, 0) == 'falhou'
+
+
+def test_distribuir_equilibra_e_e_deterministico():
+    unidades = [{"media_name": f"m{i:02d}.png", "peso": peso} for i, peso in enumerate([9, 7, 6, 5, 5, 4, 3, 1])]
+    shards = distribuir(unidades, 3)
+    assert sorted(u['media_name'] for s in shards for u in s['unidades']) == sorted(u['media_name'] for u in unidades)
+    pesos = [s['peso'] for s in shards]
+    assert sum(pesos) == 40 and max(pesos) - min(pesos) <= 1
+    assert distribuir(list(reversed(unidades)), 3) == shards
+
+
+def _linha(media, participante, resposta):
+    return json.dumps({"media_name": media, "participante": participante, "Resposta": resposta}) + '\n'
+
+
+def test_mesclar_substitui_chaves_refeitas_e_e_idempotente(tmp_path, monkeypatch):
+    import eyetracking_analyzer.sharding as sharding
+    monkeypatch.setattr(sharding, 'DASHBOARD_EXPORTAR_AO_FINAL', False)
+    plano = tmp_path / 'plano'
+    plano.mkdir()
+    with _leases(plano, 'a:1') as leases:
+        leases.inicializar(3)
+        for _ in range(2):
+            leases.encerrar(leases.assumir(), True)   # shards 0 e 1 concluídos, 2 pendente
+
+    canonico = tmp_path / 'relatorio.jsonl'
+    canonico.write_text(_linha('x.png', '01', 'antiga') + _linha('a.png', '01', 'ERRO: timeout'), encoding='utf-8')
+    conteudos = {
+        0: _linha('a.png', '01', 'nova') + _linha('a.png', '02', 'ok') + '{"media_name": "incomp',
+        1: _linha('b.png', '01', 'ERRO: cota') + _linha('b.png', '01', 'refeita'),
+        2: _linha('c.png', '01', 'de shard pendente'),
+    }
+    for shard, conteudo in conteudos.items():
+        saida = diretorio_saida_shard(str(plano), shard)
+        (tmp_path / saida).mkdir(parents=True)
+        (tmp_path / saida / canonico.name).write_text(conteudo, encoding='utf-8')
+
+    assert mesclar_shards(str(plano), caminho_jsonl=str(canonico)) == 3
+    primeira = canonico.read_text(encoding='utf-8')
+    registros = [json.loads(linha) for linha in primeira.splitlines()]
+    assert [(r['media_name'], r['participante'], r['Resposta']) for r in registros] == [
+        ('x.png', '01', 'antiga'), ('a.png', '01', 'nova'), ('a.png', '02', 'ok'), ('b.png', '01', 'refeita'),
+    ]
+
+    mesclar_shards(str(plano), caminho_jsonl=str(canonico))
+    assert canonico.read_text(encoding='utf-8') == primeira
+
+    mesclar_shards(str(plano), caminho_jsonl=str(canonico), incluir_parciais=True)
+    assert 'de shard pendente' in canonico.read_text(encoding='utf-8')
+
+
+def test_shard_cujo_processo_falha_nao_e_concluido(tmp_path, monkeypatch):
+    from eyetracking_analyzer.sharding import NOME_PLANO, trabalhar
+    # Sem chave da API o main.py não consegue configurar o backend 'gemini' e deve sair com erro.
+    monkeypatch.setenv('GOOGLE_API_KEY', '')
+    plano = {"parametros": {"participante": None, "media_name": None, "tipo_de_midia": None},
+             "shards": [{"peso": 1, "unidades": [{"media_name": "a.png", "participantes": ["01"], "peso": 1}]}]}
+    (tmp_path / NOME_PLANO).write_text(json.dumps(plano), encoding='utf-8')
+    with _leases(tmp_path, 'a:1') as leases:
+        leases.inicializar(1)
+
+    # O worker tenta de novo até o limite; o shard termina 'falhou', nunca 'concluido'.
+    assert trabalhar(str(tmp_path)) == 0
+    with _leases(tmp_path, 'a:1') as leases:
+        assert [(estado, tentativas) for _, estado, _, _, tentativas in leases.estados()] == \
+            [('falhou', SHARD_MAX_TENTATIVAS)]
+    log = tmp_path / diretorio_saida_shard(str(tmp_path), 0) / 'execucao.log'
+    assert 'Falha na configuração da API' in log.read_text(encoding='utf-8')
@@ -0,0 +1,163 @@
+# tests/test_visualizer.py
+import numpy as np
+import pandas as pd
+import pytest
+from PIL import Image, ImageDraw
+from eyetracking_analyzer.fixation_index import limites_janelas
+from eyetracking_analyzer import visualizer
+from eyetracking_analyzer.visualizer import (
+    calcular_densidades, calcular_densidades_janelas, desenhar_scanpath, renderizar_scanpaths, obter_fonte,
+    gerar_scanpath, gerar_scanpaths_em_lote, PALETA_PARTICIPANTES
+)
+
+
+def _densidade_referencia(xs, ys, largura, altura, pesos=None, resolucao=64):
+    """Soma direta, célula a célula, de uma gaussiana por fixação (sigma pela regra de Scott)."""
+    escala = min(1.0, resolucao / max(largura, altura))
+    gw, gh = max(1, round(largura * escala)), max(1, round(altura * escala))
+    xs, ys = np.asarray(xs, dtype=np.float64), np.asarray(ys, dtype=np.float64)
+    w = np.ones(len(xs)) if pesos is None else np.asarray(pesos, dtype=np.float64)
+    dentro = (xs >= 0) & (xs <= 1) & (ys >= 0) & (ys <= 1)
+    xs, ys, w = xs[dentro], ys[dentro], w[dentro]
+
+    minimo = 0.02 * max(largura, altura)
+    if len(xs) < 2:
+        sx = sy = minimo
+    else:
+        fator = (w.sum() ** 2 / (w ** 2).sum()) ** (-1 / 6)
+        sx = max(np.sqrt(np.cov(xs * largura, aweights=w)) * fator, minimo)
+        sy = max(np.sqrt(np.cov(ys * altura, aweights=w)) * fator, minimo)
+    sx, sy = sx * escala, sy * escala
+
+    densidade = np.zeros((gh, gw))
+    for x, y, peso in zip(xs, ys, w / w.sum()):
+        coluna, linha = min(int(x * gw), gw - 1), min(int(y * gh), gh - 1)
+        for r in range(gh):
+            for c in range(gw):
+                densidade[r, c] += peso * np.exp(-0.5 * ((c - coluna) / sx) ** 2) / (sx * np.sqrt(2 * np.pi)) \
+                    * np.exp(-0.5 * ((r - linha) / sy) ** 2) / (sy * np.sqrt(2 * np.pi))
+    return densidade
+
+
+@pytest.mark.parametrize('ponderar', [False, True])
+def test_densidade_igual_a_soma_direta_de_gaussianas(ponderar):
+    gerador = np.random.default_rng(7)
+    conjuntos = [(gerador.uniform(0, 1, n), gerador.uniform(0, 1, n)) for n in (1, 2, 9)]
+    conjuntos.append((np.array([0.2, 1.2, 0.7]), np.array([0.3, 0.5, -0.1])))  # fixações fora da imagem
+    pesos = [gerador.uniform(0.1, 1.0, len(xs)) for xs, _ in conjuntos] if ponderar else None
+
+    densidades = calcular_densidades(conjuntos, 200, 120, pesos, resolucao=40)
+    assert densidades.shape == (4, 24, 40)
+    for b, (xs, ys) in enumerate(conjuntos):
+        esperado = _densidade_referencia(xs, ys, 200, 120, pesos[b] if ponderar else None, resolucao=40)
+        np.testing.assert_allclose(densidades[b], esperado, rtol=1e-4, atol=1e-8)
+
+
+def test_densidade_orientacao_e_massa():
+    # Imagem larga e fixação fora do centro: linhas = y, colunas = x.
+    densidade = calcular_densidades([(np.array([0.8]), np.array([0.25]))], 400, 200, resolucao=100)[0]
+    assert densidade.shape == (50, 100)
+    assert np.unravel_index(np.argmax(densidade), densidade.shape) == (12, 80)
+    # Longe das bordas quase toda a massa fica na grade; perto do canto, parte dela se perde.
+    assert densidade.sum() == pytest.approx(1.0, abs=1e-3)
+    canto = calcular_densidades([(np.array([0.0]), np.array([0.0]))], 400, 200, resolucao=100)[0]
+    assert 0.25 < canto.sum() < 0.5
+
+
+def _scanpath_por_fixacao(imagem, xs, ys, radius=15):
+    """Desenho original (antes da vetorização): uma fixação por vez, medindo cada rótulo."""
+    largura, altura = imagem.size
+    draw = ImageDraw.Draw(imagem)
+    font = obter_fonte(radius)
+    fixacoes = [(x * largura, y * altura) for x, y in zip(xs, ys)]
+    if len(fixacoes) > 1:
+        draw.line(fixacoes, fill=(66, 135, 245, 200), width=3)
+    for i, (x, y) in enumerate(fixacoes):
+        if i == 0:
+            cor = (46, 204, 113, 255)
+        elif i == len(fixacoes) - 1:
+            cor = (231, 76, 60, 255)
+        else:
+            cor = (52, 152, 219, 255)
+        draw.ellipse([x - radius, y - radius, x + radius, y + radius], fill=cor, outline=(255, 255, 255, 255), width=2)
+        texto = str(i + 1)
+        caixa = draw.textbbox((0, 0), texto, font=font)
+        draw.text((x - (caixa[2] - caixa[0]) / 2, y - (caixa[3] - caixa[1]) / 2), texto, font=font, fill="white")
+
+
+@pytest.mark.parametrize('n', [1, 2, 12])
+def test_scanpath_igual_ao_desenho_por_fixacao(n):
+    gerador = np.random.default_rng(n)
+    xs, ys = gerador.uniform(0, 1, n), gerador.uniform(0, 1, n)
+    base = Image.new('RGBA', (160, 100), (30, 30, 30, 255))
+    esperado = base.copy()
+    _scanpath_por_fixacao(esperado, xs, ys)
+
+    obtido = base.copy()
+    desenhar_scanpath(obtido, xs, ys)
+    assert np.array_equal(np.asarray(obtido), np.asarray(esperado))
+    # O lote (aceita DataFrames, como o caminho antigo) desenha o mesmo em cópias da base.
+    df = pd.DataFrame({'FPOGX': xs, 'FPOGY': ys})
+    lote = renderizar_scanpaths([(df['FPOGX'].to_numpy(), df['FPOGY'].to_numpy())] * 2, base)
+    assert all(np.array_equal(np.asarray(imagem), np.asarray(esperado)) for imagem in lote)
+    assert np.array_equal(np.asarray(base), np.full((100, 160, 4), (30, 30, 30, 255)))
+
+
+def _conjunto(gerador, n):
+    xs, ys = gerador.uniform(-0.05, 1.05, n), gerador.uniform(0, 1, n)  # algumas fora da imagem
+    tempos = np.cumsum(gerador.uniform(0.05, 0.6, n)) + 100.0
+    return xs, ys, tempos, gerador.uniform(0.1, 0.5, n)
+
+
+@pytest.mark.parametrize('ponderar', [False, True])
+def test_janelas_iguais_a_calcular_densidades_por_janela(ponderar):
+    gerador = np.random.default_rng(3)
+    conjuntos = [_conjunto(gerador, n) for n in (1, 6, 20, 40)]
+    segundos = [3.0, None, 1.0, 0.0]
+    pesos = [c[3] for c in conjuntos] if ponderar else None
+
+    janelas = calcular_densidades_janelas([(x, y) for x, y, _, _ in conjuntos], [t for _, _, t, _ in conjuntos],
+                                          segundos, 120, 80, pesos, resolucao=60)
+    assert janelas.shape == (4, 4, 40, 60)
+    for b, (xs, ys, tempos, duracoes) in enumerate(conjuntos):
+        for j, limite in enumerate(limites_janelas(tempos, segundos)):
+            esperado = calcular_densidades([(xs[:limite], ys[:limite])], 120, 80,
+                                           [duracoes[:limite]] if ponderar else None, resolucao=60)[0]
+            np.testing.assert_allclose(janelas[b, j], esperado, rtol=1e-4, atol=1e-7,
+                                       err_msg=f"conjunto {b}, janela {segundos[j]}")
+
+
+def test_lote_de_scanpaths_decodifica_a_base_uma_vez_e_salva_o_mesmo_que_um_a_um(tmp_path, monkeypatch):
+    base = tmp_path / 'midia.png'
+    Image.new('RGB', (120, 90), (200, 180, 160)).save(base)
+    gerador = np.random.default_rng(7)
+    participantes = [pd.DataFrame({'FPOGX': gerador.uniform(0, 1, n), 'FPOGY': gerador.uniform(0, 1, n)})
+                     for n in (1, 4, 9)]
+
+    aberturas = []
+    abrir = visualizer.Image.open
+    monkeypatch.setattr(visualizer.Image, 'open', lambda caminho, *args: aberturas.append(caminho) or abrir(caminho, *args))
+    visualizer._abrir_imagem_base_cache.cache_clear()
+    saidas = [str(tmp_path / f'lote_{i}.png') for i in range(3)]
+    # Aceita DataFrames e dicionários de arrays (como IndiceFixacoes.obter).
+    lista = [participantes[0], {col: participantes[1][col].to_numpy() for col in ('FPOGX', 'FPOGY')}, participantes[2]]
+    assert gerar_scanpaths_em_lote(lista, str(base), saidas)
+    assert aberturas.count(str(base)) == 1
+
+    for i, df in enumerate(participantes):
+        individual = str(tmp_path / f'individual_{i}.png')
+        assert gerar_scanpath(df, str(base), individual)
+        assert np.array_equal(np.asarray(Image.open(saidas[i])), np.asarray(Image.open(individual)))
+    assert aberturas.count(str(base)) == 1  # a base continua em cache entre chamadas
+
+
+def test_sobreposicao_desenha_cada_participante_com_sua_cor():
+    gerador = np.random.default_rng(11)
+    coordenadas = [(gerador.uniform(0, 1, 5), gerador.uniform(0, 1, 5)) for _ in range(len(PALETA_PARTICIPANTES) + 1)]
+    base = Image.new('RGB', (150, 110), (20, 20, 20))
+
+    esperado = base.convert('RGBA')
+    for i, (xs, ys) in enumerate(coordenadas):
+        desenhar_scanpath(esperado, xs, ys, cor=PALETA_PARTICIPANTES[i % len(PALETA_PARTICIPANTES)])
+    [obtido] = renderizar_scanpaths(coordenadas, base, sobrepor=True)
+    assert np.array_equal(np.asarray(obtido), np.asarray(esperado))